@@ -0,0 +1,105 @@
+"""
+Backend routing and hedging benchmark against local mock endpoints.
+
+Starts three mock /v1/chat/completions servers (bench_transport.py) with
+skewed latencies and sends the same calls through services/llmRouter with
+different setups:
+
+- single:  every call to the first backend (what a hardwired endpoint gives)
+- random:  a random backend per call (latency-blind spreading)
+- routed:  lowest latency EWMA, no hedging
+- hedged:  lowest latency EWMA, duplicate to the next backend after its p95
+
+Backends (override with --backends name:latency_ms[:tail_ms:tail_rate]):
+
+- steady: 40 ms
+- spiky:  25 ms, but 4% of calls take 400 ms
+- slow:   120 ms
+
+Usage:
+    python bench_routing.py --calls 600 --concurrency 8
+    python bench_routing.py --backends cpu:300 gpu:60:900:0.05
+"""
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import services.llmRouter as llmRouter
+from bench_transport import start_mock_server
+from services.llmRouter import Backend, LLMRouter
+
+DEFAULT_BACKENDS = ["steady:40", "spiky:25:400:0.04", "slow:120"]
+
+
+def parse_backend(text: str):
+    name, latency, *tail = text.split(":")
+    tail_ms, tail_rate = (float(tail[0]), float(tail[1])) if len(tail) == 2 else (0.0, 0.0)
+    return name, float(latency) / 1000, tail_ms / 1000, tail_rate
+
+
+def percentile(ordered, q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+
+def run_scenario(router: LLMRouter, calls: int, concurrency: int, pick_random: bool):
+    messages = [{"role": "user", "content": "ping"}]
+
+    def one_call(_):
+        start = time.perf_counter()
+        if pick_random:
+            random.choice(router.backends).complete(model="mock", messages=messages)
+        else:
+            router.create(model="mock", messages=messages)
+        return time.perf_counter() - start
+
+    wall = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(one_call, range(calls)))
+    return latencies, time.perf_counter() - wall
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark latency-aware routing and hedging against skewed mocks.")
+    parser.add_argument("--calls", type=int, default=600)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--backends", nargs="+", default=DEFAULT_BACKENDS, help="name:latency_ms[:tail_ms:tail_rate]")
+    args = parser.parse_args(argv)
+
+    backends = [parse_backend(b) for b in args.backends]
+    servers = [start_mock_server(latency, tail, rate) for _, latency, tail, rate in backends]
+    specs = [
+        {"name": name, "base_url": f"http://127.0.0.1:{server.server_address[1]}/v1", "api_key": "bench"}
+        for (name, *_), server in zip(backends, servers)
+    ]
+
+    scenarios = [
+        ("single", specs[:1], False, False),
+        ("random", specs, True, False),
+        ("routed", specs, False, False),
+        ("hedged", specs, False, True),
+    ]
+
+    print(f"{args.calls} calls, concurrency {args.concurrency}, backends: {' '.join(args.backends)}")
+    print(f"{'routing':<8} {'calls/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'hedged':>7}  share")
+    for name, scenario_specs, pick_random, hedge in scenarios:
+        llmRouter.LLM_HEDGE = hedge
+        router = LLMRouter([Backend(spec) for spec in scenario_specs])
+        try:
+            latencies, wall = run_scenario(router, args.calls, args.concurrency, pick_random)
+            status = router.status()
+        finally:
+            router.close()
+        answered = {b["name"]: b["models"].get("mock", {}).get("calls", 0) for b in status["backends"]}
+        total = sum(answered.values()) or 1
+        share = " ".join(f"{n}={c * 100 / total:.0f}%" for n, c in answered.items())
+        print(f"{name:<8} {args.calls / wall:>8.1f} {percentile(latencies, 0.5):>8.1f} {percentile(latencies, 0.95):>8.1f} "
+              f"{percentile(latencies, 0.99):>8.1f} {latencies[-1] * 1000:>8.1f} {status['hedged'] * 100 / args.calls:>6.1f}%  {share}")
+
+    for server in servers:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
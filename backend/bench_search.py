@@ -0,0 +1,98 @@
+"""
+Question search benchmark (services/searchIndex.py) on a synthetic question bank.
+
+Extracts the questions of a sample paper, then records --papers copies of
+it under different paper ids and syllabi, each question with made-up topics,
+confidences and scope, into a scratch database (the real outputs/search.db
+is not touched). Then times typical searches:
+
+- keyword:    "fraction simplest"
+- prefix:     "simul" (search as you type)
+- topic:      one topic, sorted by confidence
+- filtered:   keyword + out of scope + confidence range + one syllabus
+- deep page:  keyword, page 20
+
+Usage:
+    python bench_search.py --papers 200 --repeat 50
+    python bench_search.py --pdf services/samplePaper1.pdf
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import services.searchIndex as searchIndex
+from services.explanations import question_texts
+from services.textExtractorQuestion import extract_questions_from_pdf
+
+TOPICS = [
+    "Algebraic Fractions", "Simultaneous Equations", "Quadratic Equations", "Indices", "Standard Form",
+    "Percentages", "Ratio and Proportion", "Coordinate Geometry", "Trigonometry", "Mensuration",
+    "Probability", "Statistics", "Vectors", "Matrices", "Sets", "Functions and Graphs",
+]
+SYLLABI = [("s-old", "2013 syllabus"), ("s-new", "2020 syllabus")]
+
+
+def build(papers: int, questions_data) -> int:
+    texts = question_texts(questions_data)
+    rng = random.Random(7)
+    rows = 0
+    for n in range(papers):
+        syllabus_id, syllabus_name = SYLLABI[n % len(SYLLABI)]
+        mapping = []
+        for qid in texts:
+            in_syllabus = rng.random() > 0.15
+            mapping.append({
+                "question_id": qid,
+                "page": 3 + rng.randrange(20),
+                "topics": rng.sample(TOPICS, rng.choice((1, 1, 2))),
+                "in_syllabus": in_syllabus,
+                "confidence": round(rng.uniform(0.4, 1.0), 2),
+                "out_of_scope_reason": "" if in_syllabus else "Uses content beyond the syllabus.",
+            })
+        rows += searchIndex.record_paper(f"paper-{n:04d}", texts, {"question_topic_mapping": mapping},
+                                         syllabus_id, syllabus_name)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark question search on a synthetic question bank.")
+    parser.add_argument("--papers", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--pdf", default=str(Path(__file__).resolve().parent / "services" / "samplePaper2.pdf"))
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        questions_data = extract_questions_from_pdf(args.pdf, os.path.join(scratch, "questions.json"))
+        searchIndex.DB_PATH = Path(scratch) / "search.db"
+
+        start = time.perf_counter()
+        rows = build(args.papers, questions_data)
+        print(f"Recorded {rows} mapping rows ({args.papers} papers) in {time.perf_counter() - start:.1f} s")
+
+        queries = [
+            ("keyword", dict(keywords="fraction simplest")),
+            ("prefix", dict(keywords="simul")),
+            ("topic", dict(topic="trigonometry", sort="confidence")),
+            ("filtered", dict(keywords="equation", in_syllabus=False, min_confidence=0.5, max_confidence=0.9,
+                              syllabus_id="s-new")),
+            ("deep page", dict(keywords="find", offset=400)),
+        ]
+        print(f"{'query':<10} {'total':>7} {'mean ms':>8} {'p95 ms':>8}")
+        for name, kwargs in queries:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                found = searchIndex.search(**kwargs)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(0.95 * len(timings)))]
+            print(f"{name:<10} {found['total']:>7} {statistics.mean(timings):>8.2f} {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Startup-time benchmark for the API.
+
+Each measurement runs in a fresh interpreter so module caches do not carry
+over between runs:
+
+- import:  `import main` (module import + default app construction)
+- ready:   import + lifespan startup, i.e. the app can serve its first request
+- prewarm: same as ready with PREWARM_ON_STARTUP=1
+
+Usage:
+    python bench_startup.py --runs 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_SNIPPET = """
+import time
+t = time.perf_counter()
+import main
+print(time.perf_counter() - t)
+"""
+
+READY_SNIPPET = """
+import time
+t = time.perf_counter()
+import main
+from fastapi.testclient import TestClient
+with TestClient(main.create_app()) as c:
+    c.get("/")
+    print(time.perf_counter() - t)
+"""
+
+SCENARIOS = [
+    ("import", IMPORT_SNIPPET, {}),
+    ("ready", READY_SNIPPET, {"PREWARM_ON_STARTUP": "0"}),
+    ("prewarm", READY_SNIPPET, {"PREWARM_ON_STARTUP": "1"}),
+]
+
+
+def time_once(snippet: str, extra_env: dict) -> float:
+    env = {**os.environ, **extra_env}
+    env.setdefault("OPENAI_API_KEY", "bench")
+    out = subprocess.run(
+        [sys.executable, "-c", snippet],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    # Startup may print progress lines; the timing is the last line
+    return float(out.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure API cold-start time.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per scenario")
+    args = parser.parse_args(argv)
+
+    print(f"{'scenario':<10} {'min (s)':>8} {'median (s)':>11} {'max (s)':>8}")
+    for name, snippet, extra_env in SCENARIOS:
+        times = [time_once(snippet, extra_env) for _ in range(args.runs)]
+        print(f"{name:<10} {min(times):>8.3f} {statistics.median(times):>11.3f} {max(times):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Model-call transport benchmark against a local mock endpoint.
+
+Starts a mock /v1/chat/completions server on localhost (fixed simulated
+latency, keep-alive HTTP/1.1) and fires the same number of calls at it with
+three client setups:
+
+- per-call:  a new OpenAI client for every call (no connection reuse)
+- default:   one OpenAI client with the SDK's default transport
+- pooled:    one OpenAI client on the shared pooled transport from
+             config/openai_client.http_client_options()
+
+Overhead is the mean call latency minus the simulated server latency. The
+mock speaks plain HTTP, so this measures pooling and keep-alive only; HTTP/2
+multiplexing and saved TLS handshakes add to the pooled gain against the
+real API.
+
+Usage:
+    python bench_transport.py --calls 400 --concurrency 32 --latency-ms 20
+"""
+
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from openai import OpenAI
+
+from config.openai_client import http_client_options
+
+MOCK_COMPLETION = {
+    "id": "chatcmpl-mock",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "mock",
+    "choices": [{
+        "index": 0,
+        "finish_reason": "stop",
+        "message": {"role": "assistant", "content": "{\"question_topic_mapping\": []}"},
+    }],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+
+def start_mock_server(latency: float, tail_latency: float = 0.0, tail_rate: float = 0.0) -> ThreadingHTTPServer:
+    """Mock endpoint answering after `latency` seconds (`tail_latency` for a `tail_rate` fraction of calls)."""
+    body = json.dumps(MOCK_COMPLETION).encode("utf-8")
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out as separate writes; with Nagle on, keep-alive
+        # replies wait for the client's delayed ACK (~40 ms)
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(tail_latency if tail_rate and random.random() < tail_rate else latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        # The default listen backlog of 5 resets connections under fan-out
+        request_queue_size = 256
+
+    server = Server(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_scenario(make_client, calls: int, concurrency: int, shared: bool):
+    shared_client = make_client() if shared else None
+    messages = [{"role": "user", "content": "ping"}]
+
+    def one_call(_):
+        client = shared_client or make_client()
+        start = time.perf_counter()
+        client.chat.completions.create(model="mock", messages=messages)
+        elapsed = time.perf_counter() - start
+        if not shared:
+            client.close()
+        return elapsed
+
+    wall = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one_call, range(calls)))
+    wall = time.perf_counter() - wall
+
+    if shared_client is not None:
+        shared_client.close()
+    return latencies, wall
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark model-call transports against a local mock.")
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Simulated server latency per call")
+    args = parser.parse_args(argv)
+
+    latency = args.latency_ms / 1000
+    server = start_mock_server(latency)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    scenarios = [
+        ("per-call", lambda: OpenAI(api_key="bench", base_url=base_url, max_retries=0), False),
+        ("default", lambda: OpenAI(api_key="bench", base_url=base_url, max_retries=0), True),
+        ("pooled", lambda: OpenAI(api_key="bench", base_url=base_url, max_retries=0,
+                                  http_client=httpx.Client(**http_client_options())), True),
+    ]
+
+    print(f"{args.calls} calls, concurrency {args.concurrency}, server latency {args.latency_ms:g} ms")
+    print(f"{'transport':<10} {'calls/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'overhead ms':>12}")
+    for name, make_client, shared in scenarios:
+        latencies, wall = run_scenario(make_client, args.calls, args.concurrency, shared)
+        ordered = sorted(latencies)
+        p50 = statistics.median(ordered) * 1000
+        p95 = ordered[int(len(ordered) * 0.95) - 1] * 1000
+        overhead = (statistics.mean(ordered) - latency) * 1000
+        print(f"{name:<10} {args.calls / wall:>8.1f} {p50:>8.1f} {p95:>8.1f} {overhead:>12.1f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
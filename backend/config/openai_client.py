@@ -14,23 +14,136 @@ Usage:
     result = await call_openai("Your prompt here")
 """
 
-from openai import AsyncOpenAI
 import os
+import threading
 from dotenv import load_dotenv
 from typing import Dict, Any, Optional
 import json
 
-# Load environment variables
+# Load environment variables (the only place the backend reads .env)
 load_dotenv()
 
-# Initialize OpenAI client
-client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# HTTP transport shared by every model call. Pool sizes should cover the
+# largest fan-out (bulk analysis runs BULK_LLM_CONCURRENCY calls at once).
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "16"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+# Default read timeout; services pass tighter per-call timeouts where it matters
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+# HTTP/2 multiplexes concurrent calls over one TLS connection; needs the h2 package
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "1").lower() in ("1", "true", "yes")
+
+# Clients are created on first use (or by the app lifespan) so importing this
+# module does not pull in the openai package. One sync client serves every
+# service; the async client backs call_openai().
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def _http2_available() -> bool:
+    if not LLM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def http_client_options() -> Dict[str, Any]:
+    """Keyword arguments for the pooled httpx client behind the OpenAI clients."""
+    import httpx
+
+    return {
+        "http2": _http2_available(),
+        "limits": httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+    }
+
+
+def get_client():
+    """Shared sync OpenAI client on the pooled transport, created on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import httpx
+                from openai import OpenAI
+                _client = OpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    http_client=httpx.Client(**http_client_options()),
+                    max_retries=2
+                )
+    return _client
+
+
+def get_async_client():
+    """Shared async OpenAI client on the pooled transport, created on first use."""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                import httpx
+                from openai import AsyncOpenAI
+                _async_client = AsyncOpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    http_client=httpx.AsyncClient(**http_client_options()),
+                    max_retries=2
+                )
+    return _async_client
+
+
+async def close_clients() -> None:
+    """Close the shared clients (called from the app lifespan on shutdown)."""
+    global _client, _async_client
+    with _client_lock:
+        client, async_client = _client, _async_client
+        _client = _async_client = None
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        await async_client.close()
+
+
+def __getattr__(name: str):
+    # Keeps `from config.openai_client import client` working without an eager client
+    if name == "client":
+        return get_async_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # Default settings - Using gpt-4o (best model)
 DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
 DEFAULT_TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", "0.3"))
 DEFAULT_MAX_TOKENS = int(os.getenv("OPENAI_MAX_TOKENS", "2000"))
 
+# Model cascades - cheapest/fastest tier first. An answer is re-submitted to the
+# next tier when its confidence is below the threshold (or it is flagged
+# "Unknown Topic, Needs Review"). Override with comma-separated env vars.
+MAPPING_MODEL_TIERS = [m.strip() for m in os.getenv("MAPPING_MODEL_TIERS", "gpt-4o-mini,gpt-4o").split(",") if m.strip()]
+MAPPING_CONFIDENCE_THRESHOLD = float(os.getenv("MAPPING_CONFIDENCE_THRESHOLD", "0.75"))
+
+SYLLABUS_DIFF_MODEL_TIERS = [m.strip() for m in os.getenv("SYLLABUS_DIFF_MODEL_TIERS", "gpt-4o-mini,gpt-5.2").split(",") if m.strip()]
+SYLLABUS_DIFF_CONFIDENCE_THRESHOLD = float(os.getenv("SYLLABUS_DIFF_CONFIDENCE_THRESHOLD", "0.7"))
+
+# Concurrent model calls of one bulk analysis, across all its papers; also
+# the most a /api/analyze-papers-bulk request may ask for
+BULK_LLM_CONCURRENCY = int(os.getenv("BULK_LLM_CONCURRENCY", "8"))
+
+# Module-mapping comparison (score and justification), a single call
+COMPARISON_MODEL = os.getenv("COMPARISON_MODEL", "gpt-4o-mini")
+
+# Per-call read timeouts (seconds): one question chunk / one syllabus section
+# is small, whole-document prompts get the longer default
+MAPPING_CALL_TIMEOUT = float(os.getenv("MAPPING_CALL_TIMEOUT", "60"))
+SECTION_DIFF_CALL_TIMEOUT = float(os.getenv("SECTION_DIFF_CALL_TIMEOUT", "60"))
+
 
 async def call_openai(
     prompt: str,
@@ -77,7 +190,7 @@ async def call_openai(
         if response_format:
             kwargs["response_format"] = response_format
         
-        response = await client.chat.completions.create(**kwargs)
+        response = await get_async_client().chat.completions.create(**kwargs)
         return response.choices[0].message.content
     
     except Exception as e:
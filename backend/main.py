@@ -1,73 +1,293 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import APIRouter, FastAPI, UploadFile, File, Form, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from typing import List
+from datetime import datetime
 import os
 import json
 from pathlib import Path
-import fitz  # PyMuPDF
-from io import BytesIO
 import re
-from services.syllabusJsonCreator import generate_syllabus_json, generate_syllabus_comparison_with_score
-from services.comparePrompt import map_questions_to_syllabus
-from services.textExtractorQuestion import extract_questions_from_pdf
+import shutil
+import uuid
+from services.syllabusJsonCreator import generate_syllabus_json, generate_syllabus_comparison_with_score, diff_registered_versions, changes_since, COMPARISON_PROMPT_VERSION
+from services.syllabusVersions import register_version, list_versions, version_chain, version_doc_hashes, SECTION_DIFF_PROMPT_VERSION
+from services.comparePrompt import map_questions_to_syllabus, prompt_version, MAPPING_PROMPT_VERSION
+from services.reportCache import make_report_id, etag_for, etag_matches, not_modified, report_response, load_report, save_report
+from services.uploadStore import resolve_upload, save_upload, stored_blob, valid_sha256
+from services.failsafe import CircuitOpenError, breaker_status, get_breaker
+from services.deadline import CLIENT_DISCONNECTED, RequestCancelled
+from services.admission import admission_status, admit
+from services.singleFlight import flight_status, idempotency_key, replay, run_once
+from services.profiling import PROFILE_FORMATS, list_profiles, profile_file, profile_request, require_profile_access
+from services.llmRouter import close_router, get_router, router_status
+from services.pageRender import (CROP_ZOOM, THUMBNAIL_ZOOM, PageNotFound, close_renderer, crop_etag, find_region,
+                                 page_etag, question_regions, render_page, render_region, render_status, save_regions)
+from config.openai_client import BULK_LLM_CONCURRENCY, close_clients, get_client
 
+# PyMuPDF, pandas/pyarrow (coverage store) and the openai package are imported
+# inside the handlers that need them so a worker starts without loading them.
+# Set PREWARM_ON_STARTUP=1 to load them (and the on-disk stores) before serving.
+PREWARM_ON_STARTUP = os.getenv("PREWARM_ON_STARTUP", "0").lower() in ("1", "true", "yes")
 
-async def extract_text_from_pdf(file: UploadFile) -> str:
+# analyze-paper and compare-syllabi-detailed return terse reports by default;
+# explanations are generated when a row is expanded (see services/explanations.py)
+TERSE_RESPONSES = os.getenv("TERSE_RESPONSES", "1").lower() in ("1", "true", "yes")
+
+
+def extract_text_from_path(pdf_path: str) -> str:
     """
-    Extract text content from a PDF file using PyMuPDF.
+    Extract text content from a PDF on disk using PyMuPDF.
+    Opening by path lets MuPDF read pages from the file instead of an in-memory copy.
     
     Args:
-        file: UploadFile object from FastAPI
+        pdf_path: Path to the PDF file
         
     Returns:
         str: Extracted text from all pages of the PDF
     """
+    from services.pdfDocument import pdf_text
+
     try:
-        # Read file content
-        content = await file.read()
-        
-        # Open PDF from bytes
-        pdf_document = fitz.open(stream=content, filetype="pdf")
-        
-        # Extract text from all pages
-        text = ""
-        for page_num in range(pdf_document.page_count):
-            page = pdf_document[page_num]
-            text += page.get_text()
-        
-        pdf_document.close()
-        
-        return text.strip()
+        # Extract text from all pages; the document is closed even if a page fails
+        return pdf_text(pdf_path).strip()
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error extracting PDF text: {str(e)}")
 
 
-app = FastAPI(title="Syllabus Alignment API", version="1.0.0")
+async def extract_text_from_pdf(file: UploadFile) -> str:
+    """
+    Extract text content from an uploaded PDF.
+    The upload is streamed to disk (see services/uploadStore.py) rather than read into memory.
+    
+    Args:
+        file: UploadFile object from FastAPI
+        
+    Returns:
+        str: Extracted text from all pages of the PDF
+    """
+    stored = await save_upload(file)
+    return extract_text_from_path(stored["path"])
+
+
+def report_or_stale(report_id: str, content: dict) -> JSONResponse:
+    """Stored report with its ETag, or a stale fallback result (never cached)."""
+    if content.get("stale"):
+        return JSONResponse(content=content)
+    return report_response(content, report_id)
+
+
+def document_name(file: UploadFile, filename: str, default: str) -> str:
+    """Filename of an uploaded file, or the one sent alongside a hash-only reference."""
+    if file is not None:
+        return file.filename
+    return filename or default
+
+
+# Syllabi accepted by one /api/analyze-paper-multi request
+MAX_SYLLABI_PER_ANALYSIS = int(os.getenv("MAX_SYLLABI_PER_ANALYSIS", "6"))
 
-# CORS middleware for Next.js frontend
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000"],  # Next.js dev server
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Reject oversized multipart bodies before they are parsed and spooled
+MAX_REQUEST_BYTES = int(float(os.getenv("MAX_REQUEST_MB", "200")) * 1024 * 1024)
 
-# Ensure directories exist
 UPLOAD_DIR = Path("uploads")
 OUTPUT_DIR = Path("outputs")
-UPLOAD_DIR.mkdir(exist_ok=True)
-OUTPUT_DIR.mkdir(exist_ok=True)
+
+router = APIRouter()
+
+
+async def limit_request_size(request: Request, call_next):
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_REQUEST_BYTES:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Request body exceeds the {MAX_REQUEST_BYTES / (1024 * 1024):g} MB limit"}
+        )
+    return await call_next(request)
+
+
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    """Model service is down and there is no stored answer to fall back on."""
+    retry_in = get_breaker().status()["retry_in_seconds"]
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "circuit": breaker_status()},
+        headers={"Retry-After": str(max(1, int(retry_in)))}
+    )
+
+
+async def request_cancelled_handler(request: Request, exc: RequestCancelled):
+    """
+    The computation ran out of time (504) or its client left (499, logged
+    only). Finished mapping chunks are checkpointed; a retry resumes from them.
+    """
+    if exc.reason == CLIENT_DISCONNECTED:
+        return JSONResponse(status_code=499, content={"detail": str(exc)})
+    return JSONResponse(
+        status_code=504,
+        content={"detail": f"{exc}; finished parts were kept, retry to resume", "resumable": True}
+    )
+
+
+def prewarm() -> None:
+    """Load heavy modules, the shared client and the on-disk stores ahead of the first request."""
+    import fitz  # noqa: F401
+    import services.textExtractorQuestion  # noqa: F401
+    from services.coverageStore import list_syllabi
+
+    get_client()
+    get_router()
+    versions = list_versions()
+    syllabi = list_syllabi()
+    print(f"🔥 Pre-warmed: {len(versions)} syllabus version(s), {len(syllabi)} syllabus coverage set(s)")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    UPLOAD_DIR.mkdir(exist_ok=True)
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    if app.state.prewarm:
+        await run_in_threadpool(prewarm)
+    yield
+    close_router()
+    close_renderer()
+    await close_clients()
+
+
+def create_app(prewarm: bool = PREWARM_ON_STARTUP) -> FastAPI:
+    """
+    Build the API app.
+
+    Args:
+        prewarm: Load heavy modules and stores during startup instead of on first use
+
+    Returns:
+        FastAPI: Configured app
+    """
+    app = FastAPI(title="Syllabus Alignment API", version="1.0.0", lifespan=lifespan)
+    app.state.prewarm = prewarm
+
+    # CORS middleware for Next.js frontend
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:3000"],  # Next.js dev server
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["ETag", "Retry-After", "X-Profile-Id"],
+    )
+    app.middleware("http")(limit_request_size)
+    # Opt-in pyinstrument profiling of single requests (PROFILE_TOKEN)
+    app.middleware("http")(profile_request)
+
+    # Compress large JSON reports; prefer brotli when the optional package is installed
+    try:
+        from brotli_asgi import BrotliMiddleware
+        app.add_middleware(BrotliMiddleware, minimum_size=1024, gzip_fallback=True)
+    except ImportError:
+        app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+    app.add_exception_handler(CircuitOpenError, circuit_open_handler)
+    app.add_exception_handler(RequestCancelled, request_cancelled_handler)
+    app.include_router(router)
+    return app
 
 
-@app.get("/")
+@router.get("/")
 async def root():
     """Health check endpoint"""
     return {"status": "ok", "message": "Syllabus Alignment API is running"}
 
 
-@app.post("/api/upload-syllabus")
+@router.get("/api/health/llm")
+async def llm_health():
+    """Circuit breaker state for the model service, and live latency per model backend."""
+    return {"status": "ok", "breakers": breaker_status(), "routing": router_status()}
+
+
+@router.get("/api/health/admission")
+async def admission_health():
+    """Slots, queue lengths, wait times and rejections per endpoint class, plus coalesced computations."""
+    return {"status": "ok", "classes": admission_status(), "flights": flight_status()}
+
+
+@router.get("/api/profiles")
+async def get_profiles(request: Request, limit: int = Query(20, ge=1, le=200)):
+    """
+    Recent request and CLI profiles, newest first.
+    Requires PROFILE_TOKEN (X-Profile header or ?profile=); answers 404 otherwise.
+    """
+    require_profile_access(request)
+    return {"success": True, "profiles": list_profiles(limit)}
+
+
+@router.get("/api/profiles/{profile_id}")
+async def get_profile(request: Request, profile_id: str, part: str = Query(None), format: str = Query("html")):
+    """
+    One stored profile as pyinstrument HTML, speedscope JSON or text.
+    `part` is "request" (event loop) or "worker" (threadpool computation); defaults
+    to the worker part when there is one.
+    """
+    require_profile_access(request)
+    if format not in PROFILE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(PROFILE_FORMATS)}")
+    parts = [part] if part else ["worker", "request"]
+    for candidate in parts:
+        path = profile_file(profile_id, candidate, format)
+        if path is not None:
+            return FileResponse(path, media_type=PROFILE_FORMATS[format][1])
+    raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+
+
+@router.get("/api/uploads/negotiate")
+async def negotiate_uploads(sha256: List[str] = Query(...)):
+    """
+    Ask which documents the server already holds, by SHA-256 of the file bytes.
+    Known documents can be referenced by hash (the `*_sha256` form fields of the
+    analysis endpoints) instead of being uploaded again.
+    """
+    from services.pdfLayout import LAYOUT_DIR
+
+    documents = []
+    for digest in sha256:
+        digest = digest.lower()
+        if not valid_sha256(digest):
+            raise HTTPException(status_code=400, detail=f"Invalid sha256: {digest}")
+        stored = stored_blob(digest)
+        documents.append({
+            "sha256": digest,
+            "known": stored is not None,
+            "size": stored["size"] if stored else None,
+            "artifacts": {
+                # Parsed span layout (PDF_LAYOUT_CACHE): re-parsing skips MuPDF
+                "layout": stored is not None and (LAYOUT_DIR / f"{digest}.spans.npy").exists()
+            }
+        })
+    return JSONResponse(content={"success": True, "documents": documents})
+
+
+@router.post("/api/uploads")
+async def upload_blob(file: UploadFile = File(...)):
+    """
+    Store a PDF content-addressed (uploads/blobs/<sha256>.pdf) so later requests
+    can reference it by hash. Sending an already stored file is a no-op.
+    """
+    if not file.filename.endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+
+    stored = await save_upload(file)
+    return JSONResponse(content={
+        "success": True,
+        "sha256": stored["sha256"],
+        "size": stored["size"],
+        "filename": stored["filename"]
+    })
+
+
+@router.post("/api/upload-syllabus")
 async def upload_syllabus(
     file: UploadFile = File(...)
     ):
@@ -90,48 +310,100 @@ async def upload_syllabus(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/diff-syllabus")
+def build_diff_report(report_id: str, old_stored: dict, new_stored: dict, old_filename: str, new_filename: str) -> dict:
+    """
+    Diff two syllabi and store the report (blocking; runs in the threadpool).
+    Returns the report content, marked "stale" when it came from the failsafe fallback.
+    """
+    # An identical request may have finished while this one waited for a slot
+    cached = load_report(report_id)
+    if cached is not None:
+        return cached
+
+    # Extract text from PDFs (doc_old and doc_new)
+    doc_old = extract_text_from_path(old_stored["path"])
+    doc_new = extract_text_from_path(new_stored["path"])
+
+    # Use generate_syllabus_json function from services
+    json_result = generate_syllabus_json(
+        doc_old=doc_old,
+        doc_new=doc_new,
+        old_filename=old_filename,
+        new_filename=new_filename
+    )
+
+    # Debug: Print what we got back
+    print(f"🔍 DEBUG - OpenAI returned: {json_result[:500]}...")
+
+    # Parse the JSON string result
+    diff_report = json.loads(json_result)
+    print(f"🔍 DEBUG - Parsed report keys: {diff_report.keys()}")
+    print(f"🔍 DEBUG - syllabi_diff content: {diff_report.get('syllabi_diff', 'NOT FOUND')}")
+
+    content = {
+        "success": True,
+        "old_file": old_filename,
+        "new_file": new_filename,
+        "report": diff_report
+    }
+    if diff_report.get("stale"):
+        # Last-known-good answers are served but never cached as the report
+        return {**content, "stale": True}
+    save_report(report_id, content)
+    return content
+
+
+@router.post("/api/diff-syllabus")
 async def diff_syllabus(
-    old_syllabus: UploadFile = File(...),
-    new_syllabus: UploadFile = File(...)
+    request: Request,
+    old_syllabus: UploadFile = File(None),
+    new_syllabus: UploadFile = File(None),
+    old_syllabus_sha256: str = Form(None),
+    new_syllabus_sha256: str = Form(None),
+    old_syllabus_filename: str = Form(None),
+    new_syllabus_filename: str = Form(None)
 ):
     """
     Compare two syllabus PDFs (old vs new) using OpenAI.
     Uses generate_syllabus_json from syllabusJsonCreator.py
     Returns JSON with topic_name, status, description fields.
+    The same pair of PDFs is served from the report cache (see GET /api/reports/{report_id}),
+    and identical concurrent requests share one computation (Idempotency-Key supported).
     """
+    key = idempotency_key(request, "diff-syllabus")
     try:
+        replayed = await replay(key, request)
+        if replayed is not None:
+            return report_or_stale(*replayed)
+
+        old_filename = document_name(old_syllabus, old_syllabus_filename, "old_syllabus.pdf")
+        new_filename = document_name(new_syllabus, new_syllabus_filename, "new_syllabus.pdf")
+
         # Validate file types
-        if not (old_syllabus.filename.endswith('.pdf') and new_syllabus.filename.endswith('.pdf')):
+        if not (old_filename.endswith('.pdf') and new_filename.endswith('.pdf')):
             raise HTTPException(status_code=400, detail="Both files must be PDFs")
-        
-        # Extract text from PDFs (doc_old and doc_new)
-        doc_old = await extract_text_from_pdf(old_syllabus)
-        doc_new = await extract_text_from_pdf(new_syllabus)
-        
-        # Use generate_syllabus_json function from services
-        json_result = generate_syllabus_json(
-            doc_old=doc_old,
-            doc_new=doc_new,
-            old_filename=old_syllabus.filename,
-            new_filename=new_syllabus.filename
+
+        # Stream both uploads to disk, hashing on the way (or reuse blobs sent by hash)
+        old_stored = await resolve_upload(old_syllabus, old_syllabus_sha256, old_filename)
+        new_stored = await resolve_upload(new_syllabus, new_syllabus_sha256, new_filename)
+
+        report_id = make_report_id("diff-syllabus", SECTION_DIFF_PROMPT_VERSION, old_stored["sha256"], new_stored["sha256"])
+        cached = load_report(report_id)
+        if cached is not None:
+            print(f"♻️  Serving cached diff report {report_id[:12]}")
+            return report_response(cached, report_id)
+
+        content = await run_once(
+            report_id,
+            lambda: build_diff_report(report_id, old_stored, new_stored, old_filename, new_filename),
+            lambda: admit("syllabus", request),
+            key,
+            request,
         )
-        
-        # Debug: Print what we got back
-        print(f"🔍 DEBUG - OpenAI returned: {json_result[:500]}...")
-        
-        # Parse the JSON string result
-        diff_report = json.loads(json_result)
-        print(f"🔍 DEBUG - Parsed report keys: {diff_report.keys()}")
-        print(f"🔍 DEBUG - syllabi_diff content: {diff_report.get('syllabi_diff', 'NOT FOUND')}")
-        
-        return JSONResponse(content={
-            "success": True,
-            "old_file": old_syllabus.filename,
-            "new_file": new_syllabus.filename,
-            "report": diff_report
-        })
-    
+        return report_or_stale(report_id, content)
+
+    except (HTTPException, CircuitOpenError, RequestCancelled):
+        raise
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
@@ -139,40 +411,101 @@ async def diff_syllabus(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/compare-syllabi-detailed")
+def build_comparison_report(report_id: str, old_stored: dict, new_stored: dict,
+                            old_filename: str, new_filename: str, terse: bool) -> dict:
+    """
+    Score a module mapping and store the report (blocking; runs in the threadpool).
+    Returns the report content, marked "stale" when it came from the failsafe fallback.
+    """
+    from services.explanations import save_context
+
+    # An identical request may have finished while this one waited for a slot
+    cached = load_report(report_id)
+    if cached is not None:
+        return cached
+
+    # Extract text from PDFs
+    doc_old = extract_text_from_path(old_stored["path"])
+    doc_new = extract_text_from_path(new_stored["path"])
+
+    # Use new comparison function with similarity score
+    json_result = generate_syllabus_comparison_with_score(
+        doc_old=doc_old,
+        doc_new=doc_new,
+        old_filename=old_filename,
+        new_filename=new_filename,
+        terse=terse
+    )
+
+    # Parse and return the AI response directly
+    comparison_report = json.loads(json_result)
+    comparison_report["success"] = True
+    comparison_report["old_file"] = old_filename
+    comparison_report["new_file"] = new_filename
+
+    if comparison_report.get("stale"):
+        return comparison_report
+    save_report(report_id, comparison_report)
+    save_context(report_id, {
+        "kind": "comparison",
+        "old_sha256": old_stored["sha256"],
+        "new_sha256": new_stored["sha256"],
+        "old_filename": old_filename,
+        "new_filename": new_filename,
+    })
+    return comparison_report
+
+
+@router.post("/api/compare-syllabi-detailed")
 async def compare_syllabi_detailed(
-    old_syllabus: UploadFile = File(...),
-    new_syllabus: UploadFile = File(...)
+    request: Request,
+    old_syllabus: UploadFile = File(None),
+    new_syllabus: UploadFile = File(None),
+    old_syllabus_sha256: str = Form(None),
+    new_syllabus_sha256: str = Form(None),
+    old_syllabus_filename: str = Form(None),
+    new_syllabus_filename: str = Form(None),
+    terse: bool = Form(TERSE_RESPONSES)
 ):
     """
     Compare two syllabus PDFs with detailed similarity score and AI justification.
-    Returns format matching the Syllabus Mapping Result UI.
+    Returns format matching the Syllabus Mapping Result UI. With `terse` the
+    justification is left out; fetch it from GET /api/reports/{report_id}/justification.
+    Identical concurrent requests share one computation (Idempotency-Key supported).
     """
+    key = idempotency_key(request, "compare-syllabi")
     try:
+        replayed = await replay(key, request)
+        if replayed is not None:
+            return report_or_stale(*replayed)
+
+        old_filename = document_name(old_syllabus, old_syllabus_filename, "old_syllabus.pdf")
+        new_filename = document_name(new_syllabus, new_syllabus_filename, "new_syllabus.pdf")
+
         # Validate file types
-        if not (old_syllabus.filename.endswith('.pdf') and new_syllabus.filename.endswith('.pdf')):
+        if not (old_filename.endswith('.pdf') and new_filename.endswith('.pdf')):
             raise HTTPException(status_code=400, detail="Both files must be PDFs")
-        
-        # Extract text from PDFs
-        doc_old = await extract_text_from_pdf(old_syllabus)
-        doc_new = await extract_text_from_pdf(new_syllabus)
-        
-        # Use new comparison function with similarity score
-        json_result = generate_syllabus_comparison_with_score(
-            doc_old=doc_old,
-            doc_new=doc_new,
-            old_filename=old_syllabus.filename,
-            new_filename=new_syllabus.filename
+
+        old_stored = await resolve_upload(old_syllabus, old_syllabus_sha256, old_filename)
+        new_stored = await resolve_upload(new_syllabus, new_syllabus_sha256, new_filename)
+
+        report_id = make_report_id("compare-syllabi", prompt_version(COMPARISON_PROMPT_VERSION, terse), old_stored["sha256"], new_stored["sha256"])
+        cached = load_report(report_id)
+        if cached is not None:
+            print(f"♻️  Serving cached comparison report {report_id[:12]}")
+            return report_response(cached, report_id)
+
+        content = await run_once(
+            report_id,
+            lambda: build_comparison_report(report_id, old_stored, new_stored, old_filename, new_filename, terse),
+            lambda: admit("syllabus", request),
+            key,
+            request,
         )
-        
-        # Parse and return the AI response directly
-        comparison_report = json.loads(json_result)
-        comparison_report["success"] = True
-        comparison_report["old_file"] = old_syllabus.filename
-        comparison_report["new_file"] = new_syllabus.filename
-        
-        return JSONResponse(content=comparison_report)
-    
+        return report_or_stale(report_id, content)
+
+    except (HTTPException, CircuitOpenError, RequestCancelled):
+        raise
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
@@ -180,7 +513,147 @@ async def compare_syllabi_detailed(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/upload-paper")
+@router.post("/api/syllabus-versions")
+async def register_syllabus_version(
+    label: str = Form(...),
+    file: UploadFile = File(...)
+):
+    """
+    Register a syllabus PDF as a named version (e.g. "2025").
+    Section hashes are stored so later diffs only re-check changed sections.
+    """
+    try:
+        if not file.filename.endswith('.pdf'):
+            raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+
+        text = await extract_text_from_pdf(file)
+        version = register_version(label, text, source_filename=file.filename)
+
+        return JSONResponse(content={"success": True, **version})
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/syllabus-versions")
+async def get_syllabus_versions():
+    """List registered syllabus versions in chain order."""
+    return JSONResponse(content={"success": True, "versions": list_versions()})
+
+
+def build_version_diff_report(report_id: str, old: str, new: str) -> dict:
+    """
+    Diff two registered syllabus versions and store the report (blocking; runs in the threadpool).
+    Returns the report content, marked "stale" when it came from the failsafe fallback.
+    """
+    cached = load_report(report_id)
+    if cached is not None:
+        return cached
+
+    entries = diff_registered_versions(old, new)
+    content = {
+        "success": True,
+        "old_version": old,
+        "new_version": new,
+        "report": {"syllabi_diff": entries}
+    }
+    if any(e.get("stale") for e in entries):
+        return {**content, "stale": True}
+    save_report(report_id, content)
+    return content
+
+
+def build_changes_since_report(report_id: str, label: str, until: str) -> dict:
+    """
+    Compose the changes since a version and store the report (blocking; runs in the threadpool).
+    Returns the report content, marked "stale" when it came from the failsafe fallback.
+    """
+    cached = load_report(report_id)
+    if cached is not None:
+        return cached
+
+    result = changes_since(label, until)
+    content = {
+        "success": True,
+        "since": label,
+        "chain": result["chain"],
+        "steps": result["steps"],
+        "report": {"syllabi_diff": result["syllabi_diff"]}
+    }
+    if any(e.get("stale") for e in result["syllabi_diff"]):
+        return {**content, "stale": True}
+    save_report(report_id, content)
+    return content
+
+
+@router.get("/api/syllabus-versions/diff")
+async def diff_syllabus_versions(request: Request, old: str, new: str):
+    """
+    Diff two registered syllabus versions.
+    Unchanged sections are skipped and changed section pairs come from the cache when seen before.
+    """
+    try:
+        hashes = await run_in_threadpool(version_doc_hashes, [old, new])
+        report_id = make_report_id("version-diff", SECTION_DIFF_PROMPT_VERSION, *hashes)
+        if etag_matches(request, etag_for(report_id)):
+            return not_modified(etag_for(report_id))
+        cached = load_report(report_id)
+        if cached is not None:
+            return report_response(cached, report_id)
+
+        content = await run_once(
+            report_id,
+            lambda: build_version_diff_report(report_id, old, new),
+            lambda: admit("syllabus", request),
+            request=request,
+        )
+        return report_or_stale(report_id, content)
+
+    except (HTTPException, CircuitOpenError, RequestCancelled):
+        raise
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/syllabus-versions/changes-since/{label}")
+async def syllabus_changes_since(request: Request, label: str, until: str = None):
+    """
+    What changed since version `label`, composed from the stored step diffs
+    along the version chain (e.g. 2023 -> 2024 -> 2025 -> 2026).
+    """
+    try:
+        chain = await run_in_threadpool(version_chain, label, until)
+        hashes = await run_in_threadpool(version_doc_hashes, chain)
+        report_id = make_report_id("changes-since", SECTION_DIFF_PROMPT_VERSION, *hashes)
+        if etag_matches(request, etag_for(report_id)):
+            return not_modified(etag_for(report_id))
+        cached = load_report(report_id)
+        if cached is not None:
+            return report_response(cached, report_id)
+
+        content = await run_once(
+            report_id,
+            lambda: build_changes_since_report(report_id, label, until),
+            lambda: admit("syllabus", request),
+            request=request,
+        )
+        return report_or_stale(report_id, content)
+
+    except (HTTPException, CircuitOpenError, RequestCancelled):
+        raise
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/api/upload-paper")
 async def upload_paper(file: UploadFile = File(...)):
     """
     Upload a practice paper PDF and save it to the uploads directory.
@@ -191,150 +664,246 @@ async def upload_paper(file: UploadFile = File(...)):
         if not file.filename.endswith('.pdf'):
             raise HTTPException(status_code=400, detail="Only PDF files are allowed")
         
-        # Save file to uploads directory
-        file_path = UPLOAD_DIR / file.filename
-        content = await file.read()
-        
-        with open(file_path, "wb") as f:
-            f.write(content)
+        # Stream file to uploads directory
+        stored = await save_upload(file, UPLOAD_DIR / Path(file.filename).name)
         
         return JSONResponse(content={
             "success": True,
             "filename": file.filename,
-            "file_path": str(file_path),
+            "file_path": stored["path"],
+            "sha256": stored["sha256"],
+            "size": stored["size"],
             "message": "Paper uploaded and saved successfully."
         })
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/analyze-paper")
+def build_paper_analysis(report_id: str, paper_stored: dict, syllabus_stored: dict,
+                         paper_name: str, syllabus_name: str, terse: bool) -> dict:
+    """
+    Extract, map and store one paper's analysis report (blocking; runs in the threadpool).
+    Returns the report content, marked "stale" when it came from the failsafe fallback.
+    """
+    from services.textExtractorQuestion import extract_questions_from_pdf
+
+    # An identical request may have finished while this one waited for a slot
+    cached = load_report(report_id)
+    if cached is not None:
+        return cached
+
+    uploads_dir = UPLOAD_DIR
+    paper_path = Path(paper_stored["path"])
+    syllabus_path = Path(syllabus_stored["path"])
+
+    # Extract questions
+    print("\n🔍 Extracting questions from PDF...")
+    questions_json_path = uploads_dir / f"questions_{report_id[:16]}.json"
+    extract_questions_from_pdf(str(paper_path), str(questions_json_path), paper_id=paper_name)
+    
+    # Load the extracted questions
+    with open(questions_json_path, "r", encoding="utf-8") as f:
+        questions_data = json.load(f)
+    # Kept for question crops (GET /api/documents/{sha256}/questions/...)
+    save_regions(paper_stored["sha256"], questions_data.get("regions"))
+    
+    print(f"✅ Questions extracted: {type(questions_data)}")
+    print(f"📝 Questions data keys: {list(questions_data.keys()) if isinstance(questions_data, dict) else 'Not a dict'}")
+    if isinstance(questions_data, dict) and 'questions' in questions_data:
+        print(f"📊 Number of questions: {len(questions_data['questions'])}")
+        if questions_data['questions']:
+            print(f"🔢 First question ID: {questions_data['questions'][0].get('id', 'N/A')}")
+    
+    # Extract syllabus text
+    print("\n📤 Extracting text from syllabus PDF...")
+    from services.pdfDocument import open_pdf
+
+    syllabus_text = ""
+    with open_pdf(syllabus_path) as syllabus_doc:
+        for page_num, page in enumerate(syllabus_doc):
+            page_text = page.get_text()
+            syllabus_text += page_text
+            print(f"📄 Page {page_num + 1}: {len(page_text)} chars")
+    
+    print(f"✅ Syllabus extracted: {len(syllabus_text)} chars total")
+    
+    # Save syllabus text
+    print("\n💾 Saving temporary files...")
+    syllabus_txt_path = uploads_dir / f"syllabus_{report_id[:16]}.txt"
+    with open(syllabus_txt_path, "w", encoding="utf-8") as f:
+        f.write(syllabus_text)
+    print(f"✅ Syllabus text saved to {syllabus_txt_path}")
+    
+    # Questions JSON already saved by extract_questions_from_pdf
+    print(f"✅ Questions JSON already saved to {questions_json_path}")
+    
+    # Call map_questions_to_syllabus directly
+    print("\n🤖 Calling map_questions_to_syllabus...")
+    print(f"   Syllabus path: {syllabus_txt_path}")
+    print(f"   Questions path: {questions_json_path}")
+    print(f"   Chunk size: 5")
+    
+    try:
+        result = map_questions_to_syllabus(
+            syllabus_path=str(syllabus_txt_path),
+            questions_path=str(questions_json_path),
+            chunk_size=5,
+            terse=terse,
+            partial_id=report_id
+        )
+    finally:
+        # Temp files are per report so concurrent analyses never share a path
+        questions_json_path.unlink(missing_ok=True)
+        syllabus_txt_path.unlink(missing_ok=True)
+    
+    print(f"\n✅ map_questions_to_syllabus returned: {type(result)}")
+    
+    # Return raw format from map_questions_to_syllabus
+    alignment_report = result
+    
+    if isinstance(alignment_report, dict):
+        print(f"🔑 Response keys: {list(alignment_report.keys())}")
+        if 'question_topic_mapping' in alignment_report:
+            print(f"📝 Found {len(alignment_report['question_topic_mapping'])} questions in mapping")
+            if alignment_report['question_topic_mapping']:
+                first_q = alignment_report['question_topic_mapping'][0]
+                print(f"🔢 First question mapping: {first_q.get('question_id', 'N/A')}")
+    else:
+        print(f"⚠️  Result is not a dict: {alignment_report}")
+
+    response_data = store_paper_analysis(report_id, alignment_report, questions_data, syllabus_text,
+                                         syllabus_stored["sha256"], paper_name, syllabus_name)
+
+    print(f"\n📤 Returning response with keys: {list(response_data.keys())}")
+    print("=" * 80)
+    print("✅ ANALYZE PAPER ENDPOINT COMPLETE")
+    print("=" * 80)
+    return response_data
+
+
+def store_paper_analysis(report_id: str, alignment_report: dict, questions_data: dict, syllabus_text: str,
+                         syllabus_sha256: str, paper_name: str, syllabus_name: str) -> dict:
+    """
+    Record a paper/syllabus mapping in the coverage store and save its report
+    and explanation context. Returns the report content; a stale fallback
+    result is marked "stale" and neither recorded nor saved.
+    """
+    from services.coverageStore import record_mapping, syllabus_id_for
+    from services.explanations import question_texts, save_context
+    from services.searchIndex import record_paper
+
+    stale = bool(alignment_report.get("stale"))
+
+    # Add to the coverage store so aggregate views include this paper, and to
+    # the search index (stale fallback answers are shown but kept out of both)
+    if not stale:
+        try:
+            recorded = record_mapping(alignment_report, syllabus_id_for(syllabus_text), syllabus_name, paper_name)
+            print(f"📊 Recorded {recorded} mapping(s) in coverage store")
+        except Exception as e:
+            print(f"⚠️  Could not record mapping in coverage store: {e}")
+        try:
+            record_paper(paper_name, question_texts(questions_data), alignment_report,
+                         syllabus_id_for(syllabus_text), syllabus_name)
+        except Exception as e:
+            print(f"⚠️  Could not record mapping in search index: {e}")
+
+    response_data = {
+        "success": True,
+        "paper_file": paper_name,
+        "syllabus_file": syllabus_name,
+        "report": alignment_report
+    }
+
+    if stale:
+        return {**response_data, "stale": True}
+    save_report(report_id, response_data)
+    save_context(report_id, {
+        "kind": "mapping",
+        "syllabus_sha256": syllabus_sha256,
+        "paper_id": paper_name,
+        "questions": question_texts(questions_data),
+    })
+    return response_data
+
+
+@router.post("/api/analyze-paper")
 async def analyze_paper(
-    paper: UploadFile = File(...),
-    syllabus: UploadFile = File(...)
+    request: Request,
+    paper: UploadFile = File(None),
+    syllabus: UploadFile = File(None),
+    paper_sha256: str = Form(None),
+    syllabus_sha256: str = Form(None),
+    paper_filename: str = Form(None),
+    syllabus_filename: str = Form(None),
+    terse: bool = Form(TERSE_RESPONSES)
 ):
     """
     Analyze a practice paper against a syllabus using OpenAI.
-    Returns JSON with question_topic_mapping format.
+    Either file can be sent as a `*_sha256` reference to a blob already stored
+    (see GET /api/uploads/negotiate) instead of its bytes.
+    Returns JSON with question_topic_mapping format. With `terse` the entries
+    carry no elaboration; fetch one from GET /api/reports/{report_id}/explanations/{question_id}.
+    Identical concurrent requests share one computation; send an Idempotency-Key
+    header to reattach to it (or get its result) when retrying.
     """
+    key = idempotency_key(request, "analyze-paper")
     try:
+        replayed = await replay(key, request)
+        if replayed is not None:
+            return report_or_stale(*replayed)
+
+        paper_name = document_name(paper, paper_filename, "paper.pdf")
+        syllabus_name = document_name(syllabus, syllabus_filename, "syllabus.pdf")
+
         print("=" * 80)
         print("🚀 ANALYZE PAPER ENDPOINT CALLED")
-        print(f"📄 Paper filename: {paper.filename}")
-        print(f"📄 Syllabus filename: {syllabus.filename}")
+        print(f"📄 Paper filename: {paper_name}")
+        print(f"📄 Syllabus filename: {syllabus_name}")
         print("=" * 80)
     
         # Validate file types
         print("🔍 Validating file types...")
-        if not (paper.filename.endswith('.pdf') and syllabus.filename.endswith('.pdf')):
+        if not (paper_name.endswith('.pdf') and syllabus_name.endswith('.pdf')):
             print("❌ Validation failed: not PDFs")
             raise HTTPException(status_code=400, detail="Both files must be PDFs")
         print("✅ File types validated")
 
-        # Save PDFs to uploads folder
+        # Stream PDFs to uploads folder (content-addressed), hashing on the way;
+        # files the client sent earlier arrive as hash references
         print("\n💾 Saving PDFs to uploads folder...")
-        uploads_dir = Path("uploads")
+        uploads_dir = UPLOAD_DIR
         uploads_dir.mkdir(exist_ok=True)
-        
-        paper_path = uploads_dir / f"paper_{paper.filename}"
-        syllabus_path = uploads_dir / f"syllabus_{syllabus.filename}"
-        
-        print(f"📁 Paper path: {paper_path}")
-        print(f"📁 Syllabus path: {syllabus_path}")
-        
-        paper_content = await paper.read()
-        print(f"📊 Paper size: {len(paper_content)} bytes")
-        with open(paper_path, "wb") as f:
-            f.write(paper_content)
+
+        paper_stored = await resolve_upload(paper, paper_sha256, paper_name)
+        print(f"📊 Paper size: {paper_stored['size']} bytes")
+        syllabus_stored = await resolve_upload(syllabus, syllabus_sha256, syllabus_name)
+        print(f"📊 Syllabus size: {syllabus_stored['size']} bytes")
+
+        paper_path = Path(paper_stored["path"])
+        syllabus_path = Path(syllabus_stored["path"])
         print(f"✅ Paper saved to {paper_path}")
-        
-        syllabus_content = await syllabus.read()
-        print(f"📊 Syllabus size: {len(syllabus_content)} bytes")
-        with open(syllabus_path, "wb") as f:
-            f.write(syllabus_content)
         print(f"✅ Syllabus saved to {syllabus_path}")
-        
-        # Extract questions
-        print("\n🔍 Extracting questions from PDF...")
-        questions_json_path = uploads_dir / "questions_temp.json"
-        extract_questions_from_pdf(str(paper_path), str(questions_json_path))
-        
-        # Load the extracted questions
-        with open(questions_json_path, "r", encoding="utf-8") as f:
-            questions_data = json.load(f)
-        
-        print(f"✅ Questions extracted: {type(questions_data)}")
-        print(f"📝 Questions data keys: {list(questions_data.keys()) if isinstance(questions_data, dict) else 'Not a dict'}")
-        if isinstance(questions_data, dict) and 'questions' in questions_data:
-            print(f"📊 Number of questions: {len(questions_data['questions'])}")
-            if questions_data['questions']:
-                print(f"🔢 First question ID: {questions_data['questions'][0].get('id', 'N/A')}")
-        
-        # Extract syllabus text
-        print("\n📤 Extracting text from syllabus PDF...")
-        syllabus_doc = fitz.open(str(syllabus_path))
-        syllabus_text = ""
-        for page_num, page in enumerate(syllabus_doc):
-            page_text = page.get_text()
-            syllabus_text += page_text
-            print(f"📄 Page {page_num + 1}: {len(page_text)} chars")
-        syllabus_doc.close()
-        
-        print(f"✅ Syllabus extracted: {len(syllabus_text)} chars total")
-        
-        # Save syllabus text
-        print("\n💾 Saving temporary files...")
-        syllabus_txt_path = uploads_dir / "syllabus_temp.txt"
-        with open(syllabus_txt_path, "w", encoding="utf-8") as f:
-            f.write(syllabus_text)
-        print(f"✅ Syllabus text saved to {syllabus_txt_path}")
-        
-        # Questions JSON already saved by extract_questions_from_pdf
-        print(f"✅ Questions JSON already saved to {questions_json_path}")
-        
-        # Call map_questions_to_syllabus directly
-        print("\n🤖 Calling map_questions_to_syllabus...")
-        print(f"   Syllabus path: {syllabus_txt_path}")
-        print(f"   Questions path: {questions_json_path}")
-        print(f"   Chunk size: 5")
-        
-        result = map_questions_to_syllabus(
-            syllabus_path=str(syllabus_txt_path),
-            questions_path=str(questions_json_path),
-            chunk_size=5
+
+        report_id = make_report_id("analyze-paper", prompt_version(MAPPING_PROMPT_VERSION, terse), paper_stored["sha256"], syllabus_stored["sha256"])
+        cached = load_report(report_id)
+        if cached is not None:
+            print(f"♻️  Serving cached analysis report {report_id[:12]}")
+            return report_response(cached, report_id)
+
+        content = await run_once(
+            report_id,
+            lambda: build_paper_analysis(report_id, paper_stored, syllabus_stored, paper_name, syllabus_name, terse),
+            lambda: admit("analysis", request),
+            key,
+            request,
         )
-        
-        print(f"\n✅ map_questions_to_syllabus returned: {type(result)}")
-        
-        # Return raw format from map_questions_to_syllabus
-        alignment_report = result
-        
-        if isinstance(alignment_report, dict):
-            print(f"🔑 Response keys: {list(alignment_report.keys())}")
-            if 'question_topic_mapping' in alignment_report:
-                print(f"📝 Found {len(alignment_report['question_topic_mapping'])} questions in mapping")
-                if alignment_report['question_topic_mapping']:
-                    first_q = alignment_report['question_topic_mapping'][0]
-                    print(f"🔢 First question mapping: {first_q.get('question_id', 'N/A')}")
-        else:
-            print(f"⚠️  Result is not a dict: {alignment_report}")
-        
-        response_data = {
-            "success": True,
-            "paper_file": paper.filename,
-            "syllabus_file": syllabus.filename,
-            "report": alignment_report
-        }
-        
-        print(f"\n📤 Returning response with keys: {list(response_data.keys())}")
-        print("=" * 80)
-        print("✅ ANALYZE PAPER ENDPOINT COMPLETE")
-        print("=" * 80)
-        
-        return JSONResponse(content=response_data)
+        return report_or_stale(report_id, content)
     
-    except HTTPException:
+    except (HTTPException, CircuitOpenError, RequestCancelled):
         raise
     except Exception as e:
         import traceback
@@ -350,6 +919,501 @@ async def analyze_paper(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def build_multi_paper_analysis(report_id: str, paper_stored: dict, syllabi: List[dict], paper_name: str, terse: bool) -> dict:
+    """
+    Map one paper against several syllabi and store the side-by-side report
+    (blocking; runs in the threadpool). `syllabi` are {"label", "filename",
+    "stored", "pair_id"}, where pair_id is the /api/analyze-paper report id
+    of the paper with that syllabus.
+
+    Pairs already analysed are reused. For the rest the paper is extracted
+    once and services/multiSyllabus maps them together; each is stored under
+    its pair id, so single analyses, explanations and the coverage store
+    see it as if it had been analysed alone.
+    """
+    from services.multiSyllabus import map_paper_to_syllabi, side_by_side
+    from services.pdfDocument import pdf_text
+    from services.textExtractorQuestion import extract_questions_from_pdf
+
+    cached = load_report(report_id)
+    if cached is not None:
+        return cached
+
+    pairs = {}
+    missing = []
+    for syllabus in syllabi:
+        stored_pair = load_report(syllabus["pair_id"])
+        if stored_pair is not None:
+            pairs[syllabus["label"]] = stored_pair
+        else:
+            missing.append(syllabus)
+    print(f"📚 {len(syllabi)} syllabi: {len(syllabi) - len(missing)} reused, {len(missing)} to map")
+
+    if missing:
+        questions_json_path = UPLOAD_DIR / f"questions_{report_id[:16]}.json"
+        questions_data = extract_questions_from_pdf(str(paper_stored["path"]), str(questions_json_path), paper_id=paper_name)
+        questions_json_path.unlink(missing_ok=True)
+        save_regions(paper_stored["sha256"], questions_data.get("regions"))
+        texts = {syllabus["label"]: pdf_text(syllabus["stored"]["path"]) for syllabus in missing}
+        mapped = map_paper_to_syllabi(questions_data, texts, terse=terse,
+                                      partial_ids={syllabus["label"]: syllabus["pair_id"] for syllabus in missing})
+        for syllabus in missing:
+            label = syllabus["label"]
+            pairs[label] = store_paper_analysis(syllabus["pair_id"], mapped[label], questions_data, texts[label],
+                                                syllabus["stored"]["sha256"], paper_name, syllabus["filename"])
+
+    reports = {syllabus["label"]: pairs[syllabus["label"]]["report"] for syllabus in syllabi}
+    stale = any(pair.get("stale") for pair in pairs.values())
+    response_data = {
+        "success": True,
+        "paper_file": paper_name,
+        "syllabi": [
+            {
+                "syllabus": syllabus["label"],
+                "syllabus_file": syllabus["filename"],
+                # Per-pair report (explanations, GET /api/reports/{id}); stale pairs are not stored
+                "report_id": None if pairs[syllabus["label"]].get("stale") else syllabus["pair_id"],
+                "reused": syllabus not in missing,
+            }
+            for syllabus in syllabi
+        ],
+        "comparison": side_by_side(reports),
+        "reports": reports,
+    }
+    if stale:
+        return {**response_data, "stale": True}
+    save_report(report_id, response_data)
+    return response_data
+
+
+@router.post("/api/analyze-paper-multi")
+async def analyze_paper_multi(
+    request: Request,
+    paper: UploadFile = File(None),
+    syllabi: List[UploadFile] = File(None),
+    paper_sha256: str = Form(None),
+    syllabus_sha256: List[str] = Form(None),
+    paper_filename: str = Form(None),
+    syllabus_filename: List[str] = Form(None),
+    terse: bool = Form(TERSE_RESPONSES)
+):
+    """
+    Analyze one practice paper against several syllabi (e.g. old and new, or
+    E-Math and A-Math) and compare their coverage side by side.
+    Syllabi are sent as files (`syllabi`, repeated) and/or hash references
+    (`syllabus_sha256`, repeated, with a matching `syllabus_filename` each).
+    The paper is extracted once and all syllabi are mapped together; pairs
+    already analysed by /api/analyze-paper are reused, and each pair's report
+    is stored under its /api/analyze-paper id.
+    """
+    key = idempotency_key(request, "analyze-paper-multi")
+    try:
+        replayed = await replay(key, request)
+        if replayed is not None:
+            return report_or_stale(*replayed)
+
+        paper_name = document_name(paper, paper_filename, "paper.pdf")
+        files = syllabi or []
+        hashes = syllabus_sha256 or []
+        names = syllabus_filename or []
+        if not 1 <= len(files) + len(hashes) <= MAX_SYLLABI_PER_ANALYSIS:
+            raise HTTPException(status_code=400, detail=f"Send between 1 and {MAX_SYLLABI_PER_ANALYSIS} syllabi")
+        syllabus_names = [f.filename for f in files] + [
+            names[i] if i < len(names) and names[i] else f"syllabus_{len(files) + i + 1}.pdf" for i in range(len(hashes))
+        ]
+        if not paper_name.endswith('.pdf') or not all(name.endswith('.pdf') for name in syllabus_names):
+            raise HTTPException(status_code=400, detail="All files must be PDFs")
+
+        UPLOAD_DIR.mkdir(exist_ok=True)
+        paper_stored = await resolve_upload(paper, paper_sha256, paper_name)
+        stored = [await resolve_upload(f) for f in files]
+        stored += [await resolve_upload(None, sha, name) for sha, name in zip(hashes, syllabus_names[len(files):])]
+        if len({s["sha256"] for s in stored}) != len(stored):
+            raise HTTPException(status_code=400, detail="The same syllabus was sent more than once")
+
+        version = prompt_version(MAPPING_PROMPT_VERSION, terse)
+        labels = set()
+        syllabus_inputs = []
+        for name, syllabus_stored in zip(syllabus_names, stored):
+            label = name if name not in labels else f"{name} ({len(syllabus_inputs) + 1})"
+            labels.add(label)
+            syllabus_inputs.append({
+                "label": label,
+                "filename": name,
+                "stored": syllabus_stored,
+                "pair_id": make_report_id("analyze-paper", version, paper_stored["sha256"], syllabus_stored["sha256"]),
+            })
+
+        report_id = make_report_id("analyze-paper-multi", version, paper_stored["sha256"], *(s["sha256"] for s in stored))
+        cached = load_report(report_id)
+        if cached is not None:
+            print(f"♻️  Serving cached multi-syllabus report {report_id[:12]}")
+            return report_response(cached, report_id)
+
+        content = await run_once(
+            report_id,
+            lambda: build_multi_paper_analysis(report_id, paper_stored, syllabus_inputs, paper_name, terse),
+            lambda: admit("analysis", request),
+            key,
+            request,
+        )
+        return report_or_stale(report_id, content)
+
+    except (HTTPException, CircuitOpenError, RequestCancelled):
+        raise
+    except Exception as e:
+        import traceback
+        print(f"ERROR in analyze_paper_multi: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/api/analyze-papers-bulk")
+async def analyze_papers_bulk(
+    request: Request,
+    syllabus: UploadFile = File(...),
+    papers: List[UploadFile] = File(...),
+    chunk_size: int = Form(5),
+    concurrency: int = Form(BULK_LLM_CONCURRENCY)
+):
+    """
+    Analyze a whole bank of papers against one syllabus.
+    The syllabus is extracted once, papers are extracted in a process pool and
+    all mapping chunks share one global concurrency limit, capped at
+    BULK_LLM_CONCURRENCY whatever the request asks for.
+    Returns the aggregated topic-coverage report plus each paper's mapping.
+    """
+    from services.bulkAnalysis import analyze_papers
+
+    ticket = None
+    batch_dir = None
+    try:
+        if not syllabus.filename.endswith('.pdf') or not all(p.filename.endswith('.pdf') for p in papers):
+            raise HTTPException(status_code=400, detail="All files must be PDFs")
+        ticket = await admit("bulk", request)
+
+        # Random suffix: runs started in the same second must not share (and delete) a directory
+        run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        batch_dir = UPLOAD_DIR / f"bulk_{run_id}"
+        report_dir = OUTPUT_DIR / f"bulk_{run_id}"
+        batch_dir.mkdir(parents=True)
+
+        # Position prefix on disk only, so same-named uploads do not overwrite
+        # each other; papers are recorded under the names they were uploaded as
+        paper_paths = []
+        for i, paper in enumerate(papers):
+            stored = await save_upload(paper, batch_dir / f"{i:03d}_{Path(paper.filename).name}")
+            paper_paths.append(stored["path"])
+        paper_names = [Path(paper.filename).name for paper in papers]
+
+        syllabus_text = await extract_text_from_pdf(syllabus)
+
+        summary = await run_in_threadpool(
+            analyze_papers,
+            syllabus_text=syllabus_text,
+            paper_paths=paper_paths,
+            output_dir=str(report_dir),
+            chunk_size=chunk_size,
+            concurrency=max(1, min(concurrency, BULK_LLM_CONCURRENCY)),
+            syllabus_name=syllabus.filename,
+            paper_names=paper_names,
+        )
+
+        reports = {}
+        for paper in summary["papers"]:
+            key = paper["paper_id"]
+            if key in reports:
+                # A second paper uploaded under the same name: key it by its report file
+                key = Path(paper["report_path"]).name.removesuffix(".mapping.json")
+            with open(paper["report_path"], "r", encoding="utf-8") as f:
+                reports[key] = json.load(f)
+
+        return JSONResponse(content={
+            "success": True,
+            "syllabus_file": syllabus.filename,
+            "report_dir": str(report_dir),
+            "coverage": summary,
+            "reports": reports
+        })
+
+    except (HTTPException, CircuitOpenError, RequestCancelled):
+        raise
+    except Exception as e:
+        import traceback
+        print(f"ERROR in analyze_papers_bulk: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if ticket:
+            ticket.release()
+        # Reports live under OUTPUT_DIR; the uploaded copies are only needed for the run
+        if batch_dir is not None:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+
+@router.get("/api/coverage/syllabi")
+async def coverage_syllabi():
+    """Syllabi that have mapped papers in the coverage store."""
+    from services.coverageStore import list_syllabi
+
+    return JSONResponse(content={"success": True, "syllabi": list_syllabi()})
+
+
+@router.get("/api/coverage/topics")
+async def coverage_topics(request: Request, syllabus_id: str = None, paper_id: List[str] = Query(None)):
+    """
+    Per-topic counts, mean confidence, out-of-scope rate and confidence histogram
+    (10 buckets of width 0.1) across all mapped papers.
+    """
+    from services.coverageStore import CONFIDENCE_BINS, store_version, topic_summary
+
+    report_id = make_report_id("coverage-topics", store_version(), syllabus_id or "", *(paper_id or []))
+    if etag_matches(request, etag_for(report_id)):
+        return not_modified(etag_for(report_id))
+
+    return report_response({
+        "success": True,
+        "confidence_bins": CONFIDENCE_BINS.tolist(),
+        "topics": topic_summary(syllabus_id, paper_id)
+    }, report_id)
+
+
+@router.get("/api/coverage/papers")
+async def coverage_papers(request: Request, syllabus_id: str = None):
+    """Per-paper question counts and out-of-scope / needs-review rates."""
+    from services.coverageStore import paper_summary, store_version
+
+    report_id = make_report_id("coverage-papers", store_version(), syllabus_id or "")
+    if etag_matches(request, etag_for(report_id)):
+        return not_modified(etag_for(report_id))
+
+    return report_response({"success": True, "papers": paper_summary(syllabus_id)}, report_id)
+
+
+@router.get("/api/coverage/matrix")
+async def coverage_matrix(request: Request, syllabus_id: str = None, paper_id: List[str] = Query(None)):
+    """Topic x paper question-count matrix."""
+    from services.coverageStore import store_version, topic_paper_matrix
+
+    report_id = make_report_id("coverage-matrix", store_version(), syllabus_id or "", *(paper_id or []))
+    if etag_matches(request, etag_for(report_id)):
+        return not_modified(etag_for(report_id))
+
+    return report_response({"success": True, **topic_paper_matrix(syllabus_id, paper_id)}, report_id)
+
+
+@router.get("/api/questions/clusters")
+async def question_clusters(
+    request: Request,
+    threshold: float = Query(None, ge=0.0, le=1.0),
+    min_size: int = Query(2, ge=2),
+    paper_id: str = None
+):
+    """
+    Clusters of near-duplicate questions across every analysed paper, for
+    question-bank curation. `threshold` is the minimum estimated similarity
+    (default QUESTION_DUPLICATE_THRESHOLD).
+    """
+    from services.questionIndex import DUPLICATE_THRESHOLD, duplicate_clusters, index_version
+
+    threshold = DUPLICATE_THRESHOLD if threshold is None else threshold
+    report_id = make_report_id("question-clusters", index_version(), str(threshold), str(min_size), paper_id or "")
+    if etag_matches(request, etag_for(report_id)):
+        return not_modified(etag_for(report_id))
+
+    clusters = await run_in_threadpool(duplicate_clusters, threshold, min_size, paper_id)
+    return report_response({"success": True, "threshold": threshold, "clusters": clusters}, report_id)
+
+
+@router.get("/api/search/questions")
+async def search_questions(
+    request: Request,
+    q: str = None,
+    topic: str = None,
+    min_confidence: float = Query(None, ge=0.0, le=1.0),
+    max_confidence: float = Query(None, ge=0.0, le=1.0),
+    in_syllabus: bool = None,
+    needs_review: bool = None,
+    paper_id: List[str] = Query(None),
+    syllabus_id: str = None,
+    sort: str = "relevance",
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    """
+    Search every analysed question and its mappings (services/searchIndex.py).
+    `q` matches question text, topics and reasons (all words, the last as a
+    prefix), ranked by relevance; the other parameters filter. One result per
+    question and syllabus it was mapped against, paginated with limit/offset.
+    """
+    from services.searchIndex import SORTS, index_version, search
+
+    if sort not in SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORTS)}")
+    params = [q, topic, min_confidence, max_confidence, in_syllabus, needs_review, syllabus_id, sort, limit, offset]
+    report_id = make_report_id("search-questions", index_version(), *(str(p) for p in params), *(paper_id or []))
+    if etag_matches(request, etag_for(report_id)):
+        return not_modified(etag_for(report_id))
+
+    found = await run_in_threadpool(search, q, topic, min_confidence, max_confidence, in_syllabus,
+                                    needs_review, paper_id, syllabus_id, sort, limit, offset)
+    return report_response({"success": True, **found}, report_id)
+
+
+@router.get("/api/search/topics")
+async def search_topics(request: Request, syllabus_id: str = None):
+    """Mapped topics with question counts, for the search topic filter."""
+    from services.searchIndex import index_version, list_topics
+
+    report_id = make_report_id("search-topics", index_version(), syllabus_id or "")
+    if etag_matches(request, etag_for(report_id)):
+        return not_modified(etag_for(report_id))
+
+    topics = await run_in_threadpool(list_topics, syllabus_id)
+    return report_response({"success": True, "topics": topics}, report_id)
+
+
+@router.get("/api/reports/{report_id}")
+async def get_report(request: Request, report_id: str):
+    """
+    Fetch a stored report by id (returned as `report_id` / ETag by the POST endpoints).
+    Send If-None-Match with the ETag to get a 304 when the report is unchanged.
+    """
+    etag = etag_for(report_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    content = load_report(report_id)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return report_response(content, report_id)
+
+
+@router.get("/api/reports/{report_id}/explanations/{question_id}")
+async def get_question_explanation(request: Request, report_id: str, question_id: str):
+    """
+    Explanation of one question's mapping in a terse analyze-paper report.
+    Generated on first request and stored; later requests are served from disk.
+    """
+    from services.explanations import explain_mapping
+
+    ticket = None
+    try:
+        ticket = await admit("explain", request)
+        return await run_in_threadpool(explain_mapping, report_id, question_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (HTTPException, CircuitOpenError, RequestCancelled):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if ticket:
+            ticket.release()
+
+
+@router.get("/api/reports/{report_id}/justification")
+async def get_comparison_justification(request: Request, report_id: str):
+    """
+    ai_justification for a terse compare-syllabi-detailed report.
+    Generated on first request and stored; later requests are served from disk.
+    """
+    from services.explanations import comparison_justification
+
+    ticket = None
+    try:
+        ticket = await admit("explain", request)
+        return await run_in_threadpool(comparison_justification, report_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (HTTPException, CircuitOpenError, RequestCancelled):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if ticket:
+            ticket.release()
+
+
+# Rendered images never change for a document hash, page, zoom and region
+RENDER_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+def _image_response(etag: str, png: bytes = None) -> Response:
+    headers = {"ETag": etag, "Cache-Control": RENDER_CACHE_CONTROL}
+    if png is None:
+        return Response(status_code=304, headers=headers)
+    # PNG is already deflated; keep the compression middleware off it
+    return Response(content=png, media_type="image/png", headers={**headers, "Content-Encoding": "identity"})
+
+
+def _stored_document(sha256: str) -> dict:
+    stored = stored_blob(sha256)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Document not found; upload it first")
+    return stored
+
+
+@router.get("/api/health/renders")
+async def render_health():
+    """Page render cache hits, renders and memory use."""
+    return {"status": "ok", "renders": render_status()}
+
+
+@router.get("/api/documents/{sha256}/pages/{page}.png")
+async def get_page_image(request: Request, sha256: str, page: int,
+                         zoom: float = Query(THUMBNAIL_ZOOM, gt=0, le=4)):
+    """
+    A page of an uploaded PDF (by content hash) as PNG; the default zoom is a thumbnail.
+    `page` is 1-based, as in mapping rows. Cached by hash/page/zoom in memory,
+    on disk and by the browser (immutable, with an ETag).
+    """
+    stored = _stored_document(sha256)
+    etag = page_etag(sha256, page, zoom)
+    if etag_matches(request, etag):
+        return _image_response(etag)
+    try:
+        png, etag = await render_page(sha256, stored["path"], page, zoom)
+    except PageNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return _image_response(etag, png)
+
+
+@router.get("/api/documents/{sha256}/questions")
+async def get_question_regions(sha256: str):
+    """
+    Where each question of an uploaded paper sits: per question, its pages and
+    bounding boxes in PDF points (`part` of the crop endpoint indexes `regions`).
+    """
+    stored = _stored_document(sha256)
+    try:
+        return {"success": True, "sha256": sha256, "questions": await question_regions(sha256, stored["path"])}
+    except RequestCancelled:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/api/documents/{sha256}/questions/{question_id}.png")
+async def get_question_image(request: Request, sha256: str, question_id: str,
+                             page: int = Query(None), part: int = Query(0, ge=0),
+                             zoom: float = Query(CROP_ZOOM, gt=0, le=4)):
+    """
+    Crop of one question from an uploaded paper as PNG, page-wide so figures are included.
+    Subpart ids (Q3b) give their question's crop. Pass the mapping row's `page`
+    when a file holds the same question number twice; `part` selects a later
+    page of a question that runs over pages.
+    """
+    stored = _stored_document(sha256)
+    try:
+        region = find_region(await question_regions(sha256, stored["path"]), question_id, page, part)
+        etag = crop_etag(sha256, region, zoom)
+        if etag_matches(request, etag):
+            return _image_response(etag)
+        png, etag = await render_region(sha256, stored["path"], region, zoom)
+    except PageNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return _image_response(etag, png)
+
+app = create_app()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
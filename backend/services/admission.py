@@ -0,0 +1,299 @@
+"""
+Admission control for model-bound endpoints.
+
+Each endpoint class (analysis, syllabus, bulk, explain) has a fixed number of
+slots and a bounded wait queue. Waiting requests are kept per client and
+slots are handed out round-robin across clients, so one teacher uploading a
+stack of papers cannot starve everyone else. A request is turned away at the
+door instead of timing out after minutes in the queue:
+
+- 429 when the client already has ADMISSION_PER_CLIENT requests queued or
+  running in that class
+- 503 when the queue is full or the estimated wait (requests ahead of it x
+  the class's moving-average service time) exceeds the class's deadline
+
+Both carry Retry-After. Requests answered from the report cache never take a
+slot. Queue lengths, wait times and rejection counts are exposed through
+GET /api/health/admission.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional
+
+from fastapi import HTTPException, Request
+
+# Slots, queue length, deadline (max seconds a request may wait) and the
+# initial service-time estimate per endpoint class; override with
+# ADMISSION_<CLASS>_SLOTS / _QUEUE / _MAX_WAIT / _SERVICE_SECONDS
+CLASS_DEFAULTS = {
+    "analysis": {"slots": 2, "queue": 20, "max_wait": 120, "service_seconds": 90},
+    "syllabus": {"slots": 2, "queue": 20, "max_wait": 120, "service_seconds": 60},
+    "bulk": {"slots": 1, "queue": 2, "max_wait": 900, "service_seconds": 600},
+    "explain": {"slots": 4, "queue": 40, "max_wait": 30, "service_seconds": 8},
+}
+
+PER_CLIENT_LIMIT = int(os.getenv("ADMISSION_PER_CLIENT", "4"))
+ADMISSION_ENABLED = os.getenv("ADMISSION_CONTROL", "1").lower() in ("1", "true", "yes")
+# Header carrying the client address when behind a reverse proxy (e.g.
+# X-Forwarded-For). Only set this if the proxy overwrites or appends it;
+# unset, clients are keyed by the peer address alone.
+CLIENT_ADDRESS_HEADER = os.getenv("ADMISSION_CLIENT_HEADER", "").strip().lower()
+
+# Weight of the newest request in the service-time moving average
+SERVICE_TIME_ALPHA = 0.2
+WAIT_SAMPLES = 500
+
+
+class AdmissionRejected(HTTPException):
+    """Request turned away before doing any work (429 per-client limit, 503 overload)."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(status_code=status_code, detail=detail,
+                         headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A request's place in an admission queue; holds a slot once started."""
+
+    def __init__(self, controller: Optional["AdmissionController"], client_id: str):
+        self.controller = controller
+        self.client_id = client_id
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.released = False
+        self.future: Optional[asyncio.Future] = None
+
+    @property
+    def waited(self) -> float:
+        return (self.started_at or time.monotonic()) - self.enqueued_at
+
+    def release(self) -> None:
+        if self.controller is not None:
+            self.controller.release(self)
+
+
+class AdmissionController:
+    def __init__(self, name: str, slots: int, max_queue: int, max_wait: float,
+                 service_seconds: float, per_client: int = PER_CLIENT_LIMIT):
+        self.name = name
+        self.slots = max(1, slots)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.per_client = per_client
+        self.service_seconds = service_seconds
+        self.in_flight = 0
+        self.admitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.timed_out = 0
+        self._queues: "OrderedDict[str, Deque[Ticket]]" = OrderedDict()
+        self._running: Dict[str, int] = {}
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self._lock = threading.Lock()
+
+    # --- internals (call with the lock held) ---
+
+    def _queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _estimate_wait(self, client_id: str) -> float:
+        """Seconds a new request from `client_id` would wait under round-robin."""
+        if self.in_flight < self.slots and not self._queues:
+            return 0.0
+        mine = len(self._queues.get(client_id, ()))
+        # Round-robin serves at most mine + 1 requests of every other client first
+        ahead = mine + sum(min(len(q), mine + 1) for c, q in self._queues.items() if c != client_id)
+        return (ahead + 1) / self.slots * self.service_seconds
+
+    def _start(self, ticket: Ticket) -> None:
+        ticket.started_at = time.monotonic()
+        self.in_flight += 1
+        self.admitted += 1
+        self._running[ticket.client_id] = self._running.get(ticket.client_id, 0) + 1
+        self._waits.append(ticket.waited)
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiting tickets, one client at a time."""
+        while self.in_flight < self.slots and self._queues:
+            client_id, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            if queue:
+                self._queues.move_to_end(client_id)
+            else:
+                del self._queues[client_id]
+            if ticket.future.done():
+                continue  # gave up waiting
+            self._start(ticket)
+            try:
+                ticket.future.get_loop().call_soon_threadsafe(_grant, ticket.future)
+            except RuntimeError:
+                # Event loop gone; the slot was never used
+                self._finish(ticket)
+
+    def _finish(self, ticket: Ticket) -> None:
+        ticket.released = True
+        self.in_flight -= 1
+        self._running[ticket.client_id] -= 1
+        if not self._running[ticket.client_id]:
+            del self._running[ticket.client_id]
+
+    def _remove(self, ticket: Ticket) -> None:
+        queue = self._queues.get(ticket.client_id)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[ticket.client_id]
+
+    # --- public ---
+
+    async def acquire(self, client_id: str) -> Ticket:
+        """
+        Wait for a slot.
+
+        Raises:
+            AdmissionRejected: Immediately when the client is over its limit or
+                the estimated wait exceeds the deadline; later if the deadline
+                passes while queued
+        """
+        ticket = Ticket(self, client_id)
+        with self._lock:
+            if self.in_flight < self.slots and not self._queues:
+                self._start(ticket)
+                return ticket
+
+            client_load = len(self._queues.get(client_id, ())) + self._running.get(client_id, 0)
+            if client_load >= self.per_client:
+                self.throttled += 1
+                raise AdmissionRejected(
+                    429, f"Too many {self.name} requests in progress for this client ({client_load})",
+                    self.service_seconds)
+
+            if self._queued() >= self.max_queue:
+                self.rejected += 1
+                raise AdmissionRejected(
+                    503, f"The {self.name} queue is full, try again later",
+                    max(self._estimate_wait(client_id) - self.max_wait, self.service_seconds / self.slots))
+
+            wait = self._estimate_wait(client_id)
+            if wait > self.max_wait:
+                self.rejected += 1
+                raise AdmissionRejected(
+                    503, f"Estimated wait for {self.name} is {wait:.0f}s (limit {self.max_wait:.0f}s), try again later",
+                    wait - self.max_wait)
+
+            ticket.future = asyncio.get_running_loop().create_future()
+            self._queues.setdefault(client_id, deque()).append(ticket)
+
+        try:
+            await asyncio.wait_for(ticket.future, self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                granted = ticket.started_at is not None
+                if not granted:
+                    self._remove(ticket)
+                    if isinstance(e, asyncio.TimeoutError):
+                        self.timed_out += 1
+            if granted:
+                self.release(ticket)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise AdmissionRejected(503, f"Timed out waiting for a {self.name} slot", self.service_seconds)
+        return ticket
+
+    def release(self, ticket: Ticket) -> None:
+        with self._lock:
+            if ticket.released or ticket.started_at is None:
+                return
+            self._finish(ticket)
+            self.completed += 1
+            elapsed = time.monotonic() - ticket.started_at
+            self.service_seconds += SERVICE_TIME_ALPHA * (elapsed - self.service_seconds)
+            self._dispatch()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "name": self.name,
+                "slots": self.slots,
+                "in_flight": self.in_flight,
+                "queued": self._queued(),
+                "waiting_clients": len(self._queues),
+                "max_queue": self.max_queue,
+                "max_wait_seconds": self.max_wait,
+                "avg_service_seconds": round(self.service_seconds, 2),
+                "estimated_wait_seconds": round(self._estimate_wait(""), 1),
+                "admitted": self.admitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "throttled": self.throttled,
+                "timed_out": self.timed_out,
+                "wait_seconds": {
+                    "p50": round(_percentile(waits, 0.5), 3),
+                    "p95": round(_percentile(waits, 0.95), 3),
+                    "max": round(waits[-1], 3) if waits else 0.0,
+                },
+            }
+
+
+def _grant(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(True)
+
+
+def _percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _setting(name: str, key: str) -> float:
+    return float(os.getenv(f"ADMISSION_{name.upper()}_{key.upper()}", CLASS_DEFAULTS[name][key]))
+
+
+_controllers: Dict[str, AdmissionController] = {}
+
+
+def get_controller(name: str) -> AdmissionController:
+    if name not in _controllers:
+        _controllers[name] = AdmissionController(
+            name,
+            slots=int(_setting(name, "slots")),
+            max_queue=int(_setting(name, "queue")),
+            max_wait=_setting(name, "max_wait"),
+            service_seconds=_setting(name, "service_seconds"),
+        )
+    return _controllers[name]
+
+
+def client_id(request: Request) -> str:
+    """
+    Client key for fair scheduling and the per-client limit: the peer address,
+    or the ADMISSION_CLIENT_HEADER set by a trusted proxy. Never a value the
+    client picks, or it could change it per request to dodge the 429.
+    """
+    if CLIENT_ADDRESS_HEADER:
+        forwarded = request.headers.get(CLIENT_ADDRESS_HEADER, "")
+        # The proxy appends the address it saw; earlier entries come from the client
+        address = forwarded.split(",")[-1].strip()
+        if address:
+            return address
+    return request.client.host if request.client else "anonymous"
+
+
+async def admit(endpoint_class: str, request: Request) -> Ticket:
+    """Take a slot in `endpoint_class` for this request; release() the ticket when done."""
+    if not ADMISSION_ENABLED:
+        return Ticket(None, client_id(request))
+    return await get_controller(endpoint_class).acquire(client_id(request))
+
+
+def admission_status() -> Dict[str, Any]:
+    return {name: get_controller(name).status() for name in CLASS_DEFAULTS}
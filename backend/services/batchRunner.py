@@ -0,0 +1,336 @@
+"""
+Offline batch submission for large model runs.
+
+Instead of one chat completion per chunk, every request of a round is written
+to an OpenAI-Batch-style JSONL file ({"custom_id", "method", "url", "body"}
+per line), submitted once, polled until the batch finishes and read back by
+custom_id. Batches trade latency (up to the completion window) for throughput
+and price, which suits term-end bulk mapping.
+
+Each round lives in its own directory and is checkpointed there:
+
+    <round_dir>/requests.jsonl   request lines (written once)
+    <round_dir>/state.json       processor, batch ids, statuses
+    <round_dir>/output.jsonl     result lines, appended per downloaded batch
+
+Re-running the same round resumes it: a finished round is read from disk, a
+submitted batch is polled again and requests lost to an expired or cancelled
+batch are re-submitted (up to BATCH_MAX_ATTEMPTS batches).
+
+Processors:
+- "openai": the Batch API (files + batches endpoints)
+- "local":  a stand-in that runs the same files on this machine, one chat
+            completion per line, with the Batch API's file formats. Used for
+            testing and for OpenAI-compatible endpoints without a batch API.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+BATCH_DIR = Path(__file__).resolve().parent.parent / "outputs" / "batch"
+LOCAL_BATCH_DIR = BATCH_DIR / "_local"
+
+BATCH_PROCESSOR = os.getenv("BATCH_PROCESSOR", "openai")
+BATCH_POLL_SECONDS = float(os.getenv("BATCH_POLL_SECONDS", "60"))
+BATCH_COMPLETION_WINDOW = os.getenv("BATCH_COMPLETION_WINDOW", "24h")
+BATCH_MAX_ATTEMPTS = int(os.getenv("BATCH_MAX_ATTEMPTS", "3"))
+
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchPending(Exception):
+    """Raised with wait=False when a submitted batch has not finished yet."""
+
+    def __init__(self, round_dir: str, batch_id: str, status: str):
+        super().__init__(f"Batch {batch_id} is {status}; re-run to resume ({round_dir})")
+        self.round_dir = round_dir
+        self.batch_id = batch_id
+        self.status = status
+
+
+class BatchFailedError(Exception):
+    """Raised when the processor rejects a batch as a whole (e.g. an invalid file)."""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _write_jsonl(path: Path, lines: List[Dict]) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+
+
+def _read_jsonl(path: Path) -> List[Dict]:
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# --- PROCESSORS ---
+
+class OpenAIBatchProcessor:
+    """Runs batch files through the OpenAI Batch API."""
+
+    name = "openai"
+
+    def __init__(self, client=None, completion_window: str = BATCH_COMPLETION_WINDOW):
+        self._client = client
+        self.completion_window = completion_window
+
+    @property
+    def client(self):
+        if self._client is None:
+            from config.openai_client import get_client
+            self._client = get_client()
+        return self._client
+
+    def submit(self, input_path: Path) -> str:
+        with open(input_path, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=CHAT_COMPLETIONS_URL,
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> Dict:
+        batch = self.client.batches.retrieve(batch_id)
+        return {
+            "status": batch.status,
+            "output_file_id": batch.output_file_id,
+            "error_file_id": batch.error_file_id,
+            "request_counts": batch.request_counts.model_dump() if batch.request_counts else None,
+            "errors": str(batch.errors) if batch.errors else None,
+        }
+
+    def download(self, batch_id: str, status: Dict, dest) -> None:
+        # Successful lines land in the output file, failed ones in the error file
+        for file_id in (status.get("output_file_id"), status.get("error_file_id")):
+            if file_id:
+                dest.write(self.client.files.content(file_id).text.rstrip("\n") + "\n")
+
+
+def _chat_responder(body: Dict) -> Dict:
+    from config.openai_client import get_client
+    return get_client().chat.completions.create(**body).model_dump()
+
+
+class LocalBatchProcessor:
+    """
+    Stand-in for the Batch API: batches are directories under `work_dir` and
+    lines are answered by `responder(body) -> chat completion dict` (default:
+    the shared OpenAI client). Lines already answered survive an interruption.
+    """
+
+    name = "local"
+
+    def __init__(self, work_dir: Path = LOCAL_BATCH_DIR, responder: Optional[Callable[[Dict], Dict]] = None, workers: int = 4):
+        self.work_dir = Path(work_dir)
+        self.responder = responder or _chat_responder
+        self.workers = workers
+
+    def _dir(self, batch_id: str) -> Path:
+        return self.work_dir / batch_id
+
+    def submit(self, input_path: Path) -> str:
+        batch_id = f"batch_local_{uuid.uuid4().hex[:16]}"
+        batch_dir = self._dir(batch_id)
+        batch_dir.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(input_path, batch_dir / "input.jsonl")
+        return batch_id
+
+    def _answer(self, line: Dict) -> Dict:
+        result = {"id": f"batch_req_{uuid.uuid4().hex[:16]}", "custom_id": line["custom_id"]}
+        try:
+            body = self.responder(line["body"])
+            result.update(response={"status_code": 200, "request_id": result["id"], "body": body}, error=None)
+        except Exception as e:
+            result.update(response=None, error={"code": type(e).__name__, "message": str(e)})
+        return result
+
+    def status(self, batch_id: str) -> Dict:
+        """Answers every outstanding line, so the first poll returns a finished batch."""
+        batch_dir = self._dir(batch_id)
+        if not batch_dir.exists():
+            return {"status": "failed", "errors": f"Unknown local batch {batch_id}"}
+
+        output_path = batch_dir / "output.jsonl"
+        done = {line["custom_id"] for line in _read_jsonl(output_path)}
+        todo = [line for line in _read_jsonl(batch_dir / "input.jsonl") if line["custom_id"] not in done]
+
+        lock = threading.Lock()
+        with open(output_path, "a", encoding="utf-8") as out:
+            def run(line):
+                result = self._answer(line)
+                with lock:
+                    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    out.flush()
+                return result
+
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(run, todo))
+
+        failed = sum(1 for r in results if r["error"])
+        return {
+            "status": "completed",
+            "request_counts": {"total": len(done) + len(todo), "completed": len(done) + len(todo) - failed, "failed": failed},
+        }
+
+    def download(self, batch_id: str, status: Dict, dest) -> None:
+        with open(self._dir(batch_id) / "output.jsonl", "r", encoding="utf-8") as f:
+            shutil.copyfileobj(f, dest)
+
+
+def get_processor(name: Optional[str] = None):
+    name = name or BATCH_PROCESSOR
+    if name == "openai":
+        return OpenAIBatchProcessor()
+    if name == "local":
+        return LocalBatchProcessor()
+    raise ValueError(f"Unknown batch processor: {name}")
+
+
+# --- ROUNDS ---
+
+def request_line(custom_id: str, body: Dict) -> Dict:
+    """One line of a batch input file for a chat completion."""
+    return {"custom_id": custom_id, "method": "POST", "url": CHAT_COMPLETIONS_URL, "body": body}
+
+
+def _parse_result(line: Dict) -> Dict:
+    if line.get("error"):
+        error = line["error"]
+        return {"error": error.get("message", str(error)) if isinstance(error, dict) else str(error)}
+    response = line.get("response") or {}
+    if response.get("status_code") != 200:
+        return {"error": f"HTTP {response.get('status_code')}: {json.dumps(response.get('body'))[:300]}"}
+    body = response["body"]
+    return {"content": body["choices"][0]["message"]["content"], "model": body.get("model")}
+
+
+def read_results(round_dir) -> Dict[str, Dict]:
+    """{custom_id: {"content", "model"} or {"error"}}; a later line for an id wins."""
+    return {line["custom_id"]: _parse_result(line) for line in _read_jsonl(Path(round_dir) / "output.jsonl")}
+
+
+def _load_state(path: Path) -> Optional[Dict]:
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_state(path: Path, state: Dict) -> None:
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_batch(round_dir, requests: List[Dict], processor=None, wait: bool = True,
+              poll_interval: float = BATCH_POLL_SECONDS) -> Dict[str, Dict]:
+    """
+    Run one round of chat completions as a batch, resuming from its checkpoint.
+
+    Args:
+        round_dir: Directory holding this round's files
+        requests: [{"custom_id", "body"}] with chat.completions.create arguments as body
+        processor: Batch processor (default: get_processor())
+        wait: Poll until the batch finishes; with False, raise BatchPending instead
+        poll_interval: Seconds between status checks
+
+    Returns:
+        dict: {custom_id: {"content", "model"} or {"error"}}. Ids with no result
+        after BATCH_MAX_ATTEMPTS batches are missing.
+
+    Raises:
+        BatchPending: wait=False and the batch is still running
+        BatchFailedError: The processor failed the whole batch
+    """
+    round_dir = Path(round_dir)
+    round_dir.mkdir(parents=True, exist_ok=True)
+    requests_path = round_dir / "requests.jsonl"
+    state_path = round_dir / "state.json"
+    output_path = round_dir / "output.jsonl"
+
+    lines = [request_line(r["custom_id"], r["body"]) for r in requests]
+    state = _load_state(state_path)
+    if state is None:
+        processor = processor or get_processor()
+        _write_jsonl(requests_path, lines)
+        state = {"state": "running", "processor": processor.name,
+                 "request_count": len(lines), "created_at": _now(), "attempts": []}
+        _save_state(state_path, state)
+    elif {line["custom_id"] for line in _read_jsonl(requests_path)} != {line["custom_id"] for line in lines}:
+        raise ValueError(f"Batch round {round_dir} was prepared for different requests; use a new batch directory")
+
+    # A resumed round stays on the processor it was submitted to
+    processor = processor or get_processor(state["processor"])
+    if processor.name != state["processor"]:
+        raise ValueError(f"Batch round {round_dir} runs on the '{state['processor']}' processor, not '{processor.name}'")
+
+    while state["state"] != "completed":
+        attempt = state["attempts"][-1] if state["attempts"] else None
+
+        if attempt is not None and not attempt["downloaded"]:
+            status = processor.status(attempt["batch_id"])
+            attempt["status"] = status["status"]
+            attempt["request_counts"] = status.get("request_counts")
+            if status["status"] not in TERMINAL_STATUSES:
+                _save_state(state_path, state)
+                if not wait:
+                    raise BatchPending(str(round_dir), attempt["batch_id"], status["status"])
+                time.sleep(poll_interval)
+                continue
+            if status["status"] == "failed":
+                _save_state(state_path, state)
+                raise BatchFailedError(f"Batch {attempt['batch_id']} failed: {status.get('errors')}")
+
+            # Download to a temp file first so a crash never leaves half a line
+            tmp_path = round_dir / "output.part"
+            with open(tmp_path, "w", encoding="utf-8") as part:
+                processor.download(attempt["batch_id"], status, part)
+            with open(tmp_path, "r", encoding="utf-8") as part, open(output_path, "a", encoding="utf-8") as out:
+                shutil.copyfileobj(part, out)
+            os.remove(tmp_path)
+            attempt["downloaded"] = True
+            attempt["finished_at"] = _now()
+            _save_state(state_path, state)
+            print(f"📦 Batch {attempt['batch_id']} {status['status']}: {status.get('request_counts')}")
+            continue
+
+        # Requests with no result line at all (expired / cancelled batch) are re-submitted
+        answered = set(read_results(round_dir))
+        missing = [line for line in lines if line["custom_id"] not in answered]
+        if not missing or len(state["attempts"]) >= BATCH_MAX_ATTEMPTS:
+            state["state"] = "completed"
+            state["completed_at"] = _now()
+            _save_state(state_path, state)
+            break
+
+        input_path = requests_path
+        if state["attempts"]:
+            input_path = round_dir / f"requests.retry{len(state['attempts'])}.jsonl"
+            _write_jsonl(input_path, missing)
+        batch_id = processor.submit(input_path)
+        state["attempts"].append({"batch_id": batch_id, "input": input_path.name, "requests": len(missing),
+                                  "status": "submitted", "submitted_at": _now(), "downloaded": False})
+        _save_state(state_path, state)
+        print(f"📤 Submitted batch {batch_id} ({len(missing)} request(s)) via {processor.name}")
+
+    return read_results(round_dir)
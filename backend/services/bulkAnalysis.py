@@ -0,0 +1,304 @@
+"""
+Bulk paper analysis for whole question banks.
+
+Extracts every paper in a directory in a process pool, loads the syllabus
+once, and schedules the mapping chunks of ALL papers through one thread pool
+so a single global limit bounds concurrent model calls. Writes one mapping
+report per paper plus an aggregated topic-coverage report. Questions that
+near-duplicate one already mapped against the syllabus (see questionIndex.py)
+reuse that mapping and are not sent to the model. With a batch directory the
+chunks of all papers are submitted as batches instead (see batchRunner.py)
+and the results are fanned back out to the per-paper reports.
+
+Usage:
+    python -m services.comparePrompt --syllabus syllabus.pdf --papers papers/ --output-dir outputs/bulk
+    python -m services.comparePrompt --syllabus syllabus.pdf --papers papers/ --batch-dir outputs/batch/term3
+"""
+
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from config.openai_client import BULK_LLM_CONCURRENCY
+from services.comparePrompt import (
+    MAPPING_PROMPT_VERSION,
+    MAX_QUESTIONS,
+    NEEDS_REVIEW_TOPIC,
+    chunk_list,
+    map_chunks_batch,
+    map_question_chunk,
+)
+from services.coverageStore import record_mapping, syllabus_id_for
+from services.explanations import question_texts
+from services.pdfDocument import pdf_text
+from services.questionIndex import index_questions, order_entries, record_question_mappings, split_inherited
+from services.searchIndex import record_paper
+from services.textExtractorQuestion import extract_questions_from_pdf
+
+# Global cap on in-flight model calls across all papers
+DEFAULT_CONCURRENCY = BULK_LLM_CONCURRENCY
+
+
+def read_syllabus_text(syllabus_path: str) -> str:
+    """Read syllabus text from a PDF or an already-extracted .txt file."""
+    if syllabus_path.lower().endswith(".pdf"):
+        return pdf_text(syllabus_path)
+
+    with open(syllabus_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _extract_one(pdf_path: str, questions_path: str, paper_id: str) -> Dict:
+    # Runs in a worker process
+    return extract_questions_from_pdf(pdf_path, questions_path, paper_id=paper_id)
+
+
+def _paper_stem(pdf_path: str) -> str:
+    return os.path.splitext(os.path.basename(pdf_path))[0]
+
+
+def analyze_papers(
+    syllabus_text: str,
+    paper_paths: List[str],
+    output_dir: str,
+    chunk_size: int = 5,
+    max_questions: Optional[int] = MAX_QUESTIONS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    extraction_workers: Optional[int] = None,
+    syllabus_name: str = "syllabus",
+    batch_dir: Optional[str] = None,
+    batch_processor=None,
+    batch_wait: bool = True,
+    paper_names: Optional[List[str]] = None,
+) -> Dict:
+    """
+    Map a batch of papers against one syllabus.
+
+    Args:
+        syllabus_text: Extracted syllabus text, shared by every chunk prompt
+        paper_paths: Paper PDFs to analyse
+        output_dir: Directory for per-paper and aggregated reports
+        chunk_size: Questions per model call
+        max_questions: Per-paper question cap (None for no cap)
+        concurrency: Global limit on concurrent model calls
+        extraction_workers: Processes for PDF extraction (default: CPU count)
+        syllabus_name: Label stored in the aggregated report
+        batch_dir: Submit chunks as checkpointed batches under this directory
+            instead of calling the model (re-run to resume)
+        batch_processor: Batch processor (default: BATCH_PROCESSOR)
+        batch_wait: Poll until the batches finish instead of raising BatchPending
+        paper_names: Paper id of each path, as recorded in the coverage store
+            and indexes (default: the file name)
+
+    Returns:
+        dict: Aggregated coverage report (also written to coverage_report.json)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    names = dict(zip(paper_paths, paper_names or [os.path.basename(p) for p in paper_paths]))
+    papers: Dict[str, Dict] = {}
+    failed: List[Dict] = []
+
+    # --- EXTRACT ALL PAPERS IN PARALLEL ---
+    print(f"📄 Extracting {len(paper_paths)} paper(s)...")
+    # Spawned, not forked: the server process has threads (and their locks) running
+    with ProcessPoolExecutor(max_workers=extraction_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {
+            pool.submit(_extract_one, path, os.path.join(output_dir, f"{_paper_stem(path)}.questions.json"), names[path]): path
+            for path in paper_paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                papers[path] = {"questions": future.result(), "mapping": {}, "errors": []}
+            except Exception as e:
+                print(f"❌ Extraction failed for {path}: {e}")
+                failed.append({"paper": names[path], "stage": "extract", "error": str(e)})
+
+    # --- REUSE MAPPINGS OF NEAR-DUPLICATES, SCHEDULE THE REST UNDER ONE LIMIT ---
+    syllabus_id = syllabus_id_for(syllabus_text)
+    jobs = []
+    for path, paper in papers.items():
+        questions = paper["questions"]["questions"]
+        if max_questions is not None:
+            questions = questions[:max_questions]
+        paper_id = paper["questions"].get("paper_id", names[path])
+        index_questions(paper["questions"])
+        paper["selected"] = questions
+        paper["inherited"], to_map = split_inherited(questions, paper_id, syllabus_id, MAPPING_PROMPT_VERSION)
+        for idx, q_chunk in enumerate(chunk_list(to_map, chunk_size)):
+            jobs.append((path, idx, q_chunk))
+
+    if batch_dir:
+        # Chunk ids stay stable across resumes: paper position + file stem + chunk index
+        positions = {path: i for i, path in enumerate(paper_paths)}
+        chunk_ids = {f"{positions[path]:04d}-{_paper_stem(path)}:{idx}": (path, idx, q_chunk) for path, idx, q_chunk in jobs}
+        print(f"🗂️  Mapping {len(jobs)} chunk(s) as batches in {batch_dir}...")
+        results, errors = map_chunks_batch(
+            syllabus_text,
+            {chunk_id: q_chunk for chunk_id, (_, _, q_chunk) in chunk_ids.items()},
+            batch_dir,
+            batch_processor,
+            wait=batch_wait,
+        )
+        for chunk_id, (path, idx, _) in chunk_ids.items():
+            if chunk_id in errors:
+                papers[path]["errors"].append({"chunk": idx, "error": errors[chunk_id]})
+            else:
+                papers[path]["mapping"][idx] = results[chunk_id]
+    else:
+        print(f"🤖 Mapping {len(jobs)} chunk(s) with concurrency {concurrency}...")
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {
+                pool.submit(map_question_chunk, syllabus_text, q_chunk): (path, idx)
+                for path, idx, q_chunk in jobs
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                path, idx = futures[future]
+                try:
+                    papers[path]["mapping"][idx] = future.result()
+                except Exception as e:
+                    papers[path]["errors"].append({"chunk": idx, "error": str(e)})
+                if done % 10 == 0 or done == len(futures):
+                    print(f"⏳ {done}/{len(futures)} chunks done")
+
+    # --- PER-PAPER REPORTS ---
+    reports = []
+    for path in paper_paths:
+        if path not in papers:
+            continue
+        paper = papers[path]
+        paper_id = paper["questions"].get("paper_id", names[path])
+        mapped = [m for idx in sorted(paper["mapping"]) for m in paper["mapping"][idx]]
+        record_question_mappings(paper_id, paper["selected"], syllabus_id, MAPPING_PROMPT_VERSION, mapped)
+        mapping = order_entries(paper["inherited"] + mapped, paper["selected"]) if paper["inherited"] else mapped
+        report = {
+            "paper_id": paper_id,
+            "question_topic_mapping": mapping,
+        }
+        if any(m.get("stale") for m in mapping):
+            report["stale"] = True
+        if paper["errors"]:
+            report["errors"] = paper["errors"]
+            failed.append({"paper": names[path], "stage": "mapping", "error": f"{len(paper['errors'])} chunk(s) failed"})
+
+        report_path = os.path.join(output_dir, f"{_paper_stem(path)}.mapping.json")
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        reports.append((report, report_path))
+        # The report is written either way; a store failure must not cost the run
+        if not report.get("stale"):
+            try:
+                record_mapping(report, syllabus_id, syllabus_name, report["paper_id"])
+            except Exception as e:
+                print(f"⚠️  Could not record {paper_id} in coverage store: {e}")
+            try:
+                record_paper(paper_id, question_texts(paper["questions"]), report, syllabus_id, syllabus_name)
+            except Exception as e:
+                print(f"⚠️  Could not record {paper_id} in search index: {e}")
+
+    summary = aggregate_coverage(reports, syllabus_name)
+    summary["failed"] = failed
+
+    with open(os.path.join(output_dir, "coverage_report.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    return summary
+
+
+def aggregate_coverage(reports: List, syllabus_name: str = "syllabus") -> Dict:
+    """
+    Build the topic-coverage report across papers.
+
+    Args:
+        reports: [(mapping report, report path)] as produced by analyze_papers
+        syllabus_name: Label stored in the report
+
+    Returns:
+        dict: Totals, per-topic counts (overall and per paper) and per-paper summaries
+    """
+    topics: Dict[str, Dict] = {}
+    papers = []
+    totals = {"questions": 0, "in_syllabus": 0, "out_of_scope": 0, "needs_review": 0}
+
+    for report, report_path in reports:
+        paper_id = report["paper_id"]
+        paper_totals = {"questions": 0, "in_syllabus": 0, "out_of_scope": 0, "needs_review": 0}
+
+        for entry in report["question_topic_mapping"]:
+            paper_totals["questions"] += 1
+            entry_topics = entry.get("topics") or []
+            if NEEDS_REVIEW_TOPIC in entry_topics:
+                paper_totals["needs_review"] += 1
+            elif entry.get("in_syllabus") is False:
+                paper_totals["out_of_scope"] += 1
+            else:
+                paper_totals["in_syllabus"] += 1
+
+            confidence = float(entry.get("confidence") or 0)
+            for topic in entry_topics:
+                t = topics.setdefault(topic, {"topic": topic, "count": 0, "confidence_sum": 0.0, "papers": {}})
+                t["count"] += 1
+                t["confidence_sum"] += confidence
+                t["papers"][paper_id] = t["papers"].get(paper_id, 0) + 1
+
+        for k in totals:
+            totals[k] += paper_totals[k]
+        papers.append({"paper_id": paper_id, "report_path": report_path, **paper_totals})
+
+    topic_rows = []
+    for t in sorted(topics.values(), key=lambda t: t["count"], reverse=True):
+        topic_rows.append({
+            "topic": t["topic"],
+            "count": t["count"],
+            "paper_count": len(t["papers"]),
+            "avg_confidence": round(t["confidence_sum"] / t["count"], 3),
+            "papers": t["papers"],
+        })
+
+    return {
+        "syllabus": syllabus_name,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "paper_count": len(papers),
+        "totals": totals,
+        "topic_coverage": topic_rows,
+        "papers": papers,
+    }
+
+
+def analyze_paper_directory(
+    syllabus_path: str,
+    papers_dir: str,
+    output_dir: str,
+    chunk_size: int = 5,
+    max_questions: Optional[int] = MAX_QUESTIONS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    extraction_workers: Optional[int] = None,
+    batch_dir: Optional[str] = None,
+    batch_processor=None,
+    batch_wait: bool = True,
+) -> Dict:
+    """Analyse every PDF in `papers_dir` against the syllabus at `syllabus_path`."""
+    paper_paths = sorted(
+        os.path.join(papers_dir, name)
+        for name in os.listdir(papers_dir)
+        if name.lower().endswith(".pdf")
+    )
+    if not paper_paths:
+        raise ValueError(f"No PDF papers found in {papers_dir}")
+
+    return analyze_papers(
+        syllabus_text=read_syllabus_text(syllabus_path),
+        paper_paths=paper_paths,
+        output_dir=output_dir,
+        chunk_size=chunk_size,
+        max_questions=max_questions,
+        concurrency=concurrency,
+        extraction_workers=extraction_workers,
+        syllabus_name=os.path.basename(syllabus_path),
+        batch_dir=batch_dir,
+        batch_processor=batch_processor,
+        batch_wait=batch_wait,
+    )
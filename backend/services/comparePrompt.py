@@ -1,36 +1,65 @@
 import os
 import json
-from dotenv import load_dotenv
-from openai import OpenAI
+import hashlib
+import tempfile
+from config.openai_client import MAPPING_MODEL_TIERS, MAPPING_CONFIDENCE_THRESHOLD, MAPPING_CALL_TIMEOUT
+from services.failsafe import guarded_completion
+from services.llmRouter import get_router
 
 # --- SETUP ---
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))    
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Cap on questions mapped per paper
+MAX_QUESTIONS = 40
+
+# Bump when the mapping prompt changes so cached reports are invalidated
+MAPPING_PROMPT_VERSION = "mapping-v2"
+
+NEEDS_REVIEW_TOPIC = "Unknown Topic, Needs Review"
+
+
+def prompt_version(version, terse):
+    """Terse and full answers differ in shape, so they are cached (and reused) apart."""
+    return f"{version}-terse" if terse else version
+
 
 def chunk_list(data, chunk_size):
     for i in range(0, len(data), chunk_size):
         yield data[i:i + chunk_size]
 
 
-def map_questions_to_syllabus(syllabus_path, questions_path, chunk_size=5):
-    # --- READ FILES ---
-    with open(syllabus_path, "r", encoding="utf-8") as f:
-        syllabus_text = f.read()
+def chunk_key(q_chunk):
+    """Checkpoint key of a chunk's mapping (reportCache.save_partial): hash of its questions."""
+    return hashlib.sha256(json.dumps(q_chunk, sort_keys=True).encode("utf-8")).hexdigest()[:32]
 
-    with open(questions_path, "r", encoding="utf-8") as f:
-        questions_data = json.load(f)
 
-    questions = questions_data["questions"][:40]  # Limit to first 40 questions
-    all_results = []
+def checkpoint_chunk(partial_id, q_chunk, entries):
+    """Keep a finished chunk's mapping so a cancelled analysis resumes from it (stale answers are not kept)."""
+    from services.reportCache import save_partial
 
-    # --- PROCESS QUESTIONS IN CHUNKS ---
-    for idx, q_chunk in enumerate(chunk_list(questions, chunk_size), start=1):
-        print(f"⏳ Processing chunk {idx} ({len(q_chunk)} questions)...")
+    if partial_id and not any(entry.get("stale") for entry in entries):
+        save_partial(partial_id, chunk_key(q_chunk), entries)
+
+
+# Terse mode: the per-question explanation is dropped from the answer (output
+# tokens dominate latency) and generated on demand instead (services/explanations.py)
+TERSE_ELABORATION = """BREVITY REQUIREMENT:
+• Do NOT write any explanation. Return only the fields in the output format below.
+"""
 
-        prompt = f"""
+ELABORATION_REQUIREMENT = """ELABORATION REQUIREMENT:
+• For EVERY question, provide a 2-sentence explanation in the "out_of_scope_reason" field (even if in_syllabus is true).
+• Sentence 1: State which syllabus topic(s) the question aligns with and why.
+• Sentence 2: Explain the confidence level assigned (e.g., "Perfect match", "Minor ambiguity in terminology", "Requires inference", "Not explicitly covered").
+• If out of scope: explain what mathematical concept is tested and why it's not in the syllabus.
+"""
+
+
+def build_mapping_prompt(syllabus_text, q_chunk, terse=False):
+    elaboration = TERSE_ELABORATION if terse else ELABORATION_REQUIREMENT
+    reason_field = "" if terse else ',\n      "out_of_scope_reason": "string or null"'
+    prompt = f"""
 You are a Senior Mathematics Curriculum Specialist.
 
 You are given:
@@ -82,12 +111,7 @@ Assign a NUANCED confidence score between 0 and 1 with varied precision:
 
 DO NOT use only 0 and 1. Use sophisticated varied scores like 0.87, 0.78, 0.92, 0.83, etc.
 
-ELABORATION REQUIREMENT:
-• For EVERY question, provide a 2-sentence explanation in the "out_of_scope_reason" field (even if in_syllabus is true).
-• Sentence 1: State which syllabus topic(s) the question aligns with and why.
-• Sentence 2: Explain the confidence level assigned (e.g., "Perfect match", "Minor ambiguity in terminology", "Requires inference", "Not explicitly covered").
-• If out of scope: explain what mathematical concept is tested and why it's not in the syllabus.
-
+{elaboration}
 
 OUTPUT FORMAT (STRICT JSON):
 {{
@@ -97,8 +121,7 @@ OUTPUT FORMAT (STRICT JSON):
       "page": number,
       "topics": ["Topic 1", "Topic 2"],
       "in_syllabus": true | false,
-      "confidence": 0,
-      "out_of_scope_reason": "string or null"
+      "confidence": 0{reason_field}
     }}
   ]
 }}
@@ -109,36 +132,370 @@ SYLLABUS:
 QUESTIONS:
 {json.dumps(q_chunk, indent=2)}
 """
+    return prompt
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0,
-            messages=[
-                {"role": "system", "content": "You output ONLY valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
 
-        chunk_json = json.loads(response.choices[0].message.content)
-        all_results.extend(chunk_json["question_topic_mapping"])
+def mapping_request(syllabus_text, q_chunk, model, terse=False):
+    """chat.completions.create arguments for one chunk (also the body of a batch line)."""
+    return {
+        "model": model,
+        "temperature": 0,
+        "messages": [
+            {"role": "system", "content": "You output ONLY valid JSON."},
+            {"role": "user", "content": build_mapping_prompt(syllabus_text, q_chunk, terse)}
+        ],
+        "response_format": {"type": "json_object"},
+    }
+
+
+def explanation_request(syllabus_text, question_text, entry, model=None):
+    """chat.completions.create arguments for explaining one (terse) mapping answer."""
+    prompt = f"""
+You are a Senior Mathematics Curriculum Specialist.
+
+An exam question was mapped against the OFFICIAL mathematics syllabus below:
+• Topics: {json.dumps(entry.get("topics") or [])}
+• In syllabus: {json.dumps(entry.get("in_syllabus"))}
+• Confidence: {entry.get("confidence")}
 
+{ELABORATION_REQUIREMENT}
+Explain THIS mapping; do not re-assess it.
+
+OUTPUT FORMAT (STRICT JSON):
+{{"explanation": "string"}}
+
+SYLLABUS:
+{syllabus_text}
+
+QUESTION ({entry.get("question_id")}):
+{question_text}
+"""
     return {
-        "paper_id": questions_data.get("paper_id", "unknown"),
-        "question_topic_mapping": all_results
+        "model": model or MAPPING_MODEL_TIERS[0],
+        "temperature": 0,
+        "messages": [
+            {"role": "system", "content": "You output ONLY valid JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        "response_format": {"type": "json_object"},
     }
 
 
-# ---- RUN ----
-if __name__ == "__main__":
-    result = map_questions_to_syllabus(
-        os.path.join(BASE_DIR, "extractedSyllabus.txt"),
-        os.path.join(BASE_DIR, "questions3.json"),
-        chunk_size=5
+def _call_mapping_model(syllabus_text, q_chunk, model, terse=False):
+    content, stale = guarded_completion(
+        get_router(),
+        **mapping_request(syllabus_text, q_chunk, model, terse),
+        timeout=MAPPING_CALL_TIMEOUT
     )
 
-    output_path = os.path.join(BASE_DIR, "question_syllabus_mapping.json")
+    answers = json.loads(content)["question_topic_mapping"]
+    if stale:
+        for entry in answers:
+            entry["stale"] = True
+    return answers
+
+
+def needs_escalation(entry, threshold=MAPPING_CONFIDENCE_THRESHOLD):
+    """True when a mapping answer is low-confidence or flagged for review."""
+    try:
+        confidence = float(entry.get("confidence") or 0)
+    except (TypeError, ValueError):
+        confidence = 0.0
+    return confidence < threshold or NEEDS_REVIEW_TOPIC in (entry.get("topics") or [])
+
+
+def _chunk_parents(q_chunk):
+    # Subpart ids (Q15a) resolve to their parent question for re-submission
+    parents = {}
+    for q in q_chunk:
+        parents[q["id"]] = q
+        for sp in q.get("subparts") or []:
+            parents[sp["id"]] = q
+    return parents
+
+
+def _merge_tier_answers(results, answers, tier, model, threshold):
+    """Tag one tier's answers and let them replace the entries that were escalated."""
+    for entry in answers:
+        entry["tier"] = tier
+        entry["model"] = model
+
+    if tier == 0:
+        return answers
+    by_id = {str(a.get("question_id")): a for a in answers}
+    return [by_id.get(str(e.get("question_id")), e) if needs_escalation(e, threshold) else e for e in results]
+
+
+def _escalation_pending(results, q_chunk, threshold):
+    """Questions (parents of low-confidence answers) to re-submit to the next tier."""
+    parents = _chunk_parents(q_chunk)
+    pending_ids = []
+    for e in results:
+        if not needs_escalation(e, threshold):
+            continue
+        parent = parents.get(str(e.get("question_id")))
+        if parent is not None and parent["id"] not in pending_ids:
+            pending_ids.append(parent["id"])
+    return [q for q in q_chunk if q["id"] in pending_ids]
+
+
+def map_question_chunk(syllabus_text, q_chunk, tiers=None, threshold=MAPPING_CONFIDENCE_THRESHOLD, terse=False):
+    """
+    Map one chunk of questions against the syllabus through the model cascade.
+
+    Every question goes to the first (cheapest) tier. Answers below the
+    confidence threshold or flagged "Unknown Topic, Needs Review" are
+    re-submitted to the next tier, and so on. Each entry records the tier and
+    model that produced it. With `terse` the answers carry no explanation.
+    """
+    tiers = tiers or MAPPING_MODEL_TIERS
+
+    results = []
+    pending = q_chunk
+    for tier, model in enumerate(tiers):
+        answers = _call_mapping_model(syllabus_text, pending, model, terse)
+        results = _merge_tier_answers(results, answers, tier, model, threshold)
+        if tier == len(tiers) - 1:
+            break
+
+        pending = _escalation_pending(results, q_chunk, threshold)
+        if not pending:
+            break
+        print(f"⬆️  Escalating {len(pending)} question(s) to {tiers[tier + 1]}")
+
+    return results
+
+
+def map_chunks_batch(syllabus_text, chunks, batch_dir, processor=None, tiers=None,
+                     threshold=MAPPING_CONFIDENCE_THRESHOLD, wait=True, terse=False):
+    """
+    Map many chunks through batch submission (see services/batchRunner.py).
+
+    The cascade runs as one batch per tier: every chunk goes to the first
+    tier, then only the escalated questions of each chunk go to the next.
+    Each tier is a checkpointed round under `batch_dir`, so calling this again
+    with the same arguments resumes the run.
+
+    Args:
+        chunks: {chunk id: questions}; ids must be stable across resumes
+
+    Returns:
+        tuple: ({chunk id: mapping entries}, {chunk id: error}) - a chunk whose
+        first tier failed has an error and no entries
+    """
+    from services.batchRunner import run_batch
+
+    tiers = tiers or MAPPING_MODEL_TIERS
+    results = {chunk_id: [] for chunk_id in chunks}
+    errors = {}
+    pending = dict(chunks)
+
+    for tier, model in enumerate(tiers):
+        requests = [
+            {"custom_id": chunk_id, "body": mapping_request(syllabus_text, q_chunk, model, terse)}
+            for chunk_id, q_chunk in pending.items()
+        ]
+        print(f"🗂️  Tier {tier} ({model}): {len(requests)} chunk request(s)")
+        outputs = run_batch(os.path.join(batch_dir, f"mapping-tier{tier}"), requests, processor, wait=wait)
+
+        next_pending = {}
+        for chunk_id in pending:
+            output = outputs.get(chunk_id, {"error": "no result returned by the batch"})
+            try:
+                if "error" in output:
+                    raise RuntimeError(output["error"])
+                answers = json.loads(output["content"])["question_topic_mapping"]
+            except Exception as e:
+                # A failed escalation keeps the lower tier's answers
+                if tier == 0:
+                    errors[chunk_id] = str(e)
+                continue
+
+            results[chunk_id] = _merge_tier_answers(results[chunk_id], answers, tier, model, threshold)
+            if tier < len(tiers) - 1:
+                escalate = _escalation_pending(results[chunk_id], chunks[chunk_id], threshold)
+                if escalate:
+                    next_pending[chunk_id] = escalate
+
+        pending = next_pending
+        if not pending:
+            break
+
+    return {chunk_id: entries for chunk_id, entries in results.items() if chunk_id not in errors}, errors
+
+
+def map_questions_to_syllabus(syllabus_path, questions_path, chunk_size=5, max_questions=MAX_QUESTIONS, dedupe=True,
+                              batch_dir=None, batch_processor=None, batch_wait=True, terse=False, partial_id=None):
+    """
+    Map a paper's extracted questions to syllabus topics.
+
+    With `terse` the model returns only ids, topics, scope and confidence;
+    explanations are generated per question on request (services/explanations.py).
+
+    With `partial_id` (the report id) each finished chunk is checkpointed and
+    chunks checkpointed by an earlier, cancelled run are not sent again.
+
+    With `batch_dir` the chunk prompts are submitted as batches instead of
+    one call each (see map_chunks_batch); re-running with the same directory
+    resumes the run.
+    """
+    # Loaded here so importing this module stays light (see main.create_app)
+    from services.coverageStore import syllabus_id_for
+    from services.questionIndex import index_questions, order_entries, record_question_mappings, split_inherited
+
+    # --- READ FILES ---
+    with open(syllabus_path, "r", encoding="utf-8") as f:
+        syllabus_text = f.read()
+
+    with open(questions_path, "r", encoding="utf-8") as f:
+        questions_data = json.load(f)
+
+    paper_id = questions_data.get("paper_id", "unknown")
+    questions = questions_data["questions"][:max_questions]  # Limit to first 40 questions
+    syllabus_id = syllabus_id_for(syllabus_text)
+    version = prompt_version(MAPPING_PROMPT_VERSION, terse)
+
+    # --- REUSE MAPPINGS OF NEAR-DUPLICATE QUESTIONS ---
+    inherited, to_map = [], questions
+    if dedupe:
+        index_questions(questions_data)
+        inherited, to_map = split_inherited(questions, paper_id, syllabus_id, version)
+
+    # --- PROCESS QUESTIONS IN CHUNKS ---
+    mapped = []
+    if batch_dir:
+        chunks = {f"{paper_id}:{idx}": q_chunk for idx, q_chunk in enumerate(chunk_list(to_map, chunk_size))}
+        results, errors = map_chunks_batch(syllabus_text, chunks, batch_dir, batch_processor, wait=batch_wait, terse=terse)
+        if errors:
+            raise RuntimeError(f"{len(errors)} chunk(s) failed in batch: {errors}")
+        for chunk_id in chunks:
+            mapped.extend(results[chunk_id])
+    else:
+        from services.reportCache import load_partials
+
+        partials = load_partials(partial_id) if partial_id else {}
+        for idx, q_chunk in enumerate(chunk_list(to_map, chunk_size), start=1):
+            resumed = partials.get(chunk_key(q_chunk))
+            if resumed is not None:
+                print(f"⏩ Chunk {idx} resumed from checkpoint")
+                mapped.extend(resumed)
+                continue
+            print(f"⏳ Processing chunk {idx} ({len(q_chunk)} questions)...")
+            entries = map_question_chunk(syllabus_text, q_chunk, terse=terse)
+            checkpoint_chunk(partial_id, q_chunk, entries)
+            mapped.extend(entries)
+
+    if dedupe:
+        record_question_mappings(paper_id, questions, syllabus_id, version, mapped)
+    all_results = order_entries(inherited + mapped, questions) if inherited else mapped
+    return mapping_result(paper_id, all_results, len(questions) - len(to_map), terse)
+
+
+def mapping_result(paper_id, entries, inherited_questions, terse=False):
+    """The mapping report returned by map_questions_to_syllabus."""
+    tier_counts = {}
+    for entry in entries:
+        tier_counts[entry.get("model", "unknown")] = tier_counts.get(entry.get("model", "unknown"), 0) + 1
+
+    return {
+        "paper_id": paper_id,
+        "question_topic_mapping": entries,
+        "model_tiers": tier_counts,
+        "inherited_questions": inherited_questions,
+        "terse": terse,
+        "stale": any(entry.get("stale") for entry in entries)
+    }
+
+
+def main(argv=None):
+    """
+    Command line entry point.
+
+    Single paper (pre-extracted questions JSON):
+        python -m services.comparePrompt --syllabus syllabus.txt --questions questions.json
+
+    Whole question bank (directory of paper PDFs):
+        python -m services.comparePrompt --syllabus syllabus.pdf --papers papers/ --output-dir outputs/bulk
+
+    Overnight batch run (re-run the same command to resume):
+        python -m services.comparePrompt --syllabus syllabus.pdf --papers papers/ --batch-dir outputs/batch/term3
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Map exam questions to syllabus topics.")
+    parser.add_argument("--syllabus", required=True, help="Syllabus .pdf or extracted .txt")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--questions", help="Questions JSON produced by extract_questions_from_pdf")
+    group.add_argument("--papers", help="Directory of paper PDFs for bulk analysis")
+    parser.add_argument("--output", default=None, help="Output JSON path (single mode)")
+    parser.add_argument("--output-dir", default=None, help="Report directory (bulk mode)")
+    parser.add_argument("--chunk-size", type=int, default=5)
+    parser.add_argument("--max-questions", type=int, default=MAX_QUESTIONS)
+    parser.add_argument("--concurrency", type=int, default=None, help="Global limit on concurrent model calls")
+    parser.add_argument("--workers", type=int, default=None, help="Processes used for PDF extraction")
+    parser.add_argument("--batch-dir", default=None, help="Submit chunk prompts as batches, checkpointed in this directory")
+    parser.add_argument("--batch-processor", choices=["openai", "local"], default=None,
+                        help="Batch API or the local stand-in (default: BATCH_PROCESSOR)")
+    parser.add_argument("--no-wait", action="store_true", help="Submit (or check) the batch and exit instead of polling")
+    args = parser.parse_args(argv)
+
+    from services.batchRunner import BatchPending, get_processor
+
+    batch = {}
+    if args.batch_dir:
+        batch = {"batch_dir": args.batch_dir, "batch_wait": not args.no_wait,
+                 "batch_processor": get_processor(args.batch_processor) if args.batch_processor else None}
+
+    try:
+        _run_cli(args, batch)
+    except BatchPending as e:
+        print(f"⏸️  {e}")
+
+
+def _run_cli(args, batch):
+    """Run the parsed command; `batch` holds the batch-mode keyword arguments (empty for live calls)."""
+    if args.papers:
+        from services.bulkAnalysis import analyze_paper_directory, DEFAULT_CONCURRENCY
+
+        output_dir = args.output_dir or os.path.join(args.papers, "reports")
+        summary = analyze_paper_directory(
+            syllabus_path=args.syllabus,
+            papers_dir=args.papers,
+            output_dir=output_dir,
+            chunk_size=args.chunk_size,
+            max_questions=args.max_questions,
+            concurrency=args.concurrency or DEFAULT_CONCURRENCY,
+            extraction_workers=args.workers,
+            **batch,
+        )
+        print(f"✅ Success! {summary['paper_count']} paper(s) mapped, reports in {output_dir}")
+        return
+
+    with tempfile.TemporaryDirectory() as scratch:
+        syllabus_path = args.syllabus
+        if syllabus_path.lower().endswith(".pdf"):
+            from services.bulkAnalysis import read_syllabus_text
+
+            # Extracted text goes to a scratch file, never next to the user's PDF
+            syllabus_path = os.path.join(scratch, "syllabus.txt")
+            with open(syllabus_path, "w", encoding="utf-8") as f:
+                f.write(read_syllabus_text(args.syllabus))
+
+        result = map_questions_to_syllabus(
+            syllabus_path,
+            args.questions,
+            chunk_size=args.chunk_size,
+            max_questions=args.max_questions,
+            **batch
+        )
+
+    output_path = args.output or os.path.join(BASE_DIR, "question_syllabus_mapping.json")
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(result, f, indent=2)
 
-    print(f"✅ Success! Saved to {output_path}")
\ No newline at end of file
+    print(f"✅ Success! Saved to {output_path}")
+
+
+# ---- RUN ----
+if __name__ == "__main__":
+    main()
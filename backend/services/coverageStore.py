@@ -0,0 +1,246 @@
+"""
+Columnar store and aggregation engine for question mappings.
+
+Every mapped paper is appended as one Parquet part file under
+outputs/coverage/ (one row per mapped question, topics as a list column).
+Summary views - per-topic counts and confidence histograms, out-of-scope
+rates, topic x paper matrices - are computed with vectorised pandas/NumPy
+group-bys over the combined frame, which is kept in memory and updated in
+place as new papers are recorded.
+"""
+
+import hashlib
+import re
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from services.comparePrompt import NEEDS_REVIEW_TOPIC
+
+STORE_DIR = Path(__file__).resolve().parent.parent / "outputs" / "coverage"
+
+# Confidence histogram buckets: [0.0, 0.1), [0.1, 0.2), ... [0.9, 1.0]
+CONFIDENCE_BINS = np.linspace(0.0, 1.0, 11)
+
+# Column dtypes; numeric and boolean columns stay typed so aggregations are vectorised
+COLUMNS = {
+    "syllabus_id": "object",
+    "syllabus_name": "object",
+    "paper_id": "object",
+    "question_id": "object",
+    "page": "Int64",
+    "topics": "object",
+    "in_syllabus": "bool",
+    "needs_review": "bool",
+    "confidence": "float64",
+    "mapped_at": "object",
+}
+
+_lock = threading.Lock()
+_frame: Optional[pd.DataFrame] = None
+_frame_version: Optional[str] = None
+
+
+def syllabus_id_for(syllabus_text: str) -> str:
+    """Stable short id for a syllabus, derived from its text."""
+    return hashlib.sha256(syllabus_text.encode("utf-8")).hexdigest()[:16]
+
+
+def _safe_paper(paper_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", paper_id)
+
+
+def _part_path(syllabus_id: str, paper_id: str) -> Path:
+    # The hash keeps ids that sanitise alike ("a b.pdf", "a_b.pdf") in separate parts
+    paper_hash = hashlib.sha256(paper_id.encode("utf-8")).hexdigest()[:8]
+    return STORE_DIR / f"{syllabus_id}__{_safe_paper(paper_id)}__{paper_hash}.parquet"
+
+
+def _legacy_part_path(syllabus_id: str, paper_id: str) -> Path:
+    """Part name used before the paper hash was added."""
+    return STORE_DIR / f"{syllabus_id}__{_safe_paper(paper_id)}.parquet"
+
+
+def _empty_frame() -> pd.DataFrame:
+    return pd.DataFrame({c: pd.Series(dtype=dtype) for c, dtype in COLUMNS.items()})
+
+
+def store_version() -> str:
+    """
+    Fingerprint of the part files on disk.
+
+    Changes whenever any worker records a paper, so it doubles as the ETag
+    input for coverage queries and as the staleness check for the cached frame.
+    """
+    parts = sorted(STORE_DIR.glob("*.parquet")) if STORE_DIR.exists() else []
+    listing = "|".join(f"{p.name}:{p.stat().st_mtime_ns}" for p in parts)
+    return hashlib.sha256(listing.encode("utf-8")).hexdigest()[:16]
+
+
+def _load() -> pd.DataFrame:
+    global _frame, _frame_version
+    version = store_version()
+    if _frame is None or version != _frame_version:
+        parts = sorted(STORE_DIR.glob("*.parquet")) if STORE_DIR.exists() else []
+        _frame = pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True) if parts else _empty_frame()
+        _frame_version = version
+    return _frame
+
+
+def _mapping_frame(report: Dict, syllabus_id: str, syllabus_name: str, paper_id: str) -> pd.DataFrame:
+    rows = report.get("question_topic_mapping", [])
+    df = pd.DataFrame.from_records(rows, columns=["question_id", "page", "topics", "in_syllabus", "confidence"])
+    df["topics"] = df["topics"].apply(lambda t: list(t) if isinstance(t, (list, tuple)) else [])
+    df["confidence"] = pd.to_numeric(df["confidence"], errors="coerce").fillna(0.0).clip(0.0, 1.0).astype("float64")
+    df["in_syllabus"] = df["in_syllabus"].fillna(True).astype(bool)
+    df["needs_review"] = df["topics"].apply(lambda t: NEEDS_REVIEW_TOPIC in t)
+    df["page"] = pd.to_numeric(df["page"], errors="coerce").astype("Int64")
+    df["question_id"] = df["question_id"].astype(str)
+    df["syllabus_id"] = syllabus_id
+    df["syllabus_name"] = syllabus_name
+    df["paper_id"] = paper_id
+    df["mapped_at"] = datetime.now(timezone.utc).isoformat()
+    return df[list(COLUMNS)]
+
+
+def record_mapping(report: Dict, syllabus_id: str, syllabus_name: str, paper_id: Optional[str] = None) -> int:
+    """
+    Add (or replace) one paper's mapping in the store.
+
+    Args:
+        report: Output of map_questions_to_syllabus
+        syllabus_id: Id of the syllabus the paper was mapped against
+        syllabus_name: Display name of the syllabus
+        paper_id: Paper identifier (default: report["paper_id"])
+
+    Returns:
+        int: Number of questions recorded
+    """
+    global _frame, _frame_version
+    paper_id = paper_id or report.get("paper_id", "unknown")
+    df = _mapping_frame(report, syllabus_id, syllabus_name, paper_id)
+
+    with _lock:
+        current = _load()
+        STORE_DIR.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(_part_path(syllabus_id, paper_id), index=False)
+        # The paper's rows now live in the new part; an old one would count them twice
+        _legacy_part_path(syllabus_id, paper_id).unlink(missing_ok=True)
+
+        keep = ~((current["syllabus_id"] == syllabus_id) & (current["paper_id"] == paper_id))
+        # Concatenating an empty frame would degrade the column dtypes
+        kept = current[keep]
+        _frame = pd.concat([kept, df], ignore_index=True) if not kept.empty else df.reset_index(drop=True)
+        _frame_version = store_version()
+
+    return len(df)
+
+
+def _select(syllabus_id: Optional[str] = None, paper_ids: Optional[List[str]] = None) -> pd.DataFrame:
+    with _lock:
+        df = _load()
+    if syllabus_id:
+        df = df[df["syllabus_id"] == syllabus_id]
+    if paper_ids:
+        df = df[df["paper_id"].isin(paper_ids)]
+    return df
+
+
+def _by_topic(df: pd.DataFrame) -> pd.DataFrame:
+    exploded = df.explode("topics", ignore_index=True).dropna(subset=["topics"]).rename(columns={"topics": "topic"})
+    exploded["confidence"] = exploded["confidence"].astype("float64")
+    return exploded
+
+
+def topic_summary(syllabus_id: Optional[str] = None, paper_ids: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Per-topic question counts, paper counts, mean confidence, out-of-scope
+    rate and a 10-bucket confidence histogram.
+    """
+    exploded = _by_topic(_select(syllabus_id, paper_ids))
+    if exploded.empty:
+        return []
+
+    stats = exploded.groupby("topic").agg(
+        count=("question_id", "size"),
+        paper_count=("paper_id", "nunique"),
+        avg_confidence=("confidence", "mean"),
+        in_syllabus_rate=("in_syllabus", "mean"),
+    )
+    stats["out_of_scope_rate"] = 1.0 - stats.pop("in_syllabus_rate")
+
+    buckets = np.clip(np.digitize(exploded["confidence"].to_numpy(), CONFIDENCE_BINS[1:-1]), 0, len(CONFIDENCE_BINS) - 2)
+    histogram = (
+        pd.crosstab(exploded["topic"].to_numpy(), buckets)
+        .reindex(columns=range(len(CONFIDENCE_BINS) - 1), fill_value=0)
+    )
+
+    stats = stats.sort_values("count", ascending=False)
+    return [
+        {
+            "topic": topic,
+            "count": int(row["count"]),
+            "paper_count": int(row["paper_count"]),
+            "avg_confidence": round(float(row["avg_confidence"]), 3),
+            "out_of_scope_rate": round(float(row["out_of_scope_rate"]), 3),
+            "confidence_histogram": histogram.loc[topic].astype(int).tolist(),
+        }
+        for topic, row in stats.iterrows()
+    ]
+
+
+def paper_summary(syllabus_id: Optional[str] = None) -> List[Dict]:
+    """Per-paper question counts and out-of-scope / needs-review rates."""
+    df = _select(syllabus_id)
+    if df.empty:
+        return []
+
+    stats = df.groupby(["syllabus_id", "paper_id"]).agg(
+        questions=("question_id", "size"),
+        avg_confidence=("confidence", "mean"),
+        in_syllabus_rate=("in_syllabus", "mean"),
+        needs_review_rate=("needs_review", "mean"),
+    ).reset_index()
+    stats["out_of_scope_rate"] = 1.0 - stats.pop("in_syllabus_rate")
+
+    return [
+        {
+            "syllabus_id": row["syllabus_id"],
+            "paper_id": row["paper_id"],
+            "questions": int(row["questions"]),
+            "avg_confidence": round(float(row["avg_confidence"]), 3),
+            "out_of_scope_rate": round(float(row["out_of_scope_rate"]), 3),
+            "needs_review_rate": round(float(row["needs_review_rate"]), 3),
+        }
+        for _, row in stats.iterrows()
+    ]
+
+
+def topic_paper_matrix(syllabus_id: Optional[str] = None, paper_ids: Optional[List[str]] = None) -> Dict:
+    """Topic x paper question-count matrix."""
+    exploded = _by_topic(_select(syllabus_id, paper_ids))
+    if exploded.empty:
+        return {"topics": [], "papers": [], "counts": []}
+
+    matrix = pd.crosstab(exploded["topic"], exploded["paper_id"])
+    return {
+        "topics": matrix.index.tolist(),
+        "papers": matrix.columns.tolist(),
+        "counts": matrix.to_numpy(dtype=int).tolist(),
+    }
+
+
+def list_syllabi() -> List[Dict]:
+    """Syllabi present in the store with their paper counts."""
+    df = _select()
+    if df.empty:
+        return []
+    grouped = df.groupby(["syllabus_id", "syllabus_name"])["paper_id"].nunique().reset_index()
+    return [
+        {"syllabus_id": r["syllabus_id"], "syllabus_name": r["syllabus_name"], "paper_count": int(r["paper_id"])}
+        for _, r in grouped.iterrows()
+    ]
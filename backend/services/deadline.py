@@ -0,0 +1,132 @@
+"""
+Per-request deadlines and cooperative cancellation.
+
+A report computation runs under a Deadline (see singleFlight.run_once). It is
+held in a context variable, so nothing has to pass it along: every model
+call (failsafe.guarded_completion) checks it before starting and gets its
+timeout clipped to the time left, and the extraction loops check it per
+page. Once the deadline has passed, or the computation was cancelled because
+every client waiting for it disconnected, the next check raises
+RequestCancelled and no further chunk, escalation or page is started. A
+call already on the wire runs to its (clipped) timeout; its answer is
+discarded.
+
+Work done before the cancellation is not lost: mapping chunks are
+checkpointed as they finish (reportCache.save_partial) and a retry resumes
+from them.
+
+Thread pools do not inherit context variables; submit with propagate(fn).
+"""
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Iterator, Optional
+
+if TYPE_CHECKING:
+    from fastapi import Request
+
+# Longest a report computation may run; clients may ask for less (X-Request-Timeout)
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "600"))
+
+DEADLINE_EXCEEDED = "deadline exceeded"
+CLIENT_DISCONNECTED = "client disconnected"
+
+_current: contextvars.ContextVar[Optional["Deadline"]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class RequestCancelled(Exception):
+    """The computation's deadline passed or its clients went away."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Request cancelled: {reason}")
+        self.reason = reason
+
+
+class Deadline:
+    """A point in time after which work stops, and a flag to stop it sooner."""
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+        self._cancelled = threading.Event()
+        self._reason: Optional[str] = None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, None without a time limit."""
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.monotonic()
+
+    def cancel(self, reason: str) -> None:
+        if not self._cancelled.is_set():
+            self._reason = reason
+            self._cancelled.set()
+
+    @property
+    def reason(self) -> Optional[str]:
+        """Why work must stop, None while it may continue."""
+        if self._cancelled.is_set():
+            return self._reason
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            return DEADLINE_EXCEEDED
+        return None
+
+    def check(self) -> None:
+        reason = self.reason
+        if reason is not None:
+            raise RequestCancelled(reason)
+
+    def timeout(self, default: float) -> float:
+        """`default` clipped to the time left (raises when none is left)."""
+        self.check()
+        remaining = self.remaining()
+        return default if remaining is None else max(0.001, min(default, remaining))
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+def check_deadline() -> None:
+    """Raise RequestCancelled if the current computation must stop."""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.check()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def under_deadline(fn: Callable, deadline: Optional[Deadline]) -> Callable:
+    """`fn` running under `deadline` (in whichever thread calls it)."""
+    def wrapper(*args, **kwargs):
+        with deadline_scope(deadline):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def propagate(fn: Callable) -> Callable:
+    """`fn` running under the caller's deadline, for thread pool submission."""
+    return under_deadline(fn, _current.get())
+
+
+def request_deadline(request: "Request") -> Deadline:
+    """Deadline for a request: REQUEST_DEADLINE_SECONDS, or the client's shorter X-Request-Timeout."""
+    seconds = REQUEST_DEADLINE_SECONDS
+    asked = request.headers.get("x-request-timeout")
+    if asked:
+        try:
+            seconds = min(seconds, max(1.0, float(asked)))
+        except ValueError:
+            pass
+    return Deadline(seconds)
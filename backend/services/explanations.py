@@ -0,0 +1,167 @@
+"""
+On-demand explanations for terse reports.
+
+Terse mapping and comparison reports (see build_mapping_prompt and
+comparison_request) carry only ids, topics, scores and labels - the
+prose the model would otherwise write for every row is the bulk of the
+output tokens and most of it is never read. When a report is built, the
+inputs needed to explain it later are kept under
+outputs/explanations/<report_id>.json; an explanation is generated the first
+time a row is expanded and stored next to that context, so it is never paid
+for twice.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+
+from config.openai_client import MAPPING_MODEL_TIERS
+from services.comparePrompt import explanation_request
+from services.failsafe import guarded_completion
+from services.llmRouter import get_router
+from services.pdfDocument import pdf_text
+from services.reportCache import load_report
+from services.syllabusJsonCreator import justification_request
+from services.uploadStore import blob_path, valid_sha256
+
+EXPLANATION_DIR = Path(__file__).resolve().parent.parent / "outputs" / "explanations"
+
+_lock = threading.Lock()
+
+
+def _path(report_id: str) -> Path:
+    return EXPLANATION_DIR / f"{report_id}.json"
+
+
+def _load(report_id: str) -> Optional[Dict]:
+    path = _path(report_id)
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save(report_id: str, store: Dict) -> None:
+    EXPLANATION_DIR.mkdir(parents=True, exist_ok=True)
+    path = _path(report_id)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(store, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def save_context(report_id: str, context: Dict) -> None:
+    """Keep what is needed to explain a report later (document hashes, question texts)."""
+    with _lock:
+        store = _load(report_id) or {"explanations": {}, "justification": None}
+        store["context"] = context
+        _save(report_id, store)
+
+
+def question_texts(questions_data: Dict) -> Dict[str, str]:
+    """Question id -> text for every question and subpart, as the mapping prompt saw them."""
+    texts = {}
+    for q in questions_data.get("questions", []):
+        texts[q["id"]] = q.get("text", "").strip()
+        for sp in q.get("subparts") or []:
+            texts[sp["id"]] = f"{q.get('text', '').strip()}\n({sp.get('label')}) {sp.get('text', '').strip()}"
+    return texts
+
+
+def _document_text(sha256: str) -> str:
+    if not valid_sha256(sha256) or not blob_path(sha256).exists():
+        raise LookupError("Source document is no longer stored")
+    return pdf_text(blob_path(sha256))
+
+
+def _report_and_store(report_id: str, kind: str):
+    report = load_report(report_id)
+    if report is None:
+        raise LookupError("Report not found")
+    store = _load(report_id)
+    if store is None or store.get("context", {}).get("kind") != kind:
+        raise LookupError("No explanation context stored for this report")
+    return report, store
+
+
+def explain_mapping(report_id: str, question_id: str) -> Dict:
+    """
+    Explanation of one question's mapping in a (terse) analyze-paper report.
+
+    Returns:
+        dict: {"question_id", "explanation", "cached"} ("stale" when served
+        from the failsafe fallback; those are not stored)
+    """
+    report, store = _report_and_store(report_id, "mapping")
+    cached = store["explanations"].get(question_id)
+    if cached:
+        return {"question_id": question_id, "explanation": cached["text"], "cached": True}
+
+    entries = report.get("report", {}).get("question_topic_mapping", [])
+    entry = next((e for e in entries if e.get("question_id") == question_id), None)
+    text = store["context"]["questions"].get(question_id)
+    if entry is None or text is None:
+        raise LookupError(f"Question {question_id} is not in this report")
+
+    # A full report already explains itself
+    if entry.get("out_of_scope_reason"):
+        return {"question_id": question_id, "explanation": entry["out_of_scope_reason"], "cached": True}
+
+    model = MAPPING_MODEL_TIERS[0]
+    syllabus_text = _document_text(store["context"]["syllabus_sha256"])
+    content, stale = guarded_completion(get_router(), **explanation_request(syllabus_text, text, entry, model))
+    explanation = json.loads(content).get("explanation", "")
+    if stale:
+        return {"question_id": question_id, "explanation": explanation, "cached": False, "stale": True}
+
+    with _lock:
+        store = _load(report_id)
+        store["explanations"][question_id] = {
+            "text": explanation,
+            "model": model,
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        _save(report_id, store)
+    return {"question_id": question_id, "explanation": explanation, "cached": False}
+
+
+def comparison_justification(report_id: str) -> Dict:
+    """
+    ai_justification for a (terse) compare-syllabi report.
+
+    Returns:
+        dict: {"ai_justification", "cached"} ("stale" when served from the
+        failsafe fallback; those are not stored)
+    """
+    report, store = _report_and_store(report_id, "comparison")
+    if report.get("ai_justification"):
+        return {"ai_justification": report["ai_justification"], "cached": True}
+    if store.get("justification"):
+        return {"ai_justification": store["justification"]["content"], "cached": True}
+
+    ctx = store["context"]
+    request = justification_request(
+        _document_text(ctx["old_sha256"]).strip(),
+        _document_text(ctx["new_sha256"]).strip(),
+        ctx["old_filename"],
+        ctx["new_filename"],
+        report.get("similarity_score"),
+        report.get("similarity_label"),
+    )
+    content, stale = guarded_completion(get_router(), **request, timeout=120.0)
+    justification = json.loads(content).get("ai_justification", {})
+    if stale:
+        return {"ai_justification": justification, "cached": False, "stale": True}
+
+    with _lock:
+        store = _load(report_id)
+        store["justification"] = {
+            "content": justification,
+            "model": request["model"],
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        _save(report_id, store)
+    return {"ai_justification": justification, "cached": False}
@@ -0,0 +1,277 @@
+"""
+Circuit breaker and last-known-good store for model calls.
+
+Every chat completion goes through guarded_completion(). While the breaker is
+closed, calls run normally and each successful response is stored under
+outputs/failsafe/, one file per hash of its input messages, so concurrent
+calls never wait on each other to store. After LLM_BREAKER_FAILURES
+consecutive failures (upstream errors or calls slower than
+LLM_BREAKER_SLOW_SECONDS) the breaker opens: calls fail fast and, when the
+same input was answered before, the stored answer is served and marked stale.
+After LLM_BREAKER_OPEN_SECONDS a single probe call is let through (half-open);
+success closes the breaker again.
+
+Only errors that say the upstream is unwell count as failures: connection
+errors, timeouts, 408, 429 and 5xx (is_upstream_failure). A request the
+upstream rejected (400, 401, 404, 422...) proves it is answering, and is
+raised to the caller as it is, without a stale answer.
+
+Under a request deadline (services/deadline.py) a call is not started once
+the deadline has passed or the request was cancelled, and its timeout is
+clipped to the time left. A call cut short that way is not held against the
+upstream and is not answered from the store; if it was the half-open probe,
+the probe is released so the next call probes instead.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from services.deadline import RequestCancelled, current_deadline
+
+FAILSAFE_DIR = Path(__file__).resolve().parent.parent / "outputs" / "failsafe"
+
+FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+SLOW_CALL_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "60"))
+OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+MAX_ENTRIES = int(os.getenv("FAILSAFE_MAX_ENTRIES", "500"))
+# Stored answers are pruned back to MAX_ENTRIES (oldest first) every this many saves
+PRUNE_EVERY = 50
+# Timeout clipped to a request's deadline when a call sets none (the client default, LLM_TIMEOUT)
+DEFAULT_CALL_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when the breaker is open and no stored answer exists for the input."""
+
+
+class UpstreamUnavailable(RuntimeError):
+    """No route to the model service is available right now (e.g. every backend's circuit is open)."""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = FAILURE_THRESHOLD,
+                 slow_call_seconds: float = SLOW_CALL_SECONDS, open_seconds: float = OPEN_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self._probe_thread: Optional[int] = None
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go through now. Moves open -> half-open after the cool-down."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                self._probe_thread = threading.get_ident()
+                return True
+            return False
+
+    def release_probe(self) -> None:
+        """
+        Give up this thread's half-open probe without a verdict (the call was
+        cancelled, which says nothing about the upstream); the next call probes.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self.probe_in_flight and self._probe_thread == threading.get_ident():
+                self.probe_in_flight = False
+
+    def record_success(self, elapsed: float) -> None:
+        if elapsed > self.slow_call_seconds:
+            self.record_failure(f"slow call ({elapsed:.1f}s)")
+            return
+        with self._lock:
+            if self.state != CLOSED:
+                print(f"✅ Circuit '{self.name}' closed")
+            self.state = CLOSED
+            self.failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self, error: str) -> None:
+        with self._lock:
+            self.failures += 1
+            self.last_error = error
+            self.probe_in_flight = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"🔌 Circuit '{self.name}' opened after {self.failures} failure(s): {error}")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def record_error(self, error: BaseException, elapsed: float) -> None:
+        """Record a failed call: a failure if the upstream is at fault, otherwise proof it answers."""
+        if is_upstream_failure(error):
+            self.record_failure(str(error))
+        elif isinstance(getattr(error, "status_code", None), int):
+            self.record_success(elapsed)
+        else:
+            # Failed before reaching the upstream (bad arguments): no verdict
+            self.release_probe()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            retry_in = max(0.0, self.open_seconds - (time.monotonic() - self.opened_at)) if self.state == OPEN else 0.0
+            return {
+                "name": self.name,
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "retry_in_seconds": round(retry_in, 1),
+                "last_error": self.last_error,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+_saves = 0
+_saves_lock = threading.Lock()
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """Whether an error says the upstream is unhealthy (transport, timeout, 408, 429, 5xx) rather than the request bad."""
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status in (408, 429) or status >= 500
+    if isinstance(error, (TimeoutError, ConnectionError, UpstreamUnavailable)):
+        return True
+    try:
+        import httpx
+        from openai import APIConnectionError
+    except ImportError:
+        return False
+    return isinstance(error, (APIConnectionError, httpx.TransportError))
+
+
+def get_breaker(name: str = "openai") -> CircuitBreaker:
+    breaker = _breakers.get(name)
+    if breaker is None:
+        # Request threads create llm:<name> breakers concurrently; only one may win
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def breaker_status() -> Dict[str, Any]:
+    return {name: b.status() for name, b in list(_breakers.items())}
+
+
+def input_hash(messages: Any, response_format: Any = None) -> str:
+    """Key for the failsafe store. The model is left out so any tier's answer can be served."""
+    payload = json.dumps({"messages": messages, "response_format": response_format}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key: str) -> Path:
+    return FAILSAFE_DIR / f"{key}.json"
+
+
+def load_last_good(key: str) -> Optional[Dict]:
+    try:
+        with open(_entry_path(key), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_last_good(key: str, content: str, model: str) -> None:
+    global _saves
+    FAILSAFE_DIR.mkdir(parents=True, exist_ok=True)
+    entry = {"content": content, "model": model, "stored_at": datetime.now(timezone.utc).isoformat()}
+    fd, tmp_path = tempfile.mkstemp(dir=FAILSAFE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, _entry_path(key))
+
+    with _saves_lock:
+        _saves += 1
+        prune = _saves % PRUNE_EVERY == 0
+    if prune:
+        _prune()
+
+
+def _prune() -> None:
+    """Drop the least recently stored answers beyond MAX_ENTRIES."""
+    entries = []
+    for path in FAILSAFE_DIR.glob("*.json"):
+        try:
+            entries.append((path.stat().st_mtime_ns, path))
+        except FileNotFoundError:
+            continue
+    entries.sort()
+    for _, path in entries[:max(0, len(entries) - MAX_ENTRIES)]:
+        path.unlink(missing_ok=True)
+
+
+def guarded_completion(client, breaker: str = "openai", **kwargs) -> Tuple[str, bool]:
+    """
+    Run client.chat.completions.create(**kwargs) behind the circuit breaker.
+
+    Args:
+        client: OpenAI client
+        breaker: Breaker name (one per upstream)
+        **kwargs: Arguments for chat.completions.create
+
+    Returns:
+        tuple: (message content, stale) - stale is True when the content is a
+        last-known-good answer served because the upstream is failing
+
+    Raises:
+        CircuitOpenError: Breaker open and no stored answer exists
+        RequestCancelled: The request's deadline passed or it was cancelled
+    """
+    cb = get_breaker(breaker)
+    key = input_hash(kwargs.get("messages"), kwargs.get("response_format"))
+    deadline = current_deadline()
+    if deadline is not None:
+        kwargs["timeout"] = deadline.timeout(kwargs.get("timeout") or DEFAULT_CALL_TIMEOUT)
+
+    if not cb.allow():
+        stored = load_last_good(key)
+        if stored is not None:
+            print(f"🩹 Circuit '{breaker}' open - serving stale result from {stored['stored_at']}")
+            return stored["content"], True
+        raise CircuitOpenError(f"Model service unavailable (circuit '{breaker}' open), no stored result for this input")
+
+    start = time.monotonic()
+    try:
+        response = client.chat.completions.create(**kwargs)
+    except Exception as e:
+        if deadline is not None and deadline.reason is not None:
+            # Not the upstream's fault, but a probe must not stay in flight forever
+            cb.release_probe()
+            raise RequestCancelled(deadline.reason) from e
+        cb.record_error(e, time.monotonic() - start)
+        if not is_upstream_failure(e):
+            # The request itself is wrong; another answer for it would hide that
+            raise
+        stored = load_last_good(key)
+        if stored is not None:
+            print(f"🩹 Model call failed ({e}) - serving stale result from {stored['stored_at']}")
+            return stored["content"], True
+        raise
+
+    cb.record_success(time.monotonic() - start)
+    content = response.choices[0].message.content
+    save_last_good(key, content, kwargs.get("model", ""))
+    return content, False
@@ -0,0 +1,353 @@
+"""
+Routing of chat completions across OpenAI-compatible backends.
+
+Services call guarded_completion(get_router(), ...) as they would with an
+OpenAI client: the router exposes chat.completions.create() and returns the
+response of whichever backend answered. Backends come from LLM_BACKENDS, a
+JSON list (or the path of a JSON file) of:
+
+    {"name": "local", "base_url": "http://127.0.0.1:8080/v1", "api_key": "none",
+     "models": {"gpt-4o-mini": "qwen2.5-7b-instruct"}}
+
+- base_url / api_key / api_key_env: where and how to call it; an entry with
+  none of them is the shared OpenAI client (config/openai_client.get_client)
+- models: logical model name (the names in the *_MODEL_TIERS settings) ->
+  name served by the backend, "*" for any other; without it the backend serves
+  every model under its own name
+- max_retries: SDK retries (default 0; the router fails over instead)
+
+Unset, there is one backend ("openai", the shared client) and calls go
+straight to it, as before.
+
+With several backends serving a model, each call goes to the one with the
+lowest latency EWMA for that model (unmeasured backends first, so every
+backend gets sampled; LLM_EXPLORE_RATE of calls go to a random other one so
+a backend that got faster is noticed). A backend whose breaker is open
+(failsafe breaker "llm:<name>") is skipped until its cool-down ends; with
+every circuit open the call fails as an upstream failure, so
+guarded_completion serves the last-known-good answer. When
+the call is still running after the backend's p95 for the model, the same
+request is sent to the next backend and the first answer wins (hedging; at
+most LLM_HEDGE_MAX_RATE of calls are hedged so a slow spell cannot double
+the load). A call that failed upstream (failsafe.is_upstream_failure) fails
+over to the next backend straight away; a rejected request is raised as is.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from services.deadline import current_deadline
+from services.failsafe import UpstreamUnavailable, get_breaker, is_upstream_failure
+
+LLM_BACKENDS = os.getenv("LLM_BACKENDS", "").strip()
+LLM_HEDGE = os.getenv("LLM_HEDGE", "1").lower() in ("1", "true", "yes")
+# Latencies recorded for a (backend, model) before its p95 is trusted for hedging
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.05"))
+LLM_HEDGE_MAX_RATE = float(os.getenv("LLM_HEDGE_MAX_RATE", "0.1"))
+LLM_EXPLORE_RATE = float(os.getenv("LLM_EXPLORE_RATE", "0.05"))
+# Threads running routed calls (a hedged call occupies two)
+LLM_ROUTER_THREADS = int(os.getenv("LLM_ROUTER_THREADS", "32"))
+
+HEDGE_QUANTILE = 0.95
+# How often a call waiting on its backends checks for cancellation (services/deadline.py)
+CANCEL_POLL_SECONDS = 0.25
+# Weight of the newest latency in the EWMA
+LATENCY_ALPHA = 0.2
+# Recent latencies kept per (backend, model) for the p95
+LATENCY_WINDOW = 200
+
+
+class NoBackendError(RuntimeError):
+    """No configured backend serves the model, or all that do are unavailable."""
+
+
+class BackendsUnavailableError(NoBackendError, UpstreamUnavailable):
+    """Every backend serving the model is unavailable; an upstream failure, so the failsafe may answer."""
+
+
+class LatencyStats:
+    """EWMA and a window of recent latencies for one (backend, model)."""
+
+    def __init__(self):
+        self.ewma: Optional[float] = None
+        self.window = deque(maxlen=LATENCY_WINDOW)
+        self.calls = 0
+        self.errors = 0
+
+    def record(self, seconds: float) -> None:
+        self.calls += 1
+        self.window.append(seconds)
+        self.ewma = seconds if self.ewma is None else LATENCY_ALPHA * seconds + (1 - LATENCY_ALPHA) * self.ewma
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.window:
+            return None
+        ordered = sorted(self.window)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Backend:
+    """One OpenAI-compatible endpoint and its live latency per model."""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.name = spec["name"]
+        self.spec = spec
+        self.models: Optional[Dict[str, str]] = spec.get("models")
+        self.breaker = get_breaker(f"llm:{self.name}")
+        self.in_flight = 0
+        self.stats: Dict[str, LatencyStats] = {}
+        self._client = None
+        self._owns_client = False
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._make_client()
+        return self._client
+
+    def _make_client(self):
+        from config.openai_client import get_client, http_client_options
+
+        spec = self.spec
+        if not any(k in spec for k in ("base_url", "api_key", "api_key_env")):
+            return get_client()
+        import httpx
+        from openai import OpenAI
+        self._owns_client = True
+        return OpenAI(
+            base_url=spec.get("base_url"),
+            api_key=spec.get("api_key") or os.getenv(spec.get("api_key_env", "OPENAI_API_KEY")),
+            http_client=httpx.Client(**http_client_options()),
+            max_retries=spec.get("max_retries", 0),
+        )
+
+    def close(self) -> None:
+        if self._client is not None and self._owns_client:
+            self._client.close()
+        self._client = None
+
+    def served_model(self, model: str) -> Optional[str]:
+        """Name this backend serves `model` under, None if it does not serve it."""
+        if self.models is None:
+            return model
+        return self.models.get(model) or self.models.get("*")
+
+    def expected_latency(self, model: str) -> float:
+        stats = self.stats.get(model)
+        return stats.ewma if stats is not None and stats.ewma is not None else 0.0
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """p95 latency for `model`, None until enough calls have been measured."""
+        stats = self.stats.get(model)
+        if stats is None or len(stats.window) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return max(LLM_HEDGE_MIN_DELAY, stats.quantile(HEDGE_QUANTILE))
+
+    def complete(self, **kwargs):
+        model = kwargs.get("model", "")
+        with self._lock:
+            self.in_flight += 1
+            stats = self.stats.setdefault(model, LatencyStats())
+        start = time.monotonic()
+        try:
+            response = self.client.chat.completions.create(**{**kwargs, "model": self.served_model(model)})
+        except Exception as e:
+            with self._lock:
+                stats.errors += 1
+            self.breaker.record_error(e, time.monotonic() - start)
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        elapsed = time.monotonic() - start
+        with self._lock:
+            stats.record(elapsed)
+        self.breaker.record_success(elapsed)
+        return response
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            models = {
+                model: {
+                    "calls": s.calls,
+                    "errors": s.errors,
+                    "ewma_ms": round(s.ewma * 1000, 1) if s.ewma is not None else None,
+                    "p95_ms": round(s.quantile(HEDGE_QUANTILE) * 1000, 1) if s.window else None,
+                }
+                for model, s in self.stats.items()
+            }
+            return {
+                "name": self.name,
+                "base_url": self.spec.get("base_url"),
+                "in_flight": self.in_flight,
+                "circuit": self.breaker.status()["state"],
+                "models": models,
+            }
+
+
+class LLMRouter:
+    """Duck-types the chat.completions part of an OpenAI client over several backends."""
+
+    def __init__(self, backends: List[Backend]):
+        self.backends = backends
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.counts = {"calls": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] += 1
+
+    def ranked(self, model: str) -> List[Backend]:
+        """Backends serving `model`, expected fastest first."""
+        eligible = [b for b in self.backends if b.served_model(model)]
+        eligible.sort(key=lambda b: (b.expected_latency(model), b.in_flight))
+        if len(eligible) > 1 and random.random() < LLM_EXPLORE_RATE:
+            eligible.insert(0, eligible.pop(random.randrange(1, len(eligible))))
+        return eligible
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            return LLM_HEDGE and self.counts["hedged"] < LLM_HEDGE_MAX_RATE * self.counts["calls"]
+
+    def create(self, **kwargs):
+        model = kwargs.get("model", "")
+        candidates = self.ranked(model)
+        if not candidates:
+            raise NoBackendError(f"No LLM backend serves model '{model}'")
+        self._count("calls")
+        if len(self.backends) == 1:
+            if not candidates[0].breaker.allow():
+                raise BackendsUnavailableError(f"LLM backend '{candidates[0].name}' is unavailable (circuit open)")
+            return candidates[0].complete(**kwargs)
+
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=LLM_ROUTER_THREADS, thread_name_prefix="llm-route")
+        remaining = iter(candidates)
+        pending = {}
+
+        def launch() -> Optional[Backend]:
+            for backend in remaining:
+                if backend.breaker.allow():
+                    pending[self._pool.submit(backend.complete, **kwargs)] = backend
+                    return backend
+            return None
+
+        primary = launch()
+        if primary is None:
+            raise BackendsUnavailableError(f"All LLM backends serving '{model}' are unavailable (circuits open)")
+        delay = primary.hedge_delay(model) if self._may_hedge() else None
+        hedge_at = time.monotonic() + delay if delay is not None else None
+        hedge: Optional[Backend] = None
+        last_error: Optional[Exception] = None
+        deadline = current_deadline()
+
+        while pending:
+            timeout = max(0.0, hedge_at - time.monotonic()) if hedge_at is not None else None
+            if deadline is not None:
+                timeout = CANCEL_POLL_SECONDS if timeout is None else min(timeout, CANCEL_POLL_SECONDS)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if deadline is not None:
+                    # Stop waiting; the calls on the wire finish in the pool
+                    deadline.check()
+                if hedge_at is None or time.monotonic() < hedge_at:
+                    continue
+                # Primary is past its p95: race a duplicate on the next backend
+                hedge_at = None
+                hedge = launch()
+                if hedge is not None:
+                    self._count("hedged")
+                continue
+            for future in done:
+                backend = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    if not is_upstream_failure(e):
+                        # The request is at fault; another backend would reject it too
+                        raise
+                    last_error = e
+                    continue
+                # The loser keeps running in the pool; its latency is still recorded
+                if backend is hedge:
+                    self._count("hedge_wins")
+                return response
+            if not pending:
+                hedge_at = None
+                if launch() is not None:
+                    self._count("failovers")
+
+        raise last_error or BackendsUnavailableError(f"No LLM backend answered for '{model}'")
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+        for backend in self.backends:
+            backend.close()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            "hedging": LLM_HEDGE and len(self.backends) > 1,
+            **counts,
+            "backends": [b.status() for b in self.backends],
+        }
+
+
+_router: Optional[LLMRouter] = None
+_router_lock = threading.Lock()
+
+
+def backend_specs() -> List[Dict[str, Any]]:
+    """Backend entries from LLM_BACKENDS (inline JSON or a file path)."""
+    if not LLM_BACKENDS:
+        return [{"name": "openai"}]
+    if LLM_BACKENDS.startswith("["):
+        specs = json.loads(LLM_BACKENDS)
+    else:
+        with open(LLM_BACKENDS, "r", encoding="utf-8") as f:
+            specs = json.load(f)
+    names = [s.get("name") for s in specs]
+    if not specs or None in names or len(set(names)) != len(names):
+        raise ValueError("LLM_BACKENDS needs at least one entry, each with a unique 'name'")
+    return specs
+
+
+def get_router() -> LLMRouter:
+    """Shared router over the configured backends, created on first use."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = LLMRouter([Backend(spec) for spec in backend_specs()])
+    return _router
+
+
+def close_router() -> None:
+    """Close the router's own clients and threads (called from the app lifespan)."""
+    global _router
+    with _router_lock:
+        router, _router = _router, None
+    if router is not None:
+        router.close()
+
+
+def router_status() -> Optional[Dict[str, Any]]:
+    return _router.status() if _router is not None else None
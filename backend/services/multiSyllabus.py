@@ -0,0 +1,201 @@
+"""
+One paper mapped against several syllabi in a single pass.
+
+Checking a paper against the old and the new syllabus (or E-Math and
+A-Math) used to take one full analysis per syllabus, each re-extracting the
+paper and re-fingerprinting its questions. Here the caller extracts the
+paper once; the near-duplicate lookup (questionIndex.duplicate_matches) runs
+once for all syllabi, and the mapping chunks of every syllabus are scheduled
+through one thread pool, so the syllabi are mapped concurrently under a
+single limit on model calls. Each syllabus gets the same mapping report
+map_questions_to_syllabus produces; side_by_side() lines them up per
+question.
+
+This module makes no decisions about caching - see main.build_multi_paper_analysis.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from services.comparePrompt import (
+    MAPPING_PROMPT_VERSION,
+    MAX_QUESTIONS,
+    NEEDS_REVIEW_TOPIC,
+    checkpoint_chunk,
+    chunk_key,
+    chunk_list,
+    map_question_chunk,
+    mapping_result,
+    prompt_version,
+)
+from services.coverageStore import syllabus_id_for
+from services.deadline import propagate
+from services.questionIndex import duplicate_matches, index_questions, order_entries, record_syllabi_mappings, split_inherited
+from services.reportCache import load_partials
+
+# Limit on in-flight model calls across all syllabi of one analysis
+MULTI_SYLLABUS_CONCURRENCY = int(os.getenv("MULTI_SYLLABUS_CONCURRENCY", "8"))
+
+
+def map_paper_to_syllabi(
+    questions_data: Dict,
+    syllabus_texts: Dict[str, str],
+    chunk_size: int = 5,
+    max_questions: Optional[int] = MAX_QUESTIONS,
+    concurrency: int = MULTI_SYLLABUS_CONCURRENCY,
+    terse: bool = False,
+    partial_ids: Optional[Dict[str, str]] = None,
+) -> Dict[str, Dict]:
+    """
+    Map one extracted paper against several syllabi.
+
+    Args:
+        questions_data: Extracted paper (as returned by extract_questions_from_pdf)
+        syllabus_texts: {label: syllabus text}
+        chunk_size: Questions per model call
+        max_questions: Question cap (None for no cap)
+        concurrency: Limit on concurrent model calls across all syllabi
+        terse: Answers without explanations (see comparePrompt.map_questions_to_syllabus)
+        partial_ids: {label: report id} to checkpoint finished chunks under
+            and resume from (see comparePrompt.map_questions_to_syllabus)
+
+    Returns:
+        dict: {label: mapping report}, in the order of `syllabus_texts`
+
+    Raises:
+        Exception: The first chunk failure, once the chunks already running
+        have finished (and been checkpointed); chunks not yet started are
+        dropped. Mappings are all-or-nothing per analysis, like a
+        single-syllabus run
+    """
+    partial_ids = partial_ids or {}
+    paper_id = questions_data.get("paper_id", "unknown")
+    questions = questions_data["questions"]
+    if max_questions is not None:
+        questions = questions[:max_questions]
+
+    # --- ONE FINGERPRINT AND DUPLICATE LOOKUP FOR ALL SYLLABI ---
+    version = prompt_version(MAPPING_PROMPT_VERSION, terse)
+    index_questions(questions_data)
+    matches = duplicate_matches(questions, paper_id)
+
+    jobs = []
+    plans = {}
+    for label, syllabus_text in syllabus_texts.items():
+        syllabus_id = syllabus_id_for(syllabus_text)
+        inherited, to_map = split_inherited(questions, paper_id, syllabus_id, version, matches)
+        plans[label] = {"syllabus_id": syllabus_id, "inherited": inherited, "to_map": to_map, "mapping": {}}
+        partials = load_partials(partial_ids[label]) if label in partial_ids else {}
+        for idx, q_chunk in enumerate(chunk_list(to_map, chunk_size)):
+            resumed = partials.get(chunk_key(q_chunk))
+            if resumed is not None:
+                plans[label]["mapping"][idx] = resumed
+            else:
+                jobs.append((label, idx, q_chunk))
+
+    # --- ALL SYLLABI'S CHUNKS UNDER ONE LIMIT ---
+    # Submitted syllabus by syllabus so a syllabus's chunks (same prompt prefix) run close together
+    resumed = sum(len(plan["mapping"]) for plan in plans.values())
+    print(f"🤖 Mapping {len(jobs)} chunk(s) for {len(syllabus_texts)} syllabi with concurrency {concurrency}"
+          f"{f' ({resumed} resumed from checkpoint)' if resumed else ''}...")
+    error = None
+    if jobs:
+        map_chunk = propagate(map_question_chunk)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {
+                pool.submit(map_chunk, syllabus_texts[label], q_chunk, terse=terse): (label, idx, q_chunk)
+                for label, idx, q_chunk in jobs
+            }
+            for future in as_completed(futures):
+                label, idx, q_chunk = futures[future]
+                if future.cancelled():
+                    continue
+                try:
+                    entries = future.result()
+                except Exception as e:
+                    if error is None:
+                        error = e
+                        for pending in futures:
+                            pending.cancel()
+                    continue
+                plans[label]["mapping"][idx] = entries
+                checkpoint_chunk(partial_ids.get(label), q_chunk, entries)
+    if error is not None:
+        raise error
+
+    mapped_by_label = {
+        label: [m for idx in sorted(plan["mapping"]) for m in plan["mapping"][idx]]
+        for label, plan in plans.items()
+    }
+    record_syllabi_mappings(paper_id, questions, version, {
+        plans[label]["syllabus_id"]: mapped for label, mapped in mapped_by_label.items()
+    })
+    reports = {}
+    for label, plan in plans.items():
+        mapped = mapped_by_label[label]
+        entries = order_entries(plan["inherited"] + mapped, questions) if plan["inherited"] else mapped
+        reports[label] = mapping_result(paper_id, entries, len(questions) - len(plan["to_map"]), terse)
+    return reports
+
+
+def _status(entry: Dict) -> str:
+    if NEEDS_REVIEW_TOPIC in (entry.get("topics") or []):
+        return "needs_review"
+    return "out_of_scope" if entry.get("in_syllabus") is False else "in_syllabus"
+
+
+def side_by_side(reports: Dict[str, Dict]) -> Dict:
+    """
+    Coverage comparison of one paper's mapping reports, one per syllabus.
+
+    Args:
+        reports: {label: mapping report} (question_topic_mapping entries)
+
+    Returns:
+        dict: Per-syllabus totals, one row per question with each syllabus's
+        topics/scope/confidence, and how many questions are in scope for all,
+        none or only some of the syllabi
+    """
+    labels = list(reports)
+    rows: Dict[str, Dict] = {}
+    syllabi = []
+    for label in labels:
+        totals = {"questions": 0, "in_syllabus": 0, "out_of_scope": 0, "needs_review": 0}
+        confidence_sum = 0.0
+        topics = set()
+        for entry in reports[label].get("question_topic_mapping", []):
+            qid = str(entry.get("question_id"))
+            row = rows.setdefault(qid, {"question_id": qid, "page": entry.get("page"), "syllabi": {}})
+            status = _status(entry)
+            row["syllabi"][label] = {
+                "topics": entry.get("topics") or [],
+                "in_syllabus": entry.get("in_syllabus"),
+                "status": status,
+                "confidence": entry.get("confidence"),
+            }
+            totals["questions"] += 1
+            totals[status] += 1
+            try:
+                confidence_sum += float(entry.get("confidence") or 0)
+            except (TypeError, ValueError):
+                pass
+            if status == "in_syllabus":
+                topics.update(entry.get("topics") or [])
+        syllabi.append({
+            "syllabus": label,
+            **totals,
+            "avg_confidence": round(confidence_sum / totals["questions"], 3) if totals["questions"] else None,
+            "topic_count": len(topics),
+        })
+
+    agreement = {"in_all": 0, "in_none": 0, "differs": 0}
+    questions: List[Dict] = []
+    for row in rows.values():
+        in_scope = [row["syllabi"].get(label, {}).get("status") == "in_syllabus" for label in labels]
+        row["agreement"] = "in_all" if all(in_scope) else "in_none" if not any(in_scope) else "differs"
+        row["in_syllabi"] = [label for label, inside in zip(labels, in_scope) if inside]
+        agreement[row["agreement"]] += 1
+        questions.append(row)
+
+    return {"syllabi": syllabi, "agreement": agreement, "questions": questions}
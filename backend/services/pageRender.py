@@ -0,0 +1,328 @@
+"""
+Page thumbnails and question crops rendered from stored PDFs.
+
+Mapping rows carry a page number, and reviewers check a question against
+the page it came from, often because the extracted text of maths is
+garbled. Pages are rendered to PNG with PyMuPDF pixmaps; a question crop is
+the page clipped to the question's region (textExtractorQuestion.page_regions),
+across the page's full width so figures beside the text are kept.
+
+Rendering is CPU-bound and holds the GIL, so it runs in a process pool
+(RENDER_WORKERS); the event loop only waits. Every image is keyed by the
+document's SHA-256, page, zoom and clip and never changes for that key, so
+it is cached twice:
+
+- in memory, least recently used first out, up to RENDER_MEMORY_MB
+- on disk under outputs/renders/<sha256>/, written by the worker that
+  rendered it, so restarts and other workers reuse it
+
+Identical renders requested while one is running share it. Callers send the
+key-derived ETag with a long immutable max-age, so browsers do not even
+revalidate while a reviewer steps through a paper's questions.
+
+Question regions come from the extraction an analysis already ran
+(save_regions); for a document not analysed here they are extracted once,
+in the pool, and kept next to the renders.
+"""
+
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+RENDER_DIR = Path(__file__).resolve().parent.parent / "outputs" / "renders"
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+RENDER_MEMORY_MB = float(os.getenv("RENDER_MEMORY_MB", "64"))
+
+THUMBNAIL_ZOOM = 0.5
+CROP_ZOOM = 2.0
+MIN_ZOOM = 0.1
+MAX_ZOOM = 4.0
+# Zooms are snapped to this step so near-identical requests share one render
+ZOOM_STEP = 0.05
+# Points of page kept above a question's region
+CROP_MARGIN = 6.0
+
+# Part of every cache key and ETag; bump when rendered output changes
+RENDER_VERSION = "1"
+
+_memory: "OrderedDict[str, bytes]" = OrderedDict()
+_memory_bytes = 0
+_memory_lock = threading.Lock()
+_inflight: Dict[str, asyncio.Future] = {}
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_stats = {"memory_hits": 0, "disk_hits": 0, "renders": 0, "shared": 0}
+
+
+class PageNotFound(LookupError):
+    """The document has no such page, or no such question."""
+
+
+def normalize_zoom(zoom: float) -> float:
+    zoom = min(MAX_ZOOM, max(MIN_ZOOM, float(zoom)))
+    return round(round(zoom / ZOOM_STEP) * ZOOM_STEP, 2)
+
+
+def render_key(page: int, zoom: float, clip: Optional[Sequence[float]] = None) -> str:
+    key = f"p{page}@{zoom:g}"
+    if clip is not None:
+        key += "-" + ",".join(f"{v:g}" for v in clip)
+    return key
+
+
+def render_etag(sha256: str, key: str) -> str:
+    digest = hashlib.sha256(f"{RENDER_VERSION}|{sha256}|{key}".encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _disk_path(sha256: str, key: str) -> Path:
+    return RENDER_DIR / sha256 / f"{key}.png"
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _render_png(pdf_path: str, page: int, zoom: float, clip: Optional[Sequence[float]], out_path: str) -> bytes:
+    """Render one page, or the band between clip's (top, bottom), and store it; runs in a pool process."""
+    import pymupdf
+
+    from services.pdfDocument import open_pdf
+
+    with open_pdf(pdf_path) as doc:
+        if not 1 <= page <= doc.page_count:
+            raise PageNotFound(f"Page {page} is not in the document ({doc.page_count} pages)")
+        pdf_page = doc[page - 1]
+        rect = pdf_page.rect
+        if clip is not None:
+            # No margin below: the band ends where the next question starts
+            rect = pymupdf.Rect(rect.x0, clip[0] - CROP_MARGIN, rect.x1, clip[1]) & pdf_page.rect
+        pixmap = pdf_page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), clip=rect, alpha=False)
+        png = pixmap.tobytes("png")
+    _write_atomic(Path(out_path), png)
+    return png
+
+
+def _extract_regions(pdf_path: str) -> List[Dict]:
+    """Question regions of a document; runs in a pool process."""
+    from services.textExtractorQuestion import extract_questions_from_pdf
+
+    fd, tmp = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        return extract_questions_from_pdf(pdf_path, tmp)["regions"]
+    finally:
+        os.unlink(tmp)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Spawned, not forked: the server process has threads (and their locks) running
+                _pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def close_renderer() -> None:
+    """Stop the render processes (called from the app lifespan)."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _remember(cache_key: str, png: bytes) -> None:
+    global _memory_bytes
+    limit = RENDER_MEMORY_MB * 1024 * 1024
+    if len(png) > limit:
+        return
+    with _memory_lock:
+        if cache_key in _memory:
+            return
+        _memory[cache_key] = png
+        _memory_bytes += len(png)
+        while _memory_bytes > limit:
+            _, evicted = _memory.popitem(last=False)
+            _memory_bytes -= len(evicted)
+
+
+def _recall(cache_key: str) -> Optional[bytes]:
+    with _memory_lock:
+        png = _memory.get(cache_key)
+        if png is not None:
+            _memory.move_to_end(cache_key)
+            _stats["memory_hits"] += 1
+        return png
+
+
+async def _load_or_render(sha256: str, pdf_path: str, page: int, zoom: float,
+                          clip: Optional[Sequence[float]]) -> bytes:
+    key = render_key(page, zoom, clip)
+    cache_key = f"{sha256}/{key}"
+    png = _recall(cache_key)
+    if png is not None:
+        return png
+
+    shared = _inflight.get(cache_key)
+    if shared is not None:
+        _stats["shared"] += 1
+        return await asyncio.shield(shared)
+
+    loop = asyncio.get_running_loop()
+    path = _disk_path(sha256, key)
+
+    async def load() -> bytes:
+        try:
+            data = await asyncio.to_thread(path.read_bytes)
+            _stats["disk_hits"] += 1
+        except FileNotFoundError:
+            data = await loop.run_in_executor(_get_pool(), _render_png, pdf_path, page, zoom,
+                                              tuple(clip) if clip is not None else None, str(path))
+            _stats["renders"] += 1
+        _remember(cache_key, data)
+        return data
+
+    task = _inflight[cache_key] = asyncio.ensure_future(load())
+    try:
+        return await asyncio.shield(task)
+    finally:
+        if task.done():
+            _inflight.pop(cache_key, None)
+        else:
+            # This caller went away; whoever shares the render still gets it
+            task.add_done_callback(lambda _: _inflight.pop(cache_key, None))
+
+
+async def render_page(sha256: str, pdf_path: str, page: int, zoom: float = THUMBNAIL_ZOOM) -> Tuple[bytes, str]:
+    """
+    PNG of one page of a stored document.
+
+    Args:
+        sha256: Content hash of the document (its blob in uploadStore)
+        pdf_path: Path of the document
+        page: 1-based page number, as in mapping rows
+        zoom: Scale (1.0 = 72 dpi), snapped to ZOOM_STEP within MIN_ZOOM..MAX_ZOOM
+
+    Returns:
+        tuple: (PNG bytes, ETag)
+
+    Raises:
+        PageNotFound: The document has no such page
+    """
+    zoom = normalize_zoom(zoom)
+    png = await _load_or_render(sha256, pdf_path, page, zoom, None)
+    return png, render_etag(sha256, render_key(page, zoom))
+
+
+def _regions_path(sha256: str) -> Path:
+    return RENDER_DIR / sha256 / "regions.json"
+
+
+def save_regions(sha256: str, regions: Optional[List[Dict]]) -> None:
+    """Keep a document's question regions (from an extraction that ran anyway)."""
+    if regions is None:
+        return
+    try:
+        _write_atomic(_regions_path(sha256), json.dumps(regions).encode("utf-8"))
+    except OSError as e:
+        print(f"⚠️  Could not save question regions: {e}")
+
+
+async def question_regions(sha256: str, pdf_path: str) -> List[Dict]:
+    """
+    Question regions of a stored document, extracting them (in the pool) on first use.
+
+    Returns:
+        list: As textExtractorQuestion.page_regions
+    """
+    path = _regions_path(sha256)
+    try:
+        return json.loads(await asyncio.to_thread(path.read_bytes))
+    except FileNotFoundError:
+        pass
+    regions = await asyncio.get_running_loop().run_in_executor(_get_pool(), _extract_regions, pdf_path)
+    save_regions(sha256, regions)
+    return regions
+
+
+def find_region(regions: List[Dict], question_id: str, page: Optional[int] = None, part: int = 0) -> Dict:
+    """
+    One page region of a question.
+
+    Args:
+        regions: As returned by question_regions()
+        question_id: Question or subpart id as in mapping rows (Q15a uses Q15's region)
+        page: Page the question starts on, to tell apart repeated ids (two papers in one file)
+        part: Which of the question's pages, 0 for the first
+
+    Raises:
+        PageNotFound: No such question, or it has fewer parts
+    """
+    match = re.match(r"Q\d+", str(question_id))
+    base = match.group(0) if match else str(question_id)
+    candidates = [r for r in regions if r["question_id"] == base]
+    if page is not None:
+        candidates = [r for r in candidates if r["page"] == page] or candidates
+    if not candidates:
+        raise PageNotFound(f"Question {question_id} was not found in the document")
+    spans = candidates[0]["regions"]
+    if not 0 <= part < len(spans):
+        raise PageNotFound(f"Question {question_id} has {len(spans)} page region(s)")
+    return spans[part]
+
+
+def _band(region: Dict) -> Tuple[float, float]:
+    # Crops are page-wide, so only the region's top and bottom matter
+    return round(region["bbox"][1], 1), round(region["bbox"][3], 1)
+
+
+async def render_region(sha256: str, pdf_path: str, region: Dict, zoom: float = CROP_ZOOM) -> Tuple[bytes, str]:
+    """
+    PNG of a question region (see find_region), page-wide.
+
+    Returns:
+        tuple: (PNG bytes, ETag)
+    """
+    zoom = normalize_zoom(zoom)
+    clip = _band(region)
+    png = await _load_or_render(sha256, pdf_path, region["page"], zoom, clip)
+    return png, render_etag(sha256, render_key(region["page"], zoom, clip))
+
+
+def crop_etag(sha256: str, region: Dict, zoom: float) -> str:
+    """ETag render_region() would return, without rendering."""
+    zoom = normalize_zoom(zoom)
+    return render_etag(sha256, render_key(region["page"], zoom, _band(region)))
+
+
+def page_etag(sha256: str, page: int, zoom: float) -> str:
+    """ETag render_page() would return, without rendering."""
+    return render_etag(sha256, render_key(page, normalize_zoom(zoom)))
+
+
+def render_status() -> Dict:
+    with _memory_lock:
+        return {
+            **_stats,
+            "memory_entries": len(_memory),
+            "memory_mb": round(_memory_bytes / (1024 * 1024), 2),
+            "in_flight": len(_inflight),
+            "workers": RENDER_WORKERS,
+        }
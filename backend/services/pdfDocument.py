@@ -0,0 +1,66 @@
+"""
+Context-managed PyMuPDF documents.
+
+Every PDF the backend reads is opened through open_pdf(), which closes the
+document when the block exits, including on exceptions and early breaks.
+A bare pymupdf.open() left the document (and the MuPDF objects behind it)
+alive until garbage collection got to it; an exception traceback keeps the
+frame, and so the document, alive even longer. open_documents() counts the
+handles currently open so the soak test (soak_memory.py) can check that
+none leak.
+
+MuPDF also keeps a process-wide store of decoded fonts, images and parsed
+objects that outlives the documents. Left alone it fills up to its 256 MB
+cap, which is the RSS creep seen under sustained traffic: each question
+extraction added about 7 MB. The store is emptied whenever the last open
+document is closed (PDF_STORE_SHRINK=0 keeps it).
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+import pymupdf
+
+from services.deadline import check_deadline
+
+PDF_STORE_SHRINK = os.getenv("PDF_STORE_SHRINK", "1").lower() in ("1", "true", "yes")
+
+_open_count = 0
+_count_lock = threading.Lock()
+
+
+def _track(delta: int) -> int:
+    global _open_count
+    with _count_lock:
+        _open_count += delta
+        return _open_count
+
+
+def open_documents() -> int:
+    """Documents opened through open_pdf() and not yet closed."""
+    return _open_count
+
+
+@contextmanager
+def open_pdf(pdf_path: str) -> Iterator[pymupdf.Document]:
+    """Open a PDF for the duration of a `with` block."""
+    doc = pymupdf.open(str(pdf_path))
+    _track(1)
+    try:
+        yield doc
+    finally:
+        doc.close()
+        if _track(-1) == 0 and PDF_STORE_SHRINK:
+            pymupdf.TOOLS.store_shrink(100)
+
+
+def pdf_text(pdf_path: str) -> str:
+    """Plain text of every page, concatenated (page.get_text() per page)."""
+    with open_pdf(pdf_path) as doc:
+        parts = []
+        for page in doc:
+            check_deadline()
+            parts.append(page.get_text())
+        return "".join(parts)
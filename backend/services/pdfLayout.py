@@ -0,0 +1,189 @@
+"""
+Compact span layout for PyMuPDF text.
+
+`page.get_text("dict")` builds nested dicts of blocks, lines and spans (bbox
+tuples, font strings, image bytes) for every page. This module converts each
+page straight into a NumPy structured array with one row per span: bbox,
+size, flags, an interned font id and offsets into one shared text buffer.
+The nested dicts of a page are dropped as soon as it is converted, so peak
+memory is one page of dicts plus the compact rows.
+
+A whole document's layout can be saved as <stem>.spans.npy + <stem>.json and
+reopened memory-mapped, so repeat parses of the same PDF skip MuPDF entirely.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from services.pdfDocument import open_pdf
+
+LAYOUT_DIR = Path(__file__).resolve().parent.parent / "outputs" / "layout"
+
+SPAN_DTYPE = np.dtype([
+    ("page", np.int32),
+    ("line", np.int32),  # line index within the page, in reading order
+    ("x0", np.float32),
+    ("y0", np.float32),
+    ("x1", np.float32),
+    ("y1", np.float32),
+    ("size", np.float32),
+    ("flags", np.int32),
+    ("font", np.int32),  # index into SpanLayout.fonts
+    ("text_start", np.int64),
+    ("text_end", np.int64),
+])
+
+# MuPDF span flag for bold text
+FLAG_BOLD = 16
+
+
+class SpanLayout:
+    """Spans of one or more pages: a structured array plus shared text and font tables."""
+
+    __slots__ = ("spans", "text", "fonts", "page_heights")
+
+    def __init__(self, spans: np.ndarray, text: str, fonts: List[str], page_heights: Dict[int, float]):
+        self.spans = spans
+        self.text = text
+        self.fonts = fonts
+        self.page_heights = page_heights
+
+    def span_text(self, i: int) -> str:
+        row = self.spans[i]
+        return self.text[row["text_start"]:row["text_end"]]
+
+    def font(self, i: int) -> str:
+        return self.fonts[self.spans[i]["font"]]
+
+    def pages(self) -> List[int]:
+        return sorted(self.page_heights)
+
+    def page(self, page_num: int) -> "SpanLayout":
+        """View of a single page (shares the text buffer and font table)."""
+        mask = self.spans["page"] == page_num
+        return SpanLayout(self.spans[mask], self.text, self.fonts, {page_num: self.page_heights[page_num]})
+
+    def lines(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """(page number, span row indices) per text line, in reading order."""
+        if len(self.spans) == 0:
+            return
+        keys = self.spans["page"].astype(np.int64) << 32 | self.spans["line"].astype(np.int64)
+        breaks = np.flatnonzero(np.diff(keys)) + 1
+        for idx in np.split(np.arange(len(self.spans)), breaks):
+            yield int(self.spans["page"][idx[0]]), idx
+
+
+def page_layout(page, page_num: int, fonts: Optional[List[str]] = None, textpage=None) -> SpanLayout:
+    """
+    Convert one page to compact rows. Pass the same `fonts` list for every
+    page of a document so font ids are shared, and a `textpage` (made with
+    TEXTFLAGS_DICT) to reuse one already built for a cheaper probe.
+    """
+    fonts = [] if fonts is None else fonts
+    font_ids = {name: i for i, name in enumerate(fonts)}
+    # Default flags on purpose: image blocks change how MuPDF groups text lines.
+    # Their bytes are dropped with the rest of the page's dicts below.
+    blocks = page.get_text("dict", textpage=textpage)["blocks"]
+
+    rows = []
+    chunks = []
+    offset = 0
+    line_no = 0
+    for block in blocks:
+        if block["type"] != 0:
+            continue
+        for line in block["lines"]:
+            for span in line["spans"]:
+                text = span["text"]
+                font_id = font_ids.get(span["font"])
+                if font_id is None:
+                    font_id = font_ids[span["font"]] = len(fonts)
+                    fonts.append(span["font"])
+                x0, y0, x1, y1 = span["bbox"]
+                rows.append((page_num, line_no, x0, y0, x1, y1, span["size"], span["flags"],
+                             font_id, offset, offset + len(text)))
+                chunks.append(text)
+                offset += len(text)
+            line_no += 1
+    del blocks
+
+    return SpanLayout(np.array(rows, dtype=SPAN_DTYPE), "".join(chunks), fonts, {page_num: float(page.rect.height)})
+
+
+def iter_page_layouts(doc, first_page: int = 1) -> Iterator[SpanLayout]:
+    """
+    Yield a compact layout per page of an open document, starting at
+    `first_page` (1-based). Stopping early skips the remaining pages.
+    """
+    fonts: List[str] = []
+    for page_num in range(first_page, doc.page_count + 1):
+        yield page_layout(doc[page_num - 1], page_num, fonts)
+
+
+def build_layout(doc, pages: Optional[Iterable[int]] = None) -> SpanLayout:
+    """Compact layout of the given 1-based pages (default: all) in one buffer."""
+    fonts: List[str] = []
+    parts, texts, heights = [], [], {}
+    offset = 0
+    for page_num in pages or range(1, doc.page_count + 1):
+        part = page_layout(doc[page_num - 1], page_num, fonts)
+        part.spans["text_start"] += offset
+        part.spans["text_end"] += offset
+        offset += len(part.text)
+        parts.append(part.spans)
+        texts.append(part.text)
+        heights.update(part.page_heights)
+    spans = np.concatenate(parts) if parts else np.zeros(0, dtype=SPAN_DTYPE)
+    return SpanLayout(spans, "".join(texts), fonts, heights)
+
+
+def iter_pages(layout: SpanLayout, first_page: int = 1) -> Iterator[SpanLayout]:
+    """Per-page views of a (possibly memory-mapped) layout, from `first_page` on."""
+    for page_num in layout.pages():
+        if page_num >= first_page:
+            yield layout.page(page_num)
+
+
+# --- PERSISTENCE ---
+
+def save_layout(layout: SpanLayout, stem: Path) -> None:
+    stem = Path(stem)
+    stem.parent.mkdir(parents=True, exist_ok=True)
+    np.save(f"{stem}.spans.npy", layout.spans)
+    meta = {"text": layout.text, "fonts": layout.fonts, "page_heights": {str(k): v for k, v in layout.page_heights.items()}}
+    tmp_path = f"{stem}.json.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, f"{stem}.json")
+
+
+def load_layout(stem: Path, mmap: bool = True) -> Optional[SpanLayout]:
+    """Reopen a saved layout; the span rows are memory-mapped by default."""
+    stem = Path(stem)
+    if not (Path(f"{stem}.spans.npy").exists() and Path(f"{stem}.json").exists()):
+        return None
+    spans = np.load(f"{stem}.spans.npy", mmap_mode="r" if mmap else None)
+    with open(f"{stem}.json", "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return SpanLayout(spans, meta["text"], meta["fonts"], {int(k): v for k, v in meta["page_heights"].items()})
+
+
+def cached_layout(pdf_path: str, layout_dir: Path = LAYOUT_DIR) -> SpanLayout:
+    """Layout of every page of a PDF, built once and memory-mapped on later calls."""
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    stem = Path(layout_dir) / digest.hexdigest()
+
+    layout = load_layout(stem)
+    if layout is None:
+        with open_pdf(pdf_path) as doc:
+            layout = build_layout(doc)
+        save_layout(layout, stem)
+    return layout
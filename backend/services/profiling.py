@@ -0,0 +1,283 @@
+"""
+On-demand request profiling with pyinstrument (optional dependency).
+
+Set PROFILE_TOKEN to enable it. A request carrying the token in an
+`X-Profile` header or a `?profile=` query parameter runs under a sampling
+profiler; the response gets an `X-Profile-Id` header and the profile is stored
+under outputs/profiles/ as pyinstrument HTML, speedscope JSON and a text
+summary. Other requests pay nothing.
+
+A profile has up to two parts:
+
+- request: the event loop side of the request (upload streaming, cache
+  lookups, admission wait, awaiting the computation)
+- worker: the blocking computation run in the threadpool (PyMuPDF
+  extraction, regex parsing, JSON, waits on the model API), recorded when the
+  request is the one that runs it (see singleFlight.run_once)
+
+Profile the extraction functions directly against a PDF, without the server:
+    python -m services.profiling samplePaper1.pdf --target questions --repeat 3
+"""
+
+import asyncio
+import hmac
+import json
+import os
+import secrets
+import shutil
+import tempfile
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException, Request
+
+PROFILE_DIR = Path(__file__).resolve().parent.parent / "outputs" / "profiles"
+
+# Shared secret for profiling requests and the profile endpoints; unset disables both
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "1")) / 1000
+# Oldest profiles beyond this many are deleted
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
+# file suffix and media type per output format
+PROFILE_FORMATS = {
+    "html": (".html", "text/html"),
+    "speedscope": (".speedscope.json", "application/json"),
+    "text": (".txt", "text/plain"),
+}
+
+# Worker sessions recorded for the profiled request running in this context
+_worker_sessions: ContextVar[Optional[list]] = ContextVar("worker_sessions", default=None)
+
+
+def _token_matches(supplied: Optional[str]) -> bool:
+    return bool(PROFILE_TOKEN and supplied and hmac.compare_digest(supplied, PROFILE_TOKEN))
+
+
+def profiling_requested(request: Request) -> bool:
+    return _token_matches(request.headers.get("x-profile") or request.query_params.get("profile"))
+
+
+def require_profile_access(request: Request) -> None:
+    """Profile endpoints answer 404 unless profiling is enabled and the token matches."""
+    if not profiling_requested(request):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+def profiled(fn: Callable) -> Callable:
+    """
+    Wrap a blocking function so it runs under its own profiler when the
+    current request is being profiled; otherwise return it unchanged.
+    """
+    sessions = _worker_sessions.get()
+    if sessions is None:
+        return fn
+
+    def run():
+        from pyinstrument import Profiler
+
+        profiler = Profiler(interval=PROFILE_INTERVAL, async_mode="disabled")
+        profiler.start()
+        try:
+            return fn()
+        finally:
+            sessions.append(profiler.stop())
+
+    return run
+
+
+def _render(session, stem: Path) -> None:
+    from pyinstrument.renderers import ConsoleRenderer, HTMLRenderer, SpeedscopeRenderer
+
+    renderers = {
+        "html": HTMLRenderer(),
+        "speedscope": SpeedscopeRenderer(),
+        "text": ConsoleRenderer(unicode=False, color=False),
+    }
+    for fmt, renderer in renderers.items():
+        suffix = PROFILE_FORMATS[fmt][0]
+        Path(f"{stem}{suffix}").write_text(renderer.render(session), encoding="utf-8")
+
+
+def _prune(profile_dir: Path) -> None:
+    entries = sorted(profile_dir.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    entries = [p for p in entries if not p.name.endswith(".speedscope.json")]
+    for meta_path in entries[PROFILE_KEEP:]:
+        profile_id = meta_path.stem
+        for path in profile_dir.glob(f"{profile_id}*"):
+            path.unlink(missing_ok=True)
+
+
+def save_profile(label: str, request_session=None, worker_sessions: Optional[List] = None,
+                 extra: Optional[Dict] = None, profile_dir: Path = PROFILE_DIR) -> Dict:
+    """
+    Render and store a profile.
+
+    Args:
+        label: What was profiled (e.g. "POST /api/analyze-paper")
+        request_session: pyinstrument session of the event loop side, if any
+        worker_sessions: Sessions recorded in worker threads; combined into one part
+        extra: Additional metadata (status code, file, ...)
+
+    Returns:
+        dict: The profile's metadata, as listed by list_profiles()
+    """
+    from pyinstrument.session import Session
+
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    profile_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+
+    parts = {}
+    if request_session is not None:
+        parts["request"] = request_session
+    if worker_sessions:
+        combined = worker_sessions[0]
+        for session in worker_sessions[1:]:
+            combined = Session.combine(combined, session)
+        parts["worker"] = combined
+
+    for part, session in parts.items():
+        _render(session, profile_dir / f"{profile_id}.{part}")
+
+    meta = {
+        "id": profile_id,
+        "label": label,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "parts": {part: round(session.duration, 4) for part, session in parts.items()},
+        **(extra or {}),
+    }
+    with open(profile_dir / f"{profile_id}.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    _prune(profile_dir)
+    return meta
+
+
+def list_profiles(limit: int = 20, profile_dir: Path = PROFILE_DIR) -> List[Dict]:
+    """Metadata of the most recent profiles, newest first."""
+    if not profile_dir.exists():
+        return []
+    profiles = []
+    for meta_path in profile_dir.glob("*.json"):
+        if meta_path.name.endswith(".speedscope.json"):
+            continue
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    profiles.sort(key=lambda m: m["id"], reverse=True)
+    return profiles[:limit]
+
+
+def profile_file(profile_id: str, part: str, fmt: str, profile_dir: Path = PROFILE_DIR) -> Optional[Path]:
+    """Path of one rendered part of a stored profile, or None."""
+    if fmt not in PROFILE_FORMATS or part not in ("request", "worker"):
+        return None
+    if not profile_id.replace("-", "").isalnum():
+        return None
+    path = profile_dir / f"{profile_id}.{part}{PROFILE_FORMATS[fmt][0]}"
+    return path if path.exists() else None
+
+
+async def profile_request(request: Request, call_next):
+    """HTTP middleware: profile requests that carry PROFILE_TOKEN."""
+    if request.url.path.startswith("/api/profiles") or not profiling_requested(request):
+        return await call_next(request)
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        print("⚠️  Profiling requested but pyinstrument is not installed")
+        return await call_next(request)
+
+    sessions: list = []
+    reset = _worker_sessions.set(sessions)
+    profiler = Profiler(interval=PROFILE_INTERVAL, async_mode="enabled")
+    started = time.perf_counter()
+    profiler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        request_session = profiler.stop()
+        _worker_sessions.reset(reset)
+
+    # Rendering the HTML/speedscope output takes a while; keep it off the event loop
+    meta = await asyncio.to_thread(
+        save_profile,
+        f"{request.method} {request.url.path}",
+        request_session,
+        sessions,
+        {"status_code": response.status_code, "seconds": round(time.perf_counter() - started, 4)},
+    )
+    print(f"⏱️  Profiled {meta['label']} -> {PROFILE_DIR / meta['id']}.*")
+    response.headers["X-Profile-Id"] = meta["id"]
+    return response
+
+
+# ---- CLI ----
+
+def _extraction_target(target: str, pdf_path: str, work_dir: str) -> Callable[[], object]:
+    if target == "questions":
+        from services.textExtractorQuestion import extract_questions_from_pdf
+
+        return lambda: extract_questions_from_pdf(pdf_path, os.path.join(work_dir, "questions.json"))
+    if target == "layout":
+        from services.pdfDocument import open_pdf
+        from services.pdfLayout import build_layout
+
+        def layout():
+            with open_pdf(pdf_path) as doc:
+                return build_layout(doc)
+
+        return layout
+    from services.bulkAnalysis import read_syllabus_text
+
+    return lambda: read_syllabus_text(pdf_path)
+
+
+def main(argv=None):
+    """
+    Profile a PDF extraction function and store the result with the request profiles.
+
+    Usage:
+        python -m services.profiling paper.pdf --target questions --repeat 3
+        python -m services.profiling syllabus.pdf --target text
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Profile PDF extraction with pyinstrument.")
+    parser.add_argument("pdf", help="PDF to extract")
+    parser.add_argument("--target", choices=["questions", "layout", "text"], default="questions",
+                        help="questions: extract_questions_from_pdf, layout: pdfLayout.build_layout, "
+                             "text: plain text as used for syllabi")
+    parser.add_argument("--repeat", type=int, default=1, help="Run the extraction this many times")
+    parser.add_argument("--profile-dir", default=str(PROFILE_DIR))
+    args = parser.parse_args(argv)
+
+    from pyinstrument import Profiler
+
+    work_dir = tempfile.mkdtemp(prefix="profile_")
+    try:
+        run = _extraction_target(args.target, args.pdf, work_dir)
+        profiler = Profiler(interval=PROFILE_INTERVAL, async_mode="disabled")
+        profiler.start()
+        for _ in range(args.repeat):
+            run()
+        session = profiler.stop()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(profiler.output_text(unicode=True, color=True))
+    meta = save_profile(
+        f"{args.target} {os.path.basename(args.pdf)}",
+        worker_sessions=[session],
+        extra={"source": "cli", "file": os.path.abspath(args.pdf), "repeat": args.repeat},
+        profile_dir=Path(args.profile_dir),
+    )
+    print(f"⏱️  Saved {Path(args.profile_dir) / meta['id']}.worker.{{html,speedscope.json,txt}}")
+
+
+if __name__ == "__main__":
+    main()
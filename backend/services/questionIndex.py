@@ -0,0 +1,406 @@
+"""
+Near-duplicate question index (MinHash + LSH).
+
+Past-year papers and school prelims reuse questions with small wording
+changes. Every extracted question is normalised, split into character
+shingles and reduced to a MinHash signature; signatures are banded into LSH
+buckets so candidate duplicates are found without comparing every pair.
+
+A question whose near-duplicate was already mapped against the same syllabus
+inherits that mapping instead of going to the model. Clusters of duplicates
+are exposed for question-bank curation.
+
+This module holds no model calls - see comparePrompt.py for the mapping.
+"""
+
+import base64
+import json
+import os
+import re
+import threading
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+STORE_PATH = Path(__file__).resolve().parent.parent / "outputs" / "question_index.json"
+
+NUM_PERM = 128
+LSH_BANDS = 16  # 16 bands x 8 rows: pairs above ~0.7 similarity collide with high probability
+SHINGLE_SIZE = 5
+
+# Estimated Jaccard similarity at which a question counts as a duplicate
+DUPLICATE_THRESHOLD = float(os.getenv("QUESTION_DUPLICATE_THRESHOLD", "0.85"))
+
+# Fixed seed: stored signatures must stay comparable across restarts
+_PRIME = np.uint64(4294967291)  # largest prime below 2**32
+_rng = np.random.default_rng(20260119)
+_PERM_A = _rng.integers(1, 4294967291, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 4294967291, NUM_PERM, dtype=np.uint64)
+_ROWS = NUM_PERM // LSH_BANDS
+
+_store_lock = threading.Lock()
+_store: Optional[Dict] = None
+_signatures: Dict[str, np.ndarray] = {}
+_buckets: Dict[Tuple[int, bytes], List[str]] = {}
+
+
+# --- FINGERPRINTS ---
+
+def normalize_question(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    text = re.sub(r"[^a-z0-9]+", " ", text.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def question_text(question: Dict) -> str:
+    """Question stem plus subpart texts."""
+    parts = [question.get("text", "")] + [sp.get("text", "") for sp in question.get("subparts") or []]
+    return " ".join(p for p in parts if p)
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint32 values) of the text's character shingles."""
+    norm = normalize_question(text)
+    if len(norm) < SHINGLE_SIZE:
+        norm = norm.ljust(SHINGLE_SIZE)
+    shingles = {norm[i:i + SHINGLE_SIZE] for i in range(len(norm) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # (a * x + b) mod p for every permutation x shingle, min over shingles
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _PRIME
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.mean(sig_a == sig_b))
+
+
+def _band_keys(signature: np.ndarray) -> List[Tuple[int, bytes]]:
+    return [(b, signature[b * _ROWS:(b + 1) * _ROWS].tobytes()) for b in range(LSH_BANDS)]
+
+
+def question_key(paper_id: str, question_id: str) -> str:
+    return f"{paper_id}::{question_id}"
+
+
+# --- STORE ---
+
+def _load() -> Dict:
+    """Load the store once and build the in-memory signatures and LSH buckets."""
+    global _store
+    if _store is None:
+        store = {"questions": {}}
+        if STORE_PATH.exists():
+            with open(STORE_PATH, "r", encoding="utf-8") as f:
+                store = json.load(f)
+        _store = store
+        _signatures.clear()
+        _buckets.clear()
+        for key, entry in store["questions"].items():
+            _add_to_buckets(key, np.frombuffer(base64.b64decode(entry["signature"]), dtype=np.uint32))
+    return _store
+
+
+def _add_to_buckets(key: str, signature: np.ndarray) -> None:
+    old = _signatures.get(key)
+    if old is not None:
+        for band in _band_keys(old):
+            _buckets[band].remove(key)
+    _signatures[key] = signature
+    for band in _band_keys(signature):
+        _buckets.setdefault(band, []).append(key)
+
+
+def _save(store: Dict) -> None:
+    STORE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = STORE_PATH.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(store, f, ensure_ascii=False)
+    os.replace(tmp_path, STORE_PATH)
+
+
+def index_version() -> str:
+    """Changes whenever questions or mappings are added (used for ETags)."""
+    with _store_lock:
+        store = _load()
+        return f"{len(store['questions'])}-{store.get('updated_at', '')}"
+
+
+def index_questions(paper_json: Dict) -> int:
+    """
+    Fingerprint every question of an extracted paper (as returned by
+    extract_questions_from_pdf) and add it to the index.
+
+    paper_id is only the uploaded filename, so a different paper uploaded
+    under the same name lands on the same keys: an entry whose text changed
+    is replaced together with its mappings. The store is written once, and
+    only if an entry changed.
+
+    Returns:
+        int: Number of questions indexed
+    """
+    paper_id = paper_json.get("paper_id", "unknown")
+    changed = False
+    with _store_lock:
+        store = _load()
+        for q in paper_json.get("questions", []):
+            key = question_key(paper_id, q["id"])
+            signature = minhash_signature(question_text(q))
+            encoded = base64.b64encode(signature.tobytes()).decode("ascii")
+            text = question_text(q)[:300]
+            entry = store["questions"].get(key)
+            if entry is not None and entry["signature"] == encoded and entry["text"] == text:
+                continue
+            store["questions"][key] = {
+                "paper_id": paper_id,
+                "question_id": q["id"],
+                "text": text,
+                "signature": encoded,
+                "mappings": {},
+            }
+            _add_to_buckets(key, signature)
+            changed = True
+        if changed:
+            store["updated_at"] = datetime.now(timezone.utc).isoformat()
+            _save(store)
+    return len(paper_json.get("questions", []))
+
+
+def _candidates(signature: np.ndarray) -> List[str]:
+    seen = []
+    for band in _band_keys(signature):
+        for key in _buckets.get(band, []):
+            if key not in seen:
+                seen.append(key)
+    return seen
+
+
+def find_duplicates(question: Dict, paper_id: str, threshold: float = DUPLICATE_THRESHOLD) -> List[Dict]:
+    """
+    Indexed near-duplicates of a question, most similar first.
+
+    Returns:
+        list: [{"key", "paper_id", "question_id", "similarity"}]
+    """
+    signature = minhash_signature(question_text(question))
+    own_key = question_key(paper_id, question["id"])
+    with _store_lock:
+        store = _load()
+        matches = []
+        for key in _candidates(signature):
+            if key == own_key:
+                continue
+            score = similarity(signature, _signatures[key])
+            if score >= threshold:
+                entry = store["questions"][key]
+                matches.append({"key": key, "paper_id": entry["paper_id"], "question_id": entry["question_id"], "similarity": round(score, 3)})
+    return sorted(matches, key=lambda m: m["similarity"], reverse=True)
+
+
+# --- MAPPING REUSE ---
+
+def _mapping_key(syllabus_id: str, prompt_version: str) -> str:
+    return f"{syllabus_id}|{prompt_version}"
+
+
+def _repeated_ids(questions: List[Dict]) -> set:
+    """Question ids that occur more than once (a PDF holding two papers restarts at Q1)."""
+    seen, repeated = set(), set()
+    for q in questions:
+        (repeated if q["id"] in seen else seen).add(q["id"])
+    return repeated
+
+
+def _parent_ids(questions: List[Dict]) -> Dict[str, str]:
+    """Question and subpart ids (Q15a) -> parent question id."""
+    parents = {}
+    for q in questions:
+        parents[q["id"]] = q["id"]
+        for sp in q.get("subparts") or []:
+            parents[sp["id"]] = q["id"]
+    return parents
+
+
+def duplicate_matches(questions: List[Dict], paper_id: str) -> Dict[str, List[Dict]]:
+    """
+    find_duplicates() for every question, keyed by question id. The lookup does
+    not depend on the syllabus, so one result serves split_inherited() for
+    any number of syllabi.
+    """
+    return {q["id"]: find_duplicates(q, paper_id) for q in questions}
+
+
+def inherited_mapping(question: Dict, paper_id: str, syllabus_id: str, prompt_version: str,
+                      matches: Optional[List[Dict]] = None) -> Optional[List[Dict]]:
+    """
+    Mapping entries copied from the closest near-duplicate already mapped
+    against this syllabus, re-labelled with this question's id. `matches` are
+    the question's find_duplicates() results, if already looked up.
+    """
+    mapping_key = _mapping_key(syllabus_id, prompt_version)
+    if matches is None:
+        matches = find_duplicates(question, paper_id)
+    for match in matches:
+        with _store_lock:
+            entries = _load()["questions"][match["key"]]["mappings"].get(mapping_key)
+        if not entries:
+            continue
+        source_id = match["question_id"]
+        inherited = []
+        for entry in entries:
+            copy = dict(entry)
+            qid = str(copy.get("question_id", source_id))
+            copy["question_id"] = question["id"] + qid[len(source_id):] if qid.startswith(source_id) else question["id"]
+            copy["inherited_from"] = {
+                "paper_id": match["paper_id"],
+                "question_id": qid,
+                "similarity": match["similarity"],
+            }
+            inherited.append(copy)
+        return inherited
+    return None
+
+
+def split_inherited(questions: List[Dict], paper_id: str, syllabus_id: str, prompt_version: str,
+                    matches: Optional[Dict[str, List[Dict]]] = None) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Separate questions that can reuse a near-duplicate's mapping.
+    `matches` is a duplicate_matches() result to reuse across syllabi.
+
+    Returns:
+        tuple: (inherited mapping entries, questions that still need the model)
+    """
+    inherited, remaining = [], []
+    repeated = _repeated_ids(questions)
+    for q in questions:
+        # Entries of repeated ids cannot be told apart, so those always go to the model
+        entries = None if q["id"] in repeated else inherited_mapping(
+            q, paper_id, syllabus_id, prompt_version, matches.get(q["id"]) if matches is not None else None)
+        if entries:
+            inherited.extend(entries)
+        else:
+            remaining.append(q)
+    if inherited:
+        print(f"♻️  {len(questions) - len(remaining)} question(s) reuse a near-duplicate's mapping")
+    return inherited, remaining
+
+
+def order_entries(entries: List[Dict], questions: List[Dict]) -> List[Dict]:
+    """Sort mapping entries into the paper's question order."""
+    position = {qid: i for i, qid in enumerate(_parent_ids(questions))}
+    return sorted(entries, key=lambda e: position.get(str(e.get("question_id")), len(position)))
+
+
+def _group_by_question(questions: List[Dict], entries: List[Dict]) -> Dict[str, List[Dict]]:
+    """Storable mapping entries grouped by parent question id."""
+    parents = _parent_ids(questions)
+    repeated = _repeated_ids(questions)
+    grouped: Dict[str, List[Dict]] = {}
+    for entry in entries:
+        if entry.get("inherited_from") or entry.get("stale"):
+            continue
+        parent = parents.get(str(entry.get("question_id")))
+        if parent is not None and parent not in repeated:
+            grouped.setdefault(parent, []).append(entry)
+    return grouped
+
+
+def record_syllabi_mappings(paper_id: str, questions: List[Dict], prompt_version: str,
+                            entries_by_syllabus: Dict[str, List[Dict]]) -> int:
+    """
+    Store model-produced mapping entries per question and syllabus so
+    near-duplicates can inherit them, writing the store once for the paper.
+    Inherited, stale (failsafe) and repeated-id entries are not stored.
+
+    Returns:
+        int: Number of (question, syllabus) mappings stored
+    """
+    grouped = {
+        syllabus_id: _group_by_question(questions, entries)
+        for syllabus_id, entries in entries_by_syllabus.items()
+    }
+    stored = 0
+    with _store_lock:
+        store = _load()
+        for syllabus_id, by_question in grouped.items():
+            mapping_key = _mapping_key(syllabus_id, prompt_version)
+            for qid, q_entries in by_question.items():
+                item = store["questions"].get(question_key(paper_id, qid))
+                if item is not None:
+                    item["mappings"][mapping_key] = q_entries
+                    stored += 1
+        if stored:
+            store["updated_at"] = datetime.now(timezone.utc).isoformat()
+            _save(store)
+    return stored
+
+
+def record_question_mappings(paper_id: str, questions: List[Dict], syllabus_id: str, prompt_version: str, entries: List[Dict]) -> int:
+    """
+    record_syllabi_mappings() for a single syllabus.
+
+    Returns:
+        int: Number of questions whose mapping was stored
+    """
+    return record_syllabi_mappings(paper_id, questions, prompt_version, {syllabus_id: entries})
+
+
+# --- CURATION ---
+
+def duplicate_clusters(threshold: float = DUPLICATE_THRESHOLD, min_size: int = 2, paper_id: Optional[str] = None) -> List[Dict]:
+    """
+    Groups of near-duplicate questions across the indexed papers.
+
+    Args:
+        threshold: Minimum estimated similarity for two questions to be linked
+        min_size: Smallest cluster to return
+        paper_id: Only clusters containing a question from this paper
+
+    Returns:
+        list: [{"cluster_id", "size", "papers", "questions"}], largest first
+    """
+    with _store_lock:
+        store = _load()
+        keys = list(_signatures)
+        parent = {k: k for k in keys}
+
+        def find(k):
+            while parent[k] != k:
+                parent[k] = parent[parent[k]]
+                k = parent[k]
+            return k
+
+        # Only pairs sharing an LSH bucket are compared
+        for members in _buckets.values():
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    ra, rb = find(a), find(b)
+                    if ra != rb and similarity(_signatures[a], _signatures[b]) >= threshold:
+                        parent[rb] = ra
+
+        groups: Dict[str, List[str]] = {}
+        for k in keys:
+            groups.setdefault(find(k), []).append(k)
+
+        clusters = []
+        for members in groups.values():
+            if len(members) < min_size:
+                continue
+            questions = [{
+                "paper_id": store["questions"][k]["paper_id"],
+                "question_id": store["questions"][k]["question_id"],
+                "text": store["questions"][k]["text"],
+                "mapped_syllabi": len(store["questions"][k]["mappings"]),
+            } for k in sorted(members)]
+            if paper_id and not any(q["paper_id"] == paper_id for q in questions):
+                continue
+            clusters.append({
+                "cluster_id": min(members),
+                "size": len(members),
+                "papers": sorted({q["paper_id"] for q in questions}),
+                "questions": questions,
+            })
+    return sorted(clusters, key=lambda c: c["size"], reverse=True)
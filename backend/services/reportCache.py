@@ -0,0 +1,130 @@
+"""
+Report cache and HTTP conditional-request helpers.
+
+Every report is identified by a strong ETag derived from the SHA-256 of its
+input documents plus the version of the prompt that produced it. Reports are
+stored on disk under outputs/reports/<id>.json, so:
+
+- a repeat POST with the same PDFs returns the stored report without recompute
+- GET /api/reports/<id> with a matching If-None-Match returns 304
+
+While a report is computed, finished pieces (mapping chunks) are checkpointed
+under outputs/partials/<id>.json; a computation that was cancelled or timed
+out resumes from them on retry. The checkpoint is dropped once the report
+is saved.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+REPORT_DIR = Path(__file__).resolve().parent.parent / "outputs" / "reports"
+PARTIAL_DIR = Path(__file__).resolve().parent.parent / "outputs" / "partials"
+_partial_lock = threading.Lock()
+
+# Reports may be reused but must be revalidated with the ETag
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_report_id(kind: str, prompt_version: str, *input_hashes: str) -> str:
+    """Stable report id for a report kind, prompt version and ordered inputs."""
+    key = "|".join([kind, prompt_version, *input_hashes])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def etag_for(report_id: str) -> str:
+    return f'"{report_id}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True when the request's If-None-Match covers `etag`."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [c.strip() for c in header.split(",")]
+    # Compression middleware may hand back a weak validator; compare opaquely
+    return any(c.removeprefix("W/") == etag for c in candidates)
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def report_response(content: Dict[str, Any], report_id: str) -> JSONResponse:
+    """JSON response carrying the report's ETag and id."""
+    return JSONResponse(
+        content={**content, "report_id": report_id},
+        headers={"ETag": etag_for(report_id), "Cache-Control": CACHE_CONTROL},
+    )
+
+
+def _report_path(report_id: str) -> Path:
+    return REPORT_DIR / f"{report_id}.json"
+
+
+def load_report(report_id: str) -> Optional[Dict[str, Any]]:
+    if not re.fullmatch(r"[0-9a-f]{64}", report_id):
+        return None
+    path = _report_path(report_id)
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_report(report_id: str, content: Dict[str, Any]) -> None:
+    REPORT_DIR.mkdir(parents=True, exist_ok=True)
+    _write_json(_report_path(report_id), content)
+    clear_partials(report_id)
+
+
+def _write_json(path: Path, content: Any) -> None:
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(content, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _partial_path(report_id: str) -> Optional[Path]:
+    if not re.fullmatch(r"[0-9a-f]{64}", report_id or ""):
+        return None
+    return PARTIAL_DIR / f"{report_id}.json"
+
+
+def load_partials(report_id: str) -> Dict[str, Any]:
+    """Pieces checkpointed for a report still being computed, by piece key."""
+    path = _partial_path(report_id)
+    if path is None or not path.exists():
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_partial(report_id: str, key: str, value: Any) -> None:
+    """Checkpoint one finished piece of a report."""
+    path = _partial_path(report_id)
+    if path is None:
+        return
+    with _partial_lock:
+        PARTIAL_DIR.mkdir(parents=True, exist_ok=True)
+        partials = load_partials(report_id)
+        partials[key] = value
+        _write_json(path, partials)
+
+
+def clear_partials(report_id: str) -> None:
+    path = _partial_path(report_id)
+    if path is not None:
+        path.unlink(missing_ok=True)
@@ -0,0 +1,297 @@
+"""
+Full-text search over every analysed question and its mappings.
+
+The coverage store (coverageStore.py) keeps mappings for aggregate views but
+not the question text, and the extracted questions were only ever a
+temporary file. Here every analysed paper's questions and mapping rows are
+kept in a SQLite database (outputs/search.db) with an FTS5 index over the
+question text, the mapped topics and the model's reason, so a teacher can
+find questions across thousands of them without re-running an analysis:
+
+- keyword: FTS5 match, ranked by BM25 (text weighs most, then topics)
+- topic: exact topic name (case-insensitive), via an indexed topic table
+- confidence range, in/out of scope, needs review, paper, syllabus: plain
+  indexed columns
+
+One row per (syllabus, paper, question): a paper mapped against two syllabi
+is found twice, once with each syllabus's topics. Recording a paper again
+replaces its rows for that syllabus.
+
+SQLite ships with Python; the database is opened in WAL mode so searches
+never wait for a paper being recorded.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from services.comparePrompt import NEEDS_REVIEW_TOPIC
+
+DB_PATH = Path(__file__).resolve().parent.parent / "outputs" / "search.db"
+
+MAX_PAGE_SIZE = 100
+SORTS = ("relevance", "confidence", "paper")
+# BM25 column weights: question text, topics, reason
+_BM25 = "bm25(mapping_fts, 4.0, 2.0, 1.0)"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    paper_id TEXT NOT NULL,
+    question_id TEXT NOT NULL,
+    page INTEGER,
+    text TEXT NOT NULL,
+    PRIMARY KEY (paper_id, question_id)
+);
+CREATE TABLE IF NOT EXISTS mappings (
+    id INTEGER PRIMARY KEY,
+    syllabus_id TEXT NOT NULL,
+    syllabus_name TEXT,
+    paper_id TEXT NOT NULL,
+    question_id TEXT NOT NULL,
+    page INTEGER,
+    topics TEXT NOT NULL,
+    in_syllabus INTEGER NOT NULL,
+    needs_review INTEGER NOT NULL,
+    confidence REAL NOT NULL,
+    reason TEXT,
+    mapped_at TEXT NOT NULL,
+    UNIQUE (syllabus_id, paper_id, question_id)
+);
+CREATE INDEX IF NOT EXISTS mappings_paper ON mappings (paper_id, syllabus_id);
+CREATE INDEX IF NOT EXISTS mappings_confidence ON mappings (confidence);
+CREATE TABLE IF NOT EXISTS mapping_topics (
+    mapping_id INTEGER NOT NULL REFERENCES mappings (id) ON DELETE CASCADE,
+    topic TEXT NOT NULL COLLATE NOCASE
+);
+CREATE INDEX IF NOT EXISTS mapping_topics_topic ON mapping_topics (topic, mapping_id);
+CREATE INDEX IF NOT EXISTS mapping_topics_mapping ON mapping_topics (mapping_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS mapping_fts USING fts5(text, topics, reason, tokenize = 'porter unicode61');
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+_write_lock = threading.Lock()
+_ready = False
+
+
+def _connect() -> sqlite3.Connection:
+    global _ready
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    if not _ready:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(_SCHEMA)
+        _ready = True
+    return conn
+
+
+def index_version() -> str:
+    """Changes whenever a paper is recorded; ETag input for search results."""
+    with closing(_connect()) as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+    return row["value"] if row else "0"
+
+
+def record_paper(paper_id: str, texts: Dict[str, str], report: Dict, syllabus_id: str, syllabus_name: str) -> int:
+    """
+    Add (or replace) one paper's questions and its mapping against one syllabus.
+
+    Args:
+        paper_id: Paper identifier
+        texts: Question id -> text for every question and subpart (explanations.question_texts)
+        report: Output of map_questions_to_syllabus
+        syllabus_id: Id of the syllabus the paper was mapped against
+        syllabus_name: Display name of the syllabus
+
+    Returns:
+        int: Number of mapping rows recorded
+    """
+    rows = report.get("question_topic_mapping", [])
+    mapped_at = datetime.now(timezone.utc).isoformat()
+    pages = {str(entry.get("question_id")): _int(entry.get("page")) for entry in rows}
+
+    with _write_lock, closing(_connect()) as conn, conn:
+        conn.executemany(
+            "INSERT INTO questions (paper_id, question_id, page, text) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (paper_id, question_id) DO UPDATE SET page = excluded.page, text = excluded.text",
+            [(paper_id, qid, pages.get(qid), text) for qid, text in texts.items()],
+        )
+        stale = [r["id"] for r in conn.execute(
+            "SELECT id FROM mappings WHERE syllabus_id = ? AND paper_id = ?", (syllabus_id, paper_id))]
+        conn.executemany("DELETE FROM mapping_fts WHERE rowid = ?", [(i,) for i in stale])
+        conn.execute("DELETE FROM mappings WHERE syllabus_id = ? AND paper_id = ?", (syllabus_id, paper_id))
+
+        for entry in rows:
+            qid = str(entry.get("question_id"))
+            topics = [str(t) for t in entry.get("topics") or []]
+            reason = entry.get("out_of_scope_reason") or ""
+            cursor = conn.execute(
+                "INSERT INTO mappings (syllabus_id, syllabus_name, paper_id, question_id, page, topics, in_syllabus, "
+                "needs_review, confidence, reason, mapped_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (syllabus_id, syllabus_name, paper_id, qid, pages.get(qid), json.dumps(topics),
+                 int(entry.get("in_syllabus") is not False), int(NEEDS_REVIEW_TOPIC in topics),
+                 _confidence(entry.get("confidence")), reason, mapped_at),
+            )
+            mapping_id = cursor.lastrowid
+            conn.executemany("INSERT INTO mapping_topics (mapping_id, topic) VALUES (?, ?)",
+                             [(mapping_id, t) for t in dict.fromkeys(topics)])
+            conn.execute("INSERT INTO mapping_fts (rowid, text, topics, reason) VALUES (?, ?, ?, ?)",
+                         (mapping_id, texts.get(qid, ""), " | ".join(topics), reason))
+
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('generation', '1') "
+            "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+    return len(rows)
+
+
+def _int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _confidence(value) -> float:
+    try:
+        return min(1.0, max(0.0, float(value)))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def match_expression(keywords: str) -> Optional[str]:
+    """
+    FTS5 query for free text typed by a user: every word must occur, the last
+    one as a prefix (search as you type). Words are quoted, so characters
+    that are FTS5 syntax ("x^2", "f(x)", quotes) cannot break the query.
+    """
+    words = re.findall(r"\w+", keywords.lower())
+    if not words:
+        return None
+    return " ".join([*(f'"{w}"' for w in words[:-1]), f'"{words[-1]}"*'])
+
+
+def search(
+    keywords: Optional[str] = None,
+    topic: Optional[str] = None,
+    min_confidence: Optional[float] = None,
+    max_confidence: Optional[float] = None,
+    in_syllabus: Optional[bool] = None,
+    needs_review: Optional[bool] = None,
+    paper_ids: Optional[List[str]] = None,
+    syllabus_id: Optional[str] = None,
+    sort: str = "relevance",
+    limit: int = 20,
+    offset: int = 0,
+) -> Dict:
+    """
+    Search recorded questions and mappings.
+
+    Args:
+        keywords: Free text matched against question text, topics and reasons
+        topic: Exact topic name (case-insensitive)
+        min_confidence / max_confidence: Inclusive confidence range
+        in_syllabus: Only in-scope (True) or out-of-scope (False) rows
+        needs_review: Only rows flagged (True) or not flagged (False) for review
+        paper_ids: Only these papers
+        syllabus_id: Only mappings against this syllabus
+        sort: "relevance" (BM25; paper order without keywords), "confidence" or "paper"
+        limit / offset: Page of results (limit at most MAX_PAGE_SIZE)
+
+    Returns:
+        dict: {"total", "limit", "offset", "results": [...]} where each result
+        is a mapping row with its question text, or a highlighted snippet of
+        it when searching by keyword
+    """
+    if sort not in SORTS:
+        raise ValueError(f"sort must be one of {', '.join(SORTS)}")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    offset = max(0, offset)
+
+    where: List[str] = []
+    params: List = []
+    match = match_expression(keywords) if keywords else None
+    if keywords and match is None:
+        return {"total": 0, "limit": limit, "offset": offset, "results": []}
+    if match is not None:
+        where.append("mapping_fts MATCH ?")
+        params.append(match)
+    if topic:
+        where.append("m.id IN (SELECT mapping_id FROM mapping_topics WHERE topic = ?)")
+        params.append(topic)
+    if min_confidence is not None:
+        where.append("m.confidence >= ?")
+        params.append(min_confidence)
+    if max_confidence is not None:
+        where.append("m.confidence <= ?")
+        params.append(max_confidence)
+    if in_syllabus is not None:
+        where.append("m.in_syllabus = ?")
+        params.append(int(in_syllabus))
+    if needs_review is not None:
+        where.append("m.needs_review = ?")
+        params.append(int(needs_review))
+    if paper_ids:
+        where.append(f"m.paper_id IN ({', '.join('?' * len(paper_ids))})")
+        params.extend(paper_ids)
+    if syllabus_id:
+        where.append("m.syllabus_id = ?")
+        params.append(syllabus_id)
+
+    # CROSS JOIN keeps the match first: left to itself the planner may run the
+    # full-text query once per row the other filters leave
+    source = "mapping_fts CROSS JOIN mappings m ON m.id = mapping_fts.rowid" if match else "mappings m"
+    clause = f"WHERE {' AND '.join(where)}" if where else ""
+    paper_order = "m.paper_id, m.page, length(m.question_id), m.question_id, m.syllabus_id"
+    order = {
+        "relevance": f"{_BM25}, {paper_order}" if match else paper_order,
+        "confidence": f"m.confidence DESC, {paper_order}",
+        "paper": paper_order,
+    }[sort]
+    text = "snippet(mapping_fts, 0, '[', ']', '…', 24)" if match else "q.text"
+    score = f"-{_BM25}" if match else "NULL"
+
+    with closing(_connect()) as conn:
+        total = conn.execute(f"SELECT count(*) FROM {source} {clause}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT m.*, {text} AS text, {score} AS score FROM {source} "
+            f"LEFT JOIN questions q ON q.paper_id = m.paper_id AND q.question_id = m.question_id "
+            f"{clause} ORDER BY {order} LIMIT ? OFFSET ?",
+            [*params, limit, offset],
+        ).fetchall()
+
+    results = []
+    for row in rows:
+        results.append({
+            "paper_id": row["paper_id"],
+            "question_id": row["question_id"],
+            "page": row["page"],
+            "syllabus_id": row["syllabus_id"],
+            "syllabus_name": row["syllabus_name"],
+            "topics": json.loads(row["topics"]),
+            "in_syllabus": bool(row["in_syllabus"]),
+            "needs_review": bool(row["needs_review"]),
+            "confidence": row["confidence"],
+            "text": row["text"],
+            "score": round(row["score"], 4) if row["score"] is not None else None,
+            "mapped_at": row["mapped_at"],
+        })
+    return {"total": total, "limit": limit, "offset": offset, "results": results}
+
+
+def list_topics(syllabus_id: Optional[str] = None) -> List[Dict]:
+    """Topics with their question counts, most frequent first (for search filters)."""
+    query = "SELECT t.topic, count(*) AS questions FROM mapping_topics t"
+    params: List = []
+    if syllabus_id:
+        query += " JOIN mappings m ON m.id = t.mapping_id WHERE m.syllabus_id = ?"
+        params.append(syllabus_id)
+    query += " GROUP BY t.topic ORDER BY questions DESC, t.topic"
+    with closing(_connect()) as conn:
+        return [dict(row) for row in conn.execute(query, params)]
@@ -0,0 +1,232 @@
+"""
+Single-flight coalescing of identical report computations.
+
+A report is identified by the hashes of its input documents plus the prompt
+version (see reportCache.make_report_id). When several requests for the same
+report arrive while it is being computed - a class submitting the same paper
+and syllabus, a double click - only the first takes an admission slot and
+runs the computation; the others await the same result. The computation runs
+as its own task, so it finishes (and lands in the report cache) even when
+the client that started it goes away.
+
+Clients may send an Idempotency-Key header. A retry carrying the same key,
+e.g. after a network blip, reattaches to the running computation or gets the
+finished result without re-sending the documents.
+
+Each computation runs under a deadline (services/deadline.py; the first
+request's X-Request-Timeout, at most REQUEST_DEADLINE_SECONDS). Waiters
+watch for their client disconnecting; when the last one has gone and nobody
+reattached within FLIGHT_ABANDON_GRACE_SECONDS, the computation is
+cancelled: no further model call or page is started. Its finished chunks are
+checkpointed, so a later request for the same report resumes from them.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+
+from services.deadline import (
+    CLIENT_DISCONNECTED,
+    REQUEST_DEADLINE_SECONDS,
+    Deadline,
+    RequestCancelled,
+    request_deadline,
+    under_deadline,
+)
+from services.profiling import profiled
+from services.reportCache import load_report
+
+# How long a finished request can be replayed by its Idempotency-Key
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "600"))
+# How long a computation whose clients all disconnected waits for one to come back
+FLIGHT_ABANDON_GRACE_SECONDS = float(os.getenv("FLIGHT_ABANDON_GRACE_SECONDS", "10"))
+
+
+class Flight:
+    """A running computation, its deadline and the requests waiting for it."""
+
+    def __init__(self, task: asyncio.Task, deadline: Deadline):
+        self.task = task
+        self.deadline = deadline
+        self.waiters = 0
+        self.abandon: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def live(self) -> bool:
+        """False once it was cancelled or ran out of time; a new request starts afresh."""
+        return self.deadline.reason is None
+
+
+_flights: Dict[str, Flight] = {}
+# Idempotency-Key -> {"report_id", "expires", "content" (stale results only)}
+_keys: Dict[str, Dict[str, Any]] = {}
+_stats = {"started": 0, "coalesced": 0, "replayed": 0, "abandoned": 0}
+
+
+def idempotency_key(request: Request, scope: str) -> Optional[str]:
+    """The request's Idempotency-Key header, namespaced by endpoint."""
+    key = request.headers.get("idempotency-key")
+    return f"{scope}:{key}" if key else None
+
+
+def _prune_keys() -> None:
+    now = time.monotonic()
+    for key in [k for k, entry in _keys.items() if entry["expires"] < now]:
+        del _keys[key]
+
+
+def _bind_key(idempotency_key: str, report_id: str) -> None:
+    _prune_keys()
+    entry = _keys.get(idempotency_key)
+    if entry and entry["report_id"] != report_id:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for different documents")
+    _keys[idempotency_key] = {"report_id": report_id, "expires": time.monotonic() + IDEMPOTENCY_TTL_SECONDS, "content": None}
+
+
+def _remember(report_id: str, task: asyncio.Task) -> None:
+    """Keep stale results for key replays (they are not in the report cache)."""
+    if task.cancelled() or task.exception() is not None:
+        return
+    content = task.result()
+    if content.get("stale"):
+        for entry in _keys.values():
+            if entry["report_id"] == report_id:
+                entry["content"] = content
+
+
+def _abandon(report_id: str, flight: Flight) -> None:
+    flight.abandon = None
+    if flight.waiters == 0 and not flight.task.done():
+        print(f"✂️  All clients of report {report_id[:12]} disconnected - cancelling its computation")
+        flight.deadline.cancel(CLIENT_DISCONNECTED)
+        _stats["abandoned"] += 1
+
+
+async def _client_gone(request: Request) -> None:
+    """Returns when the client disconnects (the body has been read, so nothing else arrives)."""
+    # request.is_disconnected() does not see the disconnect behind BaseHTTPMiddleware
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _await_flight(report_id: str, flight: Flight, request: Optional[Request]) -> Dict:
+    """
+    Wait for a flight's result. Leaving (disconnect, handler cancelled) never
+    cancels the computation itself; the last waiter to leave starts the grace
+    period after which it is cancelled.
+    """
+    flight.waiters += 1
+    if flight.abandon is not None:
+        flight.abandon.cancel()
+        flight.abandon = None
+    try:
+        if request is None:
+            return await asyncio.shield(flight.task)
+        gone = asyncio.ensure_future(_client_gone(request))
+        try:
+            # asyncio.wait never cancels what it waits for
+            await asyncio.wait({flight.task, gone}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            gone.cancel()
+        if flight.task.done():
+            return flight.task.result()
+        raise RequestCancelled(CLIENT_DISCONNECTED)
+    finally:
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            flight.abandon = asyncio.get_running_loop().call_later(
+                FLIGHT_ABANDON_GRACE_SECONDS, _abandon, report_id, flight)
+
+
+async def replay(idempotency_key: Optional[str], request: Optional[Request] = None) -> Optional[Tuple[str, Dict]]:
+    """
+    Result of an earlier request made with the same Idempotency-Key.
+
+    Returns:
+        tuple: (report_id, report content), awaiting the computation if it is
+        still running; None when the key is unknown, expired or its request
+        failed or was cancelled (the caller then starts it again)
+    """
+    if not idempotency_key:
+        return None
+    _prune_keys()
+    entry = _keys.get(idempotency_key)
+    if entry is None:
+        return None
+
+    report_id = entry["report_id"]
+    flight = _flights.get(report_id)
+    if flight is not None and flight.live:
+        _stats["replayed"] += 1
+        return report_id, await _await_flight(report_id, flight, request)
+    content = entry["content"] or load_report(report_id)
+    if content is None:
+        return None
+    _stats["replayed"] += 1
+    return report_id, content
+
+
+def _live_flight(report_id: str) -> Optional[Flight]:
+    flight = _flights.get(report_id)
+    return flight if flight is not None and flight.live else None
+
+
+async def run_once(report_id: str, compute: Callable[[], Dict], admit: Callable[[], Awaitable[Any]],
+                   idempotency_key: Optional[str] = None, request: Optional[Request] = None) -> Dict:
+    """
+    Compute a report at most once at a time.
+
+    Args:
+        report_id: Coalescing key (input hashes + prompt version)
+        compute: Blocking function producing the report; runs in the threadpool
+            under the request's deadline and should save the report itself
+        admit: Coroutine returning an admission ticket, awaited only by the
+            request that ends up running `compute`
+        idempotency_key: Client-supplied key to bind to this report
+        request: The request, for its deadline and to notice its client leaving
+
+    Returns:
+        dict: The report content (shared by every request that awaited it)
+
+    Raises:
+        RequestCancelled: The deadline passed, or this request's client disconnected
+    """
+    if idempotency_key:
+        _bind_key(idempotency_key, report_id)
+
+    flight = _live_flight(report_id)
+    if flight is None:
+        ticket = await admit()
+        # Someone may have started the same report while this one was queued
+        flight = _live_flight(report_id)
+        if flight is None:
+            deadline = request_deadline(request) if request is not None else Deadline(REQUEST_DEADLINE_SECONDS)
+            task = asyncio.ensure_future(run_in_threadpool(profiled(under_deadline(compute, deadline))))
+            flight = Flight(task, deadline)
+            _flights[report_id] = flight
+            _stats["started"] += 1
+
+            def done(t: asyncio.Task, flight: Flight = flight) -> None:
+                if _flights.get(report_id) is flight:
+                    del _flights[report_id]
+                if flight.abandon is not None:
+                    flight.abandon.cancel()
+                ticket.release()
+                _remember(report_id, t)
+
+            task.add_done_callback(done)
+            return await _await_flight(report_id, flight, request)
+        ticket.release()
+
+    _stats["coalesced"] += 1
+    print(f"🔗 Joining in-flight computation of report {report_id[:12]}")
+    return await _await_flight(report_id, flight, request)
+
+
+def flight_status() -> Dict[str, Any]:
+    _prune_keys()
+    return {"in_flight": len(_flights), "idempotency_keys": len(_keys), **_stats}
@@ -1,18 +1,37 @@
 import os
 import json
-from dotenv import load_dotenv
-from openai import OpenAI
-
-load_dotenv()
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    timeout=120.0,  # 2 minutes timeout
-    max_retries=2
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from config.openai_client import COMPARISON_MODEL, SYLLABUS_DIFF_MODEL_TIERS, SYLLABUS_DIFF_CONFIDENCE_THRESHOLD, SECTION_DIFF_CALL_TIMEOUT
+from services.deadline import propagate
+from services.failsafe import guarded_completion
+from services.llmRouter import get_router
+from services.syllabusVersions import (
+    WHOLE_DOCUMENT_KEY,
+    align_sections,
+    compose_diffs,
+    get_pair_diffs,
+    pair_key,
+    save_pair_diff,
+    segment_syllabus,
+    version_chain,
+    version_sections,
 )
 
+# Changed section pairs are diffed concurrently
+SECTION_DIFF_WORKERS = int(os.getenv("SECTION_DIFF_WORKERS", "4"))
+
+# Bump when the module-mapping comparison prompt changes
+COMPARISON_PROMPT_VERSION = "comparison-v1"
+
 def generate_syllabus_json(doc_old: str, doc_new: str, old_filename: str = "old_syllabus", new_filename: str = "new_syllabus") -> str:
     """
     Generate syllabus comparison JSON from extracted text.
+
+    Both documents are split into topic sections and only sections whose
+    content hash changed are sent to the model. Section-pair results are
+    memoised, so re-running a comparison (or diffing a later version that
+    shares sections) reuses earlier results.
     
     Args:
         doc_old: Extracted text from old syllabus 
@@ -26,7 +45,162 @@ def generate_syllabus_json(doc_old: str, doc_new: str, old_filename: str = "old_
     # Validate inputs
     if not doc_old or not doc_new:
         return json.dumps({"error": "Both syllabus texts are required"})
-    
+
+    entries = diff_sections(segment_syllabus(doc_old), segment_syllabus(doc_new))
+    return json.dumps({"syllabi_diff": entries, "stale": any(e.get("stale") for e in entries)})
+
+
+def diff_sections(old_sections: List[Dict[str, str]], new_sections: List[Dict[str, str]]) -> List[Dict]:
+    """
+    Diff two segmented syllabi, computing each changed section pair at most once.
+
+    Args:
+        old_sections: Output of segment_syllabus for the old version
+        new_sections: Output of segment_syllabus for the new version
+
+    Returns:
+        list: syllabi_diff entries, each tagged with its section_key
+    """
+    pairs = align_sections(old_sections, new_sections)
+    stored = get_pair_diffs([pair_key(p["old_hash"], p["new_hash"]) for p in pairs])
+    missing = [p for p in pairs if pair_key(p["old_hash"], p["new_hash"]) not in stored]
+    print(f"🧩 {len(pairs)} changed section(s), {len(pairs) - len(missing)} reused from cache")
+
+    def compute(pair):
+        key = pair_key(pair["old_hash"], pair["new_hash"])
+        entries = _generate_pair_diff(pair)
+        # Stale (failsafe) answers are served but never memoised; each pair is
+        # saved as it finishes so a cancelled run resumes from it
+        if not any(e.get("stale") for e in entries):
+            save_pair_diff(key, entries)
+        return key, entries
+
+    computed = {}
+    if missing:
+        with ThreadPoolExecutor(max_workers=SECTION_DIFF_WORKERS) as pool:
+            computed = dict(pool.map(propagate(compute), missing))
+
+    results = []
+    for pair in pairs:
+        key = pair_key(pair["old_hash"], pair["new_hash"])
+        results.extend(computed[key] if key in computed else stored.get(key) or [])
+    return results
+
+
+def diff_registered_versions(old_label: str, new_label: str) -> List[Dict]:
+    """Diff two registered syllabus versions, reusing stored section pairs."""
+    return diff_sections(version_sections(old_label), version_sections(new_label))
+
+
+def changes_since(since: str, until: Optional[str] = None) -> Dict:
+    """
+    Answer "what changed since version X" by composing consecutive diffs.
+
+    Each step in the chain (e.g. 2024 -> 2025 -> 2026) is diffed through the
+    section-pair cache, so only never-seen section pairs hit the model.
+
+    Args:
+        since: Registered version label to start from
+        until: Registered version label to stop at (default: latest)
+
+    Returns:
+        dict: {"chain", "steps", "syllabi_diff"} with the net composed diff
+    """
+    chain = version_chain(since, until)
+    steps = [
+        {"from": old, "to": new, "syllabi_diff": diff_registered_versions(old, new)}
+        for old, new in zip(chain, chain[1:])
+    ]
+    return {"chain": chain, "steps": steps, "syllabi_diff": compose_diffs(steps)}
+
+
+def _generate_pair_diff(pair: Dict) -> List[Dict]:
+    if pair["key"] == WHOLE_DOCUMENT_KEY:
+        return _generate_whole_document_diff(pair["old"]["text"] if pair["old"] else "", pair["new"]["text"] if pair["new"] else "")
+
+    old = pair["old"]
+    new = pair["new"]
+    topic = (new or old)["topic"]
+
+    prompt = f"""
+    You are comparing ONE topic of two O-Level syllabi: an OLD version and a NEW version.
+
+    TOPIC: {topic}
+
+    - If the OLD text is "NOT PRESENT", the topic was "added".
+    - If the NEW text is "NOT PRESENT", the topic was "removed".
+    - Otherwise compare the learning outcomes/sub-topics and report "modified".
+      If the only differences are formatting or wording with no change in scope,
+      depth or emphasis, return an empty array.
+
+    OLD TOPIC TEXT:
+    {old["text"] if old else "NOT PRESENT"}
+
+    NEW TOPIC TEXT:
+    {new["text"] if new else "NOT PRESENT"}
+
+    OUTPUT:
+    Return a JSON object with a key "syllabi_diff" containing an array with at most one object:
+    {{
+      "topic": "{topic}",
+      "status": "added | removed | modified",
+      "change_summary": "Concise technical explanation of the change in syllabus",
+      "old_summary": "Summary of old learning outcomes (if applicable)",
+      "new_summary": "Summary of new learning outcomes (if applicable) | Not Applicable if removed",
+      "confidence": <number 0-1, how sure you are that the status and summaries are correct>
+    }}
+    """
+
+    # Cascade: small model first, escalate unsure or malformed answers
+    for tier, model in enumerate(SYLLABUS_DIFF_MODEL_TIERS):
+        content, stale = guarded_completion(
+            get_router(),
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are a curriculum expert that outputs strictly valid JSON."},
+                {"role": "user", "content": prompt}
+            ],
+            response_format={ "type": "json_object" },
+            timeout=SECTION_DIFF_CALL_TIMEOUT
+        )
+
+        try:
+            entries = json.loads(content).get("syllabi_diff", [])
+        except json.JSONDecodeError:
+            entries = None
+
+        if stale:
+            break
+
+        if entries is not None and not any(_diff_needs_escalation(e) for e in entries):
+            break
+        if tier < len(SYLLABUS_DIFF_MODEL_TIERS) - 1:
+            print(f"⬆️  Escalating section '{topic}' to {SYLLABUS_DIFF_MODEL_TIERS[tier + 1]}")
+
+    if entries is None:
+        # An empty list here would be memoised as "no change in this section"
+        raise ValueError(f"Section diff for '{topic}' is not valid JSON")
+    for entry in entries:
+        entry["section_key"] = pair["key"]
+        entry["tier"] = tier
+        entry["model"] = model
+        if stale:
+            entry["stale"] = True
+    return entries
+
+
+def _diff_needs_escalation(entry: Dict) -> bool:
+    if entry.get("status") not in ("added", "removed", "modified"):
+        return True
+    try:
+        confidence = float(entry.get("confidence", 0))
+    except (TypeError, ValueError):
+        return True
+    return confidence < SYLLABUS_DIFF_CONFIDENCE_THRESHOLD
+
+
+def _generate_whole_document_diff(doc_old: str, doc_new: str) -> List[Dict]:
+    """Original whole-document prompt, used when a syllabus has no detectable sections."""
     # Truncate text to avoid token limits (30000 chars each for more content)
     doc_old_truncated = doc_old[:30000]
     doc_new_truncated = doc_new[:30000]
@@ -91,8 +265,11 @@ def generate_syllabus_json(doc_old: str, doc_new: str, old_filename: str = "old_
 
     """
 
-    response = client.chat.completions.create(
-        model="gpt-5.2", 
+    # No per-section structure to cascade on, so go straight to the strongest tier
+    model = SYLLABUS_DIFF_MODEL_TIERS[-1]
+    content, stale = guarded_completion(
+        get_router(),
+        model=model, 
         messages=[
             {"role": "system", "content": "You are a curriculum expert that outputs strictly valid JSON."},
             {"role": "user", "content": prompt}
@@ -101,10 +278,40 @@ def generate_syllabus_json(doc_old: str, doc_new: str, old_filename: str = "old_
         timeout=120.0  # 2 minutes for this specific request
     )
     
-    return response.choices[0].message.content
+    entries = json.loads(content).get("syllabi_diff", [])
+    for entry in entries:
+        entry["section_key"] = str(entry.get("topic", "")).lower()
+        entry["tier"] = len(SYLLABUS_DIFF_MODEL_TIERS) - 1
+        entry["model"] = model
+        if stale:
+            entry["stale"] = True
+    return entries
+
+
+# The explanation half of a comparison: omitted from terse comparisons and
+# generated on request (services/explanations.py)
+JUSTIFICATION_SCHEMA = """{
+        "overview": "Brief summary of the mapping assessment",
+        "key_similarities": [
+        "Specific similarity observed in the PDFs",
+        "Another alignment point",
+        "Third similarity"
+        ],
+        "key_differences": [
+        "Important difference or gap",
+        "Another significant difference",
+        "Third notable gap"
+        ],
+        "recommendation": "Clear advice on mapping feasibility"
+    }"""
 
+SCORE_SCHEMA = """{{
+    "similarity_score": <integer 0-100>,
+    "similarity_label": "<EXACTLY: 'Highly Mappable' OR 'Partially Mappable' OR 'Not Recommended'>"{justification}
+    }}"""
 
-def generate_syllabus_comparison_with_score(doc_old: str, doc_new: str, old_filename: str = "old_syllabus", new_filename: str = "new_syllabus") -> str:
+
+def _comparison_prompt(doc_old: str, doc_new: str, old_filename: str, new_filename: str, output_schema: str) -> str:
     prompt = f"""
     You are an NUS module mapping advisor evaluating whether an overseas exchange module can substitute for a local NUS module.
 
@@ -164,24 +371,7 @@ def generate_syllabus_comparison_with_score(doc_old: str, doc_new: str, old_file
     =====================
     REQUIRED JSON OUTPUT
     =====================
-    {{
-    "similarity_score": <integer 0-100>,
-    "similarity_label": "<EXACTLY: 'Highly Mappable' OR 'Partially Mappable' OR 'Not Recommended'>",
-    "ai_justification": {{
-        "overview": "Brief summary of the mapping assessment",
-        "key_similarities": [
-        "Specific similarity observed in the PDFs",
-        "Another alignment point",
-        "Third similarity"
-        ],
-        "key_differences": [
-        "Important difference or gap",
-        "Another significant difference",
-        "Third notable gap"
-        ],
-        "recommendation": "Clear advice on mapping feasibility"
-    }}
-    }}
+    {output_schema}
 
     =====================
     MODULES TO COMPARE
@@ -195,17 +385,97 @@ def generate_syllabus_comparison_with_score(doc_old: str, doc_new: str, old_file
 
     Evaluate based on the content provided. Be fair and balanced in your assessment.
     """
+    return prompt
 
-    
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        temperature=0.3,
-        messages=[
+
+def comparison_request(doc_old: str, doc_new: str, old_filename: str = "old_syllabus", new_filename: str = "new_syllabus",
+                       terse: bool = False) -> Dict:
+    """
+    chat.completions.create arguments for the module-mapping comparison (also a
+    batch line body). With `terse` only the score and label are requested.
+    """
+    justification = "" if terse else f',\n    "ai_justification": {JUSTIFICATION_SCHEMA}'
+    prompt = _comparison_prompt(doc_old, doc_new, old_filename, new_filename,
+                                SCORE_SCHEMA.format(justification=justification))
+
+    return {
+        "model": COMPARISON_MODEL,
+        "temperature": 0.3,
+        "messages": [
             {"role": "system", "content": "You are a fair and balanced university module mapping advisor. Apply label rules: 61+ = 'Highly Mappable', 45-60 = 'Partially Mappable', <45 = 'Not Recommended'. Output only valid JSON."},
             {"role": "user", "content": prompt}
         ],
-        response_format={ "type": "json_object" },
+        "response_format": { "type": "json_object" },
+    }
+
+
+def justification_request(doc_old: str, doc_new: str, old_filename: str, new_filename: str,
+                          score, label) -> Dict:
+    """chat.completions.create arguments for explaining an already-scored (terse) comparison."""
+    output_schema = (
+        f"The similarity score has already been assessed as {score} ({label}); do NOT re-score.\n"
+        f"    Explain that assessment and return ONLY:\n"
+        f'    {{"ai_justification": {JUSTIFICATION_SCHEMA}}}'
+    )
+    prompt = _comparison_prompt(doc_old, doc_new, old_filename, new_filename, output_schema)
+    return {
+        "model": COMPARISON_MODEL,
+        "temperature": 0.3,
+        "messages": [
+            {"role": "system", "content": "You are a fair and balanced university module mapping advisor. Output only valid JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        "response_format": { "type": "json_object" },
+    }
+
+
+def generate_syllabus_comparison_with_score(doc_old: str, doc_new: str, old_filename: str = "old_syllabus", new_filename: str = "new_syllabus",
+                                            batch_dir: Optional[str] = None, batch_processor=None, batch_wait: bool = True,
+                                            terse: bool = False) -> str:
+    """
+    Score how well two modules map onto each other. With `batch_dir` the
+    prompt is submitted as a (resumable) batch instead of a live call. With
+    `terse` the result has no ai_justification (see justification_request).
+    """
+    if batch_dir:
+        pair = {"id": "comparison", "doc_old": doc_old, "doc_new": doc_new,
+                "old_filename": old_filename, "new_filename": new_filename, "terse": terse}
+        result = compare_syllabi_batch([pair], batch_dir, batch_processor, batch_wait)["comparison"]
+        if "error" in result:
+            raise RuntimeError(f"Batch comparison failed: {result['error']}")
+        return result["content"]
+
+    content, stale = guarded_completion(
+        get_router(),
+        **comparison_request(doc_old, doc_new, old_filename, new_filename, terse),
         timeout=120.0
     )
-    
-    return response.choices[0].message.content
\ No newline at end of file
+
+    if stale:
+        return json.dumps({**json.loads(content), "stale": True})
+    return content
+
+
+def compare_syllabi_batch(pairs: List[Dict], batch_dir: str, batch_processor=None, batch_wait: bool = True) -> Dict[str, Dict]:
+    """
+    Run many module-mapping comparisons as one checkpointed batch.
+
+    Args:
+        pairs: [{"id", "doc_old", "doc_new", "old_filename", "new_filename", "terse"}];
+            ids must be stable across resumes
+        batch_dir: Directory for the batch round (re-run to resume)
+
+    Returns:
+        dict: {pair id: {"content": comparison JSON string} or {"error"}}
+    """
+    from services.batchRunner import run_batch
+
+    requests = [
+        {"custom_id": pair["id"], "body": comparison_request(pair["doc_old"], pair["doc_new"],
+                                                             pair.get("old_filename", "old_syllabus"),
+                                                             pair.get("new_filename", "new_syllabus"),
+                                                             pair.get("terse", False))}
+        for pair in pairs
+    ]
+    outputs = run_batch(os.path.join(batch_dir, "comparison"), requests, batch_processor, wait=batch_wait)
+    return {pair["id"]: outputs.get(pair["id"], {"error": "no result returned by the batch"}) for pair in pairs}
\ No newline at end of file
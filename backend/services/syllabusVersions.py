@@ -0,0 +1,387 @@
+"""
+Syllabus version registry with per-section content hashes.
+
+A syllabus is split into topic sections (e.g. "N2 Ratio and proportion"),
+each section is hashed, and diffs are memoised per (old section, new section)
+pair. Registered versions form a chain (2023 -> 2024 -> 2025 -> 2026), so a
+"what changed since X" query is answered by composing the stored step diffs
+instead of asking the model again.
+
+Versions and section texts live in outputs/syllabus_versions.json (written
+only on registration). Pair diffs are written once per changed section by
+every diff run, from several threads and workers, so they are kept in SQLite
+(outputs/section_diffs.db): one row per pair, read in one query per run.
+
+This module holds no model calls - see syllabusJsonCreator.py for the prompts.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+STORE_PATH = Path(__file__).resolve().parent.parent / "outputs" / "syllabus_versions.json"
+PAIR_DB_PATH = Path(__file__).resolve().parent.parent / "outputs" / "section_diffs.db"
+
+# Bump when the per-section diff prompt changes so stale pair results are not reused
+SECTION_DIFF_PROMPT_VERSION = "section-diff-v2"
+
+# Key used when a document cannot be segmented and is diffed as one block
+WHOLE_DOCUMENT_KEY = "__document__"
+
+# Administrative sections the diff prompt has always ignored
+ADMIN_SECTION_KEYWORDS = [
+    "CONTENTS",
+    "INTRODUCTION",
+    "AIMS",
+    "ASSESSMENT",
+    "USE OF CALCULATORS",
+    "NOTES",
+]
+
+TOPIC_CODE_RE = re.compile(r"^[A-Z]{1,2}\d{1,2}$")
+CAPS_HEADING_RE = re.compile(r"^[A-Z][A-Z &/,\-()]{2,60}$")
+
+_store_lock = threading.Lock()
+_pair_db_ready = False
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def hash_text(text: str) -> str:
+    """SHA-256 of whitespace-normalised text."""
+    return hashlib.sha256(_normalize(text).encode("utf-8")).hexdigest()
+
+
+def _section_key(title: str) -> str:
+    # Drop the topic code so renumbered topics (N5 -> N6) still line up
+    words = title.split()
+    if words and TOPIC_CODE_RE.match(words[0]):
+        words = words[1:]
+    return " ".join(words).lower() or title.lower()
+
+
+def segment_syllabus(text: str) -> List[Dict[str, str]]:
+    """
+    Split extracted syllabus text into topic sections.
+
+    Headings are either topic codes on their own line ("N2", "G10") followed by
+    the topic title, or ALL-CAPS headings ("SUBJECT CONTENT"). Running page
+    headers and bare page numbers are dropped.
+
+    Args:
+        text: Plain text extracted from a syllabus PDF
+
+    Returns:
+        list: [{"key", "topic", "text"}] in document order. Returns a single
+        WHOLE_DOCUMENT_KEY section when no structure can be found.
+    """
+    lines = [line.strip() for line in text.splitlines()]
+    counts: Dict[str, int] = {}
+    for line in lines:
+        if len(line) > 20:
+            counts[line] = counts.get(line, 0) + 1
+
+    sections: List[Dict[str, str]] = []
+    current: Optional[Dict[str, object]] = None
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        i += 1
+
+        # Skip page numbers and running headers
+        if not line or line.isdigit() or counts.get(line, 0) >= 3:
+            continue
+
+        title = None
+        if TOPIC_CODE_RE.match(line):
+            title_parts = [line]
+            while i < len(lines) and lines[i] and lines[i] != "•" and len(title_parts) < 5:
+                title_parts.append(lines[i])
+                i += 1
+            title = " ".join(title_parts)
+        elif CAPS_HEADING_RE.match(line) and sum(c.isalpha() for c in line) >= 3:
+            title = line
+
+        if title:
+            current = {"topic": title, "body": []}
+            sections.append(current)
+        elif current is not None:
+            current["body"].append(line)
+
+    result = []
+    for section in sections:
+        topic = str(section["topic"])
+        if any(topic.upper().startswith(k) for k in ADMIN_SECTION_KEYWORDS):
+            continue
+        body = "\n".join(section["body"]).strip()
+        if not body:
+            continue
+        result.append({"key": _section_key(topic), "topic": topic, "text": body})
+
+    if len(result) < 2:
+        return [{"key": WHOLE_DOCUMENT_KEY, "topic": "Whole document", "text": text.strip()}]
+
+    # Keep keys unique so alignment between versions is one-to-one
+    seen: Dict[str, int] = {}
+    for section in result:
+        n = seen.get(section["key"], 0)
+        seen[section["key"]] = n + 1
+        if n:
+            section["key"] = f"{section['key']} #{n + 1}"
+
+    return result
+
+
+def pair_key(old_hash: Optional[str], new_hash: Optional[str]) -> str:
+    """Cache key for a section pair. A missing side means added/removed."""
+    return f"{SECTION_DIFF_PROMPT_VERSION}:{old_hash or '-'}:{new_hash or '-'}"
+
+
+def _as_whole_document(sections: List[Dict[str, str]]) -> Dict[str, str]:
+    if len(sections) == 1 and sections[0]["key"] == WHOLE_DOCUMENT_KEY:
+        return sections[0]
+    text = "\n".join(f"{s['topic']}\n{s['text']}" for s in sections)
+    return {"key": WHOLE_DOCUMENT_KEY, "topic": "Whole document", "text": text}
+
+
+def align_sections(old_sections: List[Dict[str, str]], new_sections: List[Dict[str, str]]) -> List[Dict[str, Optional[Dict[str, str]]]]:
+    """
+    Pair up sections of two versions by topic key.
+
+    Returns only pairs whose content differs; identical sections never reach
+    the model.
+    """
+    # A document without structure can only be compared as a whole
+    if any(s["key"] == WHOLE_DOCUMENT_KEY for s in old_sections + new_sections):
+        old_sections = [_as_whole_document(old_sections)]
+        new_sections = [_as_whole_document(new_sections)]
+
+    old_by_key = {s["key"]: s for s in old_sections}
+    new_by_key = {s["key"]: s for s in new_sections}
+    keys = [s["key"] for s in old_sections] + [s["key"] for s in new_sections if s["key"] not in old_by_key]
+
+    pairs = []
+    for key in keys:
+        old = old_by_key.get(key)
+        new = new_by_key.get(key)
+        old_hash = hash_text(old["text"]) if old else None
+        new_hash = hash_text(new["text"]) if new else None
+        if old_hash == new_hash:
+            continue
+        pairs.append({"key": key, "old": old, "new": new, "old_hash": old_hash, "new_hash": new_hash})
+    return pairs
+
+
+# --- PERSISTENT STORE ---
+
+def _empty_store() -> Dict:
+    return {"sections": {}, "versions": {}}
+
+
+def load_store() -> Dict:
+    if not STORE_PATH.exists():
+        return _empty_store()
+    with open(STORE_PATH, "r", encoding="utf-8") as f:
+        store = json.load(f)
+    for k, v in _empty_store().items():
+        store.setdefault(k, v)
+    return store
+
+
+def _save_store(store: Dict) -> None:
+    STORE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = STORE_PATH.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(store, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, STORE_PATH)
+
+
+def _pair_db() -> sqlite3.Connection:
+    global _pair_db_ready
+    PAIR_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(PAIR_DB_PATH, timeout=30)
+    if not _pair_db_ready:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS pair_diffs (key TEXT PRIMARY KEY, entries TEXT NOT NULL, saved_at TEXT NOT NULL)")
+        _migrate_pair_diffs(conn)
+        _pair_db_ready = True
+    return conn
+
+
+def _migrate_pair_diffs(conn: sqlite3.Connection) -> None:
+    # Pair diffs used to be kept in the JSON store; move them over once
+    with _store_lock:
+        store = load_store()
+        legacy = store.pop("pair_diffs", None)
+        if not legacy:
+            return
+        saved_at = datetime.now(timezone.utc).isoformat()
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO pair_diffs (key, entries, saved_at) VALUES (?, ?, ?)",
+                             [(key, json.dumps(entries, ensure_ascii=False), saved_at) for key, entries in legacy.items()])
+        _save_store(store)
+
+
+def get_pair_diffs(keys: List[str]) -> Dict[str, List[Dict]]:
+    """Stored diffs of the given section pairs (missing keys are left out)."""
+    found = {}
+    unique = list(dict.fromkeys(keys))
+    with closing(_pair_db()) as conn:
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(unique), 500):
+            batch = unique[i:i + 500]
+            rows = conn.execute(
+                f"SELECT key, entries FROM pair_diffs WHERE key IN ({', '.join('?' * len(batch))})", batch)
+            found.update((key, json.loads(entries)) for key, entries in rows)
+    return found
+
+
+def get_pair_diff(key: str) -> Optional[List[Dict]]:
+    return get_pair_diffs([key]).get(key)
+
+
+def save_pair_diff(key: str, entries: List[Dict]) -> None:
+    with closing(_pair_db()) as conn, conn:
+        conn.execute("INSERT OR REPLACE INTO pair_diffs (key, entries, saved_at) VALUES (?, ?, ?)",
+                     (key, json.dumps(entries, ensure_ascii=False), datetime.now(timezone.utc).isoformat()))
+
+
+def register_version(label: str, text: str, source_filename: Optional[str] = None) -> Dict:
+    """
+    Register (or replace) a syllabus version under a label such as "2025".
+
+    Args:
+        label: Version label; versions are chained in sorted label order
+        text: Extracted syllabus text
+        source_filename: Original PDF filename, for reference
+
+    Returns:
+        dict: Version summary with the section hashes
+    """
+    sections = segment_syllabus(text)
+    with _store_lock:
+        store = load_store()
+        for s in sections:
+            store["sections"][hash_text(s["text"])] = {"topic": s["topic"], "text": s["text"]}
+        store["versions"][label] = {
+            "doc_hash": hash_text(text),
+            "source_filename": source_filename,
+            "registered_at": datetime.now(timezone.utc).isoformat(),
+            "sections": [{"key": s["key"], "topic": s["topic"], "hash": hash_text(s["text"])} for s in sections],
+        }
+        _save_store(store)
+        version = store["versions"][label]
+
+    return {"label": label, "doc_hash": version["doc_hash"], "section_count": len(sections)}
+
+
+def list_versions() -> List[Dict]:
+    with _store_lock:
+        store = load_store()
+    return [
+        {
+            "label": label,
+            "doc_hash": v["doc_hash"],
+            "source_filename": v.get("source_filename"),
+            "registered_at": v.get("registered_at"),
+            "section_count": len(v["sections"]),
+        }
+        for label, v in sorted(store["versions"].items())
+    ]
+
+
+def version_sections(label: str) -> List[Dict[str, str]]:
+    """Rebuild the section list of a registered version from the store."""
+    with _store_lock:
+        store = load_store()
+    if label not in store["versions"]:
+        raise KeyError(f"Unknown syllabus version: {label}")
+    return [
+        {"key": s["key"], "topic": s["topic"], "text": store["sections"][s["hash"]]["text"]}
+        for s in store["versions"][label]["sections"]
+    ]
+
+
+def version_doc_hashes(labels: List[str]) -> List[str]:
+    """Document hashes of registered versions, in the order given."""
+    with _store_lock:
+        store = load_store()
+    missing = [label for label in labels if label not in store["versions"]]
+    if missing:
+        raise KeyError(f"Unknown syllabus version: {missing[0]}")
+    return [store["versions"][label]["doc_hash"] for label in labels]
+
+
+def version_chain(since: str, until: Optional[str] = None) -> List[str]:
+    """Registered labels from `since` to `until` (default: latest), inclusive."""
+    labels = [v["label"] for v in list_versions()]
+    if since not in labels:
+        raise KeyError(f"Unknown syllabus version: {since}")
+    if until and until not in labels:
+        raise KeyError(f"Unknown syllabus version: {until}")
+    end = labels.index(until) if until else len(labels) - 1
+    start = labels.index(since)
+    if end < start:
+        raise ValueError(f"Version {until} is older than {since}")
+    return labels[start:end + 1]
+
+
+# --- COMPOSITION ---
+
+def _combine(first: Optional[Dict], second: Optional[Dict]) -> Optional[Dict]:
+    """Compose two consecutive changes to the same topic."""
+    if first is None:
+        return second
+    if second is None:
+        return first
+
+    a, b = first["status"], second["status"]
+    if a == "added" and b == "removed":
+        return None
+
+    if a == "added":
+        status = "added"
+    elif b == "removed":
+        status = "removed"
+    else:
+        status = "modified"
+
+    return {
+        **second,
+        "status": status,
+        "change_summary": f"{first['change_summary']} {second['change_summary']}".strip(),
+        "old_summary": first.get("old_summary", ""),
+        "new_summary": second.get("new_summary", ""),
+    }
+
+
+def compose_diffs(steps: List[Dict]) -> List[Dict]:
+    """
+    Compose consecutive version diffs into one net diff.
+
+    Args:
+        steps: [{"from": label, "to": label, "syllabi_diff": [entries with section_key]}]
+
+    Returns:
+        list: Net syllabi_diff entries, one per changed topic
+    """
+    net: Dict[str, Optional[Dict]] = {}
+    order: List[str] = []
+    for step in steps:
+        prefix = f"[{step['from']} → {step['to']}]"
+        for entry in step["syllabi_diff"]:
+            key = entry.get("section_key") or entry.get("topic", "")
+            if key not in net:
+                order.append(key)
+            labelled = {**entry, "change_summary": f"{prefix} {entry.get('change_summary', '')}"}
+            net[key] = _combine(net.get(key), labelled)
+    return [net[k] for k in order if net[k] is not None]
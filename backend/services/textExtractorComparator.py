@@ -1,16 +1,15 @@
 import fitz  # PyMuPDF
 import os
-from syllabusJsonCreator import generate_syllabus_json
+from services.syllabusJsonCreator import generate_syllabus_json
 
 
 def extract_text_from_pdf_file(file_path: str) -> str:
     """Extract text from a PDF file path."""
     try:
-        doc = fitz.open(file_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        doc.close()
+        with fitz.open(file_path) as doc:
+            text = ""
+            for page in doc:
+                text += page.get_text()
         return text.strip()
     except Exception as e:
         print(f"❌ Error extracting PDF: {e}")
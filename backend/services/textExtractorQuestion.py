@@ -2,6 +2,14 @@ import pymupdf
 import json
 import os
 import re
+from contextlib import ExitStack
+
+from services.deadline import check_deadline
+from services.pdfDocument import open_pdf
+from services.pdfLayout import cached_layout, iter_pages, page_layout
+
+# Keep each PDF's span layout under outputs/layout/ and memory-map it on re-parse
+LAYOUT_CACHE = os.getenv("PDF_LAYOUT_CACHE", "0").lower() in ("1", "true", "yes")
 
 SKIP_PAGE_KEYWORDS = [
     "Paper 2",
@@ -21,7 +29,130 @@ STOP_PAGE_KEYWORDS = [
     "Suggested Answers",
 ]
 
-def extract_questions_from_pdf(pdf_path: str, output_path: str) -> None:
+# Whole pages that never hold question text: a page with one of these markers
+# and no mark allocation such as "[3]" is skipped without span extraction
+FILLER_PAGE_MARKERS = [
+    "BLANK PAGE",
+    "READ THESE INSTRUCTIONS FIRST",
+    "Mathematical Formulae",
+]
+MARK_ALLOCATION = re.compile(r"\[\s*\d+\s*\]")
+
+
+def _probe_text(page, textpage=None) -> str:
+    """Plain text above the footer band - much cheaper than the dict layout."""
+    rect = page.rect
+    clip = pymupdf.Rect(rect.x0, rect.y0, rect.x1, rect.y0 + rect.height * 0.88)
+    return page.get_text("text", clip=clip, textpage=textpage)
+
+
+def _has_stop_keyword(text: str) -> bool:
+    lowered = text.lower()
+    return any(k.lower() in lowered for k in STOP_PAGE_KEYWORDS)
+
+
+def triage_page(page, textpage=None) -> str:
+    """
+    Classify a page from cheap signals.
+
+    Returns:
+        str: "empty" (no text, e.g. a scanned figure), "filler" (blank page,
+        cover or formula sheet), "stop" (marking scheme starts here) or "question"
+    """
+    text = _probe_text(page, textpage)
+    if not text.strip():
+        return "empty"
+    if _has_stop_keyword(text):
+        return "stop"
+    lowered = text.lower()
+    # On a page that also holds questions the marker only skips its own line
+    if any(m.lower() in lowered for m in FILLER_PAGE_MARKERS) and not MARK_ALLOCATION.search(text):
+        return "filler"
+    return "question"
+
+
+def find_answer_key_page(doc, first_page: int = 1) -> int:
+    """
+    Binary-search for the first page carrying a marking-scheme keyword
+    (answer keys are appended at the end of a paper).
+
+    Returns:
+        int: 1-based page number, or doc.page_count + 1 when there is none
+    """
+    lo, hi = first_page, doc.page_count + 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _has_stop_keyword(doc[mid - 1].get_text("text")):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+def iter_question_pages(doc, first_page: int = 1):
+    """
+    Compact layouts of the pages worth parsing: pages past the answer key are
+    never opened and filler/empty pages get only the cheap text probe.
+    """
+    last_page = min(find_answer_key_page(doc, first_page), doc.page_count)
+    fonts = []
+    for page_num in range(first_page, last_page + 1):
+        page = doc[page_num - 1]
+        # One textpage serves both the probe and the span extraction
+        textpage = page.get_textpage(flags=pymupdf.TEXTFLAGS_DICT)
+        kind = triage_page(page, textpage)
+        if kind in ("empty", "filler"):
+            print(f"⏭️  Page {page_num}: {kind}, skipped")
+            continue
+        yield page_layout(page, page_num, fonts, textpage=textpage)
+
+
+def _extend(extents: dict, page_num: int, box) -> None:
+    if box is None:
+        return
+    seen = extents.get(page_num)
+    extents[page_num] = box if seen is None else (
+        min(seen[0], box[0]), min(seen[1], box[1]), max(seen[2], box[2]), max(seen[3], box[3])
+    )
+
+
+def page_regions(questions: list, extents: list, page_heights: dict) -> list:
+    """
+    Where each question sits on its pages, for rendering crops (pageRender.py).
+
+    A question's text extent is widened downwards to where the next question
+    starts on the same page (or to the footer line), so figures and answer
+    space between its text lines are included. A running header is all that
+    some continuation pages contribute; those pages are left out. Subparts
+    share their question's region.
+
+    Args:
+        questions: Extracted questions
+        extents: {page: (x0, y0, x1, y1)} text extent per question, same order
+
+    Returns:
+        list: [{"question_id", "page", "regions": [{"page", "bbox": [x0, y0, x1, y1]}]}]
+        per question (ids repeat when a file holds two papers), in PDF points
+    """
+    starts = {}
+    for pages in extents:
+        for page_num, box in pages.items():
+            starts.setdefault(page_num, []).append(box[1])
+
+    regions = []
+    for question, pages in zip(questions, extents):
+        spans = []
+        for page_num, (x0, y0, x1, y1) in sorted(pages.items()):
+            if page_num != question["page"] and y1 < page_heights[page_num] * 0.1:
+                continue
+            below = [top for top in starts[page_num] if top > y0]
+            bottom = min(below) if below else page_heights[page_num] * 0.88
+            spans.append({"page": page_num, "bbox": [round(x0, 1), round(y0, 1), round(x1, 1), round(max(y1, bottom), 1)]})
+        regions.append({"question_id": question["id"], "page": question["page"], "regions": spans})
+    return regions
+
+
+def extract_questions_from_pdf(pdf_path: str, output_path: str, paper_id: str = None) -> dict:
     break_all_parsing = False
 
 
@@ -31,11 +162,13 @@ def extract_questions_from_pdf(pdf_path: str, output_path: str) -> None:
     last_question_page = None
 
 
-    doc = pymupdf.open(pdf_path)
-
     questions = []
     current_q = None
     current_subpart = None   
+    current_extent = None
+    # Text extent of each question per page, for page_regions()
+    extents = []
+    page_heights = {}
 
 
     # Iterates though the pages, skipping through the first 2 pages and then identify the questions number 
@@ -43,42 +176,61 @@ def extract_questions_from_pdf(pdf_path: str, output_path: str) -> None:
     # out keywords and also check if the q number is less than 50 and then subparts
     # are also extracted and formatted also theres a tracker to ensure page number at the top is not considered a questions
 
-    for page_num, page in enumerate(doc, start=1):
-        if break_all_parsing:
-            break
-
-        if page_num <= 2:
-            continue
-
-        blocks = page.get_text("dict")["blocks"]
-        page_height = page.rect.height
-
-        # This helps to extract stuff like font also
-        for block in blocks:
+    # Each page is converted to compact span rows (see pdfLayout.py) instead of
+    # keeping PyMuPDF's nested dicts; pages after the stop point are never read
+    # The document is closed when parsing stops, however it stops
+    with ExitStack() as stack:
+        if LAYOUT_CACHE:
+            pages = iter_pages(cached_layout(pdf_path), first_page=3)
+        else:
+            doc = stack.enter_context(open_pdf(pdf_path))
+            pages = iter_question_pages(doc, first_page=3)
+
+        for layout in pages:
             if break_all_parsing:
                 break
-            
-            if block["type"] != 0:
-                continue
-
-            for line in block["lines"]:
+            # Stop between pages once the request's deadline passed or it was cancelled
+            check_deadline()
+
+            page_num = layout.pages()[0]
+            page_height = layout.page_heights[page_num]
+            page_heights[page_num] = page_height
+            # Plain lists: per-row NumPy scalar access is slower than the dicts it replaces
+            starts = layout.spans["text_start"].tolist()
+            ends = layout.spans["text_end"].tolist()
+            fonts = [layout.fonts[f] for f in layout.spans["font"].tolist()]
+            tops = layout.spans["y0"].tolist()
+            lefts = layout.spans["x0"].tolist()
+            rights = layout.spans["x1"].tolist()
+            bottoms = layout.spans["y1"].tolist()
+
+            # This helps to extract stuff like font also
+            for _, line in layout.lines():
+                line = line.tolist()
                 line_text = ""
                 saw_question_number = False
                 detected_q_num = None
+                line_box = None
 
 
-                for span in line["spans"]:
-                    text    = span["text"].strip()
-                    font = span["font"]
-                    y0 = span["bbox"][1]
+                for i in line:
+                    text    = layout.text[starts[i]:ends[i]].strip()
+                    font = fonts[i]
+                    y0 = tops[i]
 
                     # Ignore footer
                     if y0 > page_height * 0.88:
                         continue
 
+                    box = (lefts[i], y0, rights[i], bottoms[i])
+                    line_box = box if line_box is None else (
+                        min(line_box[0], box[0]), min(line_box[1], box[1]),
+                        max(line_box[2], box[2]), max(line_box[3], box[3]),
+                    )
 
 
-                
+
+            
 
                     # Detect bold question number
                     if (re.fullmatch(r"\d+", text) and "Bold" in font and 1 <= int(text) <= 50):
@@ -105,26 +257,26 @@ def extract_questions_from_pdf(pdf_path: str, output_path: str) -> None:
                     saw_question_number = True
                     q_num = detected_q_num
 
-                    
                 
+            
                 line_text = line_text.strip()
                 if not line_text:
                     continue
 
-            
+        
                 if any(k.lower() in line_text.lower() for k in SKIP_PAGE_KEYWORDS):
                     continue
 
                 if any(k.lower() in line_text.lower() for k in STOP_PAGE_KEYWORDS):
                     break_all_parsing = True
                     break
-                    
+                
 
 
                 if saw_question_number:
                     if current_q:
                         questions.append(current_q)
-                        
+                    
                         # Stop if we've collected 30 questions
                         if len(questions) >= 30:
                             print(f"✅ Reached 30 questions, stopping extraction")
@@ -140,12 +292,18 @@ def extract_questions_from_pdf(pdf_path: str, output_path: str) -> None:
                     }
 
                     current_subpart = None  # reset subpart context
+                    current_extent = {}
+                    extents.append(current_extent)
+                    _extend(current_extent, page_num, line_box)
 
                     # Remove leading question number from text
                     line_text = re.sub(r"^\s*\d+\s*", "", line_text).strip()
                     if not line_text:
                         continue
 
+                elif current_q:
+                    _extend(current_extent, page_num, line_box)
+
                 # Subpart detection removed (i) cause too confusing 
                 line_text = re.sub(r"^\((i|ii|iii|iv|v)\)\s*", "", line_text)
                 subpart_match = re.match(r"^\(([a-z])\)\s*(.*)", line_text)
@@ -169,13 +327,16 @@ def extract_questions_from_pdf(pdf_path: str, output_path: str) -> None:
                     current_q["text"] += line_text + " "
 
 
-    # Save last question if it meets length requirement
-    if current_q and len(current_q.get("text", "").strip()) >= 30:
+    # Save last question if it meets length requirement (or carries subparts:
+    # with the answer key cut off, a final question's stem can be short)
+    if current_q and (len(current_q.get("text", "").strip()) >= 30 or current_q["subparts"]):
         questions.append(current_q)
 
     paper_json = {
-        "paper_id": "samplePaper.pdf",
-        "questions": questions
+        "paper_id": paper_id or os.path.basename(pdf_path),
+        "questions": questions,
+        # Not part of the questions, so prompts and fingerprints never see it
+        "regions": page_regions(questions, extents[:len(questions)], page_heights),
     }
 
     with open(output_path, "w", encoding="utf-8") as f:
@@ -184,6 +345,8 @@ def extract_questions_from_pdf(pdf_path: str, output_path: str) -> None:
     print(f"Extracted {len(questions)} question(s) ✅")
     print(f"Saved to {output_path}")
 
+    return paper_json
+
 
 def main():
     """Main function for script execution."""
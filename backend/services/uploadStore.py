@@ -0,0 +1,136 @@
+"""
+Streaming upload handling.
+
+Uploads are copied to disk in fixed-size chunks while being hashed, so a
+request never holds a whole PDF in memory. Files over the configured limit
+are rejected with 413 as soon as the limit is crossed. By default files are
+stored content-addressed under uploads/blobs/<sha256>.pdf, which also dedupes
+repeat uploads of the same document.
+
+Clients that hash a file first can ask whether its blob is already here
+(GET /api/uploads/negotiate) and then pass the hash instead of the bytes;
+resolve_upload() accepts either.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import HTTPException, UploadFile
+
+UPLOAD_DIR = Path(__file__).resolve().parent.parent / "uploads"
+BLOB_DIR = UPLOAD_DIR / "blobs"
+
+CHUNK_SIZE = 1024 * 1024
+
+# Per-file limit; MAX_REQUEST_MB in main.py bounds the whole multipart body
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", "50")) * 1024 * 1024)
+
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def blob_path(sha256: str) -> Path:
+    return BLOB_DIR / f"{sha256}.pdf"
+
+
+def valid_sha256(sha256: str) -> bool:
+    return bool(sha256) and SHA256_RE.match(sha256) is not None
+
+
+def stored_blob(sha256: str, filename: Optional[str] = None) -> Optional[Dict]:
+    """
+    Look up an already stored upload by its content hash.
+
+    Returns:
+        dict: Same shape as save_upload(), or None if the blob is not here
+    """
+    if not valid_sha256(sha256):
+        return None
+    path = blob_path(sha256)
+    try:
+        size = path.stat().st_size
+    except FileNotFoundError:
+        return None
+    return {"path": str(path), "sha256": sha256, "size": size, "filename": filename or path.name}
+
+
+def _too_large(file: UploadFile, max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"{file.filename} exceeds the {max_bytes / (1024 * 1024):g} MB upload limit"
+    )
+
+
+async def save_upload(file: UploadFile, dest_path: Optional[Path] = None, max_bytes: int = MAX_UPLOAD_BYTES) -> Dict:
+    """
+    Stream an upload to disk, hashing it on the fly.
+
+    Args:
+        file: UploadFile object from FastAPI
+        dest_path: Where to store the file (default: content-addressed blob)
+        max_bytes: Reject with 413 once the upload exceeds this size
+
+    Returns:
+        dict: {"path", "sha256", "size", "filename"}
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(file, max_bytes)
+
+    target_dir = Path(dest_path).parent if dest_path else BLOB_DIR
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    await file.seek(0)
+    fd, tmp_name = tempfile.mkstemp(dir=target_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(file, max_bytes)
+                digest.update(chunk)
+                out.write(chunk)
+
+        sha256 = digest.hexdigest()
+        final_path = Path(dest_path) if dest_path else blob_path(sha256)
+        if dest_path is None and final_path.exists():
+            os.remove(tmp_name)
+        else:
+            os.replace(tmp_name, final_path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+    return {"path": str(final_path), "sha256": sha256, "size": size, "filename": file.filename}
+
+
+async def resolve_upload(file: Optional[UploadFile], sha256: Optional[str] = None, filename: Optional[str] = None) -> Dict:
+    """
+    Store an upload, or look up a blob the client already sent by hash.
+
+    Args:
+        file: UploadFile object from FastAPI, if the bytes were sent
+        sha256: Content hash from a client that skipped the upload
+        filename: Original filename to report for a hash-only reference
+
+    Returns:
+        dict: {"path", "sha256", "size", "filename"}
+    """
+    if file is not None:
+        return await save_upload(file)
+    if not sha256:
+        raise HTTPException(status_code=400, detail="Either a file or its sha256 is required")
+    sha256 = sha256.lower()
+    if not valid_sha256(sha256):
+        raise HTTPException(status_code=400, detail=f"Invalid sha256: {sha256}")
+    stored = stored_blob(sha256, filename)
+    if stored is None:
+        # The client's negotiation is out of date (e.g. blobs were cleared): upload the file
+        raise HTTPException(status_code=409, detail=f"Document {sha256[:12]} is not stored; upload the file")
+    return stored
@@ -0,0 +1,166 @@
+"""
+Memory soak test for PDF extraction and paper analysis.
+
+Replays extractions and analyses many times against a local mock model
+endpoint (the one from bench_transport.py) and samples the Python heap
+(tracemalloc) and process RSS as it goes. After a warm-up, the run fails
+(exit code 1) when either grows by more than its budget, or when a PDF
+document is still open at the end (services/pdfDocument.open_documents).
+
+Each iteration:
+
+- extracts the questions of every paper (extract_questions_from_pdf)
+- extracts the syllabus text (main.extract_text_from_path)
+- extracts a truncated copy of the first paper (MuPDF's repair path; errors
+  are counted, not fatal)
+- every --analysis-every iterations, maps one paper's questions against the
+  mock model (map_questions_to_syllabus; near-duplicate reuse is off so every
+  chunk is a model call)
+
+The failsafe store and all scratch files go to a temporary directory; the
+real stores are not touched.
+
+Usage:
+    python soak_memory.py --iterations 500 --heap-budget-mb 8 --rss-budget-mb 64
+    python soak_memory.py --papers services/samplePaper1.pdf services/samplePaper2.pdf --syllabus services/syllabus.pdf
+"""
+
+import argparse
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_PAPERS = [os.path.join(BACKEND_DIR, "services", name) for name in ("samplePaper1.pdf", "samplePaper2.pdf")]
+SAMPLE_SYLLABUS = os.path.join(BACKEND_DIR, "services", "syllabus.pdf")
+
+MB = 1024 * 1024
+
+
+def rss_mb() -> float:
+    """Current resident set size (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / MB
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / MB if sys.platform == "darwin" else peak / 1024
+
+
+def heap_mb() -> float:
+    return tracemalloc.get_traced_memory()[0] / MB
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soak-test PDF extraction and analysis for memory growth.")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=50, help="Iterations before the baseline is taken")
+    parser.add_argument("--analysis-every", type=int, default=10, help="Run a mock analysis every N iterations (0: never)")
+    parser.add_argument("--sample-every", type=int, default=100)
+    parser.add_argument("--heap-budget-mb", type=float, default=8.0, help="Allowed tracemalloc growth after warm-up")
+    parser.add_argument("--rss-budget-mb", type=float, default=64.0, help="Allowed RSS growth after warm-up")
+    parser.add_argument("--papers", nargs="+", default=SAMPLE_PAPERS)
+    parser.add_argument("--syllabus", default=SAMPLE_SYLLABUS)
+    args = parser.parse_args(argv)
+
+    from bench_transport import start_mock_server
+
+    # Point the shared client at the mock before anything creates it
+    server = start_mock_server(0.0)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ["OPENAI_API_KEY"] = "soak"
+
+    import services.failsafe as failsafe
+    from main import extract_text_from_path
+    from services.comparePrompt import map_questions_to_syllabus
+    from services.pdfDocument import open_documents
+    from services.textExtractorQuestion import extract_questions_from_pdf
+
+    scratch = tempfile.mkdtemp(prefix="soak_")
+    failsafe.FAILSAFE_DIR = failsafe.Path(scratch) / "failsafe"
+    syllabus_txt = os.path.join(scratch, "syllabus.txt")
+    with open(syllabus_txt, "w", encoding="utf-8") as f:
+        f.write(extract_text_from_path(args.syllabus))
+    truncated = os.path.join(scratch, "truncated.pdf")
+    with open(args.papers[0], "rb") as src, open(truncated, "wb") as dst:
+        data = src.read()
+        dst.write(data[: len(data) // 3])
+
+    counts = {"extractions": 0, "analyses": 0, "faults": 0}
+
+    def iteration(i: int) -> None:
+        for n, paper in enumerate(args.papers):
+            extract_questions_from_pdf(paper, os.path.join(scratch, f"questions_{n}.json"))
+            counts["extractions"] += 1
+        extract_text_from_path(args.syllabus)
+        counts["extractions"] += 1
+        try:
+            extract_questions_from_pdf(truncated, os.path.join(scratch, "questions_truncated.json"))
+        except Exception:
+            counts["faults"] += 1
+        if args.analysis_every and i % args.analysis_every == 0:
+            questions = os.path.join(scratch, f"questions_{i // args.analysis_every % len(args.papers)}.json")
+            map_questions_to_syllabus(syllabus_txt, questions, dedupe=False)
+            counts["analyses"] += 1
+
+    # Extraction prints a line per page and question; keep the report readable
+    stdout, devnull = sys.stdout, open(os.devnull, "w")
+    tracemalloc.start()
+    failed = []
+    try:
+        sys.stdout = devnull
+        for i in range(args.warmup):
+            iteration(i)
+        gc.collect()
+        baseline = (heap_mb(), rss_mb())
+        snapshot = tracemalloc.take_snapshot()
+        samples = []
+        print(f"{'iteration':>9} {'heap MB':>10} {'rss MB':>10}", file=stdout)
+        started = time.perf_counter()
+        for i in range(args.warmup, args.warmup + args.iterations):
+            iteration(i)
+            if (i - args.warmup + 1) % args.sample_every == 0:
+                gc.collect()
+                samples.append((i - args.warmup + 1, heap_mb(), rss_mb()))
+                print(f"{samples[-1][0]:>9} {samples[-1][1]:>10.2f} {samples[-1][2]:>10.1f}", file=stdout)
+        elapsed = time.perf_counter() - started
+        gc.collect()
+        final = (heap_mb(), rss_mb())
+        top = tracemalloc.take_snapshot().compare_to(snapshot, "lineno")[:10]
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+        tracemalloc.stop()
+        server.shutdown()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    heap_growth = final[0] - baseline[0]
+    rss_growth = final[1] - baseline[1]
+    print(f"{counts['extractions']} extractions, {counts['analyses']} analyses, {counts['faults']} error(s) on the truncated copy "
+          f"in {elapsed:.1f}s (after {args.warmup} warm-up iterations)")
+    print(f"heap: {baseline[0]:.2f} -> {final[0]:.2f} MB ({heap_growth:+.2f}, budget {args.heap_budget_mb:g})")
+    print(f"rss:  {baseline[1]:.1f} -> {final[1]:.1f} MB ({rss_growth:+.1f}, budget {args.rss_budget_mb:g})")
+    print(f"open documents: {open_documents()}")
+
+    if heap_growth > args.heap_budget_mb:
+        failed.append("heap growth over budget")
+    if rss_growth > args.rss_budget_mb:
+        failed.append("RSS growth over budget")
+    if open_documents():
+        failed.append(f"{open_documents()} PDF document(s) left open")
+    if failed:
+        print("Largest heap increases since the baseline:")
+        for stat in top:
+            print(f"  {stat}")
+        print(f"❌ FAILED: {', '.join(failed)}")
+        sys.exit(1)
+    print("✅ Memory stable")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import asyncio
+
+import pytest
+
+import services.admission as admission
+from services.admission import AdmissionController, AdmissionRejected
+
+
+def controller(slots=1, max_queue=10, max_wait=60.0, service_seconds=1.0, per_client=10):
+    return AdmissionController("test", slots=slots, max_queue=max_queue, max_wait=max_wait,
+                               service_seconds=service_seconds, per_client=per_client)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_free_slot_is_granted_at_once():
+    async def scenario():
+        ac = controller(slots=2)
+        first = await ac.acquire("a")
+        second = await ac.acquire("b")
+        assert ac.in_flight == 2
+        first.release()
+        second.release()
+        return ac
+
+    ac = asyncio.run(scenario())
+    assert ac.in_flight == 0 and ac.completed == 2
+
+
+def test_release_is_idempotent():
+    async def scenario():
+        ac = controller()
+        ticket = await ac.acquire("a")
+        ticket.release()
+        ticket.release()
+        return ac
+
+    ac = asyncio.run(scenario())
+    assert ac.in_flight == 0 and ac.completed == 1
+
+
+def test_slots_are_handed_out_round_robin_across_clients():
+    async def scenario():
+        ac = controller(slots=1)
+        running = await ac.acquire("a")
+        order, tickets = [], {}
+
+        async def wait(client, label):
+            tickets[label] = await ac.acquire(client)
+            order.append(label)
+
+        for client, label in (("a", "a2"), ("a", "a3"), ("b", "b1")):
+            asyncio.ensure_future(wait(client, label))
+        await settle()
+        assert ac.status()["queued"] == 3
+        running.release()
+        for _ in range(3):
+            await settle()
+            tickets[order[-1]].release()
+        return order
+
+    # a's second request waits for b's first
+    assert asyncio.run(scenario()) == ["a2", "b1", "a3"]
+
+
+def test_client_over_its_limit_gets_429():
+    async def scenario():
+        ac = controller(slots=1, per_client=2)
+        running = await ac.acquire("a")
+        queued = asyncio.ensure_future(ac.acquire("a"))
+        await settle()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await ac.acquire("a")
+        # Other clients are still admitted to the queue
+        other = asyncio.ensure_future(ac.acquire("b"))
+        await settle()
+        assert ac.status()["queued"] == 2
+        running.release()
+        (await queued).release()
+        (await other).release()
+        return rejected.value, ac
+
+    rejected, ac = asyncio.run(scenario())
+    assert rejected.status_code == 429
+    assert int(rejected.headers["Retry-After"]) >= 1
+    assert ac.throttled == 1
+
+
+def test_full_queue_gets_503():
+    async def scenario():
+        ac = controller(slots=1, max_queue=1)
+        running = await ac.acquire("a")
+        queued = asyncio.ensure_future(ac.acquire("b"))
+        await settle()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await ac.acquire("c")
+        running.release()
+        (await queued).release()
+        return rejected.value, ac
+
+    rejected, ac = asyncio.run(scenario())
+    assert rejected.status_code == 503
+    assert ac.rejected == 1
+
+
+def test_long_estimated_wait_gets_503_up_front():
+    async def scenario():
+        ac = controller(slots=1, max_wait=10, service_seconds=30)
+        running = await ac.acquire("a")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await ac.acquire("b")
+        running.release()
+        return rejected.value
+
+    rejected = asyncio.run(scenario())
+    assert rejected.status_code == 503
+    assert "Estimated wait" in rejected.detail
+    assert int(rejected.headers["Retry-After"]) >= 20
+
+
+def test_queued_request_times_out_and_leaves_the_queue():
+    async def scenario():
+        ac = controller(slots=1, max_wait=0.05, service_seconds=0.01)
+        running = await ac.acquire("a")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await ac.acquire("b")
+        status = ac.status()
+        running.release()
+        return rejected.value, status, ac
+
+    rejected, status, ac = asyncio.run(scenario())
+    assert rejected.status_code == 503
+    assert status["queued"] == 0 and status["timed_out"] == 1
+    assert ac.in_flight == 0
+
+
+def test_cancelled_waiter_never_takes_a_slot():
+    async def scenario():
+        ac = controller(slots=1)
+        running = await ac.acquire("a")
+        queued = asyncio.ensure_future(ac.acquire("b"))
+        await settle()
+        queued.cancel()
+        await settle()
+        assert ac.status()["queued"] == 0
+        running.release()
+        return ac
+
+    ac = asyncio.run(scenario())
+    assert ac.in_flight == 0 and ac.admitted == 1
+
+
+def test_service_time_follows_completed_requests():
+    async def scenario():
+        ac = controller(service_seconds=100)
+        (await ac.acquire("a")).release()
+        return ac
+
+    ac = asyncio.run(scenario())
+    # One near-instant request moves the estimate by SERVICE_TIME_ALPHA of the gap
+    assert ac.service_seconds == pytest.approx(100 * (1 - admission.SERVICE_TIME_ALPHA), abs=0.01)
+
+
+def test_disabled_admission_hands_out_empty_tickets(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", False)
+
+    ticket = asyncio.run(admission.admit("analysis", FakeRequest({}, "10.0.0.5")))
+    assert ticket.controller is None and ticket.client_id == "10.0.0.5"
+    ticket.release()
+
+
+class FakeRequest:
+    def __init__(self, headers, host):
+        self.headers = headers
+        self.client = type("Client", (), {"host": host})() if host else None
+
+
+def test_client_id_ignores_client_chosen_headers():
+    request = FakeRequest({"x-client-id": "teacher-1", "x-forwarded-for": "1.2.3.4"}, "10.0.0.5")
+    assert admission.client_id(request) == "10.0.0.5"
+    assert admission.client_id(FakeRequest({}, None)) == "anonymous"
+
+
+def test_client_id_uses_the_configured_proxy_header(monkeypatch):
+    monkeypatch.setattr(admission, "CLIENT_ADDRESS_HEADER", "x-forwarded-for")
+    # The client sent "1.2.3.4"; the proxy appended the address it saw
+    assert admission.client_id(FakeRequest({"x-forwarded-for": "1.2.3.4, 203.0.113.9"}, "10.0.0.1")) == "203.0.113.9"
+    assert admission.client_id(FakeRequest({}, "10.0.0.1")) == "10.0.0.1"
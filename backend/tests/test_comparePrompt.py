@@ -0,0 +1,132 @@
+import json
+
+import pytest
+
+import services.comparePrompt as comparePrompt
+from services.comparePrompt import NEEDS_REVIEW_TOPIC, map_question_chunk, needs_escalation
+
+TIERS = ["small", "large"]
+
+
+def question(qid, *subparts):
+    return {"id": qid, "text": f"Question {qid}", "subparts": [{"id": f"{qid}{s}", "text": s} for s in subparts]}
+
+
+def entry(qid, confidence, topics=("Algebra",)):
+    return {"question_id": qid, "topics": list(topics), "in_syllabus": True, "confidence": confidence}
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Scripted model: answers[model] maps question id -> entries; records what each tier was sent."""
+    sent = {}
+    answers = {}
+
+    def call(syllabus_text, q_chunk, model, terse=False):
+        sent.setdefault(model, []).append([q["id"] for q in q_chunk])
+        return [dict(e) for q in q_chunk for e in answers[model][q["id"]]]
+
+    monkeypatch.setattr(comparePrompt, "_call_mapping_model", call)
+    return answers, sent
+
+
+@pytest.mark.parametrize("answer, escalate", [
+    (entry("Q1", 0.9), False),
+    (entry("Q1", 0.75), False),
+    (entry("Q1", 0.5), True),
+    (entry("Q1", None), True),
+    (entry("Q1", "high"), True),
+    (entry("Q1", 0.95, topics=[NEEDS_REVIEW_TOPIC]), True),
+    ({"question_id": "Q1"}, True),
+])
+def test_needs_escalation(answer, escalate):
+    assert needs_escalation(answer, threshold=0.75) is escalate
+
+
+def test_confident_answers_stay_on_the_first_tier(model):
+    answers, sent = model
+    answers["small"] = {"Q1": [entry("Q1", 0.9)], "Q2": [entry("Q2", 0.8)]}
+    results = map_question_chunk("syllabus", [question("Q1"), question("Q2")], tiers=TIERS, threshold=0.75)
+    assert sent == {"small": [["Q1", "Q2"]]}
+    assert [(e["tier"], e["model"]) for e in results] == [(0, "small"), (0, "small")]
+
+
+def test_low_confidence_answers_are_escalated(model):
+    answers, sent = model
+    answers["small"] = {"Q1": [entry("Q1", 0.9)], "Q2": [entry("Q2", 0.4)]}
+    answers["large"] = {"Q2": [entry("Q2", 0.85, topics=["Vectors"])]}
+    results = map_question_chunk("syllabus", [question("Q1"), question("Q2")], tiers=TIERS, threshold=0.75)
+    assert sent["large"] == [["Q2"]]
+    assert [(e["question_id"], e["model"], e["topics"]) for e in results] == [
+        ("Q1", "small", ["Algebra"]),
+        ("Q2", "large", ["Vectors"]),
+    ]
+
+
+def test_flagged_subpart_escalates_its_parent_question(model):
+    answers, sent = model
+    answers["small"] = {"Q1": [entry("Q1a", 0.9), entry("Q1b", 0.9, topics=[NEEDS_REVIEW_TOPIC])],
+                        "Q2": [entry("Q2", 0.9)]}
+    answers["large"] = {"Q1": [entry("Q1a", 0.95), entry("Q1b", 0.9, topics=["Probability"])]}
+    results = map_question_chunk("syllabus", [question("Q1", "a", "b"), question("Q2")], tiers=TIERS, threshold=0.75)
+    assert sent["large"] == [["Q1"]]
+    by_id = {e["question_id"]: e for e in results}
+    # Only the escalated entry is replaced
+    assert by_id["Q1a"]["model"] == "small"
+    assert by_id["Q1b"]["model"] == "large" and by_id["Q1b"]["topics"] == ["Probability"]
+    assert by_id["Q2"]["model"] == "small"
+
+
+def test_last_tier_answer_is_kept_even_if_unsure(model):
+    answers, sent = model
+    answers["small"] = {"Q1": [entry("Q1", 0.3)]}
+    answers["large"] = {"Q1": [entry("Q1", 0.5)]}
+    results = map_question_chunk("syllabus", [question("Q1")], tiers=TIERS, threshold=0.75)
+    assert results == [{**entry("Q1", 0.5), "tier": 1, "model": "large"}]
+
+
+def test_escalated_question_missing_from_the_answer_keeps_the_first(model):
+    answers, _ = model
+    answers["small"] = {"Q1": [entry("Q1", 0.3)]}
+    answers["large"] = {"Q1": []}
+    results = map_question_chunk("syllabus", [question("Q1")], tiers=TIERS, threshold=0.75)
+    assert [(e["model"], e["confidence"]) for e in results] == [("small", 0.3)]
+
+
+def test_stale_answers_are_marked(monkeypatch):
+    content = json.dumps({"question_topic_mapping": [entry("Q1", 0.9)]})
+    monkeypatch.setattr(comparePrompt, "get_router", lambda: None)
+    monkeypatch.setattr(comparePrompt, "guarded_completion", lambda client, **kwargs: (content, True))
+    answers = comparePrompt._call_mapping_model("syllabus", [question("Q1")], "small")
+    assert answers[0]["stale"] is True
+
+
+def test_terse_and_full_runs_do_not_inherit_each_others_mappings(model, tmp_path, monkeypatch):
+    import services.questionIndex as questionIndex
+
+    monkeypatch.setattr(questionIndex, "STORE_PATH", tmp_path / "question_index.json")
+    monkeypatch.setattr(questionIndex, "_store", None)
+    monkeypatch.setattr(questionIndex, "_signatures", {})
+    monkeypatch.setattr(questionIndex, "_buckets", {})
+    answers, sent = model
+    first_tier = comparePrompt.MAPPING_MODEL_TIERS[0]
+    answers[first_tier] = {"Q1": [entry("Q1", 0.9)]}
+
+    syllabus_path = tmp_path / "syllabus.txt"
+    syllabus_path.write_text("Algebra", encoding="utf-8")
+    stem = "Solve the simultaneous equations 3x + 2y = 12 and x - y = 1, showing your working clearly."
+
+    def run(paper_id, terse):
+        questions_path = tmp_path / f"{paper_id}.json"
+        questions_path.write_text(json.dumps({"paper_id": paper_id, "questions": [
+            {"id": "Q1", "text": stem, "subparts": []}]}), encoding="utf-8")
+        return comparePrompt.map_questions_to_syllabus(str(syllabus_path), str(questions_path), terse=terse)
+
+    run("2019", terse=True)
+    full = run("2021", terse=False)
+    assert "inherited_from" not in full["question_topic_mapping"][0]
+    assert len(sent[first_tier]) == 2
+
+    again = run("2022", terse=False)
+    assert again["question_topic_mapping"][0]["inherited_from"]["paper_id"] == "2021"
+    assert len(sent[first_tier]) == 2
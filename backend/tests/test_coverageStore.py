@@ -0,0 +1,40 @@
+import pytest
+
+import services.coverageStore as coverageStore
+from services.coverageStore import record_mapping
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(coverageStore, "STORE_DIR", tmp_path / "coverage")
+    monkeypatch.setattr(coverageStore, "_frame", None)
+    monkeypatch.setattr(coverageStore, "_frame_version", None)
+
+
+def report(*topics):
+    return {"question_topic_mapping": [
+        {"question_id": f"Q{i}", "page": 1, "topics": [t], "in_syllabus": True, "confidence": 0.9}
+        for i, t in enumerate(topics, start=1)
+    ]}
+
+
+def reload():
+    coverageStore._frame = None
+    with coverageStore._lock:
+        return coverageStore._load()
+
+
+def test_paper_ids_that_sanitise_alike_keep_separate_parts():
+    record_mapping(report("Algebra"), "s1", "Syllabus", "a b.pdf")
+    record_mapping(report("Geometry", "Statistics"), "s1", "Syllabus", "a_b.pdf")
+    assert len(list(coverageStore.STORE_DIR.glob("*.parquet"))) == 2
+    assert reload().groupby("paper_id").size().to_dict() == {"a b.pdf": 1, "a_b.pdf": 2}
+
+
+def test_recording_again_replaces_the_paper_and_its_legacy_part():
+    record_mapping(report("Algebra"), "s1", "Syllabus", "p.pdf")
+    coverageStore._part_path("s1", "p.pdf").rename(coverageStore._legacy_part_path("s1", "p.pdf"))
+
+    record_mapping(report("Geometry", "Statistics"), "s1", "Syllabus", "p.pdf")
+    assert len(list(coverageStore.STORE_DIR.glob("*.parquet"))) == 1
+    assert len(reload()) == 2
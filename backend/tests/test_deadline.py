@@ -0,0 +1,96 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.deadline import (
+    CLIENT_DISCONNECTED,
+    DEADLINE_EXCEEDED,
+    REQUEST_DEADLINE_SECONDS,
+    Deadline,
+    RequestCancelled,
+    check_deadline,
+    current_deadline,
+    deadline_scope,
+    propagate,
+    request_deadline,
+)
+
+
+class FakeRequest:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+def test_deadline_without_limit_runs_until_cancelled():
+    deadline = Deadline()
+    assert deadline.remaining() is None
+    assert deadline.reason is None
+    assert deadline.timeout(120) == 120
+    deadline.cancel(CLIENT_DISCONNECTED)
+    with pytest.raises(RequestCancelled) as cancelled:
+        deadline.check()
+    assert cancelled.value.reason == CLIENT_DISCONNECTED
+
+
+def test_deadline_expires():
+    deadline = Deadline(0.01)
+    time.sleep(0.02)
+    assert deadline.reason == DEADLINE_EXCEEDED
+    with pytest.raises(RequestCancelled):
+        deadline.timeout(120)
+
+
+def test_first_cancel_reason_wins():
+    deadline = Deadline(60)
+    deadline.cancel(CLIENT_DISCONNECTED)
+    deadline.cancel("shutdown")
+    assert deadline.reason == CLIENT_DISCONNECTED
+
+
+def test_timeout_is_clipped_to_the_time_left():
+    deadline = Deadline(2)
+    assert 0 < deadline.timeout(120) <= 2
+    assert deadline.timeout(0.5) == 0.5
+
+
+def test_scope_sets_and_restores_the_current_deadline():
+    outer, inner = Deadline(60), Deadline(30)
+    assert current_deadline() is None
+    check_deadline()
+    with deadline_scope(outer):
+        with deadline_scope(inner):
+            assert current_deadline() is inner
+        assert current_deadline() is outer
+    assert current_deadline() is None
+
+
+def test_check_deadline_raises_in_a_cancelled_scope():
+    deadline = Deadline(60)
+    with deadline_scope(deadline):
+        check_deadline()
+        deadline.cancel(CLIENT_DISCONNECTED)
+        with pytest.raises(RequestCancelled):
+            check_deadline()
+
+
+def test_propagate_carries_the_deadline_into_pool_threads():
+    deadline = Deadline(60)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        with deadline_scope(deadline):
+            carried = pool.submit(propagate(current_deadline)).result()
+            plain = pool.submit(current_deadline).result()
+    assert carried is deadline
+    assert plain is None
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, REQUEST_DEADLINE_SECONDS),
+    ("30", 30.0),
+    ("0.1", 1.0),
+    (str(REQUEST_DEADLINE_SECONDS * 10), REQUEST_DEADLINE_SECONDS),
+    ("soon", REQUEST_DEADLINE_SECONDS),
+])
+def test_request_deadline_honours_a_shorter_client_timeout(header, expected):
+    headers = {"x-request-timeout": header} if header is not None else {}
+    assert request_deadline(FakeRequest(headers)).seconds == expected
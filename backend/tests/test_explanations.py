@@ -0,0 +1,46 @@
+import pytest
+
+import services.explanations as explanations
+from services.explanations import explain_mapping, save_context
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(explanations, "EXPLANATION_DIR", tmp_path / "explanations")
+
+    def no_model(*args, **kwargs):
+        raise AssertionError("model was called")
+
+    monkeypatch.setattr(explanations, "guarded_completion", no_model)
+
+
+def mapping_report(monkeypatch, entries):
+    report = {"report": {"question_topic_mapping": entries}}
+    monkeypatch.setattr(explanations, "load_report", lambda report_id: report if report_id == "r1" else None)
+    save_context("r1", {"kind": "mapping", "syllabus_sha256": "0" * 64, "questions": {"Q1": "Find x.", "Q2": "Solve."}})
+
+
+def test_full_report_reason_is_returned_without_a_model_call(monkeypatch):
+    mapping_report(monkeypatch, [
+        {"question_id": "Q1", "topics": [], "in_syllabus": False, "confidence": 0.9,
+         "out_of_scope_reason": "Calculus is not in this syllabus."},
+    ])
+    assert explain_mapping("r1", "Q1") == {
+        "question_id": "Q1", "explanation": "Calculus is not in this syllabus.", "cached": True,
+    }
+
+
+def test_stored_explanation_is_reused(monkeypatch):
+    mapping_report(monkeypatch, [{"question_id": "Q2", "topics": ["Algebra"], "in_syllabus": True, "confidence": 0.9}])
+    store = explanations._load("r1")
+    store["explanations"]["Q2"] = {"text": "Linear equation.", "model": "m", "generated_at": "t"}
+    explanations._save("r1", store)
+    assert explain_mapping("r1", "Q2")["cached"] is True
+
+
+def test_unknown_question_and_report(monkeypatch):
+    mapping_report(monkeypatch, [])
+    with pytest.raises(LookupError):
+        explain_mapping("r1", "Q9")
+    with pytest.raises(LookupError):
+        explain_mapping("missing", "Q1")
@@ -0,0 +1,334 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import services.failsafe as failsafe
+from services.deadline import CLIENT_DISCONNECTED, Deadline, RequestCancelled, deadline_scope
+from services.failsafe import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, guarded_completion
+
+
+class StatusError(Exception):
+    """An error the upstream answered with, as the SDK raises it."""
+
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def fake_client(create):
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def answer(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def failing(error):
+    def create(**kwargs):
+        raise error
+    return create
+
+
+MESSAGES = [{"role": "user", "content": "Map Q1"}]
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(failsafe, "FAILSAFE_DIR", tmp_path / "failsafe")
+    monkeypatch.setattr(failsafe, "_breakers", {})
+
+
+def open_breaker(open_seconds=0.0):
+    cb = failsafe.get_breaker("t")
+    cb.failure_threshold = 1
+    cb.open_seconds = open_seconds
+    cb.record_failure("boom")
+    assert cb.state == OPEN
+    return cb
+
+
+# --- breaker state machine ---
+
+def test_opens_after_consecutive_failures():
+    cb = CircuitBreaker("t", failure_threshold=2, open_seconds=60)
+    cb.record_failure("a")
+    assert cb.state == CLOSED and cb.allow()
+    cb.record_failure("b")
+    assert cb.state == OPEN
+    assert not cb.allow()
+    assert cb.status()["retry_in_seconds"] > 0
+
+
+def test_success_resets_the_failure_count():
+    cb = CircuitBreaker("t", failure_threshold=2)
+    cb.record_failure("a")
+    cb.record_success(0.1)
+    cb.record_failure("b")
+    assert cb.state == CLOSED
+
+
+def test_slow_call_counts_as_failure():
+    cb = CircuitBreaker("t", failure_threshold=1, slow_call_seconds=1.0)
+    cb.record_success(2.0)
+    assert cb.state == OPEN
+    assert "slow call" in cb.last_error
+
+
+def test_half_open_lets_one_probe_through():
+    cb = CircuitBreaker("t", failure_threshold=1, open_seconds=0.05)
+    cb.record_failure("a")
+    assert not cb.allow()
+    time.sleep(0.06)
+    assert cb.allow()
+    assert cb.state == HALF_OPEN
+    # Only one probe at a time
+    assert not cb.allow()
+
+
+def test_half_open_probe_success_closes():
+    cb = CircuitBreaker("t", failure_threshold=3, open_seconds=0.0)
+    for _ in range(3):
+        cb.record_failure("a")
+    assert cb.allow()
+    cb.record_success(0.1)
+    assert cb.state == CLOSED
+    assert cb.failures == 0 and not cb.probe_in_flight
+
+
+def test_half_open_probe_failure_reopens_at_once():
+    cb = CircuitBreaker("t", failure_threshold=3, open_seconds=0.0)
+    for _ in range(3):
+        cb.record_failure("a")
+    assert cb.allow()
+    cb.record_failure("still down")
+    assert cb.state == OPEN
+    assert not cb.probe_in_flight
+
+
+def test_release_probe_frees_the_probe():
+    cb = CircuitBreaker("t", failure_threshold=1, open_seconds=0.0)
+    cb.record_failure("a")
+    assert cb.allow()
+    cb.release_probe()
+    assert cb.state == HALF_OPEN
+    assert cb.allow()
+
+
+def test_release_probe_ignores_other_threads():
+    cb = CircuitBreaker("t", failure_threshold=1, open_seconds=0.0)
+    cb.record_failure("a")
+    assert cb.allow()
+    other = threading.Thread(target=cb.release_probe)
+    other.start()
+    other.join()
+    assert cb.probe_in_flight
+    assert not cb.allow()
+
+
+def test_release_probe_is_a_no_op_when_closed():
+    cb = CircuitBreaker("t")
+    cb.release_probe()
+    assert cb.state == CLOSED and not cb.probe_in_flight
+
+
+def test_concurrent_get_breaker_creates_one_breaker(monkeypatch):
+    created = []
+
+    class SlowBreaker(CircuitBreaker):
+        def __init__(self, name):
+            time.sleep(0.01)  # widen the window between lookup and insert
+            super().__init__(name)
+            created.append(self)
+
+    monkeypatch.setattr(failsafe, "CircuitBreaker", SlowBreaker)
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(failsafe.get_breaker("llm:a"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(created) == 1
+    assert all(b is created[0] for b in got)
+
+
+# --- error classification ---
+
+@pytest.mark.parametrize("status", [408, 429, 500, 502, 503, 529])
+def test_upstream_statuses_are_failures(status):
+    assert failsafe.is_upstream_failure(StatusError(status))
+
+
+@pytest.mark.parametrize("status", [400, 401, 403, 404, 422])
+def test_rejected_requests_are_not_failures(status):
+    assert not failsafe.is_upstream_failure(StatusError(status))
+
+
+@pytest.mark.parametrize("error", [TimeoutError("read"), ConnectionError("reset")])
+def test_transport_errors_are_failures(error):
+    assert failsafe.is_upstream_failure(error)
+
+
+@pytest.mark.parametrize("error", [ValueError("bad json"), KeyError("choices"), TypeError("bad argument")])
+def test_caller_errors_are_not_failures(error):
+    assert not failsafe.is_upstream_failure(error)
+
+
+def test_httpx_transport_errors_are_failures():
+    httpx = pytest.importorskip("httpx")
+    assert failsafe.is_upstream_failure(httpx.ConnectError("refused"))
+    assert failsafe.is_upstream_failure(httpx.ReadTimeout("slow"))
+
+
+def test_record_error_on_rejected_request_closes_a_half_open_breaker():
+    cb = CircuitBreaker("t", failure_threshold=1, open_seconds=0.0)
+    cb.record_failure("a")
+    assert cb.allow()
+    # A 400 proves the upstream answers
+    cb.record_error(StatusError(400), 0.1)
+    assert cb.state == CLOSED
+
+
+def test_record_error_without_a_verdict_releases_the_probe():
+    cb = CircuitBreaker("t", failure_threshold=1, open_seconds=0.0)
+    cb.record_failure("a")
+    assert cb.allow()
+    cb.record_error(TypeError("unexpected keyword"), 0.0)
+    assert cb.state == HALF_OPEN
+    assert cb.failures == 1
+    assert cb.allow()
+
+
+# --- guarded_completion ---
+
+def test_success_stores_the_answer():
+    content, stale = guarded_completion(fake_client(lambda **kw: answer("fresh")), breaker="t",
+                                        model="m", messages=MESSAGES)
+    assert (content, stale) == ("fresh", False)
+    stored = failsafe.load_last_good(failsafe.input_hash(MESSAGES))
+    assert stored["content"] == "fresh" and stored["model"] == "m"
+
+
+def test_upstream_failure_serves_the_stored_answer():
+    guarded_completion(fake_client(lambda **kw: answer("earlier")), breaker="t", model="m", messages=MESSAGES)
+    content, stale = guarded_completion(fake_client(failing(StatusError(503))), breaker="t",
+                                        model="m", messages=MESSAGES)
+    assert (content, stale) == ("earlier", True)
+    assert failsafe.get_breaker("t").failures == 1
+
+
+def test_upstream_failure_without_stored_answer_raises():
+    with pytest.raises(StatusError):
+        guarded_completion(fake_client(failing(StatusError(500))), breaker="t", model="m", messages=MESSAGES)
+
+
+def test_rejected_request_is_raised_and_not_counted():
+    guarded_completion(fake_client(lambda **kw: answer("earlier")), breaker="t", model="m", messages=MESSAGES)
+    for _ in range(failsafe.FAILURE_THRESHOLD + 1):
+        with pytest.raises(StatusError):
+            guarded_completion(fake_client(failing(StatusError(400))), breaker="t", model="m", messages=MESSAGES)
+    cb = failsafe.get_breaker("t")
+    assert cb.state == CLOSED and cb.failures == 0
+
+
+def test_open_breaker_serves_stale_or_fails_fast():
+    guarded_completion(fake_client(lambda **kw: answer("earlier")), breaker="t", model="m", messages=MESSAGES)
+    open_breaker(open_seconds=60)
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        return answer("never")
+
+    assert guarded_completion(fake_client(create), breaker="t", model="m", messages=MESSAGES) == ("earlier", True)
+    with pytest.raises(CircuitOpenError):
+        guarded_completion(fake_client(create), breaker="t", model="m", messages=[{"role": "user", "content": "new"}])
+    assert calls == []
+
+
+def test_half_open_probe_success_through_guarded_completion():
+    cb = open_breaker()
+    assert guarded_completion(fake_client(lambda **kw: answer("back")), breaker="t",
+                              model="m", messages=MESSAGES) == ("back", False)
+    assert cb.state == CLOSED
+
+
+def test_cancelled_probe_is_released():
+    cb = open_breaker()
+    deadline = Deadline(60)
+
+    def create(**kwargs):
+        # The client disconnects while the probe is on the wire
+        deadline.cancel(CLIENT_DISCONNECTED)
+        raise TimeoutError("read timed out")
+
+    with deadline_scope(deadline), pytest.raises(RequestCancelled) as cancelled:
+        guarded_completion(fake_client(create), breaker="t", model="m", messages=MESSAGES)
+    assert cancelled.value.reason == CLIENT_DISCONNECTED
+    # Not held against the upstream, and the next call may probe
+    assert cb.state == HALF_OPEN
+    assert cb.failures == 1
+    assert not cb.probe_in_flight
+    assert cb.allow()
+
+
+def test_cancelled_call_is_not_answered_from_the_store():
+    guarded_completion(fake_client(lambda **kw: answer("earlier")), breaker="t", model="m", messages=MESSAGES)
+    deadline = Deadline(60)
+
+    def create(**kwargs):
+        deadline.cancel(CLIENT_DISCONNECTED)
+        raise StatusError(503)
+
+    with deadline_scope(deadline), pytest.raises(RequestCancelled):
+        guarded_completion(fake_client(create), breaker="t", model="m", messages=MESSAGES)
+    assert failsafe.get_breaker("t").failures == 0
+
+
+def test_expired_deadline_takes_no_probe():
+    cb = open_breaker()
+    deadline = Deadline(60)
+    deadline.cancel(CLIENT_DISCONNECTED)
+    with deadline_scope(deadline), pytest.raises(RequestCancelled):
+        guarded_completion(fake_client(lambda **kw: answer("never")), breaker="t", model="m", messages=MESSAGES)
+    assert not cb.probe_in_flight
+    assert cb.allow()
+
+
+def test_timeout_is_clipped_to_the_deadline():
+    seen = {}
+
+    def create(**kwargs):
+        seen.update(kwargs)
+        return answer("ok")
+
+    with deadline_scope(Deadline(5)):
+        guarded_completion(fake_client(create), breaker="t", model="m", messages=MESSAGES, timeout=120)
+    assert 0 < seen["timeout"] <= 5
+
+
+# --- store ---
+
+def test_entries_are_stored_one_file_per_key():
+    failsafe.save_last_good("a" * 64, "first", "m")
+    failsafe.save_last_good("b" * 64, "second", "m")
+    failsafe.save_last_good("a" * 64, "replaced", "m")
+    assert sorted(p.name for p in failsafe.FAILSAFE_DIR.iterdir()) == ["a" * 64 + ".json", "b" * 64 + ".json"]
+    assert failsafe.load_last_good("a" * 64)["content"] == "replaced"
+    assert failsafe.load_last_good("c" * 64) is None
+
+
+def test_unreadable_entry_is_ignored():
+    failsafe.save_last_good("a" * 64, "first", "m")
+    (failsafe.FAILSAFE_DIR / ("a" * 64 + ".json")).write_text("{trunc", encoding="utf-8")
+    assert failsafe.load_last_good("a" * 64) is None
+
+
+def test_store_is_pruned_to_max_entries(monkeypatch):
+    monkeypatch.setattr(failsafe, "MAX_ENTRIES", 3)
+    monkeypatch.setattr(failsafe, "PRUNE_EVERY", 5)
+    monkeypatch.setattr(failsafe, "_saves", 0)
+    for i in range(5):
+        failsafe.save_last_good(f"{i:064d}", str(i), "m")
+    assert len(list(failsafe.FAILSAFE_DIR.glob("*.json"))) == 3
@@ -0,0 +1,268 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import services.failsafe as failsafe
+import services.llmRouter as llmRouter
+from services.deadline import CLIENT_DISCONNECTED, Deadline, RequestCancelled, deadline_scope
+from services.failsafe import guarded_completion, input_hash, is_upstream_failure, save_last_good
+from services.llmRouter import Backend, BackendsUnavailableError, LatencyStats, LLMRouter, NoBackendError
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FakeClient:
+    """chat.completions.create() that answers with the backend's name, after `delay` or on `release`."""
+
+    def __init__(self, name, error=None, delay=0.0, release=None):
+        self.name = name
+        self.error = error
+        self.delay = delay
+        self.release = release
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.release is not None:
+            self.release.wait(5)
+        elif self.delay:
+            time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(backend=self.name, model=kwargs["model"])
+
+
+def backend(name, models=None, **client):
+    b = Backend({"name": name, **({"models": models} if models is not None else {})})
+    b._client = FakeClient(name, **client)
+    return b
+
+
+def measured(b, model, *latencies):
+    stats = b.stats.setdefault(model, LatencyStats())
+    for seconds in latencies:
+        stats.record(seconds)
+    return b
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    monkeypatch.setattr(failsafe, "_breakers", {})
+    monkeypatch.setattr(llmRouter, "LLM_EXPLORE_RATE", 0.0)
+    monkeypatch.setattr(llmRouter, "LLM_HEDGE", False)
+
+
+@pytest.fixture
+def routers():
+    made = []
+
+    def make(*backends):
+        router = LLMRouter(list(backends))
+        made.append(router)
+        return router
+
+    yield make
+    for router in made:
+        router.close()
+
+
+# --- latency and model names ---
+
+def test_latency_ewma_and_quantile():
+    stats = LatencyStats()
+    assert stats.ewma is None and stats.quantile(0.95) is None
+    stats.record(1.0)
+    assert stats.ewma == 1.0
+    stats.record(2.0)
+    assert stats.ewma == pytest.approx(1.0 + llmRouter.LATENCY_ALPHA)
+    for _ in range(18):
+        stats.record(1.0)
+    assert stats.quantile(0.95) == 2.0
+    assert stats.quantile(0.5) == 1.0
+
+
+def test_served_model_names():
+    assert backend("a").served_model("gpt-4o-mini") == "gpt-4o-mini"
+    local = backend("b", models={"gpt-4o-mini": "qwen2.5-7b-instruct"})
+    assert local.served_model("gpt-4o-mini") == "qwen2.5-7b-instruct"
+    assert local.served_model("gpt-4o") is None
+    assert backend("c", models={"*": "llama"}).served_model("gpt-4o") == "llama"
+
+
+def test_call_uses_the_served_model_name(routers):
+    local = backend("local", models={"m": "served-m"})
+    assert routers(local).create(model="m", messages=[]).model == "served-m"
+
+
+def test_backend_records_latency_and_errors():
+    b = backend("a")
+    b.complete(model="m", messages=[])
+    assert b.stats["m"].calls == 1 and b.stats["m"].ewma is not None
+    b._client.error = StatusError(400)
+    with pytest.raises(StatusError):
+        b.complete(model="m", messages=[])
+    assert b.stats["m"].errors == 1
+    assert b.in_flight == 0
+    # A rejected request says nothing bad about the backend
+    assert b.breaker.state == failsafe.CLOSED and b.breaker.failures == 0
+
+
+# --- ranking ---
+
+def test_unmeasured_backends_are_tried_first_then_the_fastest(routers):
+    slow = measured(backend("slow"), "m", 2.0)
+    fast = measured(backend("fast"), "m", 0.5)
+    new = backend("new")
+    only_other = backend("other", models={"x": "x"})
+    router = routers(slow, fast, new, only_other)
+    assert [b.name for b in router.ranked("m")] == ["new", "fast", "slow"]
+
+
+def test_exploration_sometimes_promotes_another_backend(routers, monkeypatch):
+    monkeypatch.setattr(llmRouter, "LLM_EXPLORE_RATE", 1.0)
+    router = routers(measured(backend("fast"), "m", 0.1), measured(backend("slow"), "m", 5.0))
+    assert router.ranked("m")[0].name == "slow"
+
+
+def test_unserved_model_raises(routers):
+    with pytest.raises(NoBackendError):
+        routers(backend("a", models={"x": "x"})).create(model="m", messages=[])
+
+
+# --- failover ---
+
+def test_upstream_failure_fails_over(routers):
+    down = measured(backend("down", error=StatusError(503)), "m", 0.1)
+    up = measured(backend("up"), "m", 0.2)
+    router = routers(down, up)
+    assert router.create(model="m", messages=[]).backend == "up"
+    assert router.counts["failovers"] == 1
+    assert down.breaker.failures == 1
+
+
+def test_rejected_request_does_not_fail_over(routers):
+    bad = measured(backend("a", error=StatusError(400)), "m", 0.1)
+    other = measured(backend("b"), "m", 0.2)
+    router = routers(bad, other)
+    with pytest.raises(StatusError):
+        router.create(model="m", messages=[])
+    assert other._client.calls == []
+
+
+def test_every_backend_failing_raises_the_last_error(routers):
+    router = routers(measured(backend("a", error=StatusError(502)), "m", 0.1),
+                     measured(backend("b", error=TimeoutError("read")), "m", 0.2))
+    with pytest.raises(TimeoutError):
+        router.create(model="m", messages=[])
+
+
+def test_backend_with_open_circuit_is_skipped(routers):
+    tripped = measured(backend("tripped"), "m", 0.1)
+    tripped.breaker.open_seconds = 60
+    for _ in range(tripped.breaker.failure_threshold):
+        tripped.breaker.record_failure("down")
+    router = routers(tripped, measured(backend("ok"), "m", 0.2))
+    assert router.create(model="m", messages=[]).backend == "ok"
+    assert tripped._client.calls == []
+
+
+def test_all_circuits_open_raises(routers):
+    backends = [backend("a"), backend("b")]
+    for b in backends:
+        b.breaker.open_seconds = 60
+        for _ in range(b.breaker.failure_threshold):
+            b.breaker.record_failure("down")
+    with pytest.raises(NoBackendError):
+        routers(*backends).create(model="m", messages=[])
+
+
+def trip(b):
+    b.breaker.open_seconds = 60
+    for _ in range(b.breaker.failure_threshold):
+        b.breaker.record_failure("down")
+    return b
+
+
+def test_single_backend_with_open_circuit_is_not_called(routers):
+    only = trip(backend("only"))
+    with pytest.raises(BackendsUnavailableError):
+        routers(only).create(model="m", messages=[])
+    assert only._client.calls == []
+
+
+def test_all_circuits_open_is_an_upstream_failure_but_no_backend_is_not():
+    assert is_upstream_failure(BackendsUnavailableError("circuits open"))
+    assert not is_upstream_failure(NoBackendError("no backend serves 'm'"))
+
+
+def test_all_circuits_open_serves_the_last_good_answer(routers, tmp_path, monkeypatch):
+    monkeypatch.setattr(failsafe, "FAILSAFE_DIR", tmp_path / "failsafe")
+    messages = [{"role": "user", "content": "Map Q1"}]
+    save_last_good(input_hash(messages), "stored answer", "m")
+    router = routers(trip(backend("a")), trip(backend("b")))
+    assert guarded_completion(router, model="m", messages=messages) == ("stored answer", True)
+
+
+# --- hedging and cancellation ---
+
+def test_slow_primary_is_hedged(routers, monkeypatch):
+    monkeypatch.setattr(llmRouter, "LLM_HEDGE", True)
+    monkeypatch.setattr(llmRouter, "LLM_HEDGE_MAX_RATE", 1.0)
+    monkeypatch.setattr(llmRouter, "LLM_HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(llmRouter, "LLM_HEDGE_MIN_DELAY", 0.01)
+    stuck = threading.Event()
+    primary = measured(backend("primary", release=stuck), "m", *[0.01] * 5)
+    spare = measured(backend("spare"), "m", 0.05)
+    router = routers(primary, spare)
+    try:
+        assert router.create(model="m", messages=[]).backend == "spare"
+    finally:
+        stuck.set()
+    assert router.counts["hedged"] == 1 and router.counts["hedge_wins"] == 1
+
+
+def test_no_hedge_before_enough_samples(routers, monkeypatch):
+    monkeypatch.setattr(llmRouter, "LLM_HEDGE", True)
+    monkeypatch.setattr(llmRouter, "LLM_HEDGE_MAX_RATE", 1.0)
+    primary = measured(backend("primary", delay=0.05), "m", 0.01)
+    spare = measured(backend("spare"), "m", 0.05)
+    router = routers(primary, spare)
+    assert router.create(model="m", messages=[]).backend == "primary"
+    assert spare._client.calls == []
+
+
+def test_cancelled_request_stops_waiting(routers):
+    stuck = threading.Event()
+    router = routers(measured(backend("a", release=stuck), "m", 0.1), measured(backend("b"), "m", 0.2))
+    deadline = Deadline(60)
+    timer = threading.Timer(0.1, deadline.cancel, args=(CLIENT_DISCONNECTED,))
+    timer.start()
+    started = time.monotonic()
+    try:
+        with deadline_scope(deadline), pytest.raises(RequestCancelled):
+            router.create(model="m", messages=[])
+    finally:
+        stuck.set()
+        timer.cancel()
+    assert time.monotonic() - started < 0.1 + 2 * llmRouter.CANCEL_POLL_SECONDS
+
+
+# --- configuration ---
+
+def test_backend_specs_default_to_the_shared_client(monkeypatch):
+    monkeypatch.setattr(llmRouter, "LLM_BACKENDS", "")
+    assert llmRouter.backend_specs() == [{"name": "openai"}]
+
+
+@pytest.mark.parametrize("specs", ['[]', '[{"base_url": "x"}]', '[{"name": "a"}, {"name": "a"}]'])
+def test_backend_specs_need_unique_names(monkeypatch, specs):
+    monkeypatch.setattr(llmRouter, "LLM_BACKENDS", specs)
+    with pytest.raises(ValueError):
+        llmRouter.backend_specs()
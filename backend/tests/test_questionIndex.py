@@ -0,0 +1,193 @@
+import pytest
+
+import services.questionIndex as questionIndex
+from services.questionIndex import (
+    duplicate_clusters,
+    find_duplicates,
+    index_questions,
+    inherited_mapping,
+    minhash_signature,
+    normalize_question,
+    record_question_mappings,
+    record_syllabi_mappings,
+    similarity,
+    split_inherited,
+)
+
+STEM = "The diagram shows a triangle ABC with AB = 7 cm, BC = 9 cm and angle ABC = 48 degrees. Calculate the area of the triangle."
+REWORDED = "The diagram shows triangle ABC where AB = 7 cm, BC = 9 cm and angle ABC = 48 degrees. Calculate the area of triangle ABC."
+OTHER = "Solve the simultaneous equations 3x + 2y = 12 and x - y = 1, showing your working clearly."
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(questionIndex, "STORE_PATH", tmp_path / "question_index.json")
+    monkeypatch.setattr(questionIndex, "_store", None)
+    monkeypatch.setattr(questionIndex, "_signatures", {})
+    monkeypatch.setattr(questionIndex, "_buckets", {})
+
+
+def paper(paper_id, *questions):
+    return {"paper_id": paper_id, "questions": list(questions)}
+
+
+def question(qid, text, *subparts):
+    return {"id": qid, "text": text, "subparts": [{"id": f"{qid}{s}", "text": f"Part {s}."} for s in subparts]}
+
+
+def entry(qid, topics, **extra):
+    return {"question_id": qid, "topics": topics, "in_syllabus": True, "confidence": 0.9, **extra}
+
+
+# --- fingerprints ---
+
+def test_normalize_question():
+    assert normalize_question("  Find  x, given:\n x^2 = 4! ") == "find x given x 2 4"
+
+
+def test_similarity_of_near_duplicates():
+    assert similarity(minhash_signature(STEM), minhash_signature(STEM)) == 1.0
+    assert similarity(minhash_signature(STEM), minhash_signature(STEM.upper() + "  ")) == 1.0
+    assert similarity(minhash_signature(STEM), minhash_signature(REWORDED)) >= 0.6
+    assert similarity(minhash_signature(STEM), minhash_signature(OTHER)) < 0.2
+
+
+def test_short_and_empty_text_has_a_signature():
+    assert minhash_signature("").shape == (questionIndex.NUM_PERM,)
+    assert minhash_signature("x = 1").shape == (questionIndex.NUM_PERM,)
+
+
+# --- lookups ---
+
+def test_find_duplicates_across_papers():
+    index_questions(paper("2019", question("Q3", STEM), question("Q4", OTHER)))
+    matches = find_duplicates(question("Q7", STEM), "2021")
+    assert [(m["paper_id"], m["question_id"]) for m in matches] == [("2019", "Q3")]
+    assert matches[0]["similarity"] == 1.0
+
+
+def test_a_question_is_not_its_own_duplicate():
+    index_questions(paper("2019", question("Q3", STEM)))
+    assert find_duplicates(question("Q3", STEM), "2019") == []
+
+
+def test_index_is_reloaded_from_disk(monkeypatch):
+    index_questions(paper("2019", question("Q3", STEM)))
+    monkeypatch.setattr(questionIndex, "_store", None)
+    monkeypatch.setattr(questionIndex, "_signatures", {})
+    monkeypatch.setattr(questionIndex, "_buckets", {})
+    assert [m["question_id"] for m in find_duplicates(question("Q7", STEM), "2021")] == ["Q3"]
+
+
+def test_reindexing_replaces_a_questions_buckets():
+    index_questions(paper("2019", question("Q3", STEM)))
+    index_questions(paper("2019", question("Q3", OTHER)))
+    assert find_duplicates(question("Q7", STEM), "2021") == []
+    assert [m["question_id"] for m in find_duplicates(question("Q7", OTHER), "2021")] == ["Q3"]
+
+
+# --- mapping reuse ---
+
+def test_inherited_mapping_is_relabelled():
+    source = question("Q3", STEM, "a", "b")
+    index_questions(paper("2019", source))
+    record_question_mappings("2019", [source], "s1", "v1", [entry("Q3a", ["Trigonometry"]), entry("Q3b", ["Mensuration"])])
+
+    inherited = inherited_mapping(question("Q7", STEM, "a", "b"), "2021", "s1", "v1")
+    assert [e["question_id"] for e in inherited] == ["Q7a", "Q7b"]
+    assert [e["topics"] for e in inherited] == [["Trigonometry"], ["Mensuration"]]
+    assert inherited[0]["inherited_from"] == {"paper_id": "2019", "question_id": "Q3a", "similarity": 1.0}
+
+
+def test_mappings_are_per_syllabus_and_prompt_version():
+    source = question("Q3", STEM)
+    index_questions(paper("2019", source))
+    record_question_mappings("2019", [source], "s1", "v1", [entry("Q3", ["Trigonometry"])])
+    assert inherited_mapping(question("Q7", STEM), "2021", "s2", "v1") is None
+    assert inherited_mapping(question("Q7", STEM), "2021", "s1", "v2") is None
+
+
+def test_inherited_and_stale_entries_are_not_stored():
+    source = question("Q3", STEM)
+    index_questions(paper("2019", source))
+    stored = record_question_mappings("2019", [source], "s1", "v1", [
+        entry("Q3", ["Trigonometry"], stale=True),
+        entry("Q3", ["Trigonometry"], inherited_from={"paper_id": "2018", "question_id": "Q1", "similarity": 1.0}),
+    ])
+    assert stored == 0
+    assert inherited_mapping(question("Q7", STEM), "2021", "s1", "v1") is None
+
+
+def test_same_filename_for_a_different_paper_drops_old_mappings():
+    circle = "Calculate the area of a circle of radius 7 cm, giving your answer correct to 3 significant figures."
+    index_questions(paper("exam.pdf", question("Q3", circle)))
+    record_question_mappings("exam.pdf", [question("Q3", circle)], "s1", "v1", [entry("Q3", ["Mensuration"])])
+
+    # A different paper uploaded under the same name
+    index_questions(paper("exam.pdf", question("Q3", OTHER)))
+    assert inherited_mapping(question("Q7", OTHER), "2021", "s1", "v1") is None
+
+
+def test_reindexing_an_unchanged_paper_keeps_mappings_without_writing(monkeypatch):
+    source = question("Q3", STEM)
+    index_questions(paper("2019", source))
+    record_question_mappings("2019", [source], "s1", "v1", [entry("Q3", ["Trigonometry"])])
+
+    writes = []
+    monkeypatch.setattr(questionIndex, "_save", writes.append)
+    index_questions(paper("2019", source))
+    assert writes == []
+    assert [e["topics"] for e in inherited_mapping(question("Q7", STEM), "2021", "s1", "v1")] == [["Trigonometry"]]
+
+
+def test_mappings_for_several_syllabi_are_written_once(monkeypatch):
+    source = question("Q3", STEM)
+    index_questions(paper("2019", source))
+
+    writes = []
+    monkeypatch.setattr(questionIndex, "_save", writes.append)
+    stored = record_syllabi_mappings("2019", [source], "v1", {
+        "s1": [entry("Q3", ["Trigonometry"])],
+        "s2": [entry("Q3", ["Mensuration"])],
+    })
+    assert stored == 2
+    assert len(writes) == 1
+    assert inherited_mapping(question("Q7", STEM), "2021", "s2", "v1")[0]["topics"] == ["Mensuration"]
+
+
+def test_split_inherited_sends_the_rest_to_the_model():
+    source = question("Q3", STEM)
+    index_questions(paper("2019", source))
+    record_question_mappings("2019", [source], "s1", "v1", [entry("Q3", ["Trigonometry"])])
+
+    new = [question("Q1", OTHER), question("Q2", STEM)]
+    inherited, remaining = split_inherited(new, "2021", "s1", "v1")
+    assert [e["question_id"] for e in inherited] == ["Q2"]
+    assert [q["id"] for q in remaining] == ["Q1"]
+
+
+def test_repeated_question_ids_always_go_to_the_model():
+    source = question("Q3", STEM)
+    index_questions(paper("2019", source))
+    record_question_mappings("2019", [source], "s1", "v1", [entry("Q3", ["Trigonometry"])])
+
+    # Two papers in one file: both restart at Q1
+    new = [question("Q1", STEM), question("Q1", OTHER)]
+    inherited, remaining = split_inherited(new, "2021", "s1", "v1")
+    assert inherited == []
+    assert len(remaining) == 2
+    assert record_question_mappings("2021", new, "s1", "v1", [entry("Q1", ["Trigonometry"])]) == 0
+
+
+# --- curation ---
+
+def test_duplicate_clusters():
+    index_questions(paper("2019", question("Q3", STEM), question("Q4", OTHER)))
+    index_questions(paper("2021", question("Q7", STEM)))
+    index_questions(paper("2022", question("Q2", STEM)))
+
+    clusters = duplicate_clusters()
+    assert len(clusters) == 1
+    assert clusters[0]["size"] == 3
+    assert duplicate_clusters(paper_id="2021")[0]["size"] == 3
+    assert duplicate_clusters(min_size=4) == []
@@ -0,0 +1,155 @@
+import pytest
+
+import services.searchIndex as searchIndex
+from services.comparePrompt import NEEDS_REVIEW_TOPIC
+from services.searchIndex import match_expression, search
+
+HOSTILE = [
+    '"unterminated quote',
+    "^x",
+    "x^2 + 3x",
+    "f(x) = (x - 1)(x + 2)",
+    "NEAR(fraction simplest, 2)",
+    "fraction AND OR NOT",
+    "NOT",
+    "text: fraction",
+    "topics:algebra",
+    "{text topics}: fraction",
+    "fraction -simplest",
+    "'; DROP TABLE mappings; --",
+    "fraction\x00simplest",
+    "分数 fraction",
+    "fraction " * 200,
+]
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(searchIndex, "DB_PATH", tmp_path / "search.db")
+    monkeypatch.setattr(searchIndex, "_ready", False)
+
+
+def row(qid, topics, confidence=0.9, in_syllabus=True, reason="", page=3):
+    return {"question_id": qid, "page": page, "topics": topics, "confidence": confidence,
+            "in_syllabus": in_syllabus, "out_of_scope_reason": reason}
+
+
+@pytest.fixture
+def recorded():
+    texts = {
+        "Q1": "Express the fraction in its simplest form.",
+        "Q2": "Solve the simultaneous equations 2x + y = 7 and x - y = 2.",
+        "Q3": "Find f(x) when x^2 - 4 = 0, and state NOT more than two roots.",
+        "Q4": "Sketch the graph.",
+    }
+    report = {"question_topic_mapping": [
+        row("Q1", ["Algebraic Fractions"], 0.95),
+        row("Q2", ["Simultaneous Equations"], 0.8),
+        row("Q3", ["Quadratic Equations"], 0.5, in_syllabus=False, reason="Uses the quadratic formula."),
+        row("Q4", [NEEDS_REVIEW_TOPIC], 0.3),
+    ]}
+    assert searchIndex.record_paper("p1", texts, report, "s1", "2020 syllabus") == 4
+    return texts
+
+
+def ids(found):
+    return [r["question_id"] for r in found["results"]]
+
+
+# --- match_expression ---
+
+def test_words_are_quoted_and_the_last_is_a_prefix():
+    assert match_expression("Fraction simpl") == '"fraction" "simpl"*'
+
+
+@pytest.mark.parametrize("keywords", HOSTILE)
+def test_hostile_input_becomes_quoted_words(keywords):
+    expression = match_expression(keywords)
+    assert expression is not None
+    for term in expression.split(" "):
+        word = term.rstrip("*")
+        assert word.startswith('"') and word.endswith('"')
+        assert '"' not in word[1:-1]
+
+
+@pytest.mark.parametrize("keywords", ["", "   ", '"', "*", "!!!", '"" ()*^-', "—…"])
+def test_input_without_words_matches_nothing(keywords):
+    assert match_expression(keywords) is None
+
+
+def test_fts_keywords_are_searched_as_plain_words():
+    assert match_expression("NEAR OR") == '"near" "or"*'
+
+
+# --- search ---
+
+@pytest.mark.parametrize("keywords", HOSTILE)
+def test_hostile_keywords_never_break_the_query(recorded, keywords):
+    found = search(keywords=keywords)
+    assert found["total"] == len(found["results"])
+
+
+@pytest.mark.parametrize("keywords", ['"', "*", "()*^"])
+def test_punctuation_only_keywords_return_no_results(recorded, keywords):
+    assert search(keywords=keywords)["total"] == 0
+
+
+def test_quoted_syntax_matches_the_words(recorded):
+    assert ids(search(keywords='"fraction simplest')) == ["Q1"]
+    assert ids(search(keywords="f(x)")) == ["Q3"]
+    # NOT is a word of the text here, not an operator
+    assert ids(search(keywords="NOT more")) == ["Q3"]
+
+
+def test_prefix_search_as_you_type(recorded):
+    assert ids(search(keywords="simul")) == ["Q2"]
+
+
+def test_keywords_match_topics_and_reasons(recorded):
+    assert ids(search(keywords="quadratic formula")) == ["Q3"]
+    assert ids(search(keywords="algebraic")) == ["Q1"]
+
+
+def test_filters(recorded):
+    assert ids(search(topic="algebraic fractions")) == ["Q1"]
+    assert ids(search(in_syllabus=False)) == ["Q3"]
+    assert ids(search(needs_review=True)) == ["Q4"]
+    assert ids(search(min_confidence=0.5, max_confidence=0.8, sort="confidence")) == ["Q2", "Q3"]
+    assert search(syllabus_id="other")["total"] == 0
+
+
+def test_hostile_filter_values_are_parameters(recorded):
+    assert search(topic="' OR 1=1 --")["total"] == 0
+    assert search(paper_ids=["p1' OR '1'='1"])["total"] == 0
+    assert search(syllabus_id="s1; DROP TABLE mappings")["total"] == 0
+    assert search()["total"] == 4
+
+
+def test_unknown_sort_is_rejected(recorded):
+    with pytest.raises(ValueError):
+        search(sort="id; DROP TABLE mappings")
+
+
+def test_paging_is_bounded(recorded):
+    found = search(limit=10_000, offset=-5)
+    assert found["limit"] == searchIndex.MAX_PAGE_SIZE and found["offset"] == 0
+    assert ids(search(limit=2, offset=2, sort="paper")) == ["Q3", "Q4"]
+
+
+def test_recording_again_replaces_the_rows(recorded):
+    version = searchIndex.index_version()
+    report = {"question_topic_mapping": [row("Q1", ["Ratio and Proportion"], 0.7)]}
+    searchIndex.record_paper("p1", recorded, report, "s1", "2020 syllabus")
+    assert search()["total"] == 1
+    assert ids(search(keywords="fraction")) == ["Q1"]
+    assert search(topic="Algebraic Fractions")["total"] == 0
+    assert searchIndex.index_version() != version
+
+
+def test_malformed_rows_are_recorded(recorded):
+    report = {"question_topic_mapping": [{"question_id": "Q9", "page": "n/a", "topics": None, "confidence": "high"}]}
+    searchIndex.record_paper("p2", {"Q9": "A question."}, report, "s1", "2020 syllabus")
+    found = search(paper_ids=["p2"])
+    assert found["results"][0]["confidence"] == 0.0
+    assert found["results"][0]["page"] is None
+    assert found["results"][0]["topics"] == []
@@ -0,0 +1,281 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+import services.reportCache as reportCache
+import services.singleFlight as singleFlight
+from services.deadline import CLIENT_DISCONNECTED, RequestCancelled, check_deadline, current_deadline
+from services.singleFlight import replay, run_once
+
+
+class FakeTicket:
+    def __init__(self):
+        self.released = 0
+
+    def release(self):
+        self.released += 1
+
+
+class Admissions:
+    """admit() for run_once that counts the tickets it hands out."""
+
+    def __init__(self):
+        self.tickets = []
+
+    async def __call__(self):
+        ticket = FakeTicket()
+        self.tickets.append(ticket)
+        return ticket
+
+
+class FakeRequest:
+    """Just enough of a Starlette request: headers and a receive() that reports a disconnect."""
+
+    def __init__(self, headers=None):
+        self.headers = headers or {}
+        self.gone = asyncio.Event()
+
+    async def receive(self):
+        await self.gone.wait()
+        return {"type": "http.disconnect"}
+
+
+# Report ids are hex digests (reportCache.make_report_id)
+R1 = "1" * 64
+R2 = "2" * 64
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(singleFlight, "_flights", {})
+    monkeypatch.setattr(singleFlight, "_keys", {})
+    monkeypatch.setattr(singleFlight, "_stats", {"started": 0, "coalesced": 0, "replayed": 0, "abandoned": 0})
+    monkeypatch.setattr(reportCache, "REPORT_DIR", tmp_path / "reports")
+
+
+async def until(condition, timeout=5.0):
+    """Yield to the loop until condition() holds."""
+    loop = asyncio.get_running_loop()
+    end = loop.time() + timeout
+    while not condition():
+        assert loop.time() < end, "timed out"
+        await asyncio.sleep(0.005)
+
+
+def test_identical_requests_share_one_computation():
+    admit = Admissions()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {"report": "r1"}
+
+    async def scenario():
+        waiters = [asyncio.ensure_future(run_once(R1, compute, admit)) for _ in range(3)]
+        await until(lambda: calls)
+        release.set()
+        return await asyncio.gather(*waiters)
+
+    results = asyncio.run(scenario())
+    assert calls == [1]
+    assert all(r is results[0] for r in results)
+    assert [t.released for t in admit.tickets] == [1]
+    assert singleFlight._flights == {}
+    assert singleFlight._stats["started"] == 1 and singleFlight._stats["coalesced"] == 2
+
+
+def test_failure_is_shared_and_not_cached():
+    admit = Admissions()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        raise ValueError("model answered garbage")
+
+    async def scenario():
+        waiters = [asyncio.ensure_future(run_once(R1, compute, admit)) for _ in range(3)]
+        await until(lambda: calls)
+        release.set()
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    errors = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert errors[0] is errors[1] is errors[2]
+    assert [t.released for t in admit.tickets] == [1]
+    assert singleFlight._flights == {}
+
+    # The next request starts afresh
+    assert asyncio.run(run_once(R1, lambda: {"report": "retry"}, admit)) == {"report": "retry"}
+    assert len(admit.tickets) == 2
+
+
+def test_different_reports_do_not_coalesce():
+    admit = Admissions()
+
+    async def scenario():
+        return await asyncio.gather(run_once(R1, lambda: {"id": "a"}, admit),
+                                    run_once(R2, lambda: {"id": "b"}, admit))
+
+    assert asyncio.run(scenario()) == [{"id": "a"}, {"id": "b"}]
+    assert len(admit.tickets) == 2
+
+
+def test_computation_runs_under_a_deadline():
+    seen = []
+
+    def compute():
+        seen.append(current_deadline())
+        return {}
+
+    asyncio.run(run_once(R1, compute, Admissions(), request=FakeRequest({"x-request-timeout": "30"})))
+    assert seen[0] is not None
+    assert 0 < seen[0].remaining() <= 30
+
+
+def test_request_queued_behind_a_starting_flight_joins_it():
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {"report": "r1"}
+
+    async def scenario():
+        gates = [asyncio.Event(), asyncio.Event()]
+        tickets = []
+
+        def gated(gate):
+            async def admit():
+                ticket = FakeTicket()
+                tickets.append(ticket)
+                await gate.wait()
+                return ticket
+            return admit
+
+        # Both queue for a slot before either has started the report
+        first = asyncio.ensure_future(run_once(R1, compute, gated(gates[0])))
+        second = asyncio.ensure_future(run_once(R1, compute, gated(gates[1])))
+        await until(lambda: len(tickets) == 2)
+        gates[0].set()
+        await until(lambda: calls)
+        gates[1].set()
+        await until(lambda: tickets[1].released)
+        release.set()
+        return await asyncio.gather(first, second), tickets
+
+    results, tickets = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert results[0] is results[1]
+    assert [t.released for t in tickets] == [1, 1]
+
+
+def test_abandoned_computation_is_cancelled(monkeypatch):
+    monkeypatch.setattr(singleFlight, "FLIGHT_ABANDON_GRACE_SECONDS", 0.01)
+    started = threading.Event()
+    stopped = []
+
+    def compute():
+        started.set()
+        while True:
+            try:
+                check_deadline()
+            except RequestCancelled as e:
+                stopped.append(e.reason)
+                raise
+            threading.Event().wait(0.005)
+
+    async def scenario():
+        request = FakeRequest()
+        waiter = asyncio.ensure_future(run_once(R1, compute, Admissions(), request=request))
+        await until(started.is_set)
+        request.gone.set()
+        with pytest.raises(RequestCancelled):
+            await waiter
+        await until(lambda: stopped)
+        await until(lambda: not singleFlight._flights)
+
+    asyncio.run(scenario())
+    assert stopped == [CLIENT_DISCONNECTED]
+    assert singleFlight._stats["abandoned"] == 1
+
+
+def test_client_rejoining_within_the_grace_period_keeps_it_running(monkeypatch):
+    monkeypatch.setattr(singleFlight, "FLIGHT_ABANDON_GRACE_SECONDS", 0.2)
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        check_deadline()
+        return {"report": "r1"}
+
+    async def scenario():
+        request = FakeRequest()
+        first = asyncio.ensure_future(run_once(R1, compute, Admissions(), request=request))
+        await until(lambda: calls)
+        request.gone.set()
+        with pytest.raises(RequestCancelled):
+            await first
+        retry = asyncio.ensure_future(run_once(R1, compute, Admissions(), request=FakeRequest()))
+        await asyncio.sleep(0.3)
+        release.set()
+        return await retry
+
+    assert asyncio.run(scenario()) == {"report": "r1"}
+    assert len(calls) == 1
+    assert singleFlight._stats["abandoned"] == 0
+
+
+def test_idempotency_key_cannot_be_reused_for_other_documents():
+    async def scenario():
+        await run_once(R1, lambda: {}, Admissions(), idempotency_key="analyze:k1")
+        with pytest.raises(HTTPException) as rejected:
+            await run_once(R2, lambda: {}, Admissions(), idempotency_key="analyze:k1")
+        return rejected.value
+
+    assert asyncio.run(scenario()).status_code == 422
+
+
+def test_replay_returns_a_finished_report():
+    def compute():
+        report = {"report": "r1"}
+        reportCache.save_report(R1, report)
+        return report
+
+    async def scenario():
+        await run_once(R1, compute, Admissions(), idempotency_key="analyze:k1")
+        return await replay("analyze:k1"), await replay("analyze:unknown")
+
+    found, missing = asyncio.run(scenario())
+    assert found == (R1, {"report": "r1"})
+    assert missing is None
+
+
+def test_replay_keeps_stale_results_out_of_the_cache():
+    async def scenario():
+        await run_once(R1, lambda: {"report": "r1", "stale": True}, Admissions(), idempotency_key="analyze:k1")
+        return await replay("analyze:k1")
+
+    assert asyncio.run(scenario()) == (R1, {"report": "r1", "stale": True})
+    assert reportCache.load_report(R1) is None
+
+
+def test_replay_of_a_failed_request_starts_again():
+    def compute():
+        raise ValueError("boom")
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await run_once(R1, compute, Admissions(), idempotency_key="analyze:k1")
+        return await replay("analyze:k1")
+
+    assert asyncio.run(scenario()) is None
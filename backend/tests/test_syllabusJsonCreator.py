@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+import services.syllabusJsonCreator as syllabusJsonCreator
+import services.syllabusVersions as syllabusVersions
+from services.syllabusJsonCreator import _generate_pair_diff, diff_sections
+from services.syllabusVersions import get_pair_diffs, pair_key
+
+OLD = {"key": "algebra", "topic": "Algebra", "text": "Solve linear equations."}
+NEW = {"key": "algebra", "topic": "Algebra", "text": "Solve linear and quadratic equations."}
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(syllabusVersions, "STORE_PATH", tmp_path / "syllabus_versions.json")
+    monkeypatch.setattr(syllabusVersions, "PAIR_DB_PATH", tmp_path / "section_diffs.db")
+    monkeypatch.setattr(syllabusVersions, "_pair_db_ready", False)
+    monkeypatch.setattr(syllabusJsonCreator, "SYLLABUS_DIFF_MODEL_TIERS", ["small", "large"])
+    monkeypatch.setattr(syllabusJsonCreator, "get_router", lambda: None)
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Scripted model: answers[model] is the raw content, optionally (content, stale)."""
+    answers, called = {}, []
+
+    def completion(client, model, **kwargs):
+        called.append(model)
+        answer = answers[model]
+        return answer if isinstance(answer, tuple) else (answer, False)
+
+    monkeypatch.setattr(syllabusJsonCreator, "guarded_completion", completion)
+    return answers, called
+
+
+def diff(status="modified", confidence=0.9):
+    return json.dumps({"syllabi_diff": [{"topic": "Algebra", "status": status, "change_summary": "Adds quadratics.",
+                                         "confidence": confidence}]})
+
+
+def pair():
+    return {"key": "algebra", "old": OLD, "new": NEW, "old_hash": "h1", "new_hash": "h2"}
+
+
+def test_confident_answer_stays_on_the_first_tier(model):
+    answers, called = model
+    answers["small"] = diff()
+    entries = _generate_pair_diff(pair())
+    assert called == ["small"]
+    assert entries[0]["section_key"] == "algebra" and entries[0]["tier"] == 0
+
+
+def test_unsure_or_malformed_answer_is_escalated(model):
+    answers, called = model
+    answers["small"] = "not json"
+    answers["large"] = diff(confidence=0.95)
+    assert _generate_pair_diff(pair())[0]["model"] == "large"
+    assert called == ["small", "large"]
+
+    answers["small"] = diff(confidence=0.1)
+    assert _generate_pair_diff(pair())[0]["tier"] == 1
+
+
+def test_malformed_last_tier_answer_raises_and_is_not_memoised(model):
+    answers, _ = model
+    answers["small"] = "not json"
+    answers["large"] = "still not json"
+    with pytest.raises(ValueError):
+        _generate_pair_diff(pair())
+    with pytest.raises(ValueError):
+        diff_sections([OLD], [NEW])
+    assert get_pair_diffs([pair_key(syllabusVersions.hash_text(OLD["text"]), syllabusVersions.hash_text(NEW["text"]))]) == {}
+
+
+def test_no_change_is_memoised_and_reused(model):
+    answers, called = model
+    answers["small"] = json.dumps({"syllabi_diff": []})
+    assert diff_sections([OLD], [NEW]) == []
+    assert diff_sections([OLD], [NEW]) == []
+    assert called == ["small"]
+
+
+def test_stale_answer_is_served_but_not_memoised(model):
+    answers, called = model
+    answers["small"] = (diff(), True)
+    assert diff_sections([OLD], [NEW])[0]["stale"] is True
+    diff_sections([OLD], [NEW])
+    assert called == ["small", "small"]
@@ -0,0 +1,66 @@
+import pytest
+
+import services.syllabusVersions as syllabusVersions
+from services.syllabusVersions import _combine, compose_diffs, register_version, version_chain
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(syllabusVersions, "STORE_PATH", tmp_path / "syllabus_versions.json")
+    monkeypatch.setattr(syllabusVersions, "PAIR_DB_PATH", tmp_path / "section_diffs.db")
+    monkeypatch.setattr(syllabusVersions, "_pair_db_ready", False)
+
+
+def change(status, summary, key="algebra", **extra):
+    return {"section_key": key, "topic": "Algebra", "status": status, "change_summary": summary,
+            "old_summary": f"old {summary}", "new_summary": f"new {summary}", **extra}
+
+
+# --- composition ---
+
+@pytest.mark.parametrize("first, second, status", [
+    ("added", "modified", "added"),
+    ("modified", "removed", "removed"),
+    ("modified", "modified", "modified"),
+    ("removed", "added", "modified"),
+])
+def test_combine_statuses(first, second, status):
+    combined = _combine(change(first, "a"), change(second, "b"))
+    assert combined["status"] == status
+    assert combined["change_summary"] == "a b"
+    assert combined["old_summary"] == "old a" and combined["new_summary"] == "new b"
+
+
+def test_added_then_removed_cancels_out():
+    assert _combine(change("added", "a"), change("removed", "b")) is None
+
+
+def test_combine_with_one_side_missing():
+    only = change("modified", "a")
+    assert _combine(None, only) is only
+    assert _combine(only, None) is only
+
+
+def test_compose_diffs_nets_out_each_section():
+    steps = [
+        {"from": "2024", "to": "2025", "syllabi_diff": [change("modified", "x"), change("added", "y", key="vectors")]},
+        {"from": "2025", "to": "2026", "syllabi_diff": [change("modified", "z"), change("removed", "w", key="vectors")]},
+    ]
+    net = compose_diffs(steps)
+    assert [e["section_key"] for e in net] == ["algebra"]
+    assert net[0]["change_summary"] == "[2024 → 2025] x [2025 → 2026] z"
+
+
+# --- versions ---
+
+def test_version_chain_rejects_unknown_labels():
+    for label in ("2024", "2025", "2026"):
+        register_version(label, f"ALGEBRA\nSyllabus {label}")
+    assert version_chain("2024") == ["2024", "2025", "2026"]
+    assert version_chain("2024", "2025") == ["2024", "2025"]
+    with pytest.raises(KeyError):
+        version_chain("2024", "2030")
+    with pytest.raises(KeyError):
+        version_chain("2019")
+    with pytest.raises(ValueError):
+        version_chain("2026", "2024")
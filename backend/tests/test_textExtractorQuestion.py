@@ -0,0 +1,39 @@
+import pymupdf
+import pytest
+
+from services.textExtractorQuestion import triage_page
+
+COVER = "READ THESE INSTRUCTIONS FIRST\n" + "Write your index number and name on all the work you hand in.\n" * 8
+FORMULAE = "Mathematical Formulae\nCurved surface area of a cone = pi r l\nVolume of a sphere = 4/3 pi r^3\n"
+QUESTION = "Find the area of a circle of radius 7 cm, correct to 3 significant figures. ______ [2]\n"
+
+
+@pytest.fixture
+def page():
+    doc = pymupdf.open()
+
+    def make(text):
+        p = doc.new_page()
+        if text:
+            p.insert_textbox(pymupdf.Rect(50, 50, 550, 700), text, fontsize=9)
+        return p
+
+    yield make
+    doc.close()
+
+
+def test_blank_cover_and_formula_pages_are_filler(page):
+    assert triage_page(page("BLANK PAGE")) == "filler"
+    assert triage_page(page(COVER)) == "filler"
+    assert triage_page(page(FORMULAE)) == "filler"
+
+
+def test_marker_page_holding_a_question_is_kept(page):
+    assert triage_page(page(FORMULAE + QUESTION)) == "question"
+    assert triage_page(page("BLANK PAGE\n" + QUESTION)) == "question"
+
+
+def test_empty_stop_and_question_pages(page):
+    assert triage_page(page("")) == "empty"
+    assert triage_page(page("Answer Scheme\n1 (a) 154")) == "stop"
+    assert triage_page(page(QUESTION)) == "question"
@@ -1,8 +1,9 @@
 "use client";
 
-import { Fragment, useEffect, useMemo, useState } from "react";
+import { memo, useCallback, useDeferredValue, useEffect, useMemo, useRef, useState } from "react";
 import type { SVGProps } from "react";
 import { Pie, PieChart, Cell, ResponsiveContainer, Tooltip } from "recharts";
+import { useIncrementalItems, VirtualList } from "../ui/virtualList";
 
 type AlignmentStatus = "aligned" | "need_review" | "out_of_scope";
 
@@ -13,12 +14,17 @@ type PaperItem = {
   status: AlignmentStatus;
   confidence: number;
   elaboration?: string;
+  model?: string;  // Cascade tier that produced the answer, e.g. "gpt-4o-mini"
+  inheritedFrom?: string;  // Near-duplicate whose mapping was reused, e.g. "2023 Prelim Q4"
 };
 
 type ModalProps = {
   isOpen: boolean;
   onClose: () => void;
   refreshToken?: number;
+  // Mapping entries from the caller instead of the stored report. Pass a longer
+  // array with the same leading entries to append results as they arrive.
+  entries?: any[];
 };
 
 type SummaryCounts = {
@@ -30,6 +36,13 @@ type SummaryCounts = {
 
 type ConfidenceLevel = "high" | "medium" | "low";
 
+// Terse reports carry no elaboration; it is fetched when a row is first expanded
+type ExplanationState = {
+  loading: boolean;
+  text?: string;
+  error?: string;
+};
+
 const statusStyles: Record<
   AlignmentStatus,
   { label: string; pillClass: string; icon: JSX.Element }
@@ -68,12 +81,111 @@ const confidenceStyles: Record<ConfidenceLevel, { label: string; pillClass: stri
 
 const palette = ["#10b981", "#f59e0b", "#ef4444", "#6366f1", "#14b8a6", "#8b5cf6", "#22c55e", "#fb7185"];
 
-export function PaperAlignmentModal({ isOpen, onClose, refreshToken = 0 }: ModalProps) {
-  const [items, setItems] = useState<PaperItem[]>([]);
+type SortKey = "question" | "topic" | "confidence_desc" | "confidence_asc";
+
+const sortLabels: Record<SortKey, string> = {
+  question: "Question order",
+  topic: "Topic A–Z",
+  confidence_desc: "Confidence: high to low",
+  confidence_asc: "Confidence: low to high",
+};
+
+// Q#, topic, confidence, status, toggle
+const rowGridClass = "grid grid-cols-[4rem_minmax(0,1fr)_8rem_10rem_3rem] items-center";
+
+// Rows of the question table are windowed; this is the collapsed row height
+const ROW_HEIGHT_ESTIMATE = 52;
+
+function sourceEntries(raw: any): any[] {
+  if (Array.isArray(raw)) return raw;
+  if (Array.isArray(raw?.report?.question_topic_mapping)) return raw.report.question_topic_mapping;
+  if (Array.isArray(raw?.question_topic_mapping)) return raw.question_topic_mapping;
+  if (Array.isArray(raw?.report?.questions)) return raw.report.questions;
+  if (Array.isArray(raw?.questions)) return raw.questions;
+  if (Array.isArray(raw?.paper_analysis)) return raw.paper_analysis;
+  if (Array.isArray(raw?.report?.paper_analysis)) return raw.report.paper_analysis;
+  return [];
+}
+
+function parseEntry(entry: any, index: number): PaperItem | null {
+  // Handle question_topic_mapping format from backend
+  const confidenceValue = parseFloat(entry?.confidence ?? "0");
+
+  let status: AlignmentStatus | undefined;
+  if (entry?.in_syllabus === false) {
+    status = "out_of_scope";
+  } else if (entry?.in_syllabus === true) {
+    // Determine status based on confidence for in-syllabus questions
+    if (confidenceValue >= 0.9) {
+      status = "aligned";
+    } else if (confidenceValue >= 0.75) {
+      status = "need_review";
+    } else {
+      status = "out_of_scope";
+    }
+  } else {
+    // Fallback to explicit status field
+    status = entry?.status;
+  }
+
+  if (status !== "aligned" && status !== "need_review" && status !== "out_of_scope") {
+    return null;
+  }
+
+  // Use question_id as-is to preserve subparts (Q1, Q3a, Q25c, etc.)
+  const questionNoRaw = entry?.question_id ?? entry?.question_no ?? `${index + 1}`;
+
+  // Handle topics array from backend
+  const topicValue = Array.isArray(entry?.topics) && entry.topics.length > 0
+    ? entry.topics.join(", ")
+    : (entry?.topic ?? "Unknown Topic");
+
+  return {
+    id: entry?.id ?? index,
+    questionNo: String(questionNoRaw),  // Display as string with subparts
+    topic: topicValue,
+    status,
+    confidence: Number.isFinite(confidenceValue) ? Math.max(0, Math.min(1, confidenceValue)) : 0,
+    elaboration: entry?.out_of_scope_reason ?? entry?.elaboration ?? "",
+    model: entry?.model,
+    inheritedFrom: entry?.inherited_from
+      ? `${entry.inherited_from.paper_id} ${entry.inherited_from.question_id}`
+      : undefined,
+  };
+}
+
+// Ties, and "question" order, keep the report's order (Q1, Q2a, Q2b, ...)
+function compareItems(sortKey: SortKey, order: Map<PaperItem, number>) {
+  return (a: PaperItem, b: PaperItem) => {
+    if (sortKey === "topic") return a.topic.localeCompare(b.topic) || order.get(a)! - order.get(b)!;
+    if (sortKey === "confidence_desc") return b.confidence - a.confidence || order.get(a)! - order.get(b)!;
+    if (sortKey === "confidence_asc") return a.confidence - b.confidence || order.get(a)! - order.get(b)!;
+    return order.get(a)! - order.get(b)!;
+  };
+}
+
+function rowKey(item: PaperItem) {
+  return String(item.id);
+}
+
+export function PaperAlignmentModal({ isOpen, onClose, refreshToken = 0, entries }: ModalProps) {
+  const [source, setSource] = useState<any[]>([]);
   const [expanded, setExpanded] = useState<Record<string, boolean>>({});
+  const [isStale, setIsStale] = useState(false);
+  const [reportId, setReportId] = useState<string | null>(null);
+  const [explanations, setExplanations] = useState<Record<string, ExplanationState>>({});
+  const [query, setQuery] = useState("");
+  const [statusFilter, setStatusFilter] = useState<AlignmentStatus | "all">("all");
+  const [confidenceFilter, setConfidenceFilter] = useState<ConfidenceLevel | "all">("all");
+  const [sortKey, setSortKey] = useState<SortKey>("question");
+  const requested = useRef(new Set<string>());
+
+  // Large reports are parsed and rendered in batches; rows appear as they are parsed
+  const { items, pending } = useIncrementalItems(entries ?? source, parseEntry);
+  const hasEntries = entries !== undefined;
 
   useEffect(() => {
-    if (!isOpen) return;
+    if (!isOpen || hasEntries) return;
 
     let isMounted = true;
 
@@ -82,7 +194,7 @@ export function PaperAlignmentModal({ isOpen, onClose, refreshToken = 0 }: Modal
         // Try to get data from sessionStorage first (from API response)
         const storedResult = sessionStorage.getItem('paperAnalysisResult');
         let raw: any = null;
-        
+
         if (storedResult) {
           raw = JSON.parse(storedResult);
           console.log('📊 Loaded paper analysis from API:', raw);
@@ -92,81 +204,24 @@ export function PaperAlignmentModal({ isOpen, onClose, refreshToken = 0 }: Modal
           raw = (data.default as any) ?? {};
           console.log('📊 Loaded from database.json:', raw);
         }
-        
-        const sourceArray = Array.isArray(raw)
-          ? raw
-          : Array.isArray(raw.report?.question_topic_mapping)
-            ? raw.report.question_topic_mapping
-          : Array.isArray(raw.question_topic_mapping)
-            ? raw.question_topic_mapping
-          : Array.isArray(raw.report?.questions)
-            ? raw.report.questions
-          : Array.isArray(raw.questions)
-            ? raw.questions
-          : Array.isArray(raw.paper_analysis)
-            ? raw.paper_analysis
-          : Array.isArray(raw.report?.paper_analysis)
-                ? raw.report.paper_analysis
-                : [];
-
-        console.log('📊 Extracted sourceArray length:', sourceArray.length);
-
-        const parsed: PaperItem[] = sourceArray
-          .map((entry: any, index: number) => {
-            // Handle question_topic_mapping format from backend
-            const confidenceValue = parseFloat(entry?.confidence ?? "0");
-            
-            let status: AlignmentStatus | undefined;
-            if (entry?.in_syllabus === false) {
-              status = "out_of_scope";
-            } else if (entry?.in_syllabus === true) {
-              // Determine status based on confidence for in-syllabus questions
-              if (confidenceValue >= 0.9) {
-                status = "aligned";
-              } else if (confidenceValue >= 0.75) {
-                status = "need_review";
-              } else {
-                status = "out_of_scope";
-              }
-            } else {
-              // Fallback to explicit status field
-              status = entry?.status;
-            }
-            
-            if (status !== "aligned" && status !== "need_review" && status !== "out_of_scope") {
-              return null;
-            }
-
-            // Use question_id as-is to preserve subparts (Q1, Q3a, Q25c, etc.)
-            const questionNoRaw = entry?.question_id ?? entry?.question_no ?? `${index + 1}`;
-            const questionNoDisplay = String(questionNoRaw);
-            const questionNoNumeric = parseFloat(String(questionNoRaw).replace(/[^0-9.]/g, '')) || index + 1;
-
-            // Handle topics array from backend
-            const topicValue = Array.isArray(entry?.topics) && entry.topics.length > 0
-              ? entry.topics.join(", ")
-              : (entry?.topic ?? "Unknown Topic");
-
-            return {
-              id: entry?.id ?? index,
-              questionNo: questionNoDisplay,  // Display as string with subparts
-              topic: topicValue,
-              status,
-              confidence: Number.isFinite(confidenceValue) ? Math.max(0, Math.min(1, confidenceValue)) : 0,
-              elaboration: entry?.out_of_scope_reason ?? entry?.elaboration ?? "",
-            };
-          })
-          .filter(Boolean) as PaperItem[];
-
-        console.log('📊 Parsed items count:', parsed.length);
+
+        const entries = sourceEntries(raw);
+        console.log('📊 Extracted sourceArray length:', entries.length);
 
         if (isMounted) {
-          setItems(parsed);
+          setSource(entries);
+          setIsStale(Boolean(raw?.stale || raw?.report?.stale));
+          setReportId(typeof raw?.report_id === "string" ? raw.report_id : null);
+          setExplanations({});
+          setExpanded({});
+          requested.current.clear();
         }
       } catch (error) {
         console.error("Failed to load paper alignment data", error);
         if (isMounted) {
-          setItems([]);
+          setSource([]);
+          setIsStale(false);
+          setReportId(null);
         }
       }
     }
@@ -176,7 +231,7 @@ export function PaperAlignmentModal({ isOpen, onClose, refreshToken = 0 }: Modal
     return () => {
       isMounted = false;
     };
-  }, [isOpen, refreshToken]);
+  }, [isOpen, refreshToken, hasEntries]);
 
   const summary = useMemo<SummaryCounts>(() => {
     if (!items.length) {
@@ -209,8 +264,75 @@ export function PaperAlignmentModal({ isOpen, onClose, refreshToken = 0 }: Modal
     }));
   }, [items]);
 
+  // Typing filters the rows in a deferred render so the input never waits on the list
+  const deferredQuery = useDeferredValue(query);
+
+  const visibleItems = useMemo(() => {
+    const needle = deferredQuery.trim().toLowerCase();
+    const order = new Map(items.map((item, index) => [item, index]));
+    return items
+      .filter(
+        (item) =>
+          (statusFilter === "all" || item.status === statusFilter) &&
+          (confidenceFilter === "all" || getConfidenceLevel(item.confidence) === confidenceFilter) &&
+          (!needle || item.topic.toLowerCase().includes(needle) || String(item.questionNo).toLowerCase().includes(needle)),
+      )
+      .sort(compareItems(sortKey, order));
+  }, [items, deferredQuery, statusFilter, confidenceFilter, sortKey]);
+
+  const loadExplanation = useCallback(async (key: string, questionId: string) => {
+    if (!reportId || requested.current.has(key)) return;
+    requested.current.add(key);
+    setExplanations((prev) => ({ ...prev, [key]: { loading: true } }));
+    try {
+      const response = await fetch(
+        `http://localhost:8000/api/reports/${reportId}/explanations/${encodeURIComponent(questionId)}`,
+      );
+      if (!response.ok) {
+        throw new Error(`Request failed (${response.status})`);
+      }
+      const data = await response.json();
+      setExplanations((prev) => ({ ...prev, [key]: { loading: false, text: data.explanation ?? "" } }));
+    } catch (error) {
+      console.error("Failed to load explanation", error);
+      // Collapsing and expanding the row again retries
+      requested.current.delete(key);
+      setExplanations((prev) => ({ ...prev, [key]: { loading: false, error: "Could not load the explanation." } }));
+    }
+  }, [reportId]);
+
+  const toggleRow = useCallback((item: PaperItem, isExpanded: boolean) => {
+    const key = rowKey(item);
+    if (!isExpanded && !item.elaboration) {
+      loadExplanation(key, String(item.questionNo));
+    }
+    setExpanded((prev) => ({
+      ...prev,
+      [key]: !prev[key],
+    }));
+  }, [loadExplanation]);
+
+  const renderRow = useCallback(
+    (item: PaperItem, rowIndex: number) => {
+      const key = rowKey(item);
+      return (
+        <PaperRow
+          item={item}
+          striped={rowIndex % 2 === 1}
+          isExpanded={expanded[key] === true}
+          hasDetails={Boolean(item.elaboration) || Boolean(reportId)}
+          explanation={explanations[key]}
+          onToggle={toggleRow}
+        />
+      );
+    },
+    [expanded, explanations, reportId, toggleRow],
+  );
+
   if (!isOpen) return null;
 
+  const isFiltered = statusFilter !== "all" || confidenceFilter !== "all" || deferredQuery.trim() !== "";
+
   return (
     <div className="mt-10 w-full overflow-hidden rounded-2xl bg-white shadow-sm ring-1 ring-slate-200">
       <div className="flex items-start justify-between border-b border-slate-100 px-6 py-4">
@@ -228,6 +350,12 @@ export function PaperAlignmentModal({ isOpen, onClose, refreshToken = 0 }: Modal
         </button>
       </div>
 
+      {isStale ? (
+        <div className="border-b border-amber-100 bg-amber-50 px-6 py-2 text-sm text-amber-800">
+          The AI service is unavailable right now. Showing the last known result, which may be out of date.
+        </div>
+      ) : null}
+
       <div className="grid gap-4 border-b border-slate-100 px-6 py-4 sm:grid-cols-3">
         <SummaryCard
           label="Aligned"
@@ -255,100 +383,80 @@ export function PaperAlignmentModal({ isOpen, onClose, refreshToken = 0 }: Modal
             <div className="flex items-center justify-between">
               <p className="text-sm font-semibold text-slate-700">Question Analysis</p>
               <p className="text-xs font-medium text-slate-500">
+                {isFiltered ? `${visibleItems.length} of ` : ""}
                 <span className="text-xs font-medium text-slate-500">{summary.total}</span> questions analyzed
+                {pending ? " (loading…)" : ""}
               </p>
             </div>
 
+            <div className="flex flex-wrap items-center gap-2 text-xs">
+              <input
+                type="search"
+                value={query}
+                onChange={(event) => setQuery(event.target.value)}
+                placeholder="Filter by topic or question"
+                className="min-w-[12rem] flex-1 rounded-lg border border-slate-200 px-3 py-2 text-sm text-slate-800 placeholder:text-slate-400 focus:border-emerald-400 focus:outline-none"
+              />
+              <select
+                value={statusFilter}
+                onChange={(event) => setStatusFilter(event.target.value as AlignmentStatus | "all")}
+                className="rounded-lg border border-slate-200 px-2 py-2 text-sm text-slate-700"
+                aria-label="Filter by status"
+              >
+                <option value="all">All statuses</option>
+                {(Object.keys(statusStyles) as AlignmentStatus[]).map((status) => (
+                  <option key={status} value={status}>{statusStyles[status].label}</option>
+                ))}
+              </select>
+              <select
+                value={confidenceFilter}
+                onChange={(event) => setConfidenceFilter(event.target.value as ConfidenceLevel | "all")}
+                className="rounded-lg border border-slate-200 px-2 py-2 text-sm text-slate-700"
+                aria-label="Filter by confidence"
+              >
+                <option value="all">Any confidence</option>
+                {(Object.keys(confidenceStyles) as ConfidenceLevel[]).map((level) => (
+                  <option key={level} value={level}>{confidenceStyles[level].label} confidence</option>
+                ))}
+              </select>
+              <select
+                value={sortKey}
+                onChange={(event) => setSortKey(event.target.value as SortKey)}
+                className="rounded-lg border border-slate-200 px-2 py-2 text-sm text-slate-700"
+                aria-label="Sort questions"
+              >
+                {(Object.keys(sortLabels) as SortKey[]).map((key) => (
+                  <option key={key} value={key}>{sortLabels[key]}</option>
+                ))}
+              </select>
+            </div>
+
             <div className="overflow-hidden rounded-xl border border-slate-100 bg-white shadow-sm ring-1 ring-slate-100">
-              {items.length === 0 ? (
+              {items.length === 0 && !pending ? (
                 <div className="px-4 py-6 text-sm text-slate-500">No analysis data found.</div>
               ) : (
-                <table className="w-full table-fixed border-separate border-spacing-0">
-                  <colgroup>
-                    <col className="w-16" />
-                    <col />
-                    <col className="w-32" />
-                    <col className="w-40" />
-                    <col className="w-12" />
-                  </colgroup>
-                  <thead>
-                    <tr className="bg-slate-300 text-xs font-semibold uppercase tracking-wide text-slate-700">
-                      <th scope="col" className="px-4 py-3 text-left">Q#</th>
-                      <th scope="col" className="px-4 py-3 text-left">Topic</th>
-                      <th scope="col" className="px-4 py-3 text-center">Confidence</th>
-                      <th scope="col" className="px-4 py-3 text-center">Status</th>
-                      <th scope="col" className="px-4 py-3 text-center">
-                        <span className="sr-only">Toggle</span>
-                      </th>
-                    </tr>
-                  </thead>
-                  <tbody className="text-sm text-slate-900">
-                    {items.map((item, rowIndex) => {
-                      const confidenceLevel = getConfidenceLevel(item.confidence);
-                      const key = String(item.id);
-                      const isExpanded = expanded[key] === true;
-                      const hasDetails = Boolean(item.elaboration);
-                      const rowBgClass = rowIndex % 2 === 0 ? "" : "bg-slate-100";
-                      return (
-                        <Fragment key={item.id}>
-                          <tr className={`${rowBgClass} transition hover:bg-slate-50`}>
-                            <td className="border-b border-slate-100 px-4 py-3 align-middle">
-                              <div className="text-sm font-semibold text-slate-800">{item.questionNo}</div>
-                            </td>
-                            <td className="border-b border-slate-100 px-4 py-3 align-middle">
-                              <span className="font-medium text-base text-slate-900 break-words">{item.topic}</span>
-                            </td>
-                            <td className="border-b border-slate-100 px-4 py-3 text-center align-middle">
-                              <span className={`inline-flex rounded-full px-3 py-1 text-xs font-semibold whitespace-nowrap ${confidenceStyles[confidenceLevel].pillClass}`}>
-                                {confidenceStyles[confidenceLevel].label}
-                              </span>
-                            </td>
-                            <td className="border-b border-slate-100 px-4 py-3 text-center align-middle">
-                              <span
-                                className={`inline-flex items-center gap-1 rounded-full px-3 py-1 text-xs font-semibold whitespace-nowrap ${statusStyles[item.status].pillClass}`}
-                              >
-                                {statusStyles[item.status].icon}
-                                {statusStyles[item.status].label}
-                              </span>
-                            </td>
-                            <td className="border-b border-slate-100 px-4 py-3 text-center align-middle">
-                              <button
-                                type="button"
-                                disabled={!hasDetails}
-                                className={`rounded-full p-[0.3rem] transition focus-visible:outline focus-visible:outline-2 focus-visible:outline-offset-2 focus-visible:outline-emerald-500 ${hasDetails ? "group cursor-pointer text-slate-400 hover:bg-slate-100 hover:text-slate-600" : "cursor-default text-slate-200"}`}
-                                onClick={() =>
-                                  hasDetails
-                                    ? setExpanded((prev) => ({
-                                        ...prev,
-                                        [key]: !prev[key],
-                                      }))
-                                    : undefined
-                                }
-                                aria-label={isExpanded ? "Hide details" : "Show details"}
-                              >
-                                <ChevronIcon
-                                  className={`h-[1.2rem] w-[1.2rem] transition ${isExpanded ? "rotate-180" : ""} ${
-                                    hasDetails ? "group-hover:scale-[1.2]" : ""
-                                  }`}
-                                />
-                              </button>
-                            </td>
-                          </tr>
-                          {isExpanded && hasDetails ? (
-                            <tr className={`${rowBgClass} transition hover:bg-slate-50`}>
-                              <td colSpan={5} className="border-b border-slate-100 px-4 pb-4 text-xs text-slate-600">
-                                <div className="flex gap-4">
-                                  <div className="h-9 w-9" />
-                                  <div className="flex-1 leading-relaxed">{item.elaboration}</div>
-                                </div>
-                              </td>
-                            </tr>
-                          ) : null}
-                        </Fragment>
-                      );
-                    })}
-                  </tbody>
-                </table>
+                <div role="table" className="text-sm text-slate-900">
+                  <div
+                    role="row"
+                    className={`${rowGridClass} bg-slate-300 text-xs font-semibold uppercase tracking-wide text-slate-700`}
+                  >
+                    <div role="columnheader" className="px-4 py-3 text-left">Q#</div>
+                    <div role="columnheader" className="px-4 py-3 text-left">Topic</div>
+                    <div role="columnheader" className="px-4 py-3 text-center">Confidence</div>
+                    <div role="columnheader" className="px-4 py-3 text-center">Status</div>
+                    <div role="columnheader" className="px-4 py-3 text-center">
+                      <span className="sr-only">Toggle</span>
+                    </div>
+                  </div>
+                  <VirtualList
+                    items={visibleItems}
+                    getKey={rowKey}
+                    renderItem={renderRow}
+                    estimateSize={ROW_HEIGHT_ESTIMATE}
+                    className="max-h-[60vh]"
+                    empty={<div className="px-4 py-6 text-sm text-slate-500">No questions match these filters.</div>}
+                  />
+                </div>
               )}
             </div>
           </div>
@@ -366,6 +474,7 @@ export function PaperAlignmentModal({ isOpen, onClose, refreshToken = 0 }: Modal
                       innerRadius={50}
                       outerRadius={80}
                       paddingAngle={3}
+                      isAnimationActive={!pending}
                     >
                       {coverageData.map((entry, index) => (
                         <Cell key={`cell-${entry.name}-${index}`} fill={entry.fill} />
@@ -389,13 +498,19 @@ export function PaperAlignmentModal({ isOpen, onClose, refreshToken = 0 }: Modal
               </div>
               <div className="divide-y divide-slate-100">
                 {coverageData.map((entry) => (
-                  <div key={entry.name} className="flex items-center justify-between px-4 py-2 text-sm text-slate-700">
+                  <button
+                    key={entry.name}
+                    type="button"
+                    onClick={() => setQuery((current) => (current === entry.name ? "" : entry.name))}
+                    className={`flex w-full items-center justify-between px-4 py-2 text-left text-sm text-slate-700 transition hover:bg-slate-50 ${query === entry.name ? "bg-emerald-50" : ""}`}
+                    aria-pressed={query === entry.name}
+                  >
                     <div className="flex items-center gap-2">
                       <span className="h-3 w-3 rounded-full" style={{ backgroundColor: entry.fill }} />
                       <span>{entry.name}</span>
                     </div>
                     <span className="text-sm font-semibold text-slate-900">{entry.value}</span>
-                  </div>
+                  </button>
                 ))}
               </div>
             </div>
@@ -406,6 +521,86 @@ export function PaperAlignmentModal({ isOpen, onClose, refreshToken = 0 }: Modal
   );
 }
 
+type PaperRowProps = {
+  item: PaperItem;
+  striped: boolean;
+  isExpanded: boolean;
+  hasDetails: boolean;
+  explanation?: ExplanationState;
+  onToggle: (item: PaperItem, isExpanded: boolean) => void;
+};
+
+// Memoized: expanding a row or loading its explanation re-renders that row only
+const PaperRow = memo(function PaperRow({ item, striped, isExpanded, hasDetails, explanation, onToggle }: PaperRowProps) {
+  const confidenceLevel = getConfidenceLevel(item.confidence);
+  const rowBgClass = striped ? "bg-slate-100" : "bg-white";
+  return (
+    <div role="rowgroup" className={`${rowBgClass} border-b border-slate-100 transition hover:bg-slate-50`}>
+      <div role="row" className={rowGridClass}>
+        <div role="cell" className="px-4 py-3">
+          <div className="text-sm font-semibold text-slate-800">{item.questionNo}</div>
+        </div>
+        <div role="cell" className="px-4 py-3">
+          <span className="font-medium text-base text-slate-900 break-words">{item.topic}</span>
+        </div>
+        <div role="cell" className="px-4 py-3 text-center">
+          <span className={`inline-flex rounded-full px-3 py-1 text-xs font-semibold whitespace-nowrap ${confidenceStyles[confidenceLevel].pillClass}`}>
+            {confidenceStyles[confidenceLevel].label}
+          </span>
+        </div>
+        <div role="cell" className="px-4 py-3 text-center">
+          <span
+            className={`inline-flex items-center gap-1 rounded-full px-3 py-1 text-xs font-semibold whitespace-nowrap ${statusStyles[item.status].pillClass}`}
+          >
+            {statusStyles[item.status].icon}
+            {statusStyles[item.status].label}
+          </span>
+        </div>
+        <div role="cell" className="px-4 py-3 text-center">
+          <button
+            type="button"
+            disabled={!hasDetails}
+            className={`rounded-full p-[0.3rem] transition focus-visible:outline focus-visible:outline-2 focus-visible:outline-offset-2 focus-visible:outline-emerald-500 ${hasDetails ? "group cursor-pointer text-slate-400 hover:bg-slate-100 hover:text-slate-600" : "cursor-default text-slate-200"}`}
+            onClick={() => {
+              if (hasDetails) onToggle(item, isExpanded);
+            }}
+            aria-label={isExpanded ? "Hide details" : "Show details"}
+          >
+            <ChevronIcon
+              className={`h-[1.2rem] w-[1.2rem] transition ${isExpanded ? "rotate-180" : ""} ${
+                hasDetails ? "group-hover:scale-[1.2]" : ""
+              }`}
+            />
+          </button>
+        </div>
+      </div>
+      {isExpanded && hasDetails ? (
+        <div role="row" className="px-4 pb-4 text-xs text-slate-600">
+          <div role="cell" className="flex gap-4">
+            <div className="h-9 w-9" />
+            <div className="flex-1 leading-relaxed">
+              {item.elaboration ? (
+                item.elaboration
+              ) : explanation?.loading ? (
+                <span className="text-slate-400">Generating explanation…</span>
+              ) : explanation?.error ? (
+                <span className="text-rose-600">{explanation.error}</span>
+              ) : (
+                explanation?.text
+              )}
+              {item.inheritedFrom ? (
+                <p className="mt-1 text-[11px] font-medium text-slate-400">Mapping reused from near-duplicate {item.inheritedFrom}</p>
+              ) : item.model ? (
+                <p className="mt-1 text-[11px] font-medium text-slate-400">Answered by {item.model}</p>
+              ) : null}
+            </div>
+          </div>
+        </div>
+      ) : null}
+    </div>
+  );
+});
+
 function SummaryCard({
   label,
       value,
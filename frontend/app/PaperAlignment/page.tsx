@@ -3,7 +3,7 @@
 import { useCallback, useState } from "react";
 import type { SVGProps } from "react";
 import { Button } from "../ui/button";
-import { AlignmentDropzones } from "../ui/reactDropzone";
+import { AlignmentDropzones, appendDocument, busyMessage, postAnalysis } from "../ui/reactDropzone";
 import { TopNav } from "../ui/topnav";
 import { PaperAlignmentModal } from "./modal";
 
@@ -44,20 +44,22 @@ export default function PaperAlignmentPage() {
     console.log('✅ Both files present, starting analysis...');
     setIsAnalyzing(true);
     try {
-      // Send both files to analyze endpoint
+      // Both files were hashed (and uploaded if new) on drop; send their hashes
       console.log('📤 Analyzing paper...');
       const formData = new FormData();
-      formData.append('paper', practiceFile);
-      formData.append('syllabus', syllabusFile);
+      await appendDocument(formData, 'paper', practiceFile);
+      await appendDocument(formData, 'syllabus', syllabusFile);
 
-      const response = await fetch('http://localhost:8000/api/analyze-paper', {
-        method: 'POST',
-        body: formData,
-      });
+      const response = await postAnalysis('http://localhost:8000/api/analyze-paper', formData);
 
       console.log('📥 Response status:', response.status);
       
       if (!response.ok) {
+        const busy = busyMessage(response);
+        if (busy) {
+          alert(busy);
+          return;
+        }
         const errorText = await response.text();
         console.error('❌ Response error:', errorText);
         throw new Error('Failed to analyze paper');
@@ -1,8 +1,9 @@
 ﻿"use client";
 
-import { useEffect, useMemo, useState } from "react";
+import { memo, useCallback, useDeferredValue, useEffect, useMemo, useState } from "react";
 import type { SVGProps } from "react";
 import { Button } from "../ui/button";
+import { useIncrementalItems, VirtualList } from "../ui/virtualList";
 
 type ChangeStatus = "added" | "removed" | "modified";
 
@@ -19,6 +20,9 @@ type ModalProps = {
   isOpen: boolean;
   onClose: () => void;
   refreshToken?: number;
+  // Diff entries from the caller instead of the stored report. Pass a longer
+  // array with the same leading entries to append results as they arrive.
+  entries?: any[];
 };
 
 const statusStyles: Record<
@@ -54,13 +58,60 @@ type SummaryCounts = {
 
 const emptyCounts: SummaryCounts = { all: 0, added: 0, removed: 0, modified: 0 };
 
-export function SyllabusChangesModal({ isOpen, onClose, refreshToken = 0 }: ModalProps) {
-  const [changes, setChanges] = useState<ChangeItem[]>([]);
+type SortKey = "status" | "title";
+
+const statusOrder: Record<ChangeStatus, number> = { added: 0, removed: 1, modified: 2 };
+
+// Cards are windowed; this is a collapsed card plus the gap below it
+const CARD_HEIGHT_ESTIMATE = 104;
+
+function sourceEntries(raw: any): any[] {
+  if (Array.isArray(raw)) return raw;
+  if (Array.isArray(raw?.changes)) return raw.changes;
+  if (Array.isArray(raw?.report?.syllabi_diff)) return raw.report.syllabi_diff;
+  if (Array.isArray(raw?.report?.changes)) return raw.report.changes;
+  if (Array.isArray(raw?.syllabi_diff)) return raw.syllabi_diff;
+  return [];
+}
+
+function parseChange(item: any, idx: number): ChangeItem | null {
+  const status = item?.status;
+  if (status !== "added" && status !== "removed" && status !== "modified") {
+    return null;
+  }
+  const title = item?.title ?? item?.topic ?? item?.topic_name ?? `Change ${idx + 1}`;
+  const change_summary = item?.change_summary ?? item?.description ?? "";
+  const old_summary = item?.old_summary ?? "";
+  const new_summary = item?.new_summary ?? "";
+  return {
+    // Index suffix keeps keys unique when the model repeats an id
+    id: `${item?.id ?? status}-${idx}`,
+    status,
+    title,
+    change_summary,
+    old_summary,
+    new_summary,
+  };
+}
+
+function changeKey(change: ChangeItem) {
+  return String(change.id);
+}
+
+export function SyllabusChangesModal({ isOpen, onClose, refreshToken = 0, entries }: ModalProps) {
+  const [source, setSource] = useState<any[]>([]);
   const [activeFilter, setActiveFilter] = useState<keyof SummaryCounts>("all");
   const [expanded, setExpanded] = useState<Record<string, boolean>>({});
+  const [isStale, setIsStale] = useState(false);
+  const [query, setQuery] = useState("");
+  const [sortKey, setSortKey] = useState<SortKey>("status");
+
+  // Large diffs are parsed and rendered in batches; cards appear as they are parsed
+  const { items: changes, pending } = useIncrementalItems(entries ?? source, parseChange);
+  const hasEntries = entries !== undefined;
 
   useEffect(() => {
-    if (!isOpen) return;
+    if (!isOpen || hasEntries) return;
 
     let isMounted = true;
 
@@ -77,49 +128,17 @@ export function SyllabusChangesModal({ isOpen, onClose, refreshToken = 0 }: Moda
           const data = await import("./database.json");
           raw = (data.default as any) ?? {};
         }
-        
-        const sourceArray = Array.isArray(raw)
-          ? raw
-          : Array.isArray(raw.changes)
-            ? raw.changes
-            : Array.isArray(raw.report?.syllabi_diff)
-              ? raw.report.syllabi_diff
-            : Array.isArray(raw.report?.changes)
-              ? raw.report.changes
-              : Array.isArray(raw.syllabi_diff)
-                ? raw.syllabi_diff
-                : [];
-
-        const parsedChanges: ChangeItem[] = sourceArray
-          .map((item, idx) => {
-            const status = item?.status;
-            if (status !== "added" && status !== "removed" && status !== "modified") {
-              return null;
-            }
-            const title = item?.title ?? item?.topic ?? item?.topic_name ?? `Change ${idx + 1}`;
-            const change_summary = item?.change_summary ?? item?.description ?? "";
-            const old_summary = item?.old_summary ?? "";
-            const new_summary = item?.new_summary ?? "";
-            return {
-              id: item?.id ?? idx,
-              status,
-              title,
-              change_summary,
-              old_summary,
-              new_summary,
-            };
-          })
-          .filter(Boolean) as ChangeItem[];
 
         if (isMounted) {
-          setChanges(parsedChanges);
+          setSource(sourceEntries(raw));
+          setIsStale(Boolean(raw?.stale || raw?.report?.stale));
           setActiveFilter("all");
           setExpanded({});
         }
       } catch (error) {
         console.error("Failed to load syllabus changes", error);
         if (isMounted) {
-          setChanges([]);
+          setSource([]);
         }
       }
     }
@@ -129,7 +148,7 @@ export function SyllabusChangesModal({ isOpen, onClose, refreshToken = 0 }: Moda
     return () => {
       isMounted = false;
     };
-  }, [isOpen, refreshToken]);
+  }, [isOpen, refreshToken, hasEntries]);
 
   const counts = useMemo(() => {
     if (!changes.length) return emptyCounts;
@@ -146,20 +165,39 @@ export function SyllabusChangesModal({ isOpen, onClose, refreshToken = 0 }: Moda
     );
   }, [changes]);
 
-  const filteredChanges =
-    activeFilter === "all"
-      ? [...changes].sort(
-          (a, b) =>
-            (a.status === "added" ? 0 : a.status === "removed" ? 1 : 2) -
-            (b.status === "added" ? 0 : b.status === "removed" ? 1 : 2),
-        )
-      : changes
-          .filter((change) => change.status === activeFilter)
-          .sort(
-            (a, b) =>
-              (a.status === "added" ? 0 : a.status === "removed" ? 1 : 2) -
-              (b.status === "added" ? 0 : b.status === "removed" ? 1 : 2),
-          );
+  // Typing filters the cards in a deferred render so the input never waits on the list
+  const deferredQuery = useDeferredValue(query);
+
+  const filteredChanges = useMemo(() => {
+    const needle = deferredQuery.trim().toLowerCase();
+    return changes
+      .filter(
+        (change) =>
+          (activeFilter === "all" || change.status === activeFilter) &&
+          (!needle ||
+            change.title.toLowerCase().includes(needle) ||
+            change.change_summary.toLowerCase().includes(needle)),
+      )
+      .sort((a, b) =>
+        sortKey === "title"
+          ? a.title.localeCompare(b.title)
+          : statusOrder[a.status] - statusOrder[b.status],
+      );
+  }, [changes, activeFilter, deferredQuery, sortKey]);
+
+  const toggleChange = useCallback((key: string) => {
+    setExpanded((prev) => ({
+      ...prev,
+      [key]: !prev[key],
+    }));
+  }, []);
+
+  const renderChange = useCallback(
+    (change: ChangeItem) => (
+      <ChangeCard change={change} isExpanded={expanded[changeKey(change)] === true} onToggle={toggleChange} />
+    ),
+    [expanded, toggleChange],
+  );
 
   if (!isOpen) return null;
 
@@ -173,6 +211,7 @@ export function SyllabusChangesModal({ isOpen, onClose, refreshToken = 0 }: Moda
             <span className="text-emerald-600">+ {counts.added} Added</span>
             <span className="text-rose-600">- {counts.removed} Removed</span>
             <span className="text-amber-600">≈ {counts.modified} Modified</span>
+            {pending ? <span className="text-xs font-medium text-slate-400">loading…</span> : null}
           </div>
         </div>
         <button
@@ -185,8 +224,14 @@ export function SyllabusChangesModal({ isOpen, onClose, refreshToken = 0 }: Moda
         </button>
       </div>
 
+      {isStale ? (
+        <div className="border-b border-amber-100 bg-amber-50 px-6 py-2 text-sm text-amber-800">
+          The AI service is unavailable right now. Showing the last known result, which may be out of date.
+        </div>
+      ) : null}
+
       <div className="border-b border-slate-100 px-6 py-3">
-        <div className="flex flex-wrap gap-2">
+        <div className="flex flex-wrap items-center gap-2">
           <FilterButton
             label="All"
             count={counts.all}
@@ -211,78 +256,39 @@ export function SyllabusChangesModal({ isOpen, onClose, refreshToken = 0 }: Moda
             active={activeFilter === "modified"}
             onClick={() => setActiveFilter("modified")}
           />
+          <div className="ml-auto flex flex-wrap items-center gap-2">
+            <input
+              type="search"
+              value={query}
+              onChange={(event) => setQuery(event.target.value)}
+              placeholder="Filter by topic"
+              className="rounded-lg border border-slate-200 px-3 py-1.5 text-sm text-slate-800 placeholder:text-slate-400 focus:border-emerald-400 focus:outline-none"
+            />
+            <select
+              value={sortKey}
+              onChange={(event) => setSortKey(event.target.value as SortKey)}
+              className="rounded-lg border border-slate-200 px-2 py-1.5 text-sm text-slate-700"
+              aria-label="Sort changes"
+            >
+              <option value="status">By change type</option>
+              <option value="title">By topic A–Z</option>
+            </select>
+          </div>
         </div>
       </div>
 
-      <div className="max-h-[70vh] overflow-y-auto overscroll-contain px-6 py-5">
-        <div className="space-y-4">
-          {filteredChanges.length === 0 ? (
-            <div className="rounded-xl border border-dashed border-slate-200 bg-slate-50 px-4 py-10 text-center text-sm text-slate-500">
-              No changes found for this filter.
-            </div>
-          ) : (
-            filteredChanges.map((change, index) => {
-              const meta = statusStyles[change.status];
-              const key = String(change.id ?? `${change.status}-${index}`);
-              const isExpanded = expanded[key] === true;
-              const hasDetails = Boolean(change.old_summary || change.new_summary);
-              return (
-                <article
-                  key={change.id ?? `${change.status}-${index}`}
-                  className="group relative overflow-hidden rounded-xl border border-slate-100 bg-white shadow-sm ring-1 ring-slate-100 transition hover:shadow-md"
-                >
-                  <div className={`absolute left-0 top-0 h-full w-1 ${meta.accentClass}`} />
-                  <div className="flex w-full flex-col gap-2 px-4 py-3">
-                    <div className="flex items-start gap-2">
-                      <div className="flex flex-1 flex-wrap items-center gap-2 text-sm font-semibold">
-                        <span className={`rounded-full px-2 py-1 text-xs ${meta.pillClass}`}>
-                          {meta.label}
-                        </span>
-                        <span className="text-slate-900">{change.title}</span>
-                      </div>
-                      <button
-                        type="button"
-                        disabled={!hasDetails}
-                        className={`rounded-full p-[0.36rem] transition focus-visible:outline focus-visible:outline-2 focus-visible:outline-offset-2 focus-visible:outline-emerald-500 ${hasDetails ? "group/chevron cursor-pointer text-slate-500 hover:bg-slate-100 hover:text-slate-700" : "cursor-default text-slate-300"}`}
-                        onClick={() =>
-                          hasDetails
-                            ? setExpanded((prev) => ({
-                                ...prev,
-                                [key]: !prev[key],
-                              }))
-                            : undefined
-                        }
-                        aria-label={isExpanded ? "Hide details" : "Show details"}
-                      >
-                        <ChevronDownIcon
-                          className={`h-6 w-6 transition ${isExpanded ? "rotate-180" : ""} ${
-                            hasDetails ? "group-hover/chevron:scale-[1.2]" : ""
-                          }`}
-                        />
-                      </button>
-                    </div>
-                    <div>
-                      <p className="text-sm text-slate-700">{change.change_summary}</p>
-                    </div>
-                    {isExpanded && hasDetails ? (
-                      <div className="grid gap-3 rounded-xl bg-slate-50 p-3 text-sm text-slate-700 md:grid-cols-2">
-                        <div>
-                          <p className="text-xs font-semibold text-slate-500">Old syllabus</p>
-                          <p className="mt-1 text-slate-800">{change.old_summary || "Not present"}</p>
-                        </div>
-                        <div>
-                          <p className="text-xs font-semibold text-slate-500">New syllabus</p>
-                          <p className="mt-1 text-slate-800">{change.new_summary || "Not present"}</p>
-                        </div>
-                      </div>
-                    ) : null}
-                  </div>
-                </article>
-              );
-            })
-          )}
-        </div>
-      </div>
+      <VirtualList
+        items={filteredChanges}
+        getKey={changeKey}
+        renderItem={renderChange}
+        estimateSize={CARD_HEIGHT_ESTIMATE}
+        className="max-h-[70vh] px-6 py-5"
+        empty={
+          <div className="rounded-xl border border-dashed border-slate-200 bg-slate-50 px-4 py-10 text-center text-sm text-slate-500">
+            {pending ? "Loading changes…" : "No changes found for this filter."}
+          </div>
+        }
+      />
 
       <div className="flex items-center justify-end gap-3 border-t border-slate-100 px-6 py-4">
         <Button variant="ghost" size="sm" onClick={onClose}>
@@ -293,6 +299,64 @@ export function SyllabusChangesModal({ isOpen, onClose, refreshToken = 0 }: Moda
   );
 }
 
+type ChangeCardProps = {
+  change: ChangeItem;
+  isExpanded: boolean;
+  onToggle: (key: string) => void;
+};
+
+// Memoized: expanding a card re-renders that card only. The bottom padding is
+// the gap between cards, so it is part of the measured height.
+const ChangeCard = memo(function ChangeCard({ change, isExpanded, onToggle }: ChangeCardProps) {
+  const meta = statusStyles[change.status];
+  const hasDetails = Boolean(change.old_summary || change.new_summary);
+  return (
+    <div className="pb-4">
+      <article className="group relative overflow-hidden rounded-xl border border-slate-100 bg-white shadow-sm ring-1 ring-slate-100 transition hover:shadow-md">
+        <div className={`absolute left-0 top-0 h-full w-1 ${meta.accentClass}`} />
+        <div className="flex w-full flex-col gap-2 px-4 py-3">
+          <div className="flex items-start gap-2">
+            <div className="flex flex-1 flex-wrap items-center gap-2 text-sm font-semibold">
+              <span className={`rounded-full px-2 py-1 text-xs ${meta.pillClass}`}>
+                {meta.label}
+              </span>
+              <span className="text-slate-900">{change.title}</span>
+            </div>
+            <button
+              type="button"
+              disabled={!hasDetails}
+              className={`rounded-full p-[0.36rem] transition focus-visible:outline focus-visible:outline-2 focus-visible:outline-offset-2 focus-visible:outline-emerald-500 ${hasDetails ? "group/chevron cursor-pointer text-slate-500 hover:bg-slate-100 hover:text-slate-700" : "cursor-default text-slate-300"}`}
+              onClick={() => (hasDetails ? onToggle(changeKey(change)) : undefined)}
+              aria-label={isExpanded ? "Hide details" : "Show details"}
+            >
+              <ChevronDownIcon
+                className={`h-6 w-6 transition ${isExpanded ? "rotate-180" : ""} ${
+                  hasDetails ? "group-hover/chevron:scale-[1.2]" : ""
+                }`}
+              />
+            </button>
+          </div>
+          <div>
+            <p className="text-sm text-slate-700">{change.change_summary}</p>
+          </div>
+          {isExpanded && hasDetails ? (
+            <div className="grid gap-3 rounded-xl bg-slate-50 p-3 text-sm text-slate-700 md:grid-cols-2">
+              <div>
+                <p className="text-xs font-semibold text-slate-500">Old syllabus</p>
+                <p className="mt-1 text-slate-800">{change.old_summary || "Not present"}</p>
+              </div>
+              <div>
+                <p className="text-xs font-semibold text-slate-500">New syllabus</p>
+                <p className="mt-1 text-slate-800">{change.new_summary || "Not present"}</p>
+              </div>
+            </div>
+          ) : null}
+        </div>
+      </article>
+    </div>
+  );
+});
+
 type FilterButtonProps = {
   label: string;
   count: number;
@@ -11,15 +11,18 @@ type ModalProps = {
   newFileName?: string | null;
 };
 
+type Justification = {
+  overview?: string;
+  key_similarities?: string[];
+  key_differences?: string[];
+  recommendation?: string;
+};
+
 type MappingReport = {
   similarity_score?: number;
   similarity_label?: string;
-  ai_justification?: {
-    overview?: string;
-    key_similarities?: string[];
-    key_differences?: string[];
-    recommendation?: string;
-  };
+  ai_justification?: Justification;
+  report_id?: string;
 };
 
 const pillStyles = {
@@ -44,6 +47,10 @@ export function SyllabusMappingModal({
 }: ModalProps) {
   const [report, setReport] = useState<MappingReport | null>(null);
   const [isLoading, setIsLoading] = useState(false);
+  // Terse reports leave the justification out; it is fetched on request
+  const [fetchedJustification, setFetchedJustification] = useState<Justification | null>(null);
+  const [isJustificationLoading, setIsJustificationLoading] = useState(false);
+  const [justificationError, setJustificationError] = useState<string | null>(null);
 
   useEffect(() => {
     if (!isOpen) return;
@@ -52,6 +59,8 @@ export function SyllabusMappingModal({
 
     async function loadReport() {
       setIsLoading(true);
+      setFetchedJustification(null);
+      setJustificationError(null);
       try {
         // Try to load from sessionStorage first (from API call)
         const storedData = sessionStorage.getItem('syllabusMappingResult');
@@ -97,10 +106,30 @@ export function SyllabusMappingModal({
   const progressBarColor = progressBarStyles[mappingLevel];
   const progressWidth = Math.max(0, Math.min(100, score ?? 0));
 
-  const justification = useMemo(
-    () => (report?.ai_justification ? { ...report.ai_justification } : {}),
-    [report?.ai_justification],
+  const justification = useMemo<Justification>(
+    () => report?.ai_justification ?? fetchedJustification ?? {},
+    [report?.ai_justification, fetchedJustification],
   );
+  const canRequestJustification = !report?.ai_justification && !fetchedJustification && Boolean(report?.report_id);
+
+  async function loadJustification() {
+    if (!report?.report_id || isJustificationLoading) return;
+    setIsJustificationLoading(true);
+    setJustificationError(null);
+    try {
+      const response = await fetch(`http://localhost:8000/api/reports/${report.report_id}/justification`);
+      if (!response.ok) {
+        throw new Error(`Request failed (${response.status})`);
+      }
+      const data = await response.json();
+      setFetchedJustification(data.ai_justification ?? {});
+    } catch (error) {
+      console.error("Failed to load justification", error);
+      setJustificationError("Could not load the justification.");
+    } finally {
+      setIsJustificationLoading(false);
+    }
+  }
 
   if (!isOpen) return null;
 
@@ -155,17 +184,31 @@ export function SyllabusMappingModal({
 
         <div className="space-y-3 rounded-2xl border border-slate-100 bg-white p-5 shadow-sm">
           <p className="text-sm font-semibold text-slate-900">AI Justification</p>
-          <div className="space-y-3 rounded-xl bg-slate-50 p-4 text-sm text-slate-700">
-            <p>{justification.overview ?? "No overview available for this comparison."}</p>
-            <JustificationList title="Key Similarities" items={justification.key_similarities} />
-            <JustificationList title="Key Differences" items={justification.key_differences} />
-            <div className="space-y-1">
-              <p className="font-semibold text-slate-800">Recommendation</p>
-              <p className="text-slate-700">
-                {justification.recommendation ?? "No recommendations provided."}
-              </p>
+          {canRequestJustification ? (
+            <div className="flex flex-wrap items-center gap-3 rounded-xl bg-slate-50 p-4 text-sm text-slate-700">
+              <button
+                type="button"
+                onClick={loadJustification}
+                disabled={isJustificationLoading}
+                className="rounded-full bg-white px-4 py-1.5 text-xs font-semibold text-slate-700 ring-1 ring-slate-200 transition hover:bg-slate-100 disabled:cursor-default disabled:text-slate-400 focus-visible:outline focus-visible:outline-2 focus-visible:outline-offset-2 focus-visible:outline-emerald-500"
+              >
+                {isJustificationLoading ? "Generating justification…" : "Show justification"}
+              </button>
+              {justificationError ? <span className="text-rose-600">{justificationError}</span> : null}
             </div>
-          </div>
+          ) : (
+            <div className="space-y-3 rounded-xl bg-slate-50 p-4 text-sm text-slate-700">
+              <p>{justification.overview ?? "No overview available for this comparison."}</p>
+              <JustificationList title="Key Similarities" items={justification.key_similarities} />
+              <JustificationList title="Key Differences" items={justification.key_differences} />
+              <div className="space-y-1">
+                <p className="font-semibold text-slate-800">Recommendation</p>
+                <p className="text-slate-700">
+                  {justification.recommendation ?? "No recommendations provided."}
+                </p>
+              </div>
+            </div>
+          )}
         </div>
 
         {isLoading ? (
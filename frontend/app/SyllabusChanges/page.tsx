@@ -1,7 +1,7 @@
 "use client";
 
 import { useCallback, useState } from "react";
-import { SyllabusDropzones } from "../ui/reactDropzone";
+import { SyllabusDropzones, appendDocument, busyMessage, postAnalysis } from "../ui/reactDropzone";
 import { TopNav } from "../ui/topnav";
 import { SyllabusChangesModal } from "./modal";
 import { SyllabusMappingModal } from "./modalMapping";
@@ -34,17 +34,19 @@ export default function SyllabusChangesPage() {
     console.log('✅ Both files present, calling API...');
     try {
       const formData = new FormData();
-      formData.append('old_syllabus', oldSyllabusFile);
-      formData.append('new_syllabus', newSyllabusFile);
+      await appendDocument(formData, 'old_syllabus', oldSyllabusFile);
+      await appendDocument(formData, 'new_syllabus', newSyllabusFile);
 
-      const response = await fetch('http://localhost:8000/api/compare-syllabi-detailed', {
-        method: 'POST',
-        body: formData,
-      });
+      const response = await postAnalysis('http://localhost:8000/api/compare-syllabi-detailed', formData);
 
       console.log('📥 Response status:', response.status);
 
       if (!response.ok) {
+        const busy = busyMessage(response);
+        if (busy) {
+          alert(busy);
+          return;
+        }
         const errorText = await response.text();
         console.error('❌ Response error:', errorText);
         throw new Error('Failed to compare syllabi');
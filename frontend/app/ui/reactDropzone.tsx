@@ -5,6 +5,95 @@ import type { SVGProps } from "react";
 import { useDropzone } from "react-dropzone";
 import { Button, CheckMappingButton, CompareSyllabiButton } from "./button";
 
+const API_BASE = 'http://localhost:8000';
+
+// One hash + negotiation + (maybe) upload per dropped file, shared by the
+// dropzone and the analysis request that follows
+const uploadedDocuments = new WeakMap<File, Promise<string>>();
+
+async function sha256Hex(file: File): Promise<string> {
+  const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+  return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function uploadDocument(file: File): Promise<string> {
+  // Web Crypto only exists in secure contexts (https or localhost); elsewhere
+  // the file is uploaded and the server's hash is used
+  if (globalThis.crypto?.subtle) {
+    const sha256 = await sha256Hex(file);
+
+    // Ask first: documents the server already holds are never re-sent
+    const negotiate = await fetch(`${API_BASE}/api/uploads/negotiate?sha256=${sha256}`);
+    if (negotiate.ok) {
+      const { documents } = await negotiate.json();
+      if (documents?.[0]?.known) {
+        console.log(`♻️ ${file.name} already on server, skipping upload`);
+        return sha256;
+      }
+    }
+  }
+
+  const formData = new FormData();
+  formData.append('file', file);
+  const response = await fetch(`${API_BASE}/api/uploads`, {
+    method: 'POST',
+    body: formData,
+  });
+  if (!response.ok) {
+    throw new Error(`Failed to upload ${file.name}`);
+  }
+  const stored = await response.json();
+  return stored.sha256;
+}
+
+/** SHA-256 of a file the server now holds, uploading it only if needed. */
+export function ensureUploaded(file: File): Promise<string> {
+  let pending = uploadedDocuments.get(file);
+  if (!pending) {
+    pending = uploadDocument(file);
+    // A failed attempt is retried on the next call
+    pending.catch(() => uploadedDocuments.delete(file));
+    uploadedDocuments.set(file, pending);
+  }
+  return pending;
+}
+
+/** Add `file` to a request as a hash reference (`<field>_sha256`) instead of its bytes. */
+export async function appendDocument(formData: FormData, field: string, file: File): Promise<void> {
+  const sha256 = await ensureUploaded(file);
+  formData.append(`${field}_sha256`, sha256);
+  formData.append(`${field}_filename`, file.name);
+}
+
+/**
+ * POST an analysis request with an Idempotency-Key. If the connection drops,
+ * the retry carries the same key and reattaches to the work already running
+ * on the server instead of starting it again.
+ */
+export async function postAnalysis(url: string, formData: FormData, retries = 2): Promise<Response> {
+  const key = typeof crypto !== 'undefined' && 'randomUUID' in crypto
+    ? crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+  for (let attempt = 0; ; attempt++) {
+    try {
+      return await fetch(url, { method: 'POST', body: formData, headers: { 'Idempotency-Key': key } });
+    } catch (error) {
+      if (attempt >= retries) throw error;
+      await new Promise((resolve) => setTimeout(resolve, 1000 * (attempt + 1)));
+    }
+  }
+}
+
+/** User-facing message when the server turned a request away under load (429/503 + Retry-After), else null. */
+export function busyMessage(response: Response): string | null {
+  if (response.status !== 429 && response.status !== 503) return null;
+  const retryAfter = Number(response.headers.get('Retry-After'));
+  const wait = Number.isFinite(retryAfter) && retryAfter > 0 ? ` in about ${Math.ceil(retryAfter)} seconds` : ' in a moment';
+  return response.status === 429
+    ? `You already have requests running. Please try again${wait}.`
+    : `The server is busy right now. Please try again${wait}.`;
+}
+
 type AlignmentDropzonesProps = {
   onFilesChange?: (practiceFile: File | null, syllabusFile: File | null) => void;
 };
@@ -14,22 +103,6 @@ export function AlignmentDropzones({ onFilesChange }: AlignmentDropzonesProps =
   const [syllabusFile, setSyllabusFile] = useState<File | null>(null);
   const [isUploading, setIsUploading] = useState(false);
 
-  const uploadPaper = async (file: File) => {
-    const formData = new FormData();
-    formData.append('file', file);
-    
-    const response = await fetch('http://localhost:8000/api/upload-paper', {
-      method: 'POST',
-      body: formData,
-    });
-    
-    if (!response.ok) {
-      throw new Error('Failed to upload paper');
-    }
-    
-    return response.json();
-  };
-
   const handlePracticeDrop = useCallback(async (acceptedFiles: File[]) => {
     const file = acceptedFiles[0];
     if (!file) return;
@@ -37,7 +110,7 @@ export function AlignmentDropzones({ onFilesChange }: AlignmentDropzonesProps =
     setPracticeFile(file);
     setIsUploading(true);
     try {
-      await uploadPaper(file);
+      await ensureUploaded(file);
       console.log('Practice paper uploaded successfully');
       onFilesChange?.(file, syllabusFile);
     } catch (error) {
@@ -54,7 +127,7 @@ export function AlignmentDropzones({ onFilesChange }: AlignmentDropzonesProps =
     setSyllabusFile(file);
     setIsUploading(true);
     try {
-      await uploadPaper(file);
+      await ensureUploaded(file);
       console.log('Syllabus uploaded successfully');
       onFilesChange?.(practiceFile, file);
     } catch (error) {
@@ -118,22 +191,6 @@ export function SyllabusDropzones({
     [onFilesChange],
   );
 
-  const uploadSyllabus = async (file: File) => {
-    const formData = new FormData();
-    formData.append('file', file);
-    
-    const response = await fetch('http://localhost:8000/api/upload-syllabus', {
-      method: 'POST',
-      body: formData,
-    });
-    
-    if (!response.ok) {
-      throw new Error('Failed to upload syllabus');
-    }
-    
-    return response.json();
-  };
-
   const handleOldDrop = useCallback(async (acceptedFiles: File[]) => {
     const file = acceptedFiles[0];
     if (!file) return;
@@ -143,7 +200,7 @@ export function SyllabusDropzones({
     notifyFilesChange(file, newFile);
     setIsUploading(true);
     try {
-      await uploadSyllabus(file);
+      await ensureUploaded(file);
       console.log('Old syllabus uploaded successfully');
     } catch (error) {
       console.error('Error uploading old syllabus:', error);
@@ -161,7 +218,7 @@ export function SyllabusDropzones({
     notifyFilesChange(oldFile, file);
     setIsUploading(true);
     try {
-      await uploadSyllabus(file);
+      await ensureUploaded(file);
       console.log('New syllabus uploaded successfully');
     } catch (error) {
       console.error('Error uploading new syllabus:', error);
@@ -189,15 +246,17 @@ export function SyllabusDropzones({
     setIsComparing(true);
     try {
       const formData = new FormData();
-      formData.append('old_syllabus', oldFile);
-      formData.append('new_syllabus', newFile);
+      await appendDocument(formData, 'old_syllabus', oldFile);
+      await appendDocument(formData, 'new_syllabus', newFile);
 
-      const response = await fetch('http://localhost:8000/api/diff-syllabus', {
-        method: 'POST',
-        body: formData,
-      });
+      const response = await postAnalysis(`${API_BASE}/api/diff-syllabus`, formData);
 
       if (!response.ok) {
+        const busy = busyMessage(response);
+        if (busy) {
+          alert(busy);
+          return;
+        }
         throw new Error('Failed to compare syllabi');
       }
 
@@ -0,0 +1,201 @@
+"use client";
+
+import { useCallback, useEffect, useMemo, useRef, useState } from "react";
+import type { ReactNode } from "react";
+
+// Entries parsed and appended per animation frame when a result set is loaded
+export const APPEND_BATCH = 100;
+
+/**
+ * Parsed items of `source`, appended in batches of `batchSize` per frame so the
+ * first rows render before a large report is fully parsed. When `source` grows
+ * (same array with entries added at the end) only the new entries are parsed;
+ * any other new source starts over. `parse` must be stable (module-level).
+ */
+export function useIncrementalItems<S, T>(
+  source: S[],
+  parse: (entry: S, index: number) => T | null,
+  batchSize = APPEND_BATCH,
+) {
+  const [items, setItems] = useState<T[]>([]);
+  const [pending, setPending] = useState(false);
+  const progress = useRef<{ source: S[]; parsed: number }>({ source: [], parsed: 0 });
+
+  useEffect(() => {
+    const previous = progress.current;
+    const extendsPrevious =
+      previous.source.length > 0 && previous.parsed <= source.length && source[0] === previous.source[0];
+    if (extendsPrevious) {
+      previous.source = source;
+    } else {
+      progress.current = { source, parsed: 0 };
+      setItems([]);
+    }
+
+    let frame = 0;
+    const step = () => {
+      const start = progress.current.parsed;
+      const end = Math.min(source.length, start + batchSize);
+      const batch: T[] = [];
+      for (let index = start; index < end; index += 1) {
+        const item = parse(source[index], index);
+        if (item !== null) batch.push(item);
+      }
+      progress.current.parsed = end;
+      if (batch.length) setItems((prev) => prev.concat(batch));
+      setPending(end < source.length);
+      if (end < source.length) frame = requestAnimationFrame(step);
+    };
+    step();
+
+    return () => cancelAnimationFrame(frame);
+  }, [source, parse, batchSize]);
+
+  return { items, pending };
+}
+
+type VirtualListProps<T> = {
+  items: T[];
+  getKey: (item: T, index: number) => string;
+  renderItem: (item: T, index: number) => ReactNode;
+  // Height in px assumed for rows that have not been measured yet
+  estimateSize: number;
+  // Rows rendered above and below the visible window
+  overscan?: number;
+  // Classes of the scroll container; give it a max height
+  className?: string;
+  empty?: ReactNode;
+};
+
+/**
+ * Windowed list: only the rows in (and near) the visible part of the scroll
+ * container are mounted. Rows may have any height and change it (e.g. when
+ * expanded); each mounted row is measured and positioned from the measured
+ * heights, unmeasured rows count as `estimateSize`.
+ */
+export function VirtualList<T>({
+  items,
+  getKey,
+  renderItem,
+  estimateSize,
+  overscan = 6,
+  className = "",
+  empty = null,
+}: VirtualListProps<T>) {
+  const containerRef = useRef<HTMLDivElement>(null);
+  const sizes = useRef(new Map<string, number>());
+  const [measured, setMeasured] = useState(0);
+  const [viewport, setViewport] = useState({ top: 0, height: 0 });
+
+  // Scroll position and container size, coalesced to one update per frame
+  useEffect(() => {
+    const container = containerRef.current;
+    if (!container) return;
+    let frame = 0;
+    const update = () => {
+      frame = 0;
+      setViewport({ top: container.scrollTop, height: container.clientHeight });
+    };
+    const schedule = () => {
+      if (!frame) frame = requestAnimationFrame(update);
+    };
+    update();
+    container.addEventListener("scroll", schedule, { passive: true });
+    const observer = typeof ResizeObserver === "undefined" ? null : new ResizeObserver(schedule);
+    observer?.observe(container);
+    return () => {
+      container.removeEventListener("scroll", schedule);
+      observer?.disconnect();
+      cancelAnimationFrame(frame);
+    };
+  }, []);
+
+  const rowObserver = useMemo(() => {
+    if (typeof ResizeObserver === "undefined") return null;
+    return new ResizeObserver((entries) => {
+      let changed = false;
+      for (const entry of entries) {
+        const key = (entry.target as HTMLElement).dataset.key;
+        if (key === undefined) continue;
+        const size = entry.borderBoxSize?.[0]?.blockSize ?? entry.target.getBoundingClientRect().height;
+        if (Math.abs((sizes.current.get(key) ?? -1) - size) > 0.5) {
+          sizes.current.set(key, size);
+          changed = true;
+        }
+      }
+      if (changed) setMeasured((version) => version + 1);
+    });
+  }, []);
+
+  useEffect(() => () => rowObserver?.disconnect(), [rowObserver]);
+
+  const measureRow = useCallback(
+    (element: HTMLDivElement | null) => {
+      if (!element || !rowObserver) return;
+      rowObserver.observe(element);
+      return () => rowObserver.unobserve(element);
+    },
+    [rowObserver],
+  );
+
+  const keys = useMemo(() => items.map(getKey), [items, getKey]);
+
+  // offsets[i] is the top of row i; offsets[keys.length] the total height.
+  // `measured` changes whenever a row's measured height does.
+  const offsets = useMemo(() => {
+    const result = new Float64Array(keys.length + 1);
+    for (let index = 0; index < keys.length; index += 1) {
+      result[index + 1] = result[index] + (sizes.current.get(keys[index]) ?? estimateSize);
+    }
+    return result;
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [keys, estimateSize, measured]);
+
+  const total = offsets[keys.length];
+  // Before the first layout pass the viewport is unknown; render one screenful
+  const viewportHeight = viewport.height || estimateSize * 10;
+  const first = Math.max(0, firstRowEndingAfter(offsets, viewport.top) - overscan);
+  const last = Math.min(keys.length, firstRowEndingAfter(offsets, viewport.top + viewportHeight) + 1 + overscan);
+
+  const rows: ReactNode[] = [];
+  for (let index = first; index < last; index += 1) {
+    rows.push(
+      <div
+        key={keys[index]}
+        data-key={keys[index]}
+        ref={measureRow}
+        className="absolute inset-x-0 top-0"
+        style={{ transform: `translateY(${offsets[index]}px)` }}
+      >
+        {renderItem(items[index], index)}
+      </div>,
+    );
+  }
+
+  return (
+    <div ref={containerRef} className={`overflow-y-auto overscroll-contain ${className}`}>
+      {items.length === 0 ? (
+        empty
+      ) : (
+        <div className="relative w-full" style={{ height: total }}>
+          {rows}
+        </div>
+      )}
+    </div>
+  );
+}
+
+// Index of the first row whose bottom edge is below `position` (binary search)
+function firstRowEndingAfter(offsets: Float64Array, position: number): number {
+  let lo = 0;
+  let hi = offsets.length - 1;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (offsets[mid + 1] > position) {
+      hi = mid;
+    } else {
+      lo = mid + 1;
+    }
+  }
+  return lo;
+}